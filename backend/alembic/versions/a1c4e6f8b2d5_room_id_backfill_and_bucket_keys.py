@@ -0,0 +1,191 @@
+"""room_id at write time: insert default, backfill progress, bucket counts keyed on room_id
+
+Revision ID: a1c4e6f8b2d5
+Revises: f2b6d8e0a4c1
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a1c4e6f8b2d5"
+down_revision: Union[str, None] = "f2b6d8e0a4c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Bucket counts per room key. {keys} is the array of room keys one event counts for.
+_AGG_SQL = """
+    SELECT
+      e.org_id, e.home_id, e.subject_id,
+      r.room_key AS room_id,
+      date_bin('15 minutes', e."timestamp", TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket_start,
+      e.stream_id, e.category,
+      COUNT(*)::int AS n,
+      (COUNT(*) FILTER (WHERE r.room_key = e.room_id))::int AS n_room_id
+    FROM {src} e
+    CROSS JOIN LATERAL (
+      SELECT DISTINCT k AS room_key
+      FROM unnest({keys}) AS u(k)
+      WHERE k IS NOT NULL AND k <> ''
+    ) r
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+_ROOM_ID_KEYS = "ARRAY[e.room_id, '*']"
+_PAYLOAD_KEYS = "ARRAY[e.room_id, e.payload->>'room', e.payload->>'area', '*']"
+
+_KEY_MATCH = """
+      c.org_id = d.org_id AND c.home_id = d.home_id AND c.subject_id = d.subject_id
+      AND c.room_id = d.room_id AND c.bucket_start = d.bucket_start
+      AND c.stream_id = d.stream_id AND c.category = d.category
+"""
+
+
+def _add_sql(src: str, keys: str) -> str:
+    return f"""
+    INSERT INTO public.event_bucket_counts AS c (
+      org_id, home_id, subject_id, room_id, bucket_start, stream_id, category, n, n_room_id
+    )
+    SELECT * FROM ({_AGG_SQL.format(src=src, keys=keys)}) d
+    ORDER BY 1, 2, 3, 4, 5, 6, 7
+    ON CONFLICT (org_id, home_id, subject_id, room_id, bucket_start, stream_id, category)
+    DO UPDATE SET n = c.n + EXCLUDED.n, n_room_id = c.n_room_id + EXCLUDED.n_room_id
+    """
+
+
+def _apply_function(keys: str) -> str:
+    old = _AGG_SQL.format(src="old_events", keys=keys)
+    return f"""
+        CREATE OR REPLACE FUNCTION public.event_bucket_counts_apply()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+          IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE public.event_bucket_counts c
+            SET n = c.n - d.n, n_room_id = c.n_room_id - d.n_room_id
+            FROM ({old}) d
+            WHERE {_KEY_MATCH};
+
+            DELETE FROM public.event_bucket_counts c
+            USING ({old}) d
+            WHERE {_KEY_MATCH}
+              AND c.n <= 0;
+          END IF;
+
+          IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {_add_sql("new_events", keys)};
+          END IF;
+
+          RETURN NULL;
+        END;
+        $$;
+    """
+
+
+def _rebuild_counts(keys: str) -> str:
+    # Under a write lock so no insert lands between truncate and the new function.
+    return f"""
+        LOCK TABLE public.events IN SHARE ROW EXCLUSIVE MODE;
+        {_apply_function(keys)}
+        TRUNCATE public.event_bucket_counts;
+        {_add_sql("public.events", keys)};
+    """
+
+
+def upgrade() -> None:
+    # Writers that bypass ingest (imports, tools) get the room_id ingest would set:
+    # same order as derive_room_id_scoped (util/room_id.py) against rooms and
+    # sensor_room_map; config/room_map.yaml is Python-only. Ingest always sets it.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION public.events_default_room_id()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+          v_room_id text := NULLIF(btrim(NEW.payload->>'room_id'), '');
+          v_name text := COALESCE(
+            NULLIF(btrim(NEW.payload->>'room'), ''),
+            NULLIF(btrim(NEW.payload->>'area'), '')
+          );
+          v_entity_id text := NULLIF(btrim(NEW.payload->>'entity_id'), '');
+          rid text;
+        BEGIN
+          -- 1) payload.room_id, if it is a room of the home
+          IF v_room_id IS NOT NULL THEN
+            SELECT r.room_id INTO rid
+            FROM public.rooms r
+            WHERE r.org_id = NEW.org_id AND r.home_id = NEW.home_id AND r.room_id = v_room_id;
+          END IF;
+
+          -- 2) payload.room / area matched to rooms.display_name (case-insensitive)
+          IF rid IS NULL AND v_name IS NOT NULL THEN
+            SELECT r.room_id INTO rid
+            FROM public.rooms r
+            WHERE r.org_id = NEW.org_id AND r.home_id = NEW.home_id
+              AND lower(r.display_name) = lower(v_name)
+            ORDER BY r.room_id
+            LIMIT 1;
+          END IF;
+
+          -- 3) active sensor_room_map entry for payload.entity_id
+          IF rid IS NULL AND v_entity_id IS NOT NULL THEN
+            SELECT m.room_id INTO rid
+            FROM public.sensor_room_map m
+            WHERE m.org_id = NEW.org_id AND m.home_id = NEW.home_id
+              AND m.entity_id = v_entity_id AND m.active;
+          END IF;
+
+          -- 4) payload-only fallback (derive_room_id): trimmed room_id / room / area
+          NEW.room_id := COALESCE(rid, v_room_id, v_name);
+          RETURN NEW;
+        END;
+        $$;
+
+        DROP TRIGGER IF EXISTS trg_events_default_room_id ON public.events;
+        CREATE TRIGGER trg_events_default_room_id
+          BEFORE INSERT ON public.events
+          FOR EACH ROW
+          WHEN (NEW.room_id IS NULL OR NEW.room_id = '')
+          EXECUTE FUNCTION public.events_default_room_id();
+        """
+    )
+
+    # Resume state for room_id_backfill.py: keyset cursor per scope.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS public.room_id_backfill_progress (
+          run_key text NOT NULL,
+          org_id text NOT NULL,
+          home_id text NOT NULL,
+          subject_id text NOT NULL,
+          last_ts timestamptz NULL,
+          last_id bigint NULL,
+          scanned bigint NOT NULL DEFAULT 0,
+          updated bigint NOT NULL DEFAULT 0,
+          done boolean NOT NULL DEFAULT false,
+          updated_at timestamptz NOT NULL DEFAULT now(),
+          PRIMARY KEY (run_key, org_id, home_id, subject_id)
+        );
+        """
+    )
+
+    # Hot queries match events.room_id only; count buckets under the same key. The
+    # backfill's UPDATEs then move counts from unresolved rows to their room.
+    op.execute(_rebuild_counts(_ROOM_ID_KEYS))
+
+
+def downgrade() -> None:
+    op.execute(_rebuild_counts(_PAYLOAD_KEYS))
+    op.execute(
+        """
+        DROP TABLE IF EXISTS public.room_id_backfill_progress;
+        DROP TRIGGER IF EXISTS trg_events_default_room_id ON public.events;
+        DROP FUNCTION IF EXISTS public.events_default_room_id();
+        """
+    )
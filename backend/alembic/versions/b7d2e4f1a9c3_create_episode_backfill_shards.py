@@ -0,0 +1,45 @@
+"""create episode_backfill_shards table
+
+Revision ID: b7d2e4f1a9c3
+Revises: 1f2b3c4d5e6f
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d2e4f1a9c3"
+down_revision: Union[str, None] = "1f2b3c4d5e6f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Shard bookkeeping for episodes_backfill.py (resume of interrupted backfills).
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS public.episode_backfill_shards (
+          run_key text NOT NULL,
+          org_id text NOT NULL,
+          home_id text NOT NULL,
+          subject_id text NOT NULL,
+          day date NOT NULL,
+          status text NOT NULL,
+          events integer NOT NULL DEFAULT 0,
+          episodes integer NOT NULL DEFAULT 0,
+          read_from timestamptz NULL,
+          read_until timestamptz NULL,
+          error text NULL,
+          updated_at timestamptz NOT NULL DEFAULT now(),
+          PRIMARY KEY (run_key, org_id, home_id, subject_id, day),
+          CONSTRAINT ck_episode_backfill_shards_status CHECK (status IN ('done', 'failed'))
+        );
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS public.episode_backfill_shards;")
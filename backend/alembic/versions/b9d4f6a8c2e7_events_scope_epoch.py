@@ -0,0 +1,73 @@
+"""events_scope_epoch: per-scope counter bumped when events are deleted or updated
+
+Revision ID: b9d4f6a8c2e7
+Revises: a1c4e6f8b2d5
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b9d4f6a8c2e7"
+down_revision: Union[str, None] = "a1c4e6f8b2d5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The scheduler's incremental rule windows (services/rules/incremental.py) only
+    # read new ids. Retention, GDPR delete and room_id_backfill.py run in other
+    # processes; the epoch tells the scheduler a scope's resident rows went stale.
+    # Dropped partitions are older than any rule window and need no bump.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS public.events_scope_epoch (
+          org_id text NOT NULL,
+          home_id text NOT NULL,
+          subject_id text NOT NULL,
+          epoch bigint NOT NULL DEFAULT 1,
+          updated_at timestamptz NOT NULL DEFAULT now(),
+          PRIMARY KEY (org_id, home_id, subject_id)
+        );
+
+        CREATE OR REPLACE FUNCTION public.events_scope_epoch_bump()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+          INSERT INTO public.events_scope_epoch AS s (org_id, home_id, subject_id)
+          SELECT DISTINCT org_id, home_id, subject_id FROM old_events
+          ORDER BY 1, 2, 3
+          ON CONFLICT (org_id, home_id, subject_id)
+          DO UPDATE SET epoch = s.epoch + 1, updated_at = now();
+          RETURN NULL;
+        END;
+        $$;
+
+        DROP TRIGGER IF EXISTS trg_events_scope_epoch_del ON public.events;
+        CREATE TRIGGER trg_events_scope_epoch_del
+          AFTER DELETE ON public.events
+          REFERENCING OLD TABLE AS old_events
+          FOR EACH STATEMENT EXECUTE FUNCTION public.events_scope_epoch_bump();
+
+        DROP TRIGGER IF EXISTS trg_events_scope_epoch_upd ON public.events;
+        CREATE TRIGGER trg_events_scope_epoch_upd
+          AFTER UPDATE ON public.events
+          REFERENCING OLD TABLE AS old_events
+          FOR EACH STATEMENT EXECUTE FUNCTION public.events_scope_epoch_bump();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_events_scope_epoch_del ON public.events;
+        DROP TRIGGER IF EXISTS trg_events_scope_epoch_upd ON public.events;
+        DROP FUNCTION IF EXISTS public.events_scope_epoch_bump();
+        DROP TABLE IF EXISTS public.events_scope_epoch;
+        """
+    )
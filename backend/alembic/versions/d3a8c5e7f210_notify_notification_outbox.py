@@ -0,0 +1,52 @@
+"""notify notification_outbox listeners on new pending rows
+
+Revision ID: d3a8c5e7f210
+Revises: b7d2e4f1a9c3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d3a8c5e7f210"
+down_revision: Union[str, None] = "b7d2e4f1a9c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Wakes tools/notification_worker.py --daemon (LISTEN notification_outbox).
+    # pg_notify is delivered on commit and folded per transaction, so a bulk
+    # enqueue sends one notification.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION public.notification_outbox_notify()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+          PERFORM pg_notify('notification_outbox', '');
+          RETURN NULL;
+        END;
+        $$;
+
+        DROP TRIGGER IF EXISTS trg_notification_outbox_notify ON public.notification_outbox;
+        CREATE TRIGGER trg_notification_outbox_notify
+          AFTER INSERT OR UPDATE OF status, next_attempt_at ON public.notification_outbox
+          FOR EACH ROW
+          WHEN (NEW.status = 'PENDING')
+          EXECUTE FUNCTION public.notification_outbox_notify();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_notification_outbox_notify ON public.notification_outbox;
+        DROP FUNCTION IF EXISTS public.notification_outbox_notify();
+        """
+    )
@@ -0,0 +1,588 @@
+"""partition events by month on timestamp
+
+Unique keys on a partitioned table must contain the partition key, so the old
+event_id key (org_id, home_id, stream_id, event_id) moves to the unpartitioned
+events_dedup table. A BEFORE INSERT trigger claims the key there and skips the row
+if it is taken, so a resend is deduplicated even with a different timestamp.
+Deletes release the key; dropping a partition releases the keys of its month.
+
+The previous retention_prune_events is kept as retention_prune_events_unpartitioned
+and renamed back on downgrade.
+
+Views on events (e.g. events_attributed_v2 from sql/p1_1_subjects.sql) are saved,
+dropped and recreated around the swap, with owner, options, grants, comment and
+materialized-view indexes. Any other object that depends on events stops the
+migration with a list of what to drop first.
+
+Revision ID: e5c1a7b3d9f4
+Revises: d3a8c5e7f210
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5c1a7b3d9f4"
+down_revision: Union[str, None] = "d3a8c5e7f210"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Months before the earliest existing event get no partition of their own beyond this
+# horizon (outliers land in events_default instead of hundreds of empty partitions).
+_MAX_BACKFILL_MONTHS = 120
+
+_INDEXES = """
+    CREATE INDEX IF NOT EXISTS ix_events_event_id ON public.events (event_id);
+    CREATE INDEX IF NOT EXISTS ix_events_timestamp ON public.events ("timestamp");
+    CREATE INDEX IF NOT EXISTS ix_events_category ON public.events (category);
+    CREATE INDEX IF NOT EXISTS ix_events_scope_ts
+      ON public.events (org_id, home_id, subject_id, "timestamp");
+    CREATE INDEX IF NOT EXISTS ix_events_scope_stream_ts
+      ON public.events (org_id, home_id, subject_id, stream_id, "timestamp");
+    CREATE INDEX IF NOT EXISTS ix_events_scope_room_ts
+      ON public.events (org_id, home_id, subject_id, room_id, "timestamp");
+"""
+
+
+# Views that depend on public.events (directly or through other views), saved
+# before the table swap and recreated after it in dependency order.
+_SAVE_DEPENDENT_VIEWS = """
+    DROP TABLE IF EXISTS pg_temp._events_dependent_views;
+    CREATE TEMP TABLE _events_dependent_views AS
+    WITH RECURSIVE deps(oid, depth) AS (
+      SELECT r.ev_class, 1
+      FROM pg_depend d
+      JOIN pg_rewrite r ON r.oid = d.objid
+      WHERE d.classid = 'pg_rewrite'::regclass
+        AND d.refclassid = 'pg_class'::regclass
+        AND d.refobjid = 'public.events'::regclass
+        AND r.ev_class <> 'public.events'::regclass
+      UNION
+      SELECT r.ev_class, deps.depth + 1
+      FROM deps
+      JOIN pg_depend d
+        ON d.refobjid = deps.oid
+       AND d.refclassid = 'pg_class'::regclass
+       AND d.classid = 'pg_rewrite'::regclass
+      JOIN pg_rewrite r ON r.oid = d.objid
+      WHERE r.ev_class <> deps.oid
+    )
+    SELECT
+      n.nspname,
+      c.relname,
+      CASE c.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END AS kind,
+      max(deps.depth) AS depth,
+      rtrim(pg_get_viewdef(c.oid), E'; \\n') AS def,
+      c.reloptions,
+      pg_get_userbyid(c.relowner) AS owner,
+      c.relowner,
+      c.relacl,
+      obj_description(c.oid, 'pg_class') AS comment,
+      ARRAY(SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i WHERE i.indrelid = c.oid)
+        AS indexes
+    FROM deps
+    JOIN pg_class c ON c.oid = deps.oid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    GROUP BY c.oid, n.nspname, c.relname, c.relkind;
+
+    DO $$
+    DECLARE
+      blockers text;
+      v record;
+    BEGIN
+      -- Anything else that would stop DROP TABLE (foreign keys into events,
+      -- BEGIN ATOMIC functions, ...): fail before touching data.
+      SELECT string_agg(DISTINCT pg_describe_object(d.classid, d.objid, d.objsubid), ', ')
+        INTO blockers
+      FROM pg_depend d
+      WHERE d.deptype = 'n'
+        AND d.classid <> 'pg_rewrite'::regclass
+        AND (
+          (d.refclassid = 'pg_class'::regclass AND d.refobjid = 'public.events'::regclass)
+          OR (d.refclassid = 'pg_type'::regclass AND d.refobjid = 'public.events'::regtype)
+        );
+      IF blockers IS NOT NULL THEN
+        RAISE EXCEPTION 'objects depend on public.events and must be dropped first: %', blockers;
+      END IF;
+
+      FOR v IN SELECT * FROM _events_dependent_views ORDER BY depth DESC, relname LOOP
+        EXECUTE format('DROP %s %I.%I', v.kind, v.nspname, v.relname);
+      END LOOP;
+    END $$;
+"""
+
+_RESTORE_DEPENDENT_VIEWS = """
+    DO $$
+    DECLARE
+      v record;
+      a record;
+      ix text;
+    BEGIN
+      FOR v IN SELECT * FROM _events_dependent_views ORDER BY depth, relname LOOP
+        EXECUTE format(
+          'CREATE %s %I.%I%s AS %s',
+          v.kind, v.nspname, v.relname,
+          CASE WHEN v.reloptions IS NULL THEN ''
+               ELSE ' WITH (' || array_to_string(v.reloptions, ', ') || ')' END,
+          v.def
+        );
+        EXECUTE format('ALTER %s %I.%I OWNER TO %I', v.kind, v.nspname, v.relname, v.owner);
+        FOR a IN
+          SELECT * FROM aclexplode(v.relacl) x WHERE x.grantee <> v.relowner
+        LOOP
+          EXECUTE format(
+            'GRANT %s ON %I.%I TO %s%s',
+            a.privilege_type, v.nspname, v.relname,
+            CASE a.grantee WHEN 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(a.grantee)) END,
+            CASE WHEN a.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END
+          );
+        END LOOP;
+        IF v.comment IS NOT NULL THEN
+          EXECUTE format('COMMENT ON %s %I.%I IS %L', v.kind, v.nspname, v.relname, v.comment);
+        END IF;
+        FOREACH ix IN ARRAY v.indexes LOOP
+          EXECUTE ix;
+        END LOOP;
+      END LOOP;
+    END $$;
+
+    DROP TABLE pg_temp._events_dependent_views;
+"""
+
+
+# event_id dedup for the partitioned table. event_row_id tells a resend (new id,
+# skipped) from the same row re-inserted by a partition move (kept).
+_DEDUP = """
+    CREATE TABLE public.events_dedup (
+      org_id text NOT NULL,
+      home_id text NOT NULL,
+      stream_id text NOT NULL,
+      event_id text NOT NULL,
+      "timestamp" timestamptz NOT NULL,
+      event_row_id bigint NOT NULL,
+      PRIMARY KEY (org_id, home_id, stream_id, event_id)
+    );
+    CREATE INDEX ix_events_dedup_timestamp ON public.events_dedup ("timestamp");
+
+    INSERT INTO public.events_dedup (
+      org_id, home_id, stream_id, event_id, "timestamp", event_row_id
+    )
+    SELECT org_id, home_id, stream_id, event_id, "timestamp", id
+    FROM public.events
+    ORDER BY "timestamp", id
+    ON CONFLICT DO NOTHING;
+
+    CREATE OR REPLACE FUNCTION public.events_dedup_claim()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+      owner_id bigint;
+    BEGIN
+      INSERT INTO public.events_dedup (
+        org_id, home_id, stream_id, event_id, "timestamp", event_row_id
+      ) VALUES (
+        NEW.org_id, NEW.home_id, NEW.stream_id, NEW.event_id, NEW."timestamp", NEW.id
+      )
+      ON CONFLICT (org_id, home_id, stream_id, event_id) DO NOTHING;
+      IF FOUND THEN
+        RETURN NEW;
+      END IF;
+
+      SELECT d.event_row_id INTO owner_id
+      FROM public.events_dedup d
+      WHERE d.org_id = NEW.org_id AND d.home_id = NEW.home_id
+        AND d.stream_id = NEW.stream_id AND d.event_id = NEW.event_id;
+      IF owner_id = NEW.id THEN
+        RETURN NEW;  -- partition move or cross-partition UPDATE of the owning row
+      END IF;
+      RETURN NULL;  -- already stored: skip (not in RETURNING, not counted)
+    END;
+    $$;
+
+    CREATE OR REPLACE FUNCTION public.events_dedup_sync()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+      IF TG_OP = 'DELETE' THEN
+        DELETE FROM public.events_dedup d
+        USING old_events o
+        WHERE d.org_id = o.org_id AND d.home_id = o.home_id
+          AND d.stream_id = o.stream_id AND d.event_id = o.event_id
+          AND d.event_row_id = o.id;
+      ELSE
+        -- key columns or timestamp changed: move the key with the row
+        UPDATE public.events_dedup d
+        SET org_id = n.org_id, home_id = n.home_id, stream_id = n.stream_id,
+            event_id = n.event_id, "timestamp" = n."timestamp"
+        FROM old_events o
+        JOIN new_events n ON n.id = o.id
+        WHERE d.org_id = o.org_id AND d.home_id = o.home_id
+          AND d.stream_id = o.stream_id AND d.event_id = o.event_id
+          AND d.event_row_id = o.id
+          AND (n.org_id, n.home_id, n.stream_id, n.event_id, n."timestamp")
+              IS DISTINCT FROM (o.org_id, o.home_id, o.stream_id, o.event_id, o."timestamp");
+      END IF;
+      RETURN NULL;
+    END;
+    $$;
+
+    CREATE TRIGGER trg_events_dedup
+      BEFORE INSERT ON public.events
+      FOR EACH ROW EXECUTE FUNCTION public.events_dedup_claim();
+    CREATE TRIGGER trg_events_dedup_del
+      AFTER DELETE ON public.events
+      REFERENCING OLD TABLE AS old_events
+      FOR EACH STATEMENT EXECUTE FUNCTION public.events_dedup_sync();
+    CREATE TRIGGER trg_events_dedup_upd
+      AFTER UPDATE ON public.events
+      REFERENCING OLD TABLE AS old_events NEW TABLE AS new_events
+      FOR EACH STATEMENT EXECUTE FUNCTION public.events_dedup_sync();
+"""
+
+_DROP_DEDUP = """
+    DROP TRIGGER IF EXISTS trg_events_dedup ON public.events;
+    DROP TRIGGER IF EXISTS trg_events_dedup_del ON public.events;
+    DROP TRIGGER IF EXISTS trg_events_dedup_upd ON public.events;
+    DROP FUNCTION IF EXISTS public.events_dedup_claim();
+    DROP FUNCTION IF EXISTS public.events_dedup_sync();
+    DROP TABLE IF EXISTS public.events_dedup;
+"""
+
+
+def upgrade() -> None:
+    # Partition helpers. Partition names are events_pYYYYMM, bounds are UTC months.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION public.events_ensure_partition(p_month date)
+        RETURNS boolean
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+          m0 date := date_trunc('month', p_month)::date;
+          m1 date := (date_trunc('month', p_month) + interval '1 month')::date;
+          lo timestamptz := (m0::timestamp AT TIME ZONE 'UTC');
+          hi timestamptz := (m1::timestamp AT TIME ZONE 'UTC');
+          part text := 'events_p' || to_char(m0, 'YYYYMM');
+        BEGIN
+          IF to_regclass('public.' || part) IS NOT NULL THEN
+            RETURN false;
+          END IF;
+          -- Build detached, move rows that fell into the default partition, then attach
+          -- (ATTACH only needs SHARE UPDATE EXCLUSIVE on events; ingest keeps running).
+          EXECUTE format(
+            'CREATE TABLE public.%I (LIKE public.events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            part
+          );
+          EXECUTE format(
+            'WITH moved AS (DELETE FROM public.events_default
+                             WHERE "timestamp" >= %L AND "timestamp" < %L RETURNING *)
+             INSERT INTO public.%I SELECT * FROM moved',
+            lo, hi, part
+          );
+          EXECUTE format(
+            'ALTER TABLE public.events ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+            part, lo, hi
+          );
+          RETURN true;
+        END;
+        $$;
+
+        CREATE OR REPLACE FUNCTION public.events_ensure_partitions(p_months_ahead integer DEFAULT 3)
+        RETURNS integer
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+          m date := date_trunc('month', now() AT TIME ZONE 'UTC')::date;
+          n integer := 0;
+        BEGIN
+          FOR i IN 0..GREATEST(p_months_ahead, 0) LOOP
+            IF public.events_ensure_partition((m + make_interval(months => i))::date) THEN
+              n := n + 1;
+            END IF;
+          END LOOP;
+          RETURN n;
+        END;
+        $$;
+        """
+    )
+
+    # Swap the heap for a partitioned table and move the data.
+    op.execute(
+        f"""
+        LOCK TABLE public.events IN ACCESS EXCLUSIVE MODE;
+        {_SAVE_DEPENDENT_VIEWS}
+
+        DO $$
+        DECLARE
+          seq text := pg_get_serial_sequence('public.events', 'id');
+        BEGIN
+          IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', seq);
+          END IF;
+        END $$;
+
+        ALTER TABLE public.events RENAME TO events_unpartitioned;
+
+        CREATE TABLE public.events (
+          LIKE public.events_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+        ) PARTITION BY RANGE ("timestamp");
+
+        CREATE TABLE public.events_default PARTITION OF public.events DEFAULT;
+
+        DO $$
+        DECLARE
+          cur_m date := date_trunc('month', now() AT TIME ZONE 'UTC')::date;
+          lo date;
+          hi date;
+          m date;
+        BEGIN
+          SELECT date_trunc('month', min("timestamp") AT TIME ZONE 'UTC')::date,
+                 date_trunc('month', max("timestamp") AT TIME ZONE 'UTC')::date
+            INTO lo, hi
+          FROM public.events_unpartitioned;
+
+          lo := GREATEST(
+            COALESCE(lo, cur_m),
+            (cur_m - make_interval(months => {_MAX_BACKFILL_MONTHS}))::date
+          );
+          hi := GREATEST(COALESCE(hi, cur_m), (cur_m + interval '3 months')::date);
+
+          m := lo;
+          WHILE m <= hi LOOP
+            PERFORM public.events_ensure_partition(m);
+            m := (m + interval '1 month')::date;
+          END LOOP;
+        END $$;
+
+        INSERT INTO public.events SELECT * FROM public.events_unpartitioned;
+
+        DROP TABLE public.events_unpartitioned;
+
+        DO $$
+        DECLARE
+          seq text;
+        BEGIN
+          SELECT pg_get_expr(d.adbin, d.adrelid) INTO seq
+          FROM pg_attrdef d
+          JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+          WHERE d.adrelid = 'public.events'::regclass AND a.attname = 'id';
+          seq := substring(seq FROM 'nextval\\(''([^'']+)''');
+          IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY public.events.id', seq);
+          END IF;
+        END $$;
+
+        -- Unique keys on a partitioned table must contain the partition key.
+        ALTER TABLE public.events
+          ADD CONSTRAINT events_pkey PRIMARY KEY (id, "timestamp");
+        ALTER TABLE public.events
+          ADD CONSTRAINT ux_events_scope_stream_event_id
+          UNIQUE (org_id, home_id, stream_id, event_id, "timestamp");
+        {_INDEXES}
+        {_DEDUP}
+        {_RESTORE_DEPENDENT_VIEWS}
+        """
+    )
+
+    # Partition-aware retention: whole months go by DETACH/DROP (global, one call per
+    # run); retention_prune_events only deletes the remainder in the boundary month.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION public.retention_drop_event_partitions(p_before timestamptz)
+        RETURNS integer
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+          r record;
+          lo timestamptz;
+          hi timestamptz;
+          n integer := 0;
+        BEGIN
+          FOR r IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'public.events'::regclass
+              AND c.relname ~ '^events_p[0-9]{6}$'
+            ORDER BY c.relname
+          LOOP
+            lo := (to_date(substr(r.relname, 9), 'YYYYMM')::timestamp AT TIME ZONE 'UTC');
+            hi := ((to_date(substr(r.relname, 9), 'YYYYMM') + interval '1 month')::timestamp
+                   AT TIME ZONE 'UTC');
+            -- upper bound of the month <= cutoff: every row is past retention
+            IF hi <= p_before THEN
+              EXECUTE format('ALTER TABLE public.events DETACH PARTITION public.%I', r.relname);
+              EXECUTE format('DROP TABLE public.%I', r.relname);
+              -- dropping a partition fires no trigger: release the month's event_id keys
+              DELETE FROM public.events_dedup
+              WHERE "timestamp" >= lo AND "timestamp" < hi;
+              n := n + 1;
+            END IF;
+          END LOOP;
+          RETURN n;
+        END;
+        $$;
+
+        -- Kept under another name for the downgrade (its ctid delete is heap-only).
+        DO $$
+        BEGIN
+          IF to_regprocedure(
+               'public.retention_prune_events(text, text, text, timestamptz, integer)'
+             ) IS NOT NULL THEN
+            DROP FUNCTION IF EXISTS
+              public.retention_prune_events_unpartitioned(text, text, text, timestamptz, integer);
+            ALTER FUNCTION public.retention_prune_events(text, text, text, timestamptz, integer)
+              RENAME TO retention_prune_events_unpartitioned;
+          END IF;
+        END $$;
+
+        CREATE FUNCTION public.retention_prune_events(
+          p_org_id text, p_home_id text, p_subject_id text, p_before timestamptz, p_limit integer
+        )
+        RETURNS integer
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+          n integer;
+        BEGIN
+          -- (id, timestamp) instead of ctid: ctid is only unique within one partition
+          WITH doomed AS (
+            SELECT id, "timestamp"
+            FROM public.events
+            WHERE org_id = p_org_id AND home_id = p_home_id AND subject_id = p_subject_id
+              AND "timestamp" < p_before
+            ORDER BY "timestamp"
+            LIMIT p_limit
+          )
+          DELETE FROM public.events e
+          USING doomed d
+          WHERE e.id = d.id AND e."timestamp" = d."timestamp";
+          GET DIAGNOSTICS n = ROW_COUNT;
+          RETURN n;
+        END;
+        $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        f"""
+        DROP FUNCTION IF EXISTS public.retention_drop_event_partitions(timestamptz);
+
+        DROP FUNCTION IF EXISTS public.retention_prune_events(text, text, text, timestamptz, integer);
+        DO $do$
+        BEGIN
+          IF to_regprocedure(
+               'public.retention_prune_events_unpartitioned(text, text, text, timestamptz, integer)'
+             ) IS NOT NULL THEN
+            ALTER FUNCTION
+              public.retention_prune_events_unpartitioned(text, text, text, timestamptz, integer)
+              RENAME TO retention_prune_events;
+          ELSE
+            -- Database upgraded before the old function was kept: recreate the heap version.
+            EXECUTE $fn$
+              CREATE FUNCTION public.retention_prune_events(
+                p_org_id text, p_home_id text, p_subject_id text,
+                p_before timestamptz, p_limit integer
+              )
+              RETURNS integer
+              LANGUAGE plpgsql
+              AS $body$
+              DECLARE
+                n integer;
+              BEGIN
+                DELETE FROM public.events
+                WHERE ctid IN (
+                  SELECT ctid
+                  FROM public.events
+                  WHERE org_id = p_org_id AND home_id = p_home_id AND subject_id = p_subject_id
+                    AND "timestamp" < p_before
+                  ORDER BY "timestamp"
+                  LIMIT p_limit
+                );
+                GET DIAGNOSTICS n = ROW_COUNT;
+                RETURN n;
+              END;
+              $body$
+            $fn$;
+          END IF;
+        END $do$;
+
+        LOCK TABLE public.events IN ACCESS EXCLUSIVE MODE;
+        {_SAVE_DEPENDENT_VIEWS}
+        {_DROP_DEDUP}
+
+        DO $$
+        DECLARE
+          seq text := pg_get_serial_sequence('public.events', 'id');
+        BEGIN
+          IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', seq);
+          END IF;
+        END $$;
+
+        ALTER TABLE public.events RENAME TO events_partitioned;
+
+        CREATE TABLE public.events (
+          LIKE public.events_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+        );
+        INSERT INTO public.events SELECT * FROM public.events_partitioned;
+        DROP TABLE public.events_partitioned;
+
+        -- events_dedup kept the old key unique; in case rows bypassed it, keep the first
+        -- row of each (scope, stream, event_id) before restoring the constraint.
+        DO $$
+        DECLARE
+          n bigint;
+        BEGIN
+          DELETE FROM public.events e
+          USING (
+            SELECT id
+            FROM (
+              SELECT id, row_number() OVER (
+                PARTITION BY org_id, home_id, stream_id, event_id
+                ORDER BY "timestamp", id
+              ) AS rn
+              FROM public.events
+            ) ranked
+            WHERE rn > 1
+          ) dup
+          WHERE e.id = dup.id;
+          GET DIAGNOSTICS n = ROW_COUNT;
+          IF n > 0 THEN
+            RAISE NOTICE 'events: removed % rows duplicating (org_id, home_id, stream_id, event_id)', n;
+          END IF;
+        END $$;
+
+        DO $$
+        DECLARE
+          seq text;
+        BEGIN
+          SELECT pg_get_expr(d.adbin, d.adrelid) INTO seq
+          FROM pg_attrdef d
+          JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+          WHERE d.adrelid = 'public.events'::regclass AND a.attname = 'id';
+          seq := substring(seq FROM 'nextval\\(''([^'']+)''');
+          IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY public.events.id', seq);
+          END IF;
+        END $$;
+
+        ALTER TABLE public.events ADD CONSTRAINT events_pkey PRIMARY KEY (id);
+        ALTER TABLE public.events
+          ADD CONSTRAINT ux_events_scope_stream_event_id
+          UNIQUE (org_id, home_id, stream_id, event_id);
+        {_INDEXES}
+        {_RESTORE_DEPENDENT_VIEWS}
+
+        DROP FUNCTION IF EXISTS public.events_ensure_partitions(integer);
+        DROP FUNCTION IF EXISTS public.events_ensure_partition(date);
+        """
+    )
@@ -0,0 +1,363 @@
+"""event_bucket_counts: 15-minute room-bucket rollup maintained by triggers on events
+
+Revision ID: f2b6d8e0a4c1
+Revises: e5c1a7b3d9f4
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b6d8e0a4c1"
+down_revision: Union[str, None] = "e5c1a7b3d9f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# One row per (scope, room key, 15-min UTC bucket, stream, category).
+#
+# Room keys match the scoring predicate: an event counts once for every distinct
+# non-empty value of room_id, payload->>'room' and payload->>'area', plus once for
+# the scope total room_id='*'. n_room_id counts only events whose events.room_id
+# equals the key (what the baseline room-bucket rollup has always counted).
+_AGG_SQL = """
+    SELECT
+      e.org_id, e.home_id, e.subject_id,
+      r.room_key AS room_id,
+      date_bin('15 minutes', e."timestamp", TIMESTAMPTZ '2000-01-01 00:00:00+00') AS bucket_start,
+      e.stream_id, e.category,
+      COUNT(*)::int AS n,
+      (COUNT(*) FILTER (WHERE r.room_key = e.room_id))::int AS n_room_id
+    FROM {src} e
+    CROSS JOIN LATERAL (
+      SELECT DISTINCT k AS room_key
+      FROM unnest(ARRAY[e.room_id, e.payload->>'room', e.payload->>'area', '*']) AS u(k)
+      WHERE k IS NOT NULL AND k <> ''
+    ) r
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+_KEY_MATCH = """
+      c.org_id = d.org_id AND c.home_id = d.home_id AND c.subject_id = d.subject_id
+      AND c.room_id = d.room_id AND c.bucket_start = d.bucket_start
+      AND c.stream_id = d.stream_id AND c.category = d.category
+"""
+
+_ADD_SQL = f"""
+    INSERT INTO public.event_bucket_counts AS c (
+      org_id, home_id, subject_id, room_id, bucket_start, stream_id, category, n, n_room_id
+    )
+    SELECT * FROM ({_AGG_SQL.format(src="{src}")}) d
+    ORDER BY 1, 2, 3, 4, 5, 6, 7
+    ON CONFLICT (org_id, home_id, subject_id, room_id, bucket_start, stream_id, category)
+    DO UPDATE SET n = c.n + EXCLUDED.n, n_room_id = c.n_room_id + EXCLUDED.n_room_id
+"""
+
+_ORIGINAL_DROP_EVENT_PARTITIONS = """
+CREATE OR REPLACE FUNCTION public.retention_drop_event_partitions(p_before timestamptz)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r record;
+  lo timestamptz;
+  hi timestamptz;
+  n integer := 0;
+BEGIN
+  FOR r IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'public.events'::regclass
+      AND c.relname ~ '^events_p[0-9]{6}$'
+    ORDER BY c.relname
+  LOOP
+    lo := (to_date(substr(r.relname, 9), 'YYYYMM')::timestamp AT TIME ZONE 'UTC');
+    hi := ((to_date(substr(r.relname, 9), 'YYYYMM') + interval '1 month')::timestamp
+           AT TIME ZONE 'UTC');
+    -- upper bound of the month <= cutoff: every row is past retention
+    IF hi <= p_before THEN
+      EXECUTE format('ALTER TABLE public.events DETACH PARTITION public.%I', r.relname);
+      EXECUTE format('DROP TABLE public.%I', r.relname);
+      -- dropping a partition fires no trigger: release the month's event_id keys
+      DELETE FROM public.events_dedup
+      WHERE "timestamp" >= lo AND "timestamp" < hi;
+      n := n + 1;
+    END IF;
+  END LOOP;
+  RETURN n;
+END;
+$$;
+"""
+
+_ORIGINAL_ROOM_BUCKET_ROLLUP = """
+CREATE OR REPLACE FUNCTION public.build_daily_room_bucket_rollup(
+  p_day date,
+  p_user uuid
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_org text;
+  v_home text;
+  v_subject text;
+  v_inserted integer := 0;
+BEGIN
+  SELECT out_org, out_home, out_subject
+    INTO v_org, v_home, v_subject
+  FROM public._baseline_resolve_scope_from_user(p_user);
+
+  DELETE FROM public.baseline_room_bucket b
+  WHERE b.org_id = v_org
+    AND b.home_id = v_home
+    AND b.subject_id = v_subject
+    AND (b.bucket_start AT TIME ZONE 'Europe/Oslo')::date = p_day;
+
+  WITH events_in_day AS (
+    SELECT
+      e.room_id,
+      (
+        date_trunc('hour', e."timestamp")
+        + (floor(extract(minute from e."timestamp") / 15)::int * interval '15 minute')
+      ) AS bucket_start,
+      (
+        date_trunc('hour', e."timestamp")
+        + (floor(extract(minute from e."timestamp") / 15)::int * interval '15 minute')
+        + interval '15 minute'
+      ) AS bucket_end,
+      e.category
+    FROM public.events e
+    WHERE e.org_id = v_org
+      AND e.home_id = v_home
+      AND e.subject_id = v_subject
+      AND e.stream_id = 'prod'
+      AND (e."timestamp" AT TIME ZONE 'Europe/Oslo')::date = p_day
+      AND e.room_id IS NOT NULL
+      AND e.room_id <> ''
+  )
+  INSERT INTO public.baseline_room_bucket (
+    org_id, home_id, subject_id, room_id,
+    bucket_start, bucket_end,
+    presence_n, motion_n, door_n
+  )
+  SELECT
+    v_org,
+    v_home,
+    v_subject,
+    t.room_id,
+    t.bucket_start,
+    t.bucket_end,
+    COUNT(*) FILTER (WHERE t.category = 'presence')::int AS presence_n,
+    COUNT(*) FILTER (WHERE t.category = 'motion')::int AS motion_n,
+    COUNT(*) FILTER (WHERE t.category = 'door')::int AS door_n
+  FROM events_in_day t
+  GROUP BY t.room_id, t.bucket_start, t.bucket_end
+  ORDER BY t.room_id, t.bucket_start;
+
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN v_inserted;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS public.event_bucket_counts (
+          org_id text NOT NULL,
+          home_id text NOT NULL,
+          subject_id text NOT NULL,
+          room_id text NOT NULL,
+          bucket_start timestamptz NOT NULL,
+          stream_id text NOT NULL,
+          category text NOT NULL,
+          n integer NOT NULL DEFAULT 0,
+          n_room_id integer NOT NULL DEFAULT 0,
+          CONSTRAINT event_bucket_counts_pkey PRIMARY KEY (
+            org_id, home_id, subject_id, room_id, bucket_start, stream_id, category
+          )
+        );
+
+        -- partition-drop retention removes whole months across scopes
+        CREATE INDEX IF NOT EXISTS ix_event_bucket_counts_bucket_start
+          ON public.event_bucket_counts (bucket_start);
+        """
+    )
+
+    # Triggers are statement-level with transition tables: one grouped upsert per
+    # ingest statement (a 500-event batch is one statement), in the same transaction.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION public.event_bucket_counts_apply()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+          IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE public.event_bucket_counts c
+            SET n = c.n - d.n, n_room_id = c.n_room_id - d.n_room_id
+            FROM ({_AGG_SQL.format(src="old_events")}) d
+            WHERE {_KEY_MATCH};
+
+            DELETE FROM public.event_bucket_counts c
+            USING ({_AGG_SQL.format(src="old_events")}) d
+            WHERE {_KEY_MATCH}
+              AND c.n <= 0;
+          END IF;
+
+          IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {_ADD_SQL.format(src="new_events")};
+          END IF;
+
+          RETURN NULL;
+        END;
+        $$;
+        """
+    )
+
+    # Backfill and attach triggers under one lock so no insert falls in between.
+    op.execute(
+        f"""
+        LOCK TABLE public.events IN SHARE ROW EXCLUSIVE MODE;
+
+        TRUNCATE public.event_bucket_counts;
+        {_ADD_SQL.format(src="public.events")};
+
+        DROP TRIGGER IF EXISTS trg_events_bucket_counts_ins ON public.events;
+        DROP TRIGGER IF EXISTS trg_events_bucket_counts_del ON public.events;
+        DROP TRIGGER IF EXISTS trg_events_bucket_counts_upd ON public.events;
+
+        CREATE TRIGGER trg_events_bucket_counts_ins
+          AFTER INSERT ON public.events
+          REFERENCING NEW TABLE AS new_events
+          FOR EACH STATEMENT EXECUTE FUNCTION public.event_bucket_counts_apply();
+        CREATE TRIGGER trg_events_bucket_counts_del
+          AFTER DELETE ON public.events
+          REFERENCING OLD TABLE AS old_events
+          FOR EACH STATEMENT EXECUTE FUNCTION public.event_bucket_counts_apply();
+        CREATE TRIGGER trg_events_bucket_counts_upd
+          AFTER UPDATE ON public.events
+          REFERENCING OLD TABLE AS old_events NEW TABLE AS new_events
+          FOR EACH STATEMENT EXECUTE FUNCTION public.event_bucket_counts_apply();
+        """
+    )
+
+    # Dropping a partition fires no trigger: clear the month's counts (and event_id
+    # keys, as before) with it.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION public.retention_drop_event_partitions(p_before timestamptz)
+        RETURNS integer
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+          r record;
+          lo timestamptz;
+          hi timestamptz;
+          n integer := 0;
+        BEGIN
+          FOR r IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'public.events'::regclass
+              AND c.relname ~ '^events_p[0-9]{6}$'
+            ORDER BY c.relname
+          LOOP
+            lo := (to_date(substr(r.relname, 9), 'YYYYMM')::timestamp AT TIME ZONE 'UTC');
+            hi := ((to_date(substr(r.relname, 9), 'YYYYMM') + interval '1 month')::timestamp
+                   AT TIME ZONE 'UTC');
+            -- upper bound of the month <= cutoff: every row is past retention
+            IF hi <= p_before THEN
+              EXECUTE format('ALTER TABLE public.events DETACH PARTITION public.%I', r.relname);
+              EXECUTE format('DROP TABLE public.%I', r.relname);
+              DELETE FROM public.events_dedup
+              WHERE "timestamp" >= lo AND "timestamp" < hi;
+              DELETE FROM public.event_bucket_counts
+              WHERE bucket_start >= lo AND bucket_start < hi;
+              n := n + 1;
+            END IF;
+          END LOOP;
+          RETURN n;
+        END;
+        $$;
+        """
+    )
+
+    # Baseline rollup reads the counts instead of scanning a day of events. Oslo
+    # midnight is 15-minute aligned, so a day is a whole range of UTC buckets.
+    op.execute(
+        """
+CREATE OR REPLACE FUNCTION public.build_daily_room_bucket_rollup(
+  p_day date,
+  p_user uuid
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_org text;
+  v_home text;
+  v_subject text;
+  v_inserted integer := 0;
+BEGIN
+  SELECT out_org, out_home, out_subject
+    INTO v_org, v_home, v_subject
+  FROM public._baseline_resolve_scope_from_user(p_user);
+
+  DELETE FROM public.baseline_room_bucket b
+  WHERE b.org_id = v_org
+    AND b.home_id = v_home
+    AND b.subject_id = v_subject
+    AND (b.bucket_start AT TIME ZONE 'Europe/Oslo')::date = p_day;
+
+  INSERT INTO public.baseline_room_bucket (
+    org_id, home_id, subject_id, room_id,
+    bucket_start, bucket_end,
+    presence_n, motion_n, door_n
+  )
+  SELECT
+    v_org,
+    v_home,
+    v_subject,
+    c.room_id,
+    c.bucket_start,
+    c.bucket_start + interval '15 minute',
+    COALESCE(SUM(c.n_room_id) FILTER (WHERE c.category = 'presence'), 0)::int AS presence_n,
+    COALESCE(SUM(c.n_room_id) FILTER (WHERE c.category = 'motion'), 0)::int AS motion_n,
+    COALESCE(SUM(c.n_room_id) FILTER (WHERE c.category = 'door'), 0)::int AS door_n
+  FROM public.event_bucket_counts c
+  WHERE c.org_id = v_org
+    AND c.home_id = v_home
+    AND c.subject_id = v_subject
+    AND c.stream_id = 'prod'
+    AND c.room_id <> '*'
+    AND c.n_room_id > 0
+    AND c.bucket_start >= (p_day::timestamp AT TIME ZONE 'Europe/Oslo')
+    AND c.bucket_start < ((p_day + 1)::timestamp AT TIME ZONE 'Europe/Oslo')
+  GROUP BY c.room_id, c.bucket_start
+  ORDER BY c.room_id, c.bucket_start;
+
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN v_inserted;
+END $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(_ORIGINAL_ROOM_BUCKET_ROLLUP)
+    op.execute(_ORIGINAL_DROP_EVENT_PARTITIONS)
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_events_bucket_counts_ins ON public.events;
+        DROP TRIGGER IF EXISTS trg_events_bucket_counts_del ON public.events;
+        DROP TRIGGER IF EXISTS trg_events_bucket_counts_upd ON public.events;
+        DROP FUNCTION IF EXISTS public.event_bucket_counts_apply();
+        DROP TABLE IF EXISTS public.event_bucket_counts;
+        """
+    )
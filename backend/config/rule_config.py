@@ -20,6 +20,53 @@ class RuleConfig:
     def scheduler_default_subject_key(self) -> str:
         return str(self.raw.get("scheduler", {}).get("default_subject_key", "default"))
 
+    def scheduler_snapshot_lookback_minutes(self) -> int:
+        # Semantikk: scheduler.snapshot_lookback_minutes -> 1440 (24h, covers R-005/R-006/R-010),
+        # never shorter than the longest enabled rule lookback.
+        raw = self.raw.get("scheduler", {}).get("snapshot_lookback_minutes", 1440)
+        try:
+            minutes = int(raw)
+        except Exception:
+            minutes = 1440
+        rules = self.raw.get("rules", {}) if isinstance(self.raw, dict) else {}
+        for rid in rules.keys():
+            if self.rule_enabled_in_scheduler(rid):
+                minutes = max(minutes, self.rule_lookback_minutes(rid))
+        return minutes
+
+    def scheduler_max_parallel_scopes(self) -> int:
+        # Semantikk: scheduler.max_parallel_scopes -> 4 (worker pool cap for rule-engine fan-out), min 1.
+        raw = self.raw.get("scheduler", {}).get("max_parallel_scopes", 4)
+        try:
+            return max(1, int(raw))
+        except Exception:
+            return 4
+
+    def _scheduler_incremental(self) -> Dict[str, Any]:
+        inc = self.raw.get("scheduler", {}).get("incremental", {})
+        return inc if isinstance(inc, dict) else {}
+
+    def scheduler_incremental_enabled(self) -> bool:
+        # Semantikk: scheduler.incremental.enabled -> False when the key is absent (full-window
+        # snapshot every tick). Only saves DB reads: the rules still evaluate the whole window.
+        return bool(self._scheduler_incremental().get("enabled", False))
+
+    def scheduler_incremental_rebuild_every_ticks(self) -> int:
+        # Semantikk: scheduler.incremental.rebuild_every_ticks -> 12; every Nth tick reloads
+        # the full window and verifies the delta state against it. Min 1 (= always full).
+        try:
+            return max(1, int(self._scheduler_incremental().get("rebuild_every_ticks", 12)))
+        except Exception:
+            return 12
+
+    def scheduler_incremental_id_overlap(self) -> int:
+        # Semantikk: scheduler.incremental.id_overlap -> 1000 event ids re-read below the
+        # watermark each tick (late-committing ingest transactions).
+        try:
+            return max(0, int(self._scheduler_incremental().get("id_overlap", 1000)))
+        except Exception:
+            return 1000
+
     def defaults_lookback_minutes(self) -> int:
         defaults = self.raw.get("defaults", {}) if isinstance(self.raw, dict) else {}
         return int(defaults.get("lookback_minutes", 60))
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Parallel episode backfill over (scope, day) shards.
+
+- One shard per scope per UTC day; shards run in a process pool (--workers).
+- A shard owns the episodes that START in its day. It reads events from the last
+  reset point before the day (every recently active room quiet for >= PRESENCE_HOLD_S,
+  so no episode can be open) up to the first reset point after it. Episodes that
+  cross midnight are therefore built exactly as one contiguous run would build
+  them, without shards sharing state.
+- A shard replaces its owned episodes and marks itself done in
+  episode_backfill_shards in one transaction. Re-running with the same --run-key
+  skips done shards, so an interrupted backfill resumes where it stopped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import psycopg2
+
+from episodes_build import (
+    DOOR_CONTEXT_WINDOW_S,
+    INSERT_MODES,
+    PRESENCE_HOLD_S,
+    EpisodeDraft,
+    build_episodes,
+    db_dsn_from_env,
+    fetch_events,
+    insert_episodes,
+    parse_duration_seconds,
+    resolve_scope,
+    utc_now,
+)
+
+# Same room key as episodes_build.extract_room (payload.room, fallback payload.area).
+_ROOM_SQL = "NULLIF(btrim(COALESCE(payload->>'room', payload->>'area')), '')"
+
+
+@dataclass(frozen=True)
+class Shard:
+    org_id: str
+    home_id: str
+    subject_id: str
+    day: date
+
+    @property
+    def day_start(self) -> datetime:
+        return datetime.combine(self.day, dt_time(0, 0), tzinfo=timezone.utc)
+
+    @property
+    def day_end(self) -> datetime:
+        return self.day_start + timedelta(days=1)
+
+    @property
+    def key(self) -> Tuple[str, str, str, date]:
+        return (self.org_id, self.home_id, self.subject_id, self.day)
+
+
+def plan_shards(
+    scopes: Iterable[Tuple[str, str, str]], since_day: date, until_day: date
+) -> List[Shard]:
+    """All (scope, day) shards for days in [since_day, until_day), oldest day first."""
+    days = []
+    d = since_day
+    while d < until_day:
+        days.append(d)
+        d += timedelta(days=1)
+    scopes = list(dict.fromkeys(scopes))
+    return [Shard(o, h, s, day) for day in days for (o, h, s) in scopes]
+
+
+def owned_episodes(
+    eps: Iterable[EpisodeDraft], day_start: datetime, day_end: datetime
+) -> Iterator[EpisodeDraft]:
+    for ep in eps:
+        if day_start <= ep.start_ts < day_end:
+            yield ep
+
+
+def read_bounds(
+    conn, shard: Shard, *, stream_id: str, max_carry: timedelta
+) -> Tuple[datetime, datetime]:
+    """
+    Event window [read_from, read_until) that reproduces a contiguous run for the
+    episodes owned by shard.
+
+    read_from:  per room active within PRESENCE_HOLD_S before day_start, its last
+                event preceded by a gap >= PRESENCE_HOLD_S (state is empty there);
+                the earliest of those, at most max_carry back.
+    read_until: per room active before day_end, its first such reset event after
+                day_end (+ door context window); the latest of those, at most
+                max_carry ahead.
+    """
+    hold = timedelta(seconds=PRESENCE_HOLD_S)
+    door_w = timedelta(seconds=DOOR_CONTEXT_WINDOW_S)
+    base = {
+        "org_id": shard.org_id,
+        "home_id": shard.home_id,
+        "subject_id": shard.subject_id,
+        "stream_id": stream_id,
+        "hold": hold,
+    }
+    scope_where = f"""
+              org_id = %(org_id)s AND home_id = %(home_id)s AND subject_id = %(subject_id)s
+              AND stream_id = %(stream_id)s
+              AND category IN ('presence','motion','door')
+              AND {_ROOM_SQL} IS NOT NULL
+    """
+
+    lo = shard.day_start - max_carry
+    hi = shard.day_end + max_carry
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH ev AS (
+              SELECT {_ROOM_SQL} AS room, "timestamp" AS ts,
+                     "timestamp" - LAG("timestamp") OVER (
+                       PARTITION BY {_ROOM_SQL} ORDER BY "timestamp", id
+                     ) AS gap
+              FROM events
+              WHERE {scope_where}
+                AND "timestamp" >= %(lo)s AND "timestamp" < %(day_start)s
+            )
+            SELECT MIN(COALESCE(reset_ts, %(lo)s))
+            FROM (
+              SELECT room, MAX(ts) FILTER (WHERE gap >= %(hold)s) AS reset_ts
+              FROM ev
+              GROUP BY room
+              HAVING MAX(ts) > %(day_start)s - %(hold)s - %(door_w)s
+            ) r
+            """,
+            {**base, "lo": lo, "day_start": shard.day_start, "door_w": door_w},
+        )
+        read_from = cur.fetchone()[0] or shard.day_start
+
+        cur.execute(
+            f"""
+            WITH ev AS (
+              SELECT {_ROOM_SQL} AS room, "timestamp" AS ts,
+                     "timestamp" - LAG("timestamp") OVER (
+                       PARTITION BY {_ROOM_SQL} ORDER BY "timestamp", id
+                     ) AS gap
+              FROM events
+              WHERE {scope_where}
+                AND "timestamp" >= %(day_end)s - %(hold)s - %(door_w)s
+                AND "timestamp" < %(hi)s
+            )
+            SELECT MAX(COALESCE(reset_ts, %(hi)s))
+            FROM (
+              SELECT room,
+                     MIN(ts) FILTER (
+                       WHERE ts >= %(day_end)s AND (gap IS NULL OR gap >= %(hold)s)
+                     ) AS reset_ts
+              FROM ev
+              GROUP BY room
+              HAVING bool_or(ts < %(day_end)s)
+            ) r
+            """,
+            {**base, "hi": hi, "day_end": shard.day_end, "door_w": door_w},
+        )
+        reset_after = cur.fetchone()[0]
+
+    if reset_after is None:
+        read_until = shard.day_end
+    else:
+        # door_after of an episode closed at the reset may see doors up to window later
+        read_until = max(shard.day_end, reset_after + door_w + timedelta(seconds=1))
+    return min(read_from, shard.day_start), min(read_until, hi)
+
+
+def delete_owned(conn, shard: Shard) -> int:
+    """Delete episodes starting in the shard day (no commit; see run_shard)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM episodes
+            WHERE org_id = %s AND home_id = %s AND subject_id = %s
+              AND start_ts >= %s AND start_ts < %s
+            """,
+            (shard.org_id, shard.home_id, shard.subject_id, shard.day_start, shard.day_end),
+        )
+        return int(cur.rowcount or 0)
+
+
+def mark_shard(
+    conn,
+    run_key: str,
+    shard: Shard,
+    status: str,
+    *,
+    events: int = 0,
+    episodes: int = 0,
+    read_from: Optional[datetime] = None,
+    read_until: Optional[datetime] = None,
+    error: Optional[str] = None,
+) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO episode_backfill_shards (
+              run_key, org_id, home_id, subject_id, day,
+              status, events, episodes, read_from, read_until, error, updated_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now())
+            ON CONFLICT (run_key, org_id, home_id, subject_id, day) DO UPDATE SET
+              status = EXCLUDED.status,
+              events = EXCLUDED.events,
+              episodes = EXCLUDED.episodes,
+              read_from = EXCLUDED.read_from,
+              read_until = EXCLUDED.read_until,
+              error = EXCLUDED.error,
+              updated_at = now()
+            """,
+            (
+                run_key,
+                shard.org_id,
+                shard.home_id,
+                shard.subject_id,
+                shard.day,
+                status,
+                events,
+                episodes,
+                read_from,
+                read_until,
+                error,
+            ),
+        )
+
+
+def done_shards(conn, run_key: str) -> Set[Tuple[str, str, str, date]]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT org_id, home_id, subject_id, day
+            FROM episode_backfill_shards
+            WHERE run_key = %s AND status = 'done'
+            """,
+            (run_key,),
+        )
+        return {(r[0], r[1], r[2], r[3]) for r in cur.fetchall()}
+
+
+def run_shard(dsn: str, run_key: str, shard: Shard, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build one shard in its own connection (process-pool worker).
+
+    Delete of owned episodes, the streaming read, the inserts and the done-mark
+    commit together; on failure everything rolls back and the shard is marked failed.
+    """
+    t0 = time.monotonic()
+    out: Dict[str, Any] = {
+        "org_id": shard.org_id,
+        "home_id": shard.home_id,
+        "subject_id": shard.subject_id,
+        "day": shard.day.isoformat(),
+    }
+    conn = psycopg2.connect(dsn)
+    try:
+        try:
+            read_from, read_until = read_bounds(
+                conn,
+                shard,
+                stream_id=opts["stream_id"],
+                max_carry=timedelta(seconds=opts["max_carry_s"]),
+            )
+            deleted = delete_owned(conn, shard)
+
+            counts = {"events": 0}
+
+            def counted():
+                for ev in fetch_events(
+                    conn,
+                    read_from,
+                    read_until,
+                    shard.org_id,
+                    shard.home_id,
+                    shard.subject_id,
+                    itersize=opts["itersize"],
+                ):
+                    counts["events"] += 1
+                    yield ev
+
+            written = insert_episodes(
+                conn,
+                owned_episodes(build_episodes(counted()), shard.day_start, shard.day_end),
+                dry_run=False,
+                org_id=shard.org_id,
+                home_id=shard.home_id,
+                subject_id=shard.subject_id,
+                mode=opts["insert_mode"],
+                page_size=opts["page_size"],
+                commit=False,
+            )
+            mark_shard(
+                conn,
+                run_key,
+                shard,
+                "done",
+                events=counts["events"],
+                episodes=written,
+                read_from=read_from,
+                read_until=read_until,
+            )
+            conn.commit()
+            out.update(
+                status="done",
+                events=counts["events"],
+                episodes=written,
+                deleted=deleted,
+                read_from=read_from.isoformat(),
+                read_until=read_until.isoformat(),
+            )
+        except Exception as e:
+            out.update(status="failed", error=f"{type(e).__name__}: {e}")
+            try:
+                conn.rollback()
+                mark_shard(conn, run_key, shard, "failed", error=out["error"])
+                conn.commit()
+            except Exception:
+                # Connection lost: the shard simply stays not-done and is retried.
+                pass
+    finally:
+        conn.close()
+    out["seconds"] = round(time.monotonic() - t0, 3)
+    return out
+
+
+def list_scopes(conn, args) -> List[Tuple[str, str, str]]:
+    if args.all_scopes:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT org_id, home_id, subject_id
+                FROM api_key_scopes
+                WHERE active = true
+                ORDER BY org_id, home_id, subject_id
+                """
+            )
+            return [(r[0], r[1], r[2]) for r in cur.fetchall()]
+    org_id, home_id, subject_id, _ = resolve_scope(
+        conn, args.api_key, args.org_id, args.home_id, args.subject_id
+    )
+    return [(org_id, home_id, subject_id)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--run-key",
+        required=True,
+        help="Backfill identity for resume (use a new key after a classifier change)",
+    )
+    ap.add_argument(
+        "--all-scopes",
+        action="store_true",
+        help="Backfill every active api_key_scopes scope",
+    )
+    ap.add_argument("--api-key", default=None, help="Single scope via api_key_scopes")
+    ap.add_argument("--org-id", default="default")
+    ap.add_argument("--home-id", default="default")
+    ap.add_argument("--subject-id", default="default")
+    ap.add_argument(
+        "--last", default="30d", help="Days to backfill before today (e.g. 30d, 12w)"
+    )
+    ap.add_argument("--since-day", default=None, help="First UTC day (YYYY-MM-DD)")
+    ap.add_argument(
+        "--until-day",
+        default=None,
+        help="End UTC day, exclusive (YYYY-MM-DD); default today (complete days only)",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parallel shard processes",
+    )
+    ap.add_argument(
+        "--max-carry",
+        default="7d",
+        help="How far a shard may read before/after its day to carry open episodes",
+    )
+    ap.add_argument("--insert-mode", choices=INSERT_MODES, default="bulk")
+    ap.add_argument("--page-size", type=int, default=1000)
+    ap.add_argument("--itersize", type=int, default=5000)
+    args = ap.parse_args()
+
+    today = utc_now().date()
+    until_day = date.fromisoformat(args.until_day) if args.until_day else today
+    if args.since_day:
+        since_day = date.fromisoformat(args.since_day)
+    else:
+        since_day = until_day - timedelta(days=parse_duration_seconds(args.last) // 86400)
+
+    dsn = db_dsn_from_env()
+    conn = psycopg2.connect(dsn)
+    try:
+        scopes = list_scopes(conn, args)
+        done = done_shards(conn, args.run_key)
+    finally:
+        conn.close()
+
+    shards = plan_shards(scopes, since_day, until_day)
+    todo = [s for s in shards if s.key not in done]
+    print(
+        f"run_key={args.run_key} scopes={len(scopes)} days={since_day}..{until_day} "
+        f"shards={len(shards)} done={len(shards) - len(todo)} todo={len(todo)} workers={args.workers}"
+    )
+
+    opts = {
+        "stream_id": os.getenv("AGINGOS_STREAM_ID", "prod"),
+        "max_carry_s": parse_duration_seconds(args.max_carry),
+        "insert_mode": args.insert_mode,
+        "page_size": max(1, args.page_size),
+        "itersize": max(1, args.itersize),
+    }
+
+    failed = 0
+    t0 = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(run_shard, dsn, args.run_key, s, opts) for s in todo]
+        for fut in as_completed(futures):
+            r = fut.result()
+            if r["status"] != "done":
+                failed += 1
+                print(
+                    f"FAILED {r['org_id']}/{r['home_id']}/{r['subject_id']} day={r['day']} {r.get('error')}"
+                )
+            else:
+                print(
+                    f"done {r['org_id']}/{r['home_id']}/{r['subject_id']} day={r['day']} "
+                    f"events={r['events']} episodes={r['episodes']} s={r['seconds']}"
+                )
+
+    print(
+        f"finished shards={len(todo)} failed={failed} seconds={round(time.monotonic() - t0, 1)}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
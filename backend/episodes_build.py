@@ -15,9 +15,10 @@ import argparse
 import hashlib
 import os
 import re
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
 
 import psycopg2
 import psycopg2.extras
@@ -136,9 +137,25 @@ def resolve_scope(conn, api_key, org_id: str, home_id: str, subject_id: str):
 
 
 def fetch_events(
-    conn, since: datetime, until: datetime, org_id: str, home_id: str, subject_id: str
-) -> List[RawEvent]:
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+    conn,
+    since: datetime,
+    until: datetime,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    itersize: int = 5000,
+) -> Iterator[RawEvent]:
+    """
+    Stream events in (timestamp, id) order from a named (server-side) cursor.
+
+    Rows are pulled itersize at a time, so the window size does not bound memory.
+    The cursor lives in the caller's transaction: do not commit on conn until the
+    iterator is exhausted.
+    """
+    with conn.cursor(
+        name="episodes_build_events", cursor_factory=psycopg2.extras.RealDictCursor
+    ) as cur:
+        cur.itersize = max(1, int(itersize))
         cur.execute(
             """
             SELECT id, "timestamp" as ts, category, payload
@@ -158,18 +175,13 @@ def fetch_events(
                 os.getenv("AGINGOS_STREAM_ID", "prod"),
             ),
         )
-        rows = cur.fetchall()
-    out: List[RawEvent] = []
-    for r in rows:
-        out.append(
-            RawEvent(
+        for r in cur:
+            yield RawEvent(
                 id=int(r["id"]),
                 ts=r["ts"],
                 category=str(r["category"]),
                 payload=dict(r["payload"]),
             )
-        )
-    return out
 
 
 def extract_room(ev: RawEvent) -> Optional[str]:
@@ -213,7 +225,14 @@ def is_door(ev: RawEvent) -> bool:
     return ev.category == "door"
 
 
-def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
+# Door context window (seconds) before episode start / after episode end.
+DOOR_CONTEXT_WINDOW_S = 60
+# Longest inactivity timeout of an open episode (PRESENCE_HOLD_V1). A room that was
+# quiet this long has no open episode, whatever happened before.
+PRESENCE_HOLD_S = 5 * 60 * 60  # 5 hours
+
+
+def build_episodes(events: Iterable[RawEvent]) -> Iterator[EpisodeDraft]:
     """
     Episode rules (v1, per room):
     - Start on presence_on (preferred) or motion (fallback)
@@ -224,19 +243,19 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
       - door_before_s: nearest door event within 60s before start
       - door_during: any door event between start and end
       - door_after_s: nearest door event within 60s after end
+
+    Consumes events in chronological order and yields finished episodes in close
+    order. An episode is held back until the stream has passed end_ts + 60s (its
+    door_after window), so state is bounded by open episodes per room plus the
+    last 60s of door events, not by the event count.
     """
-    # Index door events per room for context calculations
-    door_by_room: Dict[str, List[RawEvent]] = {}
-    for ev in events:
-        if not is_door(ev):
-            continue
-        room = extract_room(ev)
-        if not room:
-            continue
-        door_by_room.setdefault(room, []).append(ev)
+    window = timedelta(seconds=DOOR_CONTEXT_WINDOW_S)
 
+    # Door events of the last `window` per room (door_before + same-ts door_after)
+    recent_doors: Dict[str, Deque[RawEvent]] = {}
     open_by_room: Dict[str, EpisodeDraft] = {}
-    finished: List[EpisodeDraft] = []
+    # Closed episodes waiting for their door_after window, in close order
+    pending: Deque[EpisodeDraft] = deque()
 
     def close_episode(ep: EpisodeDraft, end_ts: datetime, reason: str):
         ep.end_ts = end_ts
@@ -249,7 +268,14 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
             ep.quality = "low"
             if "missing_off" not in ep.quality_flags:
                 ep.quality_flags.append("missing_off")
-        finished.append(ep)
+        # door_after: doors already seen at/after end_ts (same timestamp as the close)
+        for d in recent_doors.get(ep.room, ()):
+            if d.ts >= end_ts and (d.ts - end_ts) <= window:
+                if ep.door_after_s is None or d.ts - end_ts < timedelta(
+                    seconds=ep.door_after_s
+                ):
+                    ep.door_after_s = int((d.ts - end_ts).total_seconds())
+        pending.append(ep)
 
     def maybe_timeout_close(now_ts: datetime, room: str):
         ep = open_by_room.get(room)
@@ -257,7 +283,7 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
             return
         if ep.saw_presence_on:
             # PRESENCE_HOLD_V1: hold presence-based episodes much longer to avoid false "empty" during long stays
-            ep.timeout_s = 5 * 60 * 60  # 5 hours
+            ep.timeout_s = PRESENCE_HOLD_S
         else:
             ep.timeout_s = 90
         gap = (now_ts - ep.last_activity_ts).total_seconds()
@@ -267,8 +293,49 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
             )
             del open_by_room[room]
 
+    def door_before_s(room: str, start_ts: datetime) -> Optional[int]:
+        best = None
+        for d in recent_doors.get(room, ()):
+            if d.ts <= start_ts and (start_ts - d.ts) <= window:
+                if best is None or d.ts > best.ts:
+                    best = d
+        return None if best is None else int((start_ts - best.ts).total_seconds())
+
+    def on_door(ev: RawEvent, room: str):
+        # Context for episodes that could not see this door yet
+        for ep in pending:
+            if ep.room != room:
+                continue
+            if ep.start_ts == ev.ts:
+                ep.door_before_s = 0
+            if (
+                ep.door_after_s is None
+                and ep.end_ts is not None
+                and ep.end_ts <= ev.ts
+                and (ev.ts - ep.end_ts) <= window
+            ):
+                ep.door_after_s = int((ev.ts - ep.end_ts).total_seconds())
+        ep = open_by_room.get(room)
+        if ep is not None and ep.start_ts == ev.ts:
+            ep.door_before_s = 0
+
+        doors = recent_doors.setdefault(room, deque())
+        doors.append(ev)
+        while doors and (ev.ts - doors[0].ts) > window:
+            doors.popleft()
+
+    last_ts: Optional[datetime] = None
+
     # Iterate in chronological order
     for ev in events:
+        last_ts = ev.ts
+        while (
+            pending
+            and pending[0].end_ts is not None
+            and ev.ts - pending[0].end_ts > window
+        ):
+            yield pending.popleft()
+
         room = extract_room(ev)
         if not room:
             continue
@@ -276,6 +343,9 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
         # before processing this event, check if an open episode in this room should timeout before this event
         maybe_timeout_close(ev.ts, room)
 
+        if is_door(ev):
+            on_door(ev, room)
+
         ep = open_by_room.get(room)
 
         if ep is None:
@@ -292,6 +362,7 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
                     last_event_id=ev.id,
                     total=1,
                 )
+                ep.door_before_s = door_before_s(room, ev.ts)
                 if is_motion(ev):
                     ep.motion = 1
                     ep.quality = "medium"
@@ -330,8 +401,8 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
                 # do not update last_activity_ts
 
     # Final timeout close at end of stream
-    if events:
-        stream_end = events[-1].ts
+    if last_ts is not None:
+        stream_end = last_ts
         for room in list(open_by_room.keys()):
             maybe_timeout_close(
                 stream_end + timedelta(seconds=999999), room
@@ -341,30 +412,8 @@ def build_episodes(events: List[RawEvent]) -> List[EpisodeDraft]:
                 ep = open_by_room.pop(room)
                 close_episode(ep, stream_end, "timeout")
 
-    # Attach door_before/after context (window 60s)
-    window_s = 60
-    for ep in finished:
-        doors = door_by_room.get(ep.room, [])
-        # before
-        best_before = None
-        for d in doors:
-            if d.ts <= ep.start_ts and (ep.start_ts - d.ts).total_seconds() <= window_s:
-                if best_before is None or d.ts > best_before.ts:
-                    best_before = d
-        if best_before is not None:
-            ep.door_before_s = int((ep.start_ts - best_before.ts).total_seconds())
-
-        # after
-        if ep.end_ts is not None:
-            best_after = None
-            for d in doors:
-                if d.ts >= ep.end_ts and (d.ts - ep.end_ts).total_seconds() <= window_s:
-                    if best_after is None or d.ts < best_after.ts:
-                        best_after = d
-            if best_after is not None:
-                ep.door_after_s = int((best_after.ts - ep.end_ts).total_seconds())
-
-    return finished
+    while pending:
+        yield pending.popleft()
 
 
 # --- Explainable classification (rules_v1) -----------------------------------
@@ -656,9 +705,20 @@ def score_episode(ep: EpisodeDraft) -> tuple[str, float, float, float, list[dict
 
 
 def delete_overlap(
-    conn, since: datetime, until: datetime, org_id: str, home_id: str, subject_id: str
+    conn,
+    since: datetime,
+    until: datetime,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    commit: bool = True,
 ) -> int:
-    """Delete existing episodes overlapping [since, until) to make rebuild idempotent."""
+    """
+    Delete existing episodes overlapping [since, until) to make rebuild idempotent.
+
+    commit=False leaves the delete in the open transaction so it commits together
+    with the inserts (rebuild is all-or-nothing).
+    """
     with conn.cursor() as cur:
         cur.execute(
             """
@@ -670,36 +730,12 @@ def delete_overlap(
             (org_id, home_id, subject_id, until, since),
         )
         n = cur.rowcount or 0
-    conn.commit()
+    if commit:
+        conn.commit()
     return int(n)
 
 
-def insert_episodes(
-    conn,
-    eps: List[EpisodeDraft],
-    dry_run: bool = True,
-    org_id: str = "default",
-    home_id: str = "default",
-    subject_id: str = "default",
-) -> int:
-    """
-    Insert episodes with classification=unknown (rules later).
-    """
-    if dry_run:
-        return 0
-
-    with conn.cursor() as cur:
-        for ep in eps:
-            assert ep.end_ts is not None
-            duration_s = max(0, int((ep.end_ts - ep.start_ts).total_seconds()))
-            rate = 0.0
-            if duration_s > 0:
-                rate = ep.total / (duration_s / 60.0)
-
-            klass, p_h, p_p, p_u, reasons, reason_summary = score_episode(ep)
-            cur.execute(
-                """
-                INSERT INTO episodes (
+_EPISODE_INSERT_COLUMNS = """
                   start_ts, end_ts, duration_s,
                   room, primary_sensor, sensor_set,
                   close_reason, timeout_s, quality, quality_flags,
@@ -712,7 +748,10 @@ def insert_episodes(
                   class, p_human, p_pet, p_unknown,
                   classifier_version, feature_version, reasons, reason_summary, score_debug,
                                       org_id, home_id, subject_id
-                ) VALUES (
+"""
+
+# One row of placeholders matching _EPISODE_INSERT_COLUMNS / episode_row().
+_EPISODE_INSERT_TEMPLATE = """(
                   %s, %s, %s,
                   %s, %s, %s::jsonb,
                   %s, %s, %s, %s::jsonb,
@@ -725,54 +764,130 @@ def insert_episodes(
                   %s, %s, %s, %s,
                   %s, %s, %s::jsonb, %s, %s::jsonb,
                     %s, %s, %s
-                )
-                """,
-                (
-                    ep.start_ts,
-                    ep.end_ts,
-                    duration_s,
-                    ep.room,
-                    ep.primary_sensor,
-                    psycopg2.extras.Json(ep.sensor_set),
-                    ep.close_reason,
-                    ep.timeout_s,
-                    ep.quality,
-                    psycopg2.extras.Json(ep.quality_flags),
-                    ep.total,
-                    ep.motion,
-                    ep.presence_on,
-                    ep.presence_off,
-                    rate,
-                    ep.first_event_id,
-                    ep.last_event_id,
-                    ep.door_before_s,
-                    ep.door_during,
-                    ep.door_after_s,
-                    tod_bucket_utc(ep.start_ts),
-                    int(ep.start_ts.isoweekday()),
-                    klass,
-                    p_h,
-                    p_p,
-                    p_u,
-                    "rules_v1",
-                    "features_v1",
-                    psycopg2.extras.Json(reasons),
-                    reason_summary,
-                    psycopg2.extras.Json(
-                        {
-                            "event_rate_per_min": rate,
-                            "duration_s": duration_s,
-                            "close_reason": ep.close_reason,
-                            "timeout_s": ep.timeout_s,
-                        }
-                    ),
-                    org_id,
-                    home_id,
-                    subject_id,
-                ),
+                )"""
+
+
+def episode_row(
+    ep: EpisodeDraft, org_id: str, home_id: str, subject_id: str
+) -> tuple:
+    """Scored INSERT parameters for one episode (shared by row and bulk writers)."""
+    assert ep.end_ts is not None
+    duration_s = max(0, int((ep.end_ts - ep.start_ts).total_seconds()))
+    rate = 0.0
+    if duration_s > 0:
+        rate = ep.total / (duration_s / 60.0)
+
+    klass, p_h, p_p, p_u, reasons, reason_summary = score_episode(ep)
+    return (
+        ep.start_ts,
+        ep.end_ts,
+        duration_s,
+        ep.room,
+        ep.primary_sensor,
+        psycopg2.extras.Json(ep.sensor_set),
+        ep.close_reason,
+        ep.timeout_s,
+        ep.quality,
+        psycopg2.extras.Json(ep.quality_flags),
+        ep.total,
+        ep.motion,
+        ep.presence_on,
+        ep.presence_off,
+        rate,
+        ep.first_event_id,
+        ep.last_event_id,
+        ep.door_before_s,
+        ep.door_during,
+        ep.door_after_s,
+        tod_bucket_utc(ep.start_ts),
+        int(ep.start_ts.isoweekday()),
+        klass,
+        p_h,
+        p_p,
+        p_u,
+        "rules_v1",
+        "features_v1",
+        psycopg2.extras.Json(reasons),
+        reason_summary,
+        psycopg2.extras.Json(
+            {
+                "event_rate_per_min": rate,
+                "duration_s": duration_s,
+                "close_reason": ep.close_reason,
+                "timeout_s": ep.timeout_s,
+            }
+        ),
+        org_id,
+        home_id,
+        subject_id,
+    )
+
+
+INSERT_MODES = ("row", "bulk")
+
+
+def insert_episodes(
+    conn,
+    eps: Iterable[EpisodeDraft],
+    dry_run: bool = True,
+    org_id: str = "default",
+    home_id: str = "default",
+    subject_id: str = "default",
+    mode: str = "bulk",
+    page_size: int = 1000,
+    commit: bool = True,
+) -> int:
+    """
+    Insert episodes with classification=unknown (rules later).
+
+    mode:
+    - bulk: multi-row INSERT via execute_values, page_size rows per statement
+    - row:  one INSERT per episode (reference path)
+    Both write identical rows and commit once at the end (commit=False leaves
+    the transaction open for the caller).
+    """
+    if mode not in INSERT_MODES:
+        raise ValueError(f"mode must be one of {INSERT_MODES}")
+    if dry_run:
+        return 0
+
+    with conn.cursor() as cur:
+        if mode == "bulk":
+            n = 0
+            page: list[tuple] = []
+            for ep in eps:
+                page.append(episode_row(ep, org_id, home_id, subject_id))
+                if len(page) >= page_size:
+                    _insert_episode_page(cur, page, page_size)
+                    n += len(page)
+                    page = []
+            if page:
+                _insert_episode_page(cur, page, page_size)
+                n += len(page)
+            if commit:
+                conn.commit()
+            return n
+
+        n = 0
+        for ep in eps:
+            cur.execute(
+                f"INSERT INTO episodes ({_EPISODE_INSERT_COLUMNS}) VALUES {_EPISODE_INSERT_TEMPLATE}",
+                episode_row(ep, org_id, home_id, subject_id),
             )
-        conn.commit()
-    return len(eps)
+            n += 1
+        if commit:
+            conn.commit()
+    return n
+
+
+def _insert_episode_page(cur, rows: List[tuple], page_size: int) -> None:
+    psycopg2.extras.execute_values(
+        cur,
+        f"INSERT INTO episodes ({_EPISODE_INSERT_COLUMNS}) VALUES %s",
+        rows,
+        template=_EPISODE_INSERT_TEMPLATE,
+        page_size=page_size,
+    )
 
 
 def main() -> int:
@@ -806,6 +921,24 @@ def main() -> int:
         action="store_true",
         help="Delete existing episodes overlapping the window before insert (idempotent rebuild)",
     )
+    ap.add_argument(
+        "--insert-mode",
+        choices=INSERT_MODES,
+        default="bulk",
+        help="bulk = multi-row INSERT pages (execute_values); row = one INSERT per episode",
+    )
+    ap.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Rows per INSERT statement in --insert-mode bulk",
+    )
+    ap.add_argument(
+        "--itersize",
+        type=int,
+        default=5000,
+        help="Events fetched per round-trip from the server-side cursor",
+    )
     args = ap.parse_args()
 
     seconds = parse_duration_seconds(args.last)
@@ -819,32 +952,54 @@ def main() -> int:
             conn, args.api_key, args.org_id, args.home_id, args.subject_id
         )
         print(f"scope={org_id}/{home_id}/{subject_id} scope_src={scope_src}")
-        events = fetch_events(conn, since, until, org_id, home_id, subject_id)
-        eps = build_episodes(events)
-
-        print(
-            f"events={len(events)} episodes_built={len(eps)} window={since.isoformat()}..{until.isoformat()}"
-        )
-        if eps:
-            # print a tiny summary for debugging
-            for ep in eps[:10]:
-                dur = int((ep.end_ts - ep.start_ts).total_seconds()) if ep.end_ts else 0
-                print(
-                    f"- room={ep.room} start={ep.start_ts.isoformat()} end={ep.end_ts.isoformat() if ep.end_ts else None} dur_s={dur} total={ep.total} motion={ep.motion} p_on={ep.presence_on} p_off={ep.presence_off} close={ep.close_reason} q={ep.quality}"
-                )
 
+        # Delete first but do not commit: the delete, the streaming read (named
+        # cursor, same transaction) and the inserts commit together at the end.
         if (not args.dry_run) and args.delete_overlap:
-            deleted = delete_overlap(conn, since, until, org_id, home_id, subject_id)
+            deleted = delete_overlap(
+                conn, since, until, org_id, home_id, subject_id, commit=False
+            )
 
             print(f"deleted_overlap={deleted}")
 
-        written = insert_episodes(
-            conn,
-            eps,
-            dry_run=args.dry_run,
-            org_id=org_id,
-            home_id=home_id,
-            subject_id=subject_id,
+        stats = {"events": 0, "episodes": 0}
+
+        def counted_events():
+            for ev in fetch_events(
+                conn, since, until, org_id, home_id, subject_id, itersize=args.itersize
+            ):
+                stats["events"] += 1
+                yield ev
+
+        def echoed_episodes():
+            for ep in build_episodes(counted_events()):
+                stats["episodes"] += 1
+                if stats["episodes"] <= 10:
+                    # print a tiny summary for debugging
+                    dur = int((ep.end_ts - ep.start_ts).total_seconds()) if ep.end_ts else 0
+                    print(
+                        f"- room={ep.room} start={ep.start_ts.isoformat()} end={ep.end_ts.isoformat() if ep.end_ts else None} dur_s={dur} total={ep.total} motion={ep.motion} p_on={ep.presence_on} p_off={ep.presence_off} close={ep.close_reason} q={ep.quality}"
+                    )
+                yield ep
+
+        if args.dry_run:
+            written = 0
+            for _ in echoed_episodes():
+                pass
+        else:
+            written = insert_episodes(
+                conn,
+                echoed_episodes(),
+                dry_run=False,
+                org_id=org_id,
+                home_id=home_id,
+                subject_id=subject_id,
+                mode=args.insert_mode,
+                page_size=max(1, args.page_size),
+            )
+
+        print(
+            f"events={stats['events']} episodes_built={stats['episodes']} window={since.isoformat()}..{until.isoformat()}"
         )
         if args.dry_run:
             print("dry-run: no DB writes")
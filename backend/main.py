@@ -1,19 +1,24 @@
+import base64
+import json
 import os
 import httpx
 
 
 # backend/main.py
 from fastapi import Body, Depends, FastAPI, HTTPException, Request
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 
 from db import SessionLocal
 from models.event import Event
 from models.db_event import EventDB
 
 from services.scheduler import scheduler, setup_scheduler
+from services.episodes_svc_job import mark_scope_dirty
+from services.event_bucket_counts import window_totals
 from services.auth import (
     require_scope,
     AuthScope,
+    scope_cache_stats,
     validate_auth_config_on_startup,
 )
 from services.proposals_miner import mine_proposals
@@ -27,8 +32,9 @@ from routes.notification_policy import router as notification_router
 
 from routes.rooms import router as rooms_router
 from routes.room_mappings import router as room_mappings_router
+from routes.aggregates import router as aggregates_router
 from fastapi import Query
-from sqlalchemy import text
+from sqlalchemy import text, tuple_
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
@@ -74,32 +80,68 @@ def _weekly_truth_payload(scope: "AuthScope", stream_id: str = "prod") -> dict:
     deficits = payload["basis"]["deficits"]
 
     try:
-        events_row = (
-            db.execute(
-                text(
-                    """
-                    SELECT
-                      COUNT(*)::int AS events_7d,
-                      COUNT(DISTINCT ("timestamp" AT TIME ZONE 'Europe/Oslo')::date)::int AS days_with_data_7d,
-                      MAX("timestamp") AS latest_event_ts,
-                      MIN("timestamp") AS oldest_event_ts
-                    FROM events
-                    WHERE org_id=:org_id AND home_id=:home_id AND subject_id=:subject_id
-                      AND stream_id=:stream_id
-                      AND "timestamp" >= :since_utc
-                    """
-                ),
-                {
-                    "org_id": scope.org_id,
-                    "home_id": scope.home_id,
-                    "subject_id": scope.subject_id,
-                    "stream_id": stream_id,
-                    "since_utc": since,
-                },
-            )
-            .mappings()
-            .one()
+        scope_stream = {
+            "org_id": scope.org_id,
+            "home_id": scope.home_id,
+            "subject_id": scope.subject_id,
+            "stream_id": stream_id,
+            "since_utc": since,
+        }
+        # Counts come from event_bucket_counts; only MIN/MAX (index endpoints) read
+        # events. Without the rollup table the window is counted from events.
+        totals = window_totals(
+            db,
+            org_id=scope.org_id,
+            home_id=scope.home_id,
+            subject_id=scope.subject_id,
+            stream_id=stream_id,
+            since=since,
         )
+        if totals is None:
+            events_row = (
+                db.execute(
+                    text(
+                        """
+                        SELECT
+                          COUNT(*)::int AS events_7d,
+                          COUNT(DISTINCT ("timestamp" AT TIME ZONE 'Europe/Oslo')::date)::int AS days_with_data_7d,
+                          MAX("timestamp") AS latest_event_ts,
+                          MIN("timestamp") AS oldest_event_ts
+                        FROM events
+                        WHERE org_id=:org_id AND home_id=:home_id AND subject_id=:subject_id
+                          AND stream_id=:stream_id
+                          AND "timestamp" >= :since_utc
+                        """
+                    ),
+                    scope_stream,
+                )
+                .mappings()
+                .one()
+            )
+        else:
+            span_row = (
+                db.execute(
+                    text(
+                        """
+                        SELECT
+                          MAX("timestamp") AS latest_event_ts,
+                          MIN("timestamp") AS oldest_event_ts
+                        FROM events
+                        WHERE org_id=:org_id AND home_id=:home_id AND subject_id=:subject_id
+                          AND stream_id=:stream_id
+                          AND "timestamp" >= :since_utc
+                        """
+                    ),
+                    scope_stream,
+                )
+                .mappings()
+                .one()
+            )
+            events_row = {
+                "events_7d": totals["events"],
+                "days_with_data_7d": totals["days_with_data"],
+                **span_row,
+            }
 
         all_events_row = (
             db.execute(
@@ -633,6 +675,8 @@ app.include_router(
 
 app.include_router(rooms_router, prefix="/v1", dependencies=[Depends(require_scope)])
 app.include_router(room_mappings_router, prefix="/v1", dependencies=[Depends(require_scope)])
+# /v1-only (no legacy alias): server-side aggregates for the ai-bot
+app.include_router(aggregates_router, prefix="/v1", dependencies=[Depends(require_scope)])
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -962,6 +1006,12 @@ def health_detail(scope: "AuthScope" = Depends(require_scope)):
         out["components"]["scheduler"]["status"] = "DEGRADED"
         degrade("DEGRADED", "scheduler has zero jobs configured")
 
+    # ---- auth scope cache (process-local) ----
+    out["components"]["auth_cache"] = {
+        "status": "OK",
+        "stats": scope_cache_stats(),
+    }
+
     # ---- anomalies runner status (process-local) ----
     rs = dict(ANOMALIES_RUNNER_STATUS)
     out["components"]["anomalies_runner"] = {
@@ -1260,6 +1310,8 @@ class EpisodesSvcBuildIn(BaseModel):
     advance_watermark: bool = False  # only relevant when since/until provided
     batch: int = 5000
     builder_name: str = "episodes_svc_v1"
+    loop: bool = False  # successive batches until caught up, commit per batch
+    max_batches: Optional[int] = None  # loop cap (None = until caught up)
 
 
 def _parse_iso_ts(s: Optional[str]) -> Optional[datetime]:
@@ -1285,6 +1337,7 @@ def episodes_svc_build_once(
     - Incremental by default (uses episode_builder_state watermark).
     - Idempotent writes (unique key on episodes_svc).
     - Optional window replay with since/until; watermark advances only if advance_watermark=true.
+    - loop=true: catch up in batches; the state row lock is held per batch, not per run.
     """
     from services.episodes_svc_builder import build_presence_room_v1
 
@@ -1314,6 +1367,8 @@ def episodes_svc_build_once(
         until=until,
         advance_watermark=bool(body.advance_watermark),
         batch=int(body.batch),
+        loop=bool(body.loop),
+        max_batches=body.max_batches,
     )
 
     return {
@@ -1327,6 +1382,9 @@ def episodes_svc_build_once(
         "until": body.until,
         "advance_watermark": bool(body.advance_watermark),
         "batch": int(body.batch),
+        "loop": bool(body.loop),
+        "batches": res.batches,
+        "stopped_reason": res.stopped_reason,
         "events_read": res.events_read,
         "episodes_upserted": res.episodes_upserted,
         "skipped": {
@@ -1454,27 +1512,36 @@ def receive_event(
     stream_id: str = Query(default="prod"),
     scope: AuthScope = Depends(require_scope),
 ):
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
     db = SessionLocal()
     try:
-        db_event = EventDB(
-            event_id=str(event.id),
-            timestamp=event.timestamp,
-            category=event.category,
-            payload=event.payload,
-            org_id=scope.org_id,
-            home_id=scope.home_id,
-            subject_id=scope.subject_id,
+        row = {
+            "event_id": str(event.id),
+            "timestamp": event.timestamp,
+            "category": event.category,
+            "payload": event.payload,
+            "org_id": scope.org_id,
+            "home_id": scope.home_id,
+            "subject_id": scope.subject_id,
+            # P1-7: force stream_id onto row
+            "stream_id": stream_id,
+            # Derive room_id deterministically from payload (best-effort)
+            "room_id": derive_room_id_scoped(db, scope, event.payload),  # may be None
+        }
+        # A stored (org, home, stream, event_id) is skipped by the events_dedup trigger,
+        # so the INSERT returns no row; ON CONFLICT covers an exact repeat.
+        stmt = (
+            pg_insert(EventDB.__table__)
+            .values(row)
+            .on_conflict_do_nothing(
+                index_elements=["org_id", "home_id", "stream_id", "event_id", "timestamp"]
+            )
+            .returning(EventDB.__table__.c.id)
         )
-        # P1-7: force stream_id onto row (robust even if constructor args change)
-        db_event.stream_id = stream_id
-
-        # Derive room_id deterministically from payload (best-effort)
-        db_event.room_id = derive_room_id_scoped(db, scope, event.payload)  # may be None
-
-        db.add(db_event)
         try:
+            inserted = db.execute(stmt).first() is not None
             db.commit()
-            return {"received": True, "deduped": False}
         except IntegrityError as e:
             db.rollback()
             constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
@@ -1487,6 +1554,105 @@ def receive_event(
             raise HTTPException(
                 status_code=500, detail=f"db integrity error: {constraint or str(e)}"
             )
+        if inserted and event.category == "presence":
+            mark_scope_dirty(scope.org_id, scope.home_id, scope.subject_id)
+        return {"received": True, "deduped": not inserted}
+    finally:
+        db.close()
+
+
+# Batch ingest: one multi-row INSERT ... ON CONFLICT DO NOTHING per request instead of
+# one round-trip + commit per event (Home Assistant bursts).
+_EVENTS_BATCH_MAX = int(os.getenv("AGINGOS_EVENTS_BATCH_MAX", "1000"))
+
+
+def _batch_dedup_results(event_ids: list[str], inserted_ids: set[str]) -> list[dict]:
+    """
+    Per-item result vector for a batch, in request order.
+
+    An item is deduped if its event_id was not inserted (already stored), or if the
+    same event_id appeared earlier in the same batch (the events_dedup trigger skips
+    the repeat).
+    """
+    seen: set[str] = set()
+    out: list[dict] = []
+    for eid in event_ids:
+        deduped = eid in seen or eid not in inserted_ids
+        seen.add(eid)
+        out.append({"id": eid, "received": True, "deduped": deduped})
+    return out
+
+
+@app.post("/v1/events:batch")
+def receive_events_batch_v1(
+    events: list[Event] = Body(...),
+    stream_id: str = Query(default="prod"),
+    scope: AuthScope = Depends(require_scope),
+):
+    """
+    Ingest many events in one transaction.
+    - Dedup key is the same as POST /event: (org_id, home_id, stream_id, event_id),
+      held in events_dedup (events is partitioned on timestamp).
+    - Returns per-item received/deduped in request order.
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+    if len(events) > _EVENTS_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"batch too large: {len(events)} > {_EVENTS_BATCH_MAX}",
+        )
+    if not events:
+        return {"count": 0, "inserted": 0, "deduped": 0, "results": []}
+
+    db = SessionLocal()
+    try:
+        rows = [
+            {
+                "event_id": str(ev.id),
+                "timestamp": ev.timestamp,
+                "category": ev.category,
+                "payload": ev.payload,
+                "org_id": scope.org_id,
+                "home_id": scope.home_id,
+                "subject_id": scope.subject_id,
+                "stream_id": stream_id,
+                # Derive room_id deterministically from payload (best-effort)
+                "room_id": derive_room_id_scoped(db, scope, ev.payload),
+            }
+            for ev in events
+        ]
+
+        stmt = (
+            pg_insert(EventDB.__table__)
+            .values(rows)
+            .on_conflict_do_nothing(
+                # rows whose event_id is already stored are skipped by the
+                # events_dedup trigger and missing from RETURNING
+                index_elements=["org_id", "home_id", "stream_id", "event_id", "timestamp"]
+            )
+            .returning(EventDB.__table__.c.event_id)
+        )
+        try:
+            inserted = {str(r[0]) for r in db.execute(stmt).all()}
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            constraint = getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+            raise HTTPException(
+                status_code=500, detail=f"db integrity error: {constraint or str(e)}"
+            )
+
+        results = _batch_dedup_results([r["event_id"] for r in rows], inserted)
+        n_deduped = sum(1 for r in results if r["deduped"])
+        if any(r["category"] == "presence" and r["event_id"] in inserted for r in rows):
+            mark_scope_dirty(scope.org_id, scope.home_id, scope.subject_id)
+        return {
+            "count": len(results),
+            "inserted": len(results) - n_deduped,
+            "deduped": n_deduped,
+            "results": results,
+        }
     finally:
         db.close()
 
@@ -2653,23 +2819,129 @@ def undo_episode_label(
         db.close()
 
 
+_EVENTS_ORDERS = ("asc", "desc")
+# Rows per round-trip from the server-side cursor in /v1/events/stream.
+_EVENTS_STREAM_ITERSIZE = 1000
+
+
+def _encode_events_cursor(ts: datetime, row_id: int, order: str) -> str:
+    """Opaque keyset cursor: (timestamp, events.id) of the last row + sort order."""
+    raw = json.dumps(
+        {"ts": ts.astimezone(timezone.utc).isoformat(), "id": int(row_id), "o": order},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_events_cursor(cursor: str) -> tuple[datetime, int, str]:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        obj = json.loads(base64.urlsafe_b64decode(cursor + pad))
+        ts = require_utc_aware(datetime.fromisoformat(obj["ts"]), "cursor")
+        order = obj["o"]
+        if order not in _EVENTS_ORDERS:
+            raise ValueError(order)
+        return ts, int(obj["id"]), order
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def _events_filters(
+    *,
+    scope: "AuthScope",
+    stream_id: str,
+    category: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    before: Optional[datetime],
+    cursor: Optional[str],
+    order: str,
+) -> list:
+    """
+    WHERE clauses shared by /events and /v1/events/stream.
+
+    Keyset pagination: rows strictly after the cursor in (timestamp, id) order, so
+    events sharing a timestamp are neither skipped nor repeated across pages.
+    """
+    if order not in _EVENTS_ORDERS:
+        raise HTTPException(status_code=400, detail="order must be asc|desc")
+
+    filters = [
+        # Scope enforcement (P0-2): only return data for this API-key scope
+        EventDB.org_id == scope.org_id,
+        EventDB.home_id == scope.home_id,
+        EventDB.subject_id == scope.subject_id,
+        # Stream enforcement (P1-7): default 'prod' unless specified
+        EventDB.stream_id == stream_id,
+    ]
+
+    if category:
+        filters.append(EventDB.category == category)
+    if since:
+        try:
+            since_utc = require_utc_aware(since, "since")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        filters.append(EventDB.timestamp >= since_utc)
+    if until:
+        try:
+            until_utc = require_utc_aware(until, "until")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        filters.append(EventDB.timestamp < until_utc)
+    if before:
+        try:
+            before_utc = require_utc_aware(before, "before")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        filters.append(EventDB.timestamp < before_utc)
+
+    if cursor:
+        c_ts, c_id, c_order = _decode_events_cursor(cursor)
+        if c_order != order:
+            raise HTTPException(status_code=400, detail="cursor does not match order")
+        key = tuple_(EventDB.timestamp, EventDB.id)
+        if order == "asc":
+            filters.append(key > tuple_(c_ts, c_id))
+        else:
+            filters.append(key < tuple_(c_ts, c_id))
+
+    return filters
+
+
+def _events_order_by(order: str) -> tuple:
+    if order == "asc":
+        return (EventDB.timestamp.asc(), EventDB.id.asc())
+    return (EventDB.timestamp.desc(), EventDB.id.desc())
+
+
+def _iso_z(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
 @app.get("/v1/events")
 def list_events_v1(
+    response: Response,
     category: Optional[str] = Query(default=None),
     since: Optional[datetime] = Query(default=None),
     until: Optional[datetime] = Query(default=None),
     before: Optional[datetime] = Query(default=None),
     limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None),
+    order: str = Query(default="desc"),
     stream_id: str = Query(default="prod"),
     scope: "AuthScope" = Depends(require_scope),
 ) -> list[Event]:
     # P1-5: /v1 stable alias; re-use legacy implementation
     return list_events(
+        response=response,
         category=category,
         since=since,
         until=until,
         before=before,
         limit=limit,
+        cursor=cursor,
+        order=order,
         stream_id=stream_id,
         scope=scope,
     )
@@ -2677,50 +2949,50 @@ def list_events_v1(
 
 @app.get("/events")
 def list_events(
+    response: Response,
     category: Optional[str] = Query(default=None),
     since: Optional[datetime] = Query(default=None),
     until: Optional[datetime] = Query(default=None),
     before: Optional[datetime] = Query(default=None),
     limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None),
+    order: str = Query(default="desc"),
     stream_id: str = Query(default="prod"),
     scope: "AuthScope" = Depends(require_scope),
 ) -> list[Event]:
+    """
+    Events for this scope, newest first by default.
+
+    Paging: when more rows exist, the X-Next-Cursor response header carries an
+    opaque cursor; pass it back as ?cursor=... (same order) for the next page.
+    """
+    filters = _events_filters(
+        scope=scope,
+        stream_id=stream_id,
+        category=category,
+        since=since,
+        until=until,
+        before=before,
+        cursor=cursor,
+        order=order,
+    )
+
     db = SessionLocal()
     try:
-        query = db.query(EventDB)
-
-        # Scope enforcement (P0-2): only return data for this API-key scope
-        query = query.filter(
-            EventDB.org_id == scope.org_id,
-            EventDB.home_id == scope.home_id,
-            EventDB.subject_id == scope.subject_id,
+        # One extra row tells whether there is a next page.
+        rows = (
+            db.query(EventDB)
+            .filter(*filters)
+            .order_by(*_events_order_by(order))
+            .limit(limit + 1)
+            .all()
         )
-
-        # Stream enforcement (P1-7): default 'prod' unless specified
-        query = query.filter(EventDB.stream_id == stream_id)
-
-        if category:
-            query = query.filter(EventDB.category == category)
-        if since:
-            try:
-                since_utc = require_utc_aware(since, "since")
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=str(e))
-            query = query.filter(EventDB.timestamp >= since_utc)
-        if until:
-            try:
-                until_utc = require_utc_aware(until, "until")
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=str(e))
-            query = query.filter(EventDB.timestamp < until_utc)
-        if before:
-            try:
-                before_utc = require_utc_aware(before, "before")
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=str(e))
-            query = query.filter(EventDB.timestamp < before_utc)
-
-        rows = query.order_by(EventDB.timestamp.desc()).limit(limit).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = _encode_events_cursor(
+                last.timestamp, last.id, order
+            )
 
         return [
             Event(
@@ -2735,6 +3007,72 @@ def list_events(
         db.close()
 
 
+@app.get("/v1/events/stream")
+def stream_events_v1(
+    category: Optional[str] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    order: str = Query(default="asc"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    stream_id: str = Query(default="prod"),
+    scope: "AuthScope" = Depends(require_scope),
+) -> StreamingResponse:
+    """
+    NDJSON export: one event per line, oldest first by default.
+
+    Rows are read from a server-side cursor (_EVENTS_STREAM_ITERSIZE per fetch) and
+    written as they arrive, so memory stays constant regardless of window size.
+    Each line carries `cursor`; pass the last one back to resume an interrupted export.
+    """
+    filters = _events_filters(
+        scope=scope,
+        stream_id=stream_id,
+        category=category,
+        since=since,
+        until=until,
+        before=None,
+        cursor=cursor,
+        order=order,
+    )
+
+    def _lines():
+        db = SessionLocal()
+        try:
+            q = (
+                db.query(
+                    EventDB.id,
+                    EventDB.event_id,
+                    EventDB.timestamp,
+                    EventDB.category,
+                    EventDB.payload,
+                )
+                .filter(*filters)
+                .order_by(*_events_order_by(order))
+            )
+            if limit is not None:
+                q = q.limit(limit)
+            for r in q.yield_per(_EVENTS_STREAM_ITERSIZE):
+                yield (
+                    json.dumps(
+                        {
+                            "id": r.event_id,
+                            "timestamp": _iso_z(r.timestamp),
+                            "category": r.category,
+                            "payload": r.payload,
+                            "cursor": _encode_events_cursor(r.timestamp, r.id, order),
+                        },
+                        ensure_ascii=False,
+                        default=str,
+                    )
+                    + "\n"
+                )
+        finally:
+            db.close()
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
 @app.get("/v1/subject_state")
 def get_subject_state_v1(scope: "AuthScope" = Depends(require_scope)) -> dict:
     # P1-5: /v1 stable alias; re-use legacy implementation
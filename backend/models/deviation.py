@@ -51,10 +51,14 @@ class Deviation(Base):
 
 Index("ix_deviations_status_last_seen", Deviation.status, Deviation.last_seen_at)
 
+# Matches alembic 3f36f67c80c7; also the ON CONFLICT target of the scheduler's bulk upsert.
 Index(
-    "uq_deviations_active_rule_subject",
+    "uq_deviations_active_rule_subject_scope",
     Deviation.rule_id,
     Deviation.subject_key,
+    Deviation.org_id,
+    Deviation.home_id,
+    Deviation.subject_id,
     unique=True,
     postgresql_where=Deviation.status.in_([DeviationStatus.OPEN, DeviationStatus.ACK]),
 )
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+One-time backfill of events.room_id with the ingest derivation (derive_room_id_scoped).
+
+Run it right after migration a1c4e6f8b2d5: room scoring matches on room_id only, so
+until then events that carry their room only in the payload are missing from room
+counts and baselines.
+
+- Per scope, events are read in keyset order (timestamp, id) in batches of --batch.
+- A batch updates the rows whose derived room_id differs and saves the cursor in
+  room_id_backfill_progress in one transaction. Re-running with the same --run-key
+  resumes after the last committed batch and skips finished scopes.
+- A row keeps its room_id when nothing can be derived from its payload.
+- Progress (scanned / estimated total, updated, rate) is printed per scope every
+  --progress-seconds. The estimate comes from event_bucket_counts.
+
+UPDATEs fire the event_bucket_counts triggers, so bucket counts follow the new room_id.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from util.room_id import derive_room_id_scoped
+
+
+@dataclass(frozen=True)
+class Scope:
+    org_id: str
+    home_id: str
+    subject_id: str
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return (self.org_id, self.home_id, self.subject_id)
+
+    def params(self) -> Dict[str, str]:
+        return {"org_id": self.org_id, "home_id": self.home_id, "subject_id": self.subject_id}
+
+
+@dataclass
+class Progress:
+    last_ts: Optional[datetime] = None
+    last_id: Optional[int] = None
+    scanned: int = 0
+    updated: int = 0
+    done: bool = False
+
+
+def list_scopes(db) -> List[Scope]:
+    rows = db.execute(
+        text(
+            """
+            SELECT DISTINCT org_id, home_id, subject_id
+            FROM events
+            ORDER BY 1, 2, 3
+            """
+        )
+    ).all()
+    return [Scope(str(r[0]), str(r[1]), str(r[2])) for r in rows]
+
+
+def load_progress(db, run_key: str) -> Dict[Tuple[str, str, str], Progress]:
+    rows = (
+        db.execute(
+            text(
+                """
+                SELECT org_id, home_id, subject_id, last_ts, last_id, scanned, updated, done
+                FROM room_id_backfill_progress
+                WHERE run_key = :run_key
+                """
+            ),
+            {"run_key": run_key},
+        )
+        .mappings()
+        .all()
+    )
+    return {
+        (r["org_id"], r["home_id"], r["subject_id"]): Progress(
+            last_ts=r["last_ts"],
+            last_id=r["last_id"],
+            scanned=int(r["scanned"] or 0),
+            updated=int(r["updated"] or 0),
+            done=bool(r["done"]),
+        )
+        for r in rows
+    }
+
+
+def estimate_total(db, scope: Scope) -> Optional[int]:
+    """Events in scope from the bucket-count totals (None if unavailable)."""
+    try:
+        n = db.execute(
+            text(
+                """
+                SELECT SUM(n)
+                FROM event_bucket_counts
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                  AND room_id = '*'
+                """
+            ),
+            scope.params(),
+        ).scalar()
+    except Exception:
+        db.rollback()
+        return None
+    return int(n) if n is not None else None
+
+
+def fetch_batch(
+    db, scope: Scope, progress: Progress, *, limit: int, missing_only: bool
+) -> List[Dict[str, Any]]:
+    where = ["org_id = :org_id", "home_id = :home_id", "subject_id = :subject_id"]
+    params: Dict[str, Any] = {**scope.params(), "limit": int(limit)}
+    if progress.last_ts is not None:
+        where.append('("timestamp", id) > (:after_ts, :after_id)')
+        params["after_ts"] = progress.last_ts
+        params["after_id"] = int(progress.last_id or 0)
+    if missing_only:
+        where.append("(room_id IS NULL OR room_id = '')")
+    return list(
+        db.execute(
+            text(
+                f"""
+                SELECT id, "timestamp", room_id, payload
+                FROM events
+                WHERE {' AND '.join(where)}
+                ORDER BY "timestamp" ASC, id ASC
+                LIMIT :limit
+                """
+            ),
+            params,
+        )
+        .mappings()
+        .all()
+    )
+
+
+def resolve_changes(
+    db, scope: Scope, rows: List[Dict[str, Any]]
+) -> List[Tuple[int, datetime, str]]:
+    """(id, timestamp, room_id) for rows whose derived room_id is set and differs."""
+    out: List[Tuple[int, datetime, str]] = []
+    for r in rows:
+        rid = derive_room_id_scoped(db, scope, r["payload"] or {})
+        if rid and rid != r["room_id"]:
+            out.append((int(r["id"]), r["timestamp"], rid))
+    return out
+
+
+def apply_batch(
+    db,
+    run_key: str,
+    scope: Scope,
+    changes: List[Tuple[int, datetime, str]],
+    progress: Progress,
+) -> None:
+    """Update changed rows and save the cursor, in one commit."""
+    if changes:
+        db.execute(
+            text(
+                """
+                UPDATE events e
+                SET room_id = v.room_id
+                FROM unnest(
+                  CAST(:ids AS bigint[]),
+                  CAST(:tss AS timestamptz[]),
+                  CAST(:rooms AS text[])
+                ) AS v(id, ts, room_id)
+                WHERE e.id = v.id AND e."timestamp" = v.ts
+                """
+            ),
+            {
+                "ids": [c[0] for c in changes],
+                "tss": [c[1] for c in changes],
+                "rooms": [c[2] for c in changes],
+            },
+        )
+    db.execute(
+        text(
+            """
+            INSERT INTO room_id_backfill_progress (
+              run_key, org_id, home_id, subject_id,
+              last_ts, last_id, scanned, updated, done, updated_at
+            ) VALUES (
+              :run_key, :org_id, :home_id, :subject_id,
+              :last_ts, :last_id, :scanned, :updated, :done, now()
+            )
+            ON CONFLICT (run_key, org_id, home_id, subject_id) DO UPDATE SET
+              last_ts = EXCLUDED.last_ts,
+              last_id = EXCLUDED.last_id,
+              scanned = EXCLUDED.scanned,
+              updated = EXCLUDED.updated,
+              done = EXCLUDED.done,
+              updated_at = now()
+            """
+        ),
+        {
+            "run_key": run_key,
+            **scope.params(),
+            "last_ts": progress.last_ts,
+            "last_id": progress.last_id,
+            "scanned": progress.scanned,
+            "updated": progress.updated,
+            "done": progress.done,
+        },
+    )
+    db.commit()
+
+
+def backfill_scope(
+    db,
+    run_key: str,
+    scope: Scope,
+    progress: Progress,
+    *,
+    batch: int,
+    missing_only: bool = False,
+    max_batches: Optional[int] = None,
+    progress_s: float = 10.0,
+    report: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """Run batches until the scope is done (or max_batches). Returns a summary."""
+    t0 = time.monotonic()
+    last_report = t0
+    total = estimate_total(db, scope)
+    start_scanned = progress.scanned
+    batches = 0
+
+    def _line(prefix: str) -> str:
+        elapsed = max(time.monotonic() - t0, 1e-9)
+        of = f"/{total}" if total is not None else ""
+        pct = f" ({100.0 * progress.scanned / total:.1f}%)" if total else ""
+        rate = (progress.scanned - start_scanned) / elapsed
+        last = progress.last_ts.isoformat() if progress.last_ts else "-"
+        return (
+            f"{prefix} {scope.org_id}/{scope.home_id}/{scope.subject_id} "
+            f"scanned={progress.scanned}{of}{pct} updated={progress.updated} "
+            f"rate={rate:.0f}/s last_ts={last}"
+        )
+
+    while not progress.done:
+        if max_batches is not None and batches >= max_batches:
+            break
+        rows = fetch_batch(db, scope, progress, limit=batch, missing_only=missing_only)
+        changes = resolve_changes(db, scope, rows)
+        nxt = replace(
+            progress,
+            scanned=progress.scanned + len(rows),
+            updated=progress.updated + len(changes),
+            done=len(rows) < batch,
+        )
+        if rows:
+            nxt.last_ts = rows[-1]["timestamp"]
+            nxt.last_id = int(rows[-1]["id"])
+        apply_batch(db, run_key, scope, changes, nxt)
+        progress = nxt  # advance only after the commit
+        batches += 1
+
+        now = time.monotonic()
+        if now - last_report >= progress_s:
+            report(_line("progress"))
+            last_report = now
+
+    report(_line("done" if progress.done else "paused"))
+    return {
+        "scope": list(scope.key),
+        "done": progress.done,
+        "batches": batches,
+        "scanned": progress.scanned,
+        "updated": progress.updated,
+        "seconds": round(time.monotonic() - t0, 3),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--run-key",
+        required=True,
+        help="Backfill identity for resume (use a new key after a rooms/mapping change)",
+    )
+    ap.add_argument("--org-id", default=None, help="Limit to one scope (with --home-id/--subject-id)")
+    ap.add_argument("--home-id", default=None)
+    ap.add_argument("--subject-id", default=None)
+    ap.add_argument("--batch", type=int, default=5000, help="Events per batch (one commit each)")
+    ap.add_argument(
+        "--missing-only",
+        action="store_true",
+        help="Only rows with NULL/empty room_id (skip re-deriving rows that have one)",
+    )
+    ap.add_argument(
+        "--max-batches", type=int, default=None, help="Stop each scope after N batches"
+    )
+    ap.add_argument("--progress-seconds", type=float, default=10.0)
+    args = ap.parse_args()
+
+    from db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.org_id and args.home_id and args.subject_id:
+            scopes = [Scope(args.org_id, args.home_id, args.subject_id)]
+        else:
+            scopes = list_scopes(db)
+        state = load_progress(db, args.run_key)
+        todo = [s for s in scopes if not state.get(s.key, Progress()).done]
+        print(
+            f"run_key={args.run_key} scopes={len(scopes)} "
+            f"done={len(scopes) - len(todo)} todo={len(todo)} batch={args.batch}"
+        )
+
+        t0 = time.monotonic()
+        scanned = updated = failed = 0
+        for scope in todo:
+            try:
+                r = backfill_scope(
+                    db,
+                    args.run_key,
+                    scope,
+                    state.get(scope.key, Progress()),
+                    batch=max(1, args.batch),
+                    missing_only=args.missing_only,
+                    max_batches=args.max_batches,
+                    progress_s=args.progress_seconds,
+                )
+            except Exception as e:
+                # committed batches stay; the next run resumes from the saved cursor
+                db.rollback()
+                failed += 1
+                print(f"FAILED {'/'.join(scope.key)} {type(e).__name__}: {e}")
+                continue
+            scanned += r["scanned"]
+            updated += r["updated"]
+    finally:
+        db.close()
+
+    print(
+        f"finished scopes={len(todo)} failed={failed} scanned={scanned} updated={updated} "
+        f"seconds={round(time.monotonic() - t0, 1)}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text
+
+from db import SessionLocal
+from services.auth import AuthScope, require_scope
+from util.time import require_utc_aware, utcnow
+
+router = APIRouter(prefix="/aggregates", tags=["aggregates"])
+
+
+def nightly_windows(
+    now: datetime,
+    *,
+    nights: int,
+    tz: ZoneInfo,
+    night_start_hour: int = 22,
+    night_end_hour: int = 7,
+    morning_start_hour: int = 5,
+    morning_end_hour: int = 12,
+) -> list[dict[str, Any]]:
+    """
+    Night + morning windows (UTC) for offset 0 (last night / this morning) .. nights.
+
+    Same definition as the ai-bot:
+    - night 0: night_start_hour previous local day -> night_end_hour today (local)
+    - night d: night 0 shifted by d*24h
+    - morning d: local day (today - d), morning_start_hour -> morning_end_hour;
+      morning 0 is capped at now and omitted before morning_start_hour
+    """
+    now_local = now.astimezone(tz)
+
+    end_local = now_local.replace(hour=night_end_hour, minute=0, second=0, microsecond=0)
+    start_local = (end_local - timedelta(days=1)).replace(
+        hour=night_start_hour, minute=0, second=0, microsecond=0
+    )
+    night_since = start_local.astimezone(timezone.utc)
+    night_until = end_local.astimezone(timezone.utc)
+
+    out: list[dict[str, Any]] = []
+    for d in range(0, nights + 1):
+        day = now_local.date() - timedelta(days=d)
+        m_since = datetime(day.year, day.month, day.day, morning_start_hour, tzinfo=tz)
+        m_until = datetime(day.year, day.month, day.day, morning_end_hour, tzinfo=tz)
+        morning: Optional[tuple[datetime, datetime]]
+        if d == 0:
+            if now_local.hour >= morning_start_hour:
+                morning = (m_since, now_local if now_local < m_until else m_until)
+            else:
+                morning = None
+        else:
+            morning = (m_since, m_until)
+
+        out.append(
+            {
+                "offset": d,
+                "night": (
+                    night_since - timedelta(days=d),
+                    night_until - timedelta(days=d),
+                ),
+                "morning": (
+                    (morning[0].astimezone(timezone.utc), morning[1].astimezone(timezone.utc))
+                    if morning
+                    else None
+                ),
+            }
+        )
+    return out
+
+
+@router.get("/nightly")
+def nightly_aggregates(
+    nights: int = Query(default=14, ge=1, le=90),
+    until: Optional[datetime] = Query(default=None),
+    tz: str = Query(default="Europe/Oslo"),
+    categories: str = Query(default="motion,presence"),
+    night_start_hour: int = Query(default=22, ge=0, le=23),
+    night_end_hour: int = Query(default=7, ge=0, le=23),
+    morning_start_hour: int = Query(default=5, ge=0, le=23),
+    morning_end_hour: int = Query(default=12, ge=1, le=24),
+    stream_id: str = Query(default="prod"),
+    scope: AuthScope = Depends(require_scope),
+) -> dict[str, Any]:
+    """
+    Per-night, per-room activity counts and first-activity minute for N nights.
+
+    One GROUP BY over all windows (nights 0..N and mornings 0..N) instead of one
+    /events fetch per window. `total` also counts events without a room.
+    first_minute is minutes after local midnight of the first matching event in the
+    morning window.
+
+    Rooms are grouped on payload.room, not events.room_id: the ai-bot falls back to
+    counting /events by payload.room when this endpoint is unavailable, and caches
+    finished nights from either source, so both must use the same room labels.
+    Categories are lower-cased here and matched exactly (stored lower-case, as the
+    other event queries assume), which keeps ix_events_category usable.
+    """
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid tz")
+    if morning_end_hour <= morning_start_hour:
+        raise HTTPException(
+            status_code=400, detail="morning_end_hour must be after morning_start_hour"
+        )
+
+    now = utcnow()
+    if until is not None:
+        try:
+            now = require_utc_aware(until, "until")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    cats = sorted({c.strip().lower() for c in categories.split(",") if c.strip()})
+    if not cats:
+        raise HTTPException(status_code=400, detail="categories is required")
+
+    windows = nightly_windows(
+        now,
+        nights=nights,
+        tz=zone,
+        night_start_hour=night_start_hour,
+        night_end_hour=night_end_hour,
+        morning_start_hour=morning_start_hour,
+        morning_end_hour=morning_end_hour,
+    )
+
+    kinds: list[str] = []
+    offsets: list[int] = []
+    starts: list[datetime] = []
+    ends: list[datetime] = []
+    for w in windows:
+        for kind in ("night", "morning"):
+            if w[kind] is None:
+                continue
+            kinds.append(kind)
+            offsets.append(w["offset"])
+            starts.append(w[kind][0])
+            ends.append(w[kind][1])
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.execute(
+                text(
+                    """
+                    SELECT
+                      w.kind AS kind,
+                      w.offset_d AS offset_d,
+                      (e.payload->>'room') AS room,
+                      COUNT(*)::int AS n,
+                      MIN(e."timestamp") AS first_ts
+                    FROM unnest(
+                      CAST(:kinds AS text[]),
+                      CAST(:offsets AS int[]),
+                      CAST(:starts AS timestamptz[]),
+                      CAST(:ends AS timestamptz[])
+                    ) AS w(kind, offset_d, t0, t1)
+                    JOIN events e
+                      ON e."timestamp" >= w.t0 AND e."timestamp" < w.t1
+                    WHERE e.org_id = :org_id AND e.home_id = :home_id AND e.subject_id = :subject_id
+                      AND e.stream_id = :stream_id
+                      AND e.category = ANY(CAST(:cats AS text[]))
+                    GROUP BY w.kind, w.offset_d, (e.payload->>'room')
+                    """
+                ),
+                {
+                    "kinds": kinds,
+                    "offsets": offsets,
+                    "starts": starts,
+                    "ends": ends,
+                    "org_id": scope.org_id,
+                    "home_id": scope.home_id,
+                    "subject_id": scope.subject_id,
+                    "stream_id": stream_id,
+                    "cats": cats,
+                },
+            )
+            .mappings()
+            .all()
+        )
+    finally:
+        db.close()
+
+    nights_out: list[dict[str, Any]] = []
+    by_key: dict[tuple[str, int], dict[str, Any]] = {}
+    for w in windows:
+        n_since, n_until = w["night"]
+        night = {
+            "since": n_since.isoformat(),
+            "until": n_until.isoformat(),
+            "total": 0,
+            "by_room": {},
+        }
+        by_key[("night", w["offset"])] = night
+        morning = None
+        if w["morning"] is not None:
+            m_since, m_until = w["morning"]
+            morning = {
+                "since": m_since.isoformat(),
+                "until": m_until.isoformat(),
+                "count": 0,
+                "first_ts": None,
+                "first_minute": None,
+            }
+            by_key[("morning", w["offset"])] = morning
+        nights_out.append({"offset": w["offset"], "night": night, "morning": morning})
+
+    first_by_morning: dict[int, datetime] = {}
+    for r in rows:
+        target = by_key.get((r["kind"], int(r["offset_d"])))
+        if target is None:
+            continue
+        n = int(r["n"] or 0)
+        if r["kind"] == "night":
+            target["total"] += n
+            if r["room"]:
+                target["by_room"][r["room"]] = target["by_room"].get(r["room"], 0) + n
+        else:
+            target["count"] += n
+            ts = r["first_ts"]
+            off = int(r["offset_d"])
+            if ts is not None and (off not in first_by_morning or ts < first_by_morning[off]):
+                first_by_morning[off] = ts
+
+    for off, ts in first_by_morning.items():
+        m = by_key[("morning", off)]
+        local = ts.astimezone(zone)
+        m["first_ts"] = ts.astimezone(timezone.utc).isoformat()
+        m["first_minute"] = local.hour * 60 + local.minute
+
+    return {
+        "schema_version": "v1",
+        "computed_at": now.isoformat(),
+        "tz": tz,
+        "categories": cats,
+        "stream_id": stream_id,
+        "nights": nights_out,
+    }
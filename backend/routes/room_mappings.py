@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 
 from db import get_db
 from services.auth import AuthScope, require_scope
+from util.room_id import invalidate_room_index
 
 
 router = APIRouter(prefix="/room_mappings", tags=["room_mappings"])
@@ -163,6 +164,7 @@ def upsert_room_mapping_v1(
         .one()
     )
     db.commit()
+    invalidate_room_index(scope.org_id, scope.home_id)
     return dict(row)
 
 
@@ -378,6 +380,7 @@ def self_heal_room_inventory_v1(
 
     if not dry_run:
         db.commit()
+        invalidate_room_index(scope.org_id, scope.home_id)
 
     return RoomInventoryHealResult(
         stream_id=stream_id,
@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 
 from db import get_db
 from services.auth import AuthScope, require_scope
+from util.room_id import invalidate_room_index
 
 
 router = APIRouter(prefix="/rooms", tags=["rooms"])
@@ -99,4 +100,5 @@ def upsert_room_v1(
     )
 
     db.commit()
+    invalidate_room_index(scope.org_id, scope.home_id)
     return dict(row)
@@ -12,7 +12,8 @@ from config.rule_config import load_rule_config
 from models.rule import Rule
 from models.rule import RuleType
 from services.rules.registry import RULE_REGISTRY
-from services.rules.gating import build_rule_truth
+from services.rule_rows import invalidate_rule_row_ids
+from services.rules.gating import TruthCache, build_rule_truth
 
 router = APIRouter(prefix="/rules", tags=["rules"])
 logger = logging.getLogger("rules.routes")
@@ -146,8 +147,8 @@ def _pilot_pack_row(rule_id: str, db_rule: Rule | None, yaml_rule: dict) -> dict
             "cooldown": "NONE",
             "grouping": "OPEN/ACK dedupe by rule+subject+scope in scheduler upsert",
             "evidence": [
-                "services.scheduler._upsert_open_deviation filters existing OPEN/ACK by rule_id + subject_key + org/home/subject",
-                "models.deviation unique partial index enforces one active row per rule_id + subject_key for OPEN/ACK",
+                "services.scheduler._bulk_upsert_open_deviations upserts OPEN/ACK by rule_id + subject_key + org/home/subject (ON CONFLICT)",
+                "models.deviation unique partial index enforces one active row per rule_id + subject_key + scope for OPEN/ACK",
             ],
         },
     }
@@ -194,6 +195,7 @@ def get_rules_evaluation_truth(db: Session = Depends(get_db)):
     org_id, home_id, subject_id = _resolve_scope(db)
 
     rows = []
+    truth_cache = TruthCache()
     for rid in sorted(yaml_rules.keys()):
         if not cfg.rule_enabled_in_scheduler(rid):
             continue
@@ -204,6 +206,7 @@ def get_rules_evaluation_truth(db: Session = Depends(get_db)):
             org_id=org_id,
             home_id=home_id,
             subject_id=subject_id,
+            truth_cache=truth_cache,
         )
         rows.append({"rule_id": rid, **truth})
 
@@ -266,6 +269,7 @@ def list_rules(db: Session = Depends(get_db)):
     out = []
     org_id, home_id, subject_id = _resolve_scope(db)
     truth_by_rule = {}
+    truth_cache = TruthCache()
     for name in sorted(yaml_rules.keys()):
         y = dict(yaml_rules.get(name) or {})
         spec = RULE_REGISTRY.get(name)
@@ -285,6 +289,7 @@ def list_rules(db: Session = Depends(get_db)):
                     org_id=org_id,
                     home_id=home_id,
                     subject_id=subject_id,
+                    truth_cache=truth_cache,
                 )
             except Exception:
                 logger.warning("rules_list_truth_build_failed", extra={"rule_id": name}, exc_info=True)
@@ -370,6 +375,7 @@ def create_rule(payload: dict, db: Session = Depends(get_db)):
         existing.is_enabled = payload.get("is_enabled", existing.is_enabled)
 
         db.commit()
+        invalidate_rule_row_ids()
         db.refresh(existing)
         return existing
 
@@ -383,6 +389,7 @@ def create_rule(payload: dict, db: Session = Depends(get_db)):
 
     db.add(rule)
     db.commit()
+    invalidate_rule_row_ids()
     db.refresh(rule)
     return rule
 
@@ -407,5 +414,6 @@ def patch_rule(rule_id: int, payload: dict, db: Session = Depends(get_db)):
         rule.params = merged
 
     db.commit()
+    invalidate_rule_row_ids()
     db.refresh(rule)
     return rule
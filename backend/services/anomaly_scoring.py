@@ -6,11 +6,12 @@ import math
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
-from typing import Any, Optional
+from typing import Any, Callable, Mapping, Optional
 
 from fastapi import HTTPException
 
 from services.auth import AuthScope
+from services.event_bucket_counts import room_counts
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
@@ -168,6 +169,19 @@ def _observed_activity(
         db.rollback()
         rows = []
 
+    return _activity_from_episodes(
+        rows, start, end, pet_weight=pet_weight, unknown_weight=unknown_weight
+    )
+
+
+def _activity_from_episodes(
+    rows: list,
+    start: datetime,
+    end: datetime,
+    *,
+    pet_weight: float,
+    unknown_weight: float,
+) -> tuple[float, dict]:
     total = 0.0
     used = 0
     for r in rows:
@@ -194,10 +208,31 @@ def _observed_activity(
     }
 
 
+def _bucket_counts(
+    db: Session, scope: AuthScope, rooms: list[str], start: datetime, end: datetime
+) -> Optional[dict[str, dict[str, Any]]]:
+    # Bucket-aligned windows are a primary-key read of event_bucket_counts;
+    # None means count events instead.
+    return room_counts(
+        db,
+        org_id=scope.org_id,
+        home_id=scope.home_id,
+        subject_id=scope.subject_id,
+        rooms=rooms,
+        start=start,
+        end=end,
+    )
+
+
 def _observed_door_events(
     db: Session, scope: AuthScope, room: str, start: datetime, end: datetime
 ) -> int:
-    # events.payload has room/area; we accept both keys.
+    counts = _bucket_counts(db, scope, [room], start, end)
+    if counts is not None:
+        return int((counts.get(room) or {}).get("door_n") or 0)
+
+    # room_id is resolved at write time (ingest / room_id_backfill.py): one index range.
+    # Until the backfill has run, older events without room_id are not counted.
     row = (
         db.execute(
             text(
@@ -205,15 +240,9 @@ def _observed_door_events(
             SELECT COUNT(*)::int AS n
             FROM events
             WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+              AND room_id = :room
               AND "timestamp" >= :start AND "timestamp" < :end
-              
-AND category = 'door'
-AND (
-  (room_id = :room)
-  OR ((payload->>'room') = :room)
-  OR ((payload->>'area') = :room)
-)
-
+              AND category = 'door'
             """
             ),
             {
@@ -239,21 +268,21 @@ def _observed_activity_events(
     bucket_end: "datetime",
 ) -> float:
     """MVP: observed activity from raw events (presence+motion) inside bucket.
-    Uses events.room_id when present; falls back to payload room/area for backward-compat.
+    Matches events.room_id (set at write time).
     Returns a float count (so it can be used like intensity)."""
     from sqlalchemy import text
 
+    counts = _bucket_counts(db, scope, [room], bucket_start, bucket_end)
+    if counts is not None:
+        return float((counts.get(room) or {}).get("activity_n") or 0.0)
+
     q = text("""
         SELECT COALESCE(COUNT(*),0)::float AS n
         FROM events
         WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+          AND room_id = :room
           AND timestamp >= :t0 AND timestamp < :t1
           AND category IN ('presence','motion')
-          AND (
-            (room_id = :room)
-            OR ((payload->>'room') = :room)
-            OR ((payload->>'area') = :room)
-          )
     """)
     row = (
         db.execute(
@@ -273,63 +302,62 @@ def _observed_activity_events(
     return float(row["n"] if row else 0.0)
 
 
-def score_room_bucket(
+def _grouped_event_counts(
     db: Session,
-    *,
-    scope: AuthScope,
-    room: str,
-    bucket_start: datetime,
-    pet_weight: float = 0.25,
-    unknown_weight: float = 0.50,
-    p_floor: float = 1e-6,
-) -> BucketScore:
-    room = _norm_room(room)
-    if not room:
-        raise HTTPException(status_code=400, detail="room is required")
-
-    if bucket_start.tzinfo is None:
-        raise HTTPException(
-            status_code=400, detail="bucket_start must be timezone-aware UTC"
-        )
-
-    bucket_start = bucket_start.astimezone(timezone.utc).replace(
-        second=0, microsecond=0
-    )
-    bucket_end = bucket_start + timedelta(minutes=15)
-    bucket_local = bucket_start.astimezone(OSLO)
-    dow = (int(bucket_local.weekday()) + 1) % 7  # pg_dow: 0=Sunday .. 6=Saturday (OSLO)
-    is_weekend = dow in (0, 6)  # Sunday(0) or Saturday(6)
-    bucket_idx = _bucket_idx_15m(bucket_start)
-
-    uid = _get_instance_user_id(scope)
-
-    model_end = _get_latest_model_end(db, scope)
-    row_status = (
+    scope_params: dict,
+    rooms: list[str],
+    start: datetime,
+    end: datetime,
+) -> dict[str, Mapping[str, Any]]:
+    count_rows = (
         db.execute(
             text(
                 """
-                SELECT baseline_ready
-                FROM baseline_model_status
-                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
-                ORDER BY model_end DESC
-                LIMIT 1
-                """
+            SELECT
+              room_id AS room,
+              (COUNT(*) FILTER (WHERE category = 'door'))::int AS door_n,
+              (COUNT(*) FILTER (WHERE category IN ('presence','motion')))::float AS activity_n
+            FROM events
+            WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+              AND room_id = ANY(:rooms)
+              AND "timestamp" >= :start AND "timestamp" < :end
+              AND category IN ('door','presence','motion')
+            GROUP BY room_id
+            """
             ),
-            {
-                "org_id": scope.org_id,
-                "home_id": scope.home_id,
-                "subject_id": scope.subject_id,
-            },
+            {**scope_params, "rooms": rooms, "start": start, "end": end},
         )
         .mappings()
-        .first()
-    )
-    baseline_ready = (
-        bool(row_status.get("baseline_ready"))
-        if row_status and row_status.get("baseline_ready") is not None
-        else None
+        .all()
     )
+    return {r["room"]: r for r in count_rows}
+
 
+def _score_bucket(
+    *,
+    room: str,
+    bucket_start: datetime,
+    bucket_end: datetime,
+    dow: int,
+    is_weekend: bool,
+    bucket_idx: int,
+    uid: str,
+    model_end: Optional[str],
+    baseline_ready: Optional[bool],
+    activity_obs: float,
+    act_meta: dict,
+    door_obs: int,
+    activity_fallback: Callable[[], float],
+    load_room_bucket: Callable[[], Optional[Mapping[str, Any]]],
+    load_prev_room: Callable[[], Optional[str]],
+    load_transition: Callable[[str], Optional[Mapping[str, Any]]],
+    p_floor: float,
+) -> BucketScore:
+    """
+    Pure scoring core shared by score_room_bucket (per-room queries) and
+    score_buckets_batch (grouped queries). Lookups are callables so both paths
+    fetch the same data in the same order and only when the scoring needs it.
+    """
     reasons: list[dict] = []
     details: dict[str, Any] = {
         "user_id": uid,
@@ -345,18 +373,6 @@ def score_room_bucket(
         },
     }
 
-    # Observed
-    activity_obs, act_meta = _observed_activity(
-        db,
-        scope,
-        room,
-        bucket_start,
-        bucket_end,
-        pet_weight=pet_weight,
-        unknown_weight=unknown_weight,
-    )
-    door_obs = _observed_door_events(db, scope, room, bucket_start, bucket_end)
-
     details["observed"] = {
         "activity_obs": activity_obs,
         "door_obs": door_obs,
@@ -371,7 +387,7 @@ def score_room_bucket(
             float(obs.get("activity_obs") or 0.0) <= 0.0
             and int(obs.get("episodes_used") or 0) == 0
         ):
-            ao = _observed_activity_events(db, scope, room, bucket_start, bucket_end)
+            ao = activity_fallback()
             obs["activity_obs"] = float(ao)
             details["observed"] = obs
             # also update local variable so scoring below uses the fallback value
@@ -412,41 +428,8 @@ def score_room_bucket(
         )
 
     # Room-bucket baseline
-    try:
-        b = (
-            db.execute(
-                text(
-                    """
-            SELECT
-              activity_median, activity_sigma, activity_support_n, sigma_floor,
-              door_median, door_sigma, door_support_n
-            FROM baseline_room_bucket
-            WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
-              AND model_end = :model_end
-              AND dow = :dow
-              AND is_weekend = :is_weekend
-              AND room_id = :room
-              AND bucket_idx = :bucket_idx
-            LIMIT 1
-            """
-                ),
-                {
-                    "org_id": scope.org_id,
-                    "home_id": scope.home_id,
-                    "subject_id": scope.subject_id,
-                    "model_end": model_end,
-                    "dow": dow,
-                    "is_weekend": is_weekend,
-                    "room": room,
-                    "bucket_idx": bucket_idx,
-                },
-            )
-            .mappings()
-            .first()
-        )
-    except Exception:
-        db.rollback()
-        b = None
+    b = load_room_bucket()
+
     if not b:
         reasons.append(
             {
@@ -645,41 +628,11 @@ def score_room_bucket(
                 )
 
     # Sequence component via transitions
-    prev = _prev_room(db, scope, bucket_start)
+    prev = load_prev_room()
     details["observed"]["prev_room"] = prev
 
     if prev and prev != room:
-        t = (
-            db.execute(
-                text(
-                    """
-                SELECT p_smoothed, trans_count, from_total, alpha
-                FROM baseline_transition
-                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
-                  AND model_end = :model_end
-                  AND dow = :dow
-                  AND is_weekend = :is_weekend
-                  AND bucket_idx = :bucket_idx
-                  AND from_room_id = :from_room
-                  AND to_room_id = :to_room
-                LIMIT 1
-                """
-                ),
-                {
-                    "org_id": scope.org_id,
-                    "home_id": scope.home_id,
-                    "subject_id": scope.subject_id,
-                    "model_end": model_end,
-                    "dow": dow,
-                    "is_weekend": is_weekend,
-                    "bucket_idx": bucket_idx,
-                    "from_room": prev,
-                    "to_room": room,
-                },
-            )
-            .mappings()
-            .first()
-        )
+        t = load_transition(prev)
 
         if not t or t["p_smoothed"] is None:
             reasons.append(
@@ -737,3 +690,393 @@ def score_room_bucket(
         reasons=reasons,
         details=details,
     )
+
+
+
+def score_room_bucket(
+    db: Session,
+    *,
+    scope: AuthScope,
+    room: str,
+    bucket_start: datetime,
+    pet_weight: float = 0.25,
+    unknown_weight: float = 0.50,
+    p_floor: float = 1e-6,
+) -> BucketScore:
+    room = _norm_room(room)
+    if not room:
+        raise HTTPException(status_code=400, detail="room is required")
+
+    if bucket_start.tzinfo is None:
+        raise HTTPException(
+            status_code=400, detail="bucket_start must be timezone-aware UTC"
+        )
+
+    bucket_start = bucket_start.astimezone(timezone.utc).replace(
+        second=0, microsecond=0
+    )
+    bucket_end = bucket_start + timedelta(minutes=15)
+    bucket_local = bucket_start.astimezone(OSLO)
+    dow = (int(bucket_local.weekday()) + 1) % 7  # pg_dow: 0=Sunday .. 6=Saturday (OSLO)
+    is_weekend = dow in (0, 6)  # Sunday(0) or Saturday(6)
+    bucket_idx = _bucket_idx_15m(bucket_start)
+
+    uid = _get_instance_user_id(scope)
+
+    model_end = _get_latest_model_end(db, scope)
+    row_status = (
+        db.execute(
+            text(
+                """
+                SELECT baseline_ready
+                FROM baseline_model_status
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                ORDER BY model_end DESC
+                LIMIT 1
+                """
+            ),
+            {
+                "org_id": scope.org_id,
+                "home_id": scope.home_id,
+                "subject_id": scope.subject_id,
+            },
+        )
+        .mappings()
+        .first()
+    )
+    baseline_ready = (
+        bool(row_status.get("baseline_ready"))
+        if row_status and row_status.get("baseline_ready") is not None
+        else None
+    )
+
+    # Observed
+    activity_obs, act_meta = _observed_activity(
+        db,
+        scope,
+        room,
+        bucket_start,
+        bucket_end,
+        pet_weight=pet_weight,
+        unknown_weight=unknown_weight,
+    )
+    door_obs = _observed_door_events(db, scope, room, bucket_start, bucket_end)
+
+    def _load_room_bucket() -> Optional[Mapping[str, Any]]:
+        try:
+            b = (
+                db.execute(
+                    text(
+                        """
+                SELECT
+                  activity_median, activity_sigma, activity_support_n, sigma_floor,
+                  door_median, door_sigma, door_support_n
+                FROM baseline_room_bucket
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                  AND model_end = :model_end
+                  AND dow = :dow
+                  AND is_weekend = :is_weekend
+                  AND room_id = :room
+                  AND bucket_idx = :bucket_idx
+                LIMIT 1
+                """
+                    ),
+                    {
+                        "org_id": scope.org_id,
+                        "home_id": scope.home_id,
+                        "subject_id": scope.subject_id,
+                        "model_end": model_end,
+                        "dow": dow,
+                        "is_weekend": is_weekend,
+                        "room": room,
+                        "bucket_idx": bucket_idx,
+                    },
+                )
+                .mappings()
+                .first()
+            )
+        except Exception:
+            db.rollback()
+            b = None
+        return b
+
+    def _load_transition(prev: str) -> Optional[Mapping[str, Any]]:
+        t = (
+            db.execute(
+                text(
+                    """
+                SELECT p_smoothed, trans_count, from_total, alpha
+                FROM baseline_transition
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                  AND model_end = :model_end
+                  AND dow = :dow
+                  AND is_weekend = :is_weekend
+                  AND bucket_idx = :bucket_idx
+                  AND from_room_id = :from_room
+                  AND to_room_id = :to_room
+                LIMIT 1
+                """
+                ),
+                {
+                    "org_id": scope.org_id,
+                    "home_id": scope.home_id,
+                    "subject_id": scope.subject_id,
+                    "model_end": model_end,
+                    "dow": dow,
+                    "is_weekend": is_weekend,
+                    "bucket_idx": bucket_idx,
+                    "from_room": prev,
+                    "to_room": room,
+                },
+            )
+            .mappings()
+            .first()
+        )
+        return t
+
+    return _score_bucket(
+        room=room,
+        bucket_start=bucket_start,
+        bucket_end=bucket_end,
+        dow=dow,
+        is_weekend=is_weekend,
+        bucket_idx=bucket_idx,
+        uid=uid,
+        model_end=model_end,
+        baseline_ready=baseline_ready,
+        activity_obs=activity_obs,
+        act_meta=act_meta,
+        door_obs=door_obs,
+        activity_fallback=lambda: _observed_activity_events(
+            db, scope, room, bucket_start, bucket_end
+        ),
+        load_room_bucket=_load_room_bucket,
+        load_prev_room=lambda: _prev_room(db, scope, bucket_start),
+        load_transition=_load_transition,
+        p_floor=p_floor,
+    )
+
+
+def score_buckets_batch(
+    db: Session,
+    *,
+    scope: AuthScope,
+    bucket_start: datetime,
+    rooms: list[str],
+    pet_weight: float = 0.25,
+    unknown_weight: float = 0.50,
+    p_floor: float = 1e-6,
+) -> dict[str, BucketScore]:
+    """
+    Score all rooms of one bucket with grouped queries instead of ~8 per room.
+
+    Same inputs and scoring core as score_room_bucket (the reference path), so
+    each BucketScore is identical to calling score_room_bucket for that room:
+    - baseline_model_status: 1 query (model_end + baseline_ready)
+    - episodes overlapping the bucket: 1 query for all rooms
+    - door + presence/motion counts: 1 query, grouped by room (event_bucket_counts,
+      or events when that cannot be read)
+    - baseline_room_bucket: 1 query for all rooms
+    - prev room + baseline_transition: 1 query each, only if scoring needs them
+    Returns {room: BucketScore} for the normalized, de-duplicated rooms.
+    """
+    room_list = list(dict.fromkeys(r for r in (_norm_room(x) for x in rooms) if r))
+    if not room_list:
+        return {}
+
+    if bucket_start.tzinfo is None:
+        raise HTTPException(
+            status_code=400, detail="bucket_start must be timezone-aware UTC"
+        )
+
+    bucket_start = bucket_start.astimezone(timezone.utc).replace(
+        second=0, microsecond=0
+    )
+    bucket_end = bucket_start + timedelta(minutes=15)
+    bucket_local = bucket_start.astimezone(OSLO)
+    dow = (int(bucket_local.weekday()) + 1) % 7  # pg_dow: 0=Sunday .. 6=Saturday (OSLO)
+    is_weekend = dow in (0, 6)  # Sunday(0) or Saturday(6)
+    bucket_idx = _bucket_idx_15m(bucket_start)
+
+    uid = _get_instance_user_id(scope)
+
+    scope_params = {
+        "org_id": scope.org_id,
+        "home_id": scope.home_id,
+        "subject_id": scope.subject_id,
+    }
+
+    row_status = (
+        db.execute(
+            text(
+                """
+                SELECT model_end, baseline_ready
+                FROM baseline_model_status
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                ORDER BY model_end DESC
+                LIMIT 1
+                """
+            ),
+            scope_params,
+        )
+        .mappings()
+        .first()
+    )
+    model_end = row_status["model_end"] if row_status else None
+    baseline_ready = (
+        bool(row_status.get("baseline_ready"))
+        if row_status and row_status.get("baseline_ready") is not None
+        else None
+    )
+
+    # Episodes overlapping the bucket, all rooms (start_ts order kept per room).
+    try:
+        ep_rows = (
+            db.execute(
+                text(
+                    """
+            SELECT
+              room, start_ts, end_ts, event_rate_per_min,
+              class, p_human, p_pet, p_unknown
+            FROM episodes
+            WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+              AND room = ANY(:rooms)
+              AND start_ts < :end
+              AND end_ts IS NOT NULL
+              AND end_ts > :start
+            ORDER BY room ASC, start_ts ASC
+            """
+                ),
+                {**scope_params, "rooms": room_list, "start": bucket_start, "end": bucket_end},
+            )
+            .mappings()
+            .all()
+        )
+    except Exception:
+        db.rollback()
+        ep_rows = []
+    episodes_by_room: dict[str, list] = {r: [] for r in room_list}
+    for r in ep_rows:
+        episodes_by_room.setdefault(r["room"], []).append(r)
+
+    # Door + presence/motion counts per room; same room predicate as the per-room queries.
+    counts_by_room = _bucket_counts(db, scope, room_list, bucket_start, bucket_end)
+    if counts_by_room is None:
+        counts_by_room = _grouped_event_counts(
+            db, scope_params, room_list, bucket_start, bucket_end
+        )
+
+    room_buckets: dict[str, Mapping[str, Any]] = {}
+    if model_end:
+        try:
+            for r in (
+                db.execute(
+                    text(
+                        """
+                SELECT
+                  room_id,
+                  activity_median, activity_sigma, activity_support_n, sigma_floor,
+                  door_median, door_sigma, door_support_n
+                FROM baseline_room_bucket
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                  AND model_end = :model_end
+                  AND dow = :dow
+                  AND is_weekend = :is_weekend
+                  AND room_id = ANY(:rooms)
+                  AND bucket_idx = :bucket_idx
+                """
+                    ),
+                    {
+                        **scope_params,
+                        "model_end": model_end,
+                        "dow": dow,
+                        "is_weekend": is_weekend,
+                        "rooms": room_list,
+                        "bucket_idx": bucket_idx,
+                    },
+                )
+                .mappings()
+                .all()
+            ):
+                room_buckets.setdefault(r["room_id"], r)
+        except Exception:
+            db.rollback()
+            room_buckets = {}
+
+    # prev room is scope-wide; transitions are loaded once for (prev -> any room).
+    lazy: dict[str, Any] = {}
+
+    def _load_prev_room() -> Optional[str]:
+        if "prev" not in lazy:
+            lazy["prev"] = _prev_room(db, scope, bucket_start)
+        return lazy["prev"]
+
+    def _load_transition(prev: str, room: str) -> Optional[Mapping[str, Any]]:
+        if "transitions" not in lazy:
+            rows_t = (
+                db.execute(
+                    text(
+                        """
+                    SELECT to_room_id, p_smoothed, trans_count, from_total, alpha
+                    FROM baseline_transition
+                    WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                      AND model_end = :model_end
+                      AND dow = :dow
+                      AND is_weekend = :is_weekend
+                      AND bucket_idx = :bucket_idx
+                      AND from_room_id = :from_room
+                      AND to_room_id = ANY(:rooms)
+                    """
+                    ),
+                    {
+                        **scope_params,
+                        "model_end": model_end,
+                        "dow": dow,
+                        "is_weekend": is_weekend,
+                        "bucket_idx": bucket_idx,
+                        "from_room": prev,
+                        "rooms": room_list,
+                    },
+                )
+                .mappings()
+                .all()
+            )
+            by_to: dict[str, Mapping[str, Any]] = {}
+            for r in rows_t:
+                by_to.setdefault(r["to_room_id"], r)
+            lazy["transitions"] = by_to
+        return lazy["transitions"].get(room)
+
+    out: dict[str, BucketScore] = {}
+    for room in room_list:
+        activity_obs, act_meta = _activity_from_episodes(
+            episodes_by_room.get(room, []),
+            bucket_start,
+            bucket_end,
+            pet_weight=pet_weight,
+            unknown_weight=unknown_weight,
+        )
+        counts = counts_by_room.get(room)
+        door_obs = int(counts["door_n"] or 0) if counts else 0
+        activity_n = float(counts["activity_n"] or 0.0) if counts else 0.0
+
+        out[room] = _score_bucket(
+            room=room,
+            bucket_start=bucket_start,
+            bucket_end=bucket_end,
+            dow=dow,
+            is_weekend=is_weekend,
+            bucket_idx=bucket_idx,
+            uid=uid,
+            model_end=model_end,
+            baseline_ready=baseline_ready,
+            activity_obs=activity_obs,
+            act_meta=act_meta,
+            door_obs=door_obs,
+            activity_fallback=lambda n=activity_n: n,
+            load_room_bucket=lambda r=room: room_buckets.get(r),
+            load_prev_room=_load_prev_room,
+            load_transition=lambda prev, r=room: _load_transition(prev, r),
+            p_floor=p_floor,
+        )
+    return out
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 import hashlib
 
@@ -77,9 +80,7 @@ def _sha256_hex(s: str) -> str:
     return hashlib.sha256((s or "").encode("utf-8")).hexdigest()
 
 
-def _lookup_scope_by_api_key(x_api_key: str) -> AuthScope | None:
-    # Hash key in app layer; DB stores only hash.
-    h = _sha256_hex(x_api_key)
+def _lookup_scope_by_hash(h: str) -> AuthScope | None:
     db = SessionLocal()
     try:
         row = (
@@ -110,6 +111,80 @@ def _lookup_scope_by_api_key(x_api_key: str) -> AuthScope | None:
         db.close()
 
 
+# -------------------------
+# Scope cache (hash -> AuthScope)
+# -------------------------
+# Every authenticated request resolves its scope; cache it in-process so console
+# pages and ai-bot calls do not pay one extra DB round-trip each.
+# - Bounded LRU (AGINGOS_AUTH_CACHE_MAX entries)
+# - Positive TTL (AGINGOS_AUTH_CACHE_TTL_S), short negative TTL (AGINGOS_AUTH_CACHE_NEG_TTL_S)
+# - invalidate_scope_cache() is the revocation hook; TTL bounds staleness for out-of-process writers.
+
+_SCOPE_CACHE_MAX = int(os.getenv("AGINGOS_AUTH_CACHE_MAX", "1024"))
+_SCOPE_CACHE_TTL_S = float(os.getenv("AGINGOS_AUTH_CACHE_TTL_S", "60"))
+_SCOPE_CACHE_NEG_TTL_S = float(os.getenv("AGINGOS_AUTH_CACHE_NEG_TTL_S", "5"))
+
+_SCOPE_CACHE_LOCK = threading.Lock()
+# api_key_hash -> (expires_at_monotonic, AuthScope | None)
+_SCOPE_CACHE: "OrderedDict[str, tuple[float, AuthScope | None]]" = OrderedDict()
+_SCOPE_CACHE_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "negative_hits": 0,
+    "evictions": 0,
+    "invalidations": 0,
+}
+
+
+def invalidate_scope_cache(api_key_hash: str | None = None) -> None:
+    """Drop one cached key (by sha256 hash) or the whole cache (no args)."""
+    with _SCOPE_CACHE_LOCK:
+        if api_key_hash is None:
+            _SCOPE_CACHE.clear()
+        else:
+            _SCOPE_CACHE.pop(api_key_hash, None)
+        _SCOPE_CACHE_STATS["invalidations"] += 1
+
+
+def scope_cache_stats() -> dict:
+    """Process-local cache counters (for /health/detail)."""
+    with _SCOPE_CACHE_LOCK:
+        out = dict(_SCOPE_CACHE_STATS)
+        out["size"] = len(_SCOPE_CACHE)
+    out["max_size"] = _SCOPE_CACHE_MAX
+    out["ttl_seconds"] = _SCOPE_CACHE_TTL_S
+    out["negative_ttl_seconds"] = _SCOPE_CACHE_NEG_TTL_S
+    return out
+
+
+def _lookup_scope_by_api_key(x_api_key: str) -> AuthScope | None:
+    # Hash key in app layer; DB stores only hash.
+    h = _sha256_hex(x_api_key)
+    now = time.monotonic()
+
+    with _SCOPE_CACHE_LOCK:
+        hit = _SCOPE_CACHE.get(h)
+        if hit is not None and hit[0] > now:
+            _SCOPE_CACHE.move_to_end(h)
+            _SCOPE_CACHE_STATS["hits"] += 1
+            if hit[1] is None:
+                _SCOPE_CACHE_STATS["negative_hits"] += 1
+            return hit[1]
+        _SCOPE_CACHE_STATS["misses"] += 1
+
+    scope = _lookup_scope_by_hash(h)
+
+    ttl = _SCOPE_CACHE_TTL_S if scope is not None else _SCOPE_CACHE_NEG_TTL_S
+    if _SCOPE_CACHE_MAX > 0 and ttl > 0:
+        with _SCOPE_CACHE_LOCK:
+            _SCOPE_CACHE[h] = (time.monotonic() + ttl, scope)
+            _SCOPE_CACHE.move_to_end(h)
+            while len(_SCOPE_CACHE) > _SCOPE_CACHE_MAX:
+                _SCOPE_CACHE.popitem(last=False)
+                _SCOPE_CACHE_STATS["evictions"] += 1
+    return scope
+
+
 def require_scope(
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> AuthScope:
@@ -20,6 +20,8 @@ class BuildResult:
     watermark_before_id: Optional[int]
     watermark_after_ts: Optional[datetime]
     watermark_after_id: Optional[int]
+    batches: int = 1
+    stopped_reason: Optional[str] = None
 
 
 def _utcnow() -> datetime:
@@ -57,14 +59,20 @@ def ensure_state_row(
 
 
 def read_watermark_for_update(
-    cur, *, org_id: str, home_id: str, subject_id: str, builder_name: str
+    cur,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    builder_name: str,
+    lock: bool = True,
 ) -> Tuple[Optional[datetime], Optional[int]]:
     cur.execute(
-        """
+        f"""
         SELECT last_event_ts, last_event_row_id
         FROM episode_builder_state
         WHERE org_id=%s AND home_id=%s AND subject_id=%s AND builder_name=%s
-        FOR UPDATE
+        {"FOR UPDATE" if lock else ""}
         """,
         (org_id, home_id, subject_id, builder_name),
     )
@@ -85,6 +93,8 @@ def fetch_events(
     since: Optional[datetime],
     until: Optional[datetime],
     batch: int,
+    after_ts: Optional[datetime] = None,
+    after_id: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     params: list[Any] = [
         org_id,
@@ -113,6 +123,11 @@ def fetch_events(
             where.append('("timestamp" > %s OR ("timestamp" = %s AND id > %s))')
             params.extend([wm_ts, wm_ts, (wm_id or 0)])
 
+    if after_ts is not None:
+        # keyset continuation (loop mode, window replay)
+        where.append('("timestamp" > %s OR ("timestamp" = %s AND id > %s))')
+        params.extend([after_ts, after_ts, (after_id or 0)])
+
     sql = f"""
         SELECT id, event_id, "timestamp" AS ts, payload
         FROM events
@@ -184,6 +199,214 @@ def upsert_episode(
     )
 
 
+_EPISODE_TYPE = "presence_room_v1"
+
+_UPSERT_COLUMNS = """
+          org_id, home_id, subject_id,
+          episode_type, room_id,
+          start_ts, end_ts,
+          start_event_row_id, end_event_row_id,
+          start_event_id, end_event_id,
+          event_n, is_open, meta
+"""
+
+_UPSERT_CONFLICT = """
+        ON CONFLICT (org_id, home_id, subject_id, episode_type, room_id, start_ts)
+        DO UPDATE SET
+          end_ts = EXCLUDED.end_ts,
+          end_event_row_id = EXCLUDED.end_event_row_id,
+          end_event_id = EXCLUDED.end_event_id,
+          event_n = GREATEST(episodes_svc.event_n, EXCLUDED.event_n),
+          is_open = EXCLUDED.is_open,
+          meta = episodes_svc.meta || EXCLUDED.meta
+"""
+
+
+def upsert_episodes(
+    cur,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    rows: List[Dict[str, Any]],
+    page_size: int = 1000,
+) -> int:
+    """
+    Multi-row variant of upsert_episode (execute_values pages).
+
+    rows must hold at most one entry per (room_id, start_ts): ON CONFLICT cannot
+    touch the same row twice in one statement. _apply_events collapses them.
+    """
+    import json
+
+    if not rows:
+        return 0
+    psycopg2.extras.execute_values(
+        cur,
+        f"INSERT INTO episodes_svc ({_UPSERT_COLUMNS}) VALUES %s {_UPSERT_CONFLICT}",
+        [
+            (
+                org_id,
+                home_id,
+                subject_id,
+                _EPISODE_TYPE,
+                r["room_id"],
+                r["start_ts"],
+                r["end_ts"],
+                r["start_row_id"],
+                r["end_row_id"],
+                r["start_event_id"],
+                r["end_event_id"],
+                r["event_n"],
+                r["is_open"],
+                json.dumps(r["meta"]),
+            )
+            for r in rows
+        ],
+        template="(%s,%s,%s, %s,%s, %s,%s, %s,%s, %s,%s, %s,%s, %s::jsonb)",
+        page_size=page_size,
+    )
+    return len(rows)
+
+
+def _apply_events(
+    events: List[Dict[str, Any]],
+    *,
+    open_by_room: Dict[str, Dict[str, Any]],
+    pending: Dict[Tuple[str, datetime], Dict[str, Any]],
+    counts: Dict[str, int],
+    last_seen: Tuple[Optional[datetime], Optional[int]],
+) -> Tuple[Optional[datetime], Optional[int]]:
+    """
+    Presence on/off state machine per room.
+
+    Each on/off for a room is one logical upsert (counts["episodes_upserted"]);
+    successive upserts of the same episode are collapsed into pending[(room, start)]
+    with meta merged in order, which equals applying them one by one
+    (end_*/is_open last-wins, event_n monotonic, meta shallow ||).
+    Returns the highest (ts, id) seen.
+    """
+    last_seen_ts, last_seen_id = last_seen
+
+    def _upsert(o: Dict[str, Any], room_id: str, e, ts, eid_row, is_open, meta):
+        key = (room_id, o["start_ts"])
+        row = pending.get(key)
+        if row is None:
+            row = pending[key] = {
+                "room_id": room_id,
+                "start_ts": o["start_ts"],
+                "start_row_id": o["start_row_id"],
+                "start_event_id": o["start_event_id"],
+                "meta": {},
+            }
+        row.update(
+            end_ts=ts,
+            end_row_id=eid_row,
+            end_event_id=e.get("event_id"),
+            event_n=o["event_n"],
+            is_open=is_open,
+        )
+        row["meta"].update(meta)
+        counts["episodes_upserted"] += 1
+
+    for e in events:
+        eid_row = int(e["id"])
+        ts = e["ts"]
+
+        if (
+            last_seen_ts is None
+            or ts > last_seen_ts
+            or (ts == last_seen_ts and (last_seen_id is None or eid_row > last_seen_id))
+        ):
+            last_seen_ts, last_seen_id = ts, eid_row
+
+        payload = _payload_get(e["payload"])
+        room = payload.get("room")
+        state = payload.get("state")
+
+        if not room:
+            counts["skipped_no_room"] += 1
+            continue
+        if not state:
+            counts["skipped_no_state"] += 1
+            continue
+
+        room_id = str(room)
+        st = str(state).lower().strip()
+
+        if st not in ("on", "off"):
+            counts["skipped_unknown_state"] += 1
+            continue
+
+        if st == "on":
+            o = open_by_room.get(room_id)
+            if o is None:
+                o = open_by_room[room_id] = {
+                    "start_ts": ts,
+                    "start_row_id": eid_row,
+                    "start_event_id": e.get("event_id"),
+                    "event_n": 1,
+                }
+            else:
+                o["event_n"] += 1
+            _upsert(
+                o, room_id, e, ts, eid_row, True, {"entity_id": payload.get("entity_id", "")}
+            )
+        else:  # off
+            o = open_by_room.get(room_id)
+            if o is not None:
+                o["event_n"] += 1
+                _upsert(
+                    o,
+                    room_id,
+                    e,
+                    ts,
+                    eid_row,
+                    False,
+                    {
+                        "close_reason": "off_event",
+                        "entity_id": payload.get("entity_id", ""),
+                    },
+                )
+                del open_by_room[room_id]
+            else:
+                # off without open -> ignore
+                pass
+
+    return last_seen_ts, last_seen_id
+
+
+def load_open_episodes(
+    cur, *, org_id: str, home_id: str, subject_id: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Open presence episodes per room, as _apply_events keeps them in open_by_room.
+
+    An incremental build resumes after the watermark, so an "on" folded by an
+    earlier run must still be open when its "off" arrives. Latest start wins if a
+    room has more than one open row.
+    """
+    cur.execute(
+        """
+        SELECT room_id, start_ts, start_event_row_id, start_event_id, event_n
+        FROM episodes_svc
+        WHERE org_id=%s AND home_id=%s AND subject_id=%s
+          AND episode_type=%s AND is_open
+        ORDER BY start_ts ASC
+        """,
+        (org_id, home_id, subject_id, _EPISODE_TYPE),
+    )
+    return {
+        str(r["room_id"]): {
+            "start_ts": r["start_ts"],
+            "start_row_id": r["start_event_row_id"],
+            "start_event_id": r["start_event_id"],
+            "event_n": int(r["event_n"] or 0),
+        }
+        for r in cur.fetchall()
+    }
+
+
 def update_builder_state(
     cur,
     *,
@@ -235,230 +458,175 @@ def build_presence_room_v1(
     until: Optional[datetime] = None,
     advance_watermark: bool = False,
     batch: int = 5000,
+    loop: bool = False,
+    max_batches: Optional[int] = None,
 ) -> BuildResult:
     """
     Build deterministic room episodes from presence events only (payload.room + payload.state).
     Idempotent writes via episodes_svc unique key; incremental reads via episode_builder_state watermark.
+
+    loop=False: one batch (<= batch events) in one transaction holding the state row lock.
+    loop=True:  successive batches until caught up (or max_batches). Events are read
+                and folded without the lock; each batch then takes the lock only to
+                upsert (execute_values), advance the watermark and commit. If another
+                builder moved the watermark meanwhile the loop stops (stopped_reason).
     """
     conn = psycopg2.connect(db_dsn)
     conn.autocommit = False
 
-    watermark_before_ts: Optional[datetime] = None
-    watermark_before_id: Optional[int] = None
-    watermark_after_ts: Optional[datetime] = None
-    watermark_after_id: Optional[int] = None
-
-    episodes_upserted = 0
-    skipped_no_room = 0
-    skipped_no_state = 0
-    skipped_unknown_state = 0
+    incremental = since is None and until is None
+    counts = {
+        "episodes_upserted": 0,
+        "skipped_no_room": 0,
+        "skipped_no_state": 0,
+        "skipped_unknown_state": 0,
+    }
+    scope = {
+        "org_id": org_id,
+        "home_id": home_id,
+        "subject_id": subject_id,
+        "builder_name": builder_name,
+    }
+
+    def _result(events_read, before, after, batches, stopped_reason=None):
+        return BuildResult(
+            events_read=events_read,
+            episodes_upserted=counts["episodes_upserted"],
+            skipped_no_room=counts["skipped_no_room"],
+            skipped_no_state=counts["skipped_no_state"],
+            skipped_unknown_state=counts["skipped_unknown_state"],
+            watermark_before_ts=before[0],
+            watermark_before_id=before[1],
+            watermark_after_ts=after[0],
+            watermark_after_id=after[1],
+            batches=batches,
+            stopped_reason=stopped_reason,
+        )
 
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            ensure_state_row(
-                cur,
-                org_id=org_id,
-                home_id=home_id,
-                subject_id=subject_id,
-                builder_name=builder_name,
-            )
-            wm_ts, wm_id = read_watermark_for_update(
-                cur,
-                org_id=org_id,
-                home_id=home_id,
-                subject_id=subject_id,
-                builder_name=builder_name,
-            )
+            ensure_state_row(cur, **scope)
+
+            if not loop:
+                wm = read_watermark_for_update(cur, **scope)
+                open_by_room = (
+                    load_open_episodes(
+                        cur, org_id=org_id, home_id=home_id, subject_id=subject_id
+                    )
+                    if incremental
+                    else {}
+                )
+                events = fetch_events(
+                    cur,
+                    org_id=org_id,
+                    home_id=home_id,
+                    subject_id=subject_id,
+                    wm_ts=wm[0],
+                    wm_id=wm[1],
+                    since=since,
+                    until=until,
+                    batch=batch,
+                )
+                pending: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+                last_seen = _apply_events(
+                    events,
+                    open_by_room=open_by_room,
+                    pending=pending,
+                    counts=counts,
+                    last_seen=wm,
+                )
+                upsert_episodes(
+                    cur,
+                    org_id=org_id,
+                    home_id=home_id,
+                    subject_id=subject_id,
+                    rows=list(pending.values()),
+                )
 
-            watermark_before_ts, watermark_before_id = wm_ts, wm_id
-
-            events = fetch_events(
-                cur,
-                org_id=org_id,
-                home_id=home_id,
-                subject_id=subject_id,
-                wm_ts=wm_ts,
-                wm_id=wm_id,
-                since=since,
-                until=until,
-                batch=batch,
+                # watermark rules: incremental => always advance; window replay only if asked
+                after = last_seen if (incremental or advance_watermark) else wm
+                update_builder_state(
+                    cur, **scope, last_ts=after[0], last_id=after[1], ok=True, err_msg=None
+                )
+                conn.commit()
+                return _result(len(events), wm, after, 1)
+
+            # --- loop mode ---
+            conn.commit()  # state row exists; no lock held while reading
+            before = read_watermark_for_update(cur, **scope, lock=False)
+            # episodes opened by an earlier run; a window replay starts from scratch
+            open_by_room: Dict[str, Dict[str, Any]] = (
+                load_open_episodes(cur, org_id=org_id, home_id=home_id, subject_id=subject_id)
+                if incremental
+                else {}
             )
+            conn.commit()
 
-            open_by_room: Dict[str, Dict[str, Any]] = {}
-            last_seen_ts = wm_ts
-            last_seen_id = wm_id
+            wm = before
+            cursor: Tuple[Optional[datetime], Optional[int]] = (
+                before if incremental else (None, None)
+            )
+            events_read = 0
+            batches = 0
+            stopped_reason = None
 
-            for e in events:
-                eid_row = int(e["id"])
-                ts = e["ts"]
+            while max_batches is None or batches < max_batches:
+                events = fetch_events(
+                    cur,
+                    org_id=org_id,
+                    home_id=home_id,
+                    subject_id=subject_id,
+                    wm_ts=cursor[0] if incremental else None,
+                    wm_id=cursor[1] if incremental else None,
+                    since=since,
+                    until=until,
+                    batch=batch,
+                    after_ts=None if incremental else cursor[0],
+                    after_id=None if incremental else cursor[1],
+                )
+                conn.commit()  # end the read snapshot before taking the lock
+                if not events and batches > 0:
+                    break
+
+                pending = {}
+                cursor = _apply_events(
+                    events,
+                    open_by_room=open_by_room,
+                    pending=pending,
+                    counts=counts,
+                    last_seen=cursor,
+                )
 
-                if (
-                    last_seen_ts is None
-                    or ts > last_seen_ts
-                    or (
-                        ts == last_seen_ts
-                        and (last_seen_id is None or eid_row > last_seen_id)
-                    )
-                ):
-                    last_seen_ts, last_seen_id = ts, eid_row
-
-                payload = _payload_get(e["payload"])
-                room = payload.get("room")
-                state = payload.get("state")
-
-                if not room:
-                    skipped_no_room += 1
-                    continue
-                if not state:
-                    skipped_no_state += 1
-                    continue
-
-                room_id = str(room)
-                st = str(state).lower().strip()
-
-                if st not in ("on", "off"):
-                    skipped_unknown_state += 1
-                    continue
-
-                episode_type = "presence_room_v1"
-
-                if st == "on":
-                    if room_id not in open_by_room:
-                        open_by_room[room_id] = {
-                            "start_ts": ts,
-                            "start_row_id": eid_row,
-                            "start_event_id": e.get("event_id"),
-                            "event_n": 1,
-                        }
-                        upsert_episode(
-                            cur,
-                            org_id=org_id,
-                            home_id=home_id,
-                            subject_id=subject_id,
-                            episode_type=episode_type,
-                            room_id=room_id,
-                            start_ts=ts,
-                            end_ts=ts,
-                            start_row_id=eid_row,
-                            end_row_id=eid_row,
-                            start_event_id=e.get("event_id"),
-                            end_event_id=e.get("event_id"),
-                            event_n=1,
-                            is_open=True,
-                            meta={"entity_id": payload.get("entity_id", "")},
-                        )
-                        episodes_upserted += 1
-                    else:
-                        o = open_by_room[room_id]
-                        o["event_n"] += 1
-                        upsert_episode(
-                            cur,
-                            org_id=org_id,
-                            home_id=home_id,
-                            subject_id=subject_id,
-                            episode_type=episode_type,
-                            room_id=room_id,
-                            start_ts=o["start_ts"],
-                            end_ts=ts,
-                            start_row_id=o["start_row_id"],
-                            end_row_id=eid_row,
-                            start_event_id=o["start_event_id"],
-                            end_event_id=e.get("event_id"),
-                            event_n=o["event_n"],
-                            is_open=True,
-                            meta={"entity_id": payload.get("entity_id", "")},
-                        )
-                        episodes_upserted += 1
-
-                else:  # off
-                    if room_id in open_by_room:
-                        o = open_by_room[room_id]
-                        o["event_n"] += 1
-                        upsert_episode(
-                            cur,
-                            org_id=org_id,
-                            home_id=home_id,
-                            subject_id=subject_id,
-                            episode_type=episode_type,
-                            room_id=room_id,
-                            start_ts=o["start_ts"],
-                            end_ts=ts,
-                            start_row_id=o["start_row_id"],
-                            end_row_id=eid_row,
-                            start_event_id=o["start_event_id"],
-                            end_event_id=e.get("event_id"),
-                            event_n=o["event_n"],
-                            is_open=False,
-                            meta={
-                                "close_reason": "off_event",
-                                "entity_id": payload.get("entity_id", ""),
-                            },
-                        )
-                        episodes_upserted += 1
-                        del open_by_room[room_id]
-                    else:
-                        # off without open -> ignore
-                        pass
-
-            # watermark rules
-            if since is None and until is None:
-                # incremental => always advance
-                watermark_after_ts, watermark_after_id = last_seen_ts, last_seen_id
-                update_builder_state(
+                # short write transaction: lock, compare, upsert, advance, commit
+                locked = read_watermark_for_update(cur, **scope)
+                if incremental and locked != wm:
+                    conn.rollback()
+                    stopped_reason = "watermark_moved"
+                    break
+                upsert_episodes(
                     cur,
                     org_id=org_id,
                     home_id=home_id,
                     subject_id=subject_id,
-                    builder_name=builder_name,
-                    last_ts=watermark_after_ts,
-                    last_id=watermark_after_id,
-                    ok=True,
-                    err_msg=None,
+                    rows=list(pending.values()),
                 )
-            else:
-                # window replay
-                if advance_watermark:
-                    watermark_after_ts, watermark_after_id = last_seen_ts, last_seen_id
-                    update_builder_state(
-                        cur,
-                        org_id=org_id,
-                        home_id=home_id,
-                        subject_id=subject_id,
-                        builder_name=builder_name,
-                        last_ts=watermark_after_ts,
-                        last_id=watermark_after_id,
-                        ok=True,
-                        err_msg=None,
-                    )
-                else:
-                    watermark_after_ts, watermark_after_id = wm_ts, wm_id
-                    update_builder_state(
-                        cur,
-                        org_id=org_id,
-                        home_id=home_id,
-                        subject_id=subject_id,
-                        builder_name=builder_name,
-                        last_ts=wm_ts,
-                        last_id=wm_id,
-                        ok=True,
-                        err_msg=None,
-                    )
+                wm = cursor if (incremental or advance_watermark) else locked
+                update_builder_state(
+                    cur, **scope, last_ts=wm[0], last_id=wm[1], ok=True, err_msg=None
+                )
+                conn.commit()
 
-            conn.commit()
+                batches += 1
+                events_read += len(events)
+                if len(events) < batch:
+                    break
+            else:
+                stopped_reason = "max_batches"
 
-            return BuildResult(
-                events_read=len(events),
-                episodes_upserted=episodes_upserted,
-                skipped_no_room=skipped_no_room,
-                skipped_no_state=skipped_no_state,
-                skipped_unknown_state=skipped_unknown_state,
-                watermark_before_ts=watermark_before_ts,
-                watermark_before_id=watermark_before_id,
-                watermark_after_ts=watermark_after_ts,
-                watermark_after_id=watermark_after_id,
-            )
+            return _result(events_read, before, wm, batches, stopped_reason)
     except Exception as e:
         try:
+            conn.rollback()
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 update_builder_state(
                     cur,
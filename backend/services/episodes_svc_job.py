@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from db import DATABASE_URL, SessionLocal
+from services.episodes_svc_builder import BuildResult, build_presence_room_v1
+from util.time import utcnow
+
+# Incremental episodes_svc builder, driven by ingest.
+#
+# Ingest marks a scope dirty after committing presence events; the scheduler job
+# (every INTERVAL_S) builds scopes that have been quiet for DEBOUNCE_S, or dirty for
+# MAX_DELAY_S under a continuous stream. A periodic sweep finds scopes with presence
+# events past their watermark that were not marked here (other workers, tools, restart).
+
+BUILDER_NAME = os.getenv("AGINGOS_EPISODES_SVC_BUILDER", "episodes_svc_v1")
+INTERVAL_S = float(os.getenv("AGINGOS_EPISODES_SVC_INTERVAL_S", "5"))
+DEBOUNCE_S = float(os.getenv("AGINGOS_EPISODES_SVC_DEBOUNCE_S", "2"))
+MAX_DELAY_S = float(os.getenv("AGINGOS_EPISODES_SVC_MAX_DELAY_S", "30"))
+SWEEP_S = float(os.getenv("AGINGOS_EPISODES_SVC_SWEEP_S", "300"))
+SWEEP_LOOKBACK_H = int(os.getenv("AGINGOS_EPISODES_SVC_SWEEP_LOOKBACK_H", "48"))
+BATCH = int(os.getenv("AGINGOS_EPISODES_SVC_BATCH", "5000"))
+
+Scope = tuple[str, str, str]  # (org_id, home_id, subject_id)
+
+# scope -> [first_mark, last_mark] (time.monotonic)
+_DIRTY: dict[Scope, list[float]] = {}
+_DIRTY_LOCK = threading.Lock()
+_LAST_SWEEP: list[Optional[float]] = [None]
+
+
+def episodes_svc_job_enabled() -> bool:
+    return os.getenv("AGINGOS_EPISODES_SVC_JOB", "1").lower() in ("1", "true", "yes", "on")
+
+
+def mark_scope_dirty(org_id: str, home_id: str, subject_id: str) -> None:
+    """Called by ingest after commit. O(1), never touches the DB."""
+    now = time.monotonic()
+    key = (org_id, home_id, subject_id)
+    with _DIRTY_LOCK:
+        marks = _DIRTY.get(key)
+        if marks is None:
+            _DIRTY[key] = [now, now]
+        else:
+            marks[1] = now
+
+
+def take_ready_scopes(
+    now: Optional[float] = None,
+    *,
+    debounce_s: float = DEBOUNCE_S,
+    max_delay_s: float = MAX_DELAY_S,
+) -> list[Scope]:
+    """Pop scopes that are quiet for debounce_s or have waited max_delay_s."""
+    now = time.monotonic() if now is None else now
+    ready: list[Scope] = []
+    with _DIRTY_LOCK:
+        for key, (first, last) in list(_DIRTY.items()):
+            if now - last >= debounce_s or now - first >= max_delay_s:
+                ready.append(key)
+                del _DIRTY[key]
+    return ready
+
+
+def scopes_past_watermark(
+    db: Session, *, builder_name: str = BUILDER_NAME, lookback_h: int = SWEEP_LOOKBACK_H
+) -> list[Scope]:
+    """Scopes with presence events (in the lookback) newer than their builder watermark."""
+    rows = db.execute(
+        text(
+            """
+            SELECT DISTINCT e.org_id, e.home_id, e.subject_id
+            FROM events e
+            LEFT JOIN episode_builder_state b
+              ON b.org_id = e.org_id AND b.home_id = e.home_id
+             AND b.subject_id = e.subject_id AND b.builder_name = :builder_name
+            WHERE e.stream_id = :stream_id
+              AND e.category = 'presence'
+              AND e."timestamp" >= :since
+              AND (
+                b.last_event_ts IS NULL
+                OR e."timestamp" > b.last_event_ts
+                OR (e."timestamp" = b.last_event_ts AND e.id > COALESCE(b.last_event_row_id, 0))
+              )
+            """
+        ),
+        {
+            "builder_name": builder_name,
+            "stream_id": os.getenv("AGINGOS_STREAM_ID", "prod"),
+            "since": utcnow() - timedelta(hours=lookback_h),
+        },
+    ).all()
+    return [(str(r[0]), str(r[1]), str(r[2])) for r in rows]
+
+
+def run_episodes_svc_job(
+    *,
+    build: Callable[..., BuildResult] = build_presence_room_v1,
+    sweep: Optional[bool] = None,
+) -> dict[str, Any]:
+    """
+    One scheduler tick: build ready dirty scopes (+ swept scopes) in loop mode.
+
+    A scope that fails is re-marked dirty so the next tick retries it.
+    """
+    now = time.monotonic()
+    scopes = take_ready_scopes(now)
+
+    if sweep is None:
+        sweep = _LAST_SWEEP[0] is None or now - _LAST_SWEEP[0] >= SWEEP_S
+    if sweep:
+        db = SessionLocal()
+        try:
+            swept = scopes_past_watermark(db)
+        finally:
+            db.close()
+        _LAST_SWEEP[0] = now
+        scopes.extend(s for s in swept if s not in scopes)
+
+    out: dict[str, Any] = {
+        "scopes": len(scopes),
+        "swept": bool(sweep),
+        "events_read": 0,
+        "episodes_upserted": 0,
+        "errors": [],
+    }
+    for org_id, home_id, subject_id in scopes:
+        try:
+            res = build(
+                db_dsn=DATABASE_URL,
+                org_id=org_id,
+                home_id=home_id,
+                subject_id=subject_id,
+                builder_name=BUILDER_NAME,
+                batch=BATCH,
+                loop=True,
+            )
+        except Exception as e:
+            mark_scope_dirty(org_id, home_id, subject_id)
+            out["errors"].append(
+                {
+                    "scope": [org_id, home_id, subject_id],
+                    "type": type(e).__name__,
+                    "message": str(e),
+                }
+            )
+            continue
+        out["events_read"] += res.events_read
+        out["episodes_upserted"] += res.episodes_upserted
+    return out
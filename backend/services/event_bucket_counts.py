@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Reads of event_bucket_counts (migration f2b6d8e0a4c1): per (scope, room key,
+# 15-minute UTC bucket, stream, category) event counts, kept exact by statement
+# triggers on events. Rows are keyed on events.room_id (migration a1c4e6f8b2d5);
+# room_id='*' is the scope total.
+#
+# Every reader returns None when the window is not on bucket boundaries or the
+# table cannot be read, and the caller falls back to counting events.
+
+BUCKET = timedelta(minutes=15)
+ALL_ROOMS = "*"
+
+_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def bucket_floor(ts: datetime) -> datetime:
+    """Start of the 15-minute UTC bucket containing ts (same as date_bin in SQL)."""
+    return ts - (ts - _EPOCH) % BUCKET
+
+
+def is_bucket_aligned(ts: datetime) -> bool:
+    return ts.tzinfo is not None and bucket_floor(ts) == ts
+
+
+def room_counts(
+    db: Session,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    rooms: list[str],
+    start: datetime,
+    end: datetime,
+) -> Optional[dict[str, dict[str, Any]]]:
+    """
+    {room: {"door_n": int, "activity_n": float}} for [start, end), all streams.
+
+    Rooms without events are absent. Same numbers as counting events by room_id.
+    """
+    if not (is_bucket_aligned(start) and is_bucket_aligned(end)) or end <= start:
+        return None
+    try:
+        rows = (
+            db.execute(
+                text(
+                    """
+            SELECT
+              room_id AS room,
+              (COALESCE(SUM(n) FILTER (WHERE category = 'door'), 0))::int AS door_n,
+              (COALESCE(SUM(n) FILTER (WHERE category IN ('presence','motion')), 0))::float
+                AS activity_n
+            FROM event_bucket_counts
+            WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+              AND room_id = ANY(:rooms)
+              AND bucket_start >= :start AND bucket_start < :end
+              AND category IN ('door','presence','motion')
+            GROUP BY room_id
+            """
+                ),
+                {
+                    "org_id": org_id,
+                    "home_id": home_id,
+                    "subject_id": subject_id,
+                    "rooms": list(rooms),
+                    "start": start,
+                    "end": end,
+                },
+            )
+            .mappings()
+            .all()
+        )
+    except Exception:
+        db.rollback()
+        return None
+    return {
+        r["room"]: {"door_n": int(r["door_n"] or 0), "activity_n": float(r["activity_n"] or 0.0)}
+        for r in rows
+    }
+
+
+def window_totals(
+    db: Session,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    stream_id: str,
+    since: datetime,
+) -> Optional[dict[str, int]]:
+    """
+    {"events": n, "days_with_data": d} for events at or after `since`.
+
+    Whole buckets come from the scope total rows; only the partial bucket at
+    `since` is counted from events. Days are Europe/Oslo dates (a bucket never
+    crosses Oslo midnight).
+    """
+    head_end = bucket_floor(since)
+    if head_end < since:
+        head_end += BUCKET
+    try:
+        row = (
+            db.execute(
+                text(
+                    """
+            WITH c AS (
+              SELECT bucket_start AS ts, n
+              FROM event_bucket_counts
+              WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                AND room_id = :all_rooms
+                AND stream_id = :stream_id
+                AND bucket_start >= :head_end
+              UNION ALL
+              SELECT "timestamp", 1
+              FROM events
+              WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                AND stream_id = :stream_id
+                AND "timestamp" >= :since AND "timestamp" < :head_end
+            )
+            SELECT
+              COALESCE(SUM(n), 0)::int AS events,
+              COUNT(DISTINCT (ts AT TIME ZONE 'Europe/Oslo')::date)::int AS days_with_data
+            FROM c
+            """
+                ),
+                {
+                    "org_id": org_id,
+                    "home_id": home_id,
+                    "subject_id": subject_id,
+                    "all_rooms": ALL_ROOMS,
+                    "stream_id": stream_id,
+                    "since": since,
+                    "head_end": head_end,
+                },
+            )
+            .mappings()
+            .one()
+        )
+    except Exception:
+        db.rollback()
+        return None
+    return {
+        "events": int(row["events"] or 0),
+        "days_with_data": int(row["days_with_data"] or 0),
+    }
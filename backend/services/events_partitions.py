@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import os
+import traceback
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from db import SessionLocal
+
+# Monthly events partitions (migration e5c1a7b3d9f4) are created this many months
+# ahead so inserts never fall into events_default in normal operation.
+MONTHS_AHEAD = int(os.getenv("AGINGOS_EVENTS_PARTITIONS_AHEAD", "3"))
+
+
+def ensure_event_partitions(db, *, months_ahead: int = MONTHS_AHEAD) -> int:
+    """Create missing partitions for the current month .. +months_ahead. Returns #created."""
+    n = db.execute(
+        text("SELECT public.events_ensure_partitions(:n)"), {"n": int(months_ahead)}
+    ).scalar()
+    db.commit()
+    return int(n or 0)
+
+
+def run_events_partitions_job() -> None:
+    db = SessionLocal()
+    try:
+        ensure_event_partitions(db)
+    except ProgrammingError:
+        # events not partitioned on this deployment (migration not applied): nothing to do
+        db.rollback()
+    except Exception:
+        # fail-safe: do not crash scheduler
+        db.rollback()
+        traceback.print_exc()
+    finally:
+        db.close()
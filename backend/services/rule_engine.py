@@ -13,7 +13,8 @@ from schemas.deviation_v1 import DeviationV1
 
 from services.rules.registry import RULE_REGISTRY
 from services.rules.context import RuleContext
-from services.rules.gating import build_rule_truth
+from services.rules.gating import TruthCache, build_rule_truth
+from services.rules.snapshot import EventSnapshot
 
 logger = logging.getLogger("rule_engine")
 
@@ -30,8 +31,16 @@ def _call_rule(
     home_id: str = "default",
     subject_id: str = "default",
     subject_key: str = "default",
+    events: EventSnapshot | None = None,
+    truth_cache: TruthCache | None = None,
 ) -> list[DeviationV1]:
-    """Adapter: supports both legacy rule signatures and RuleContext-based rules."""
+    """
+    Adapter: supports both legacy rule signatures and RuleContext-based rules.
+
+    events: optional shared snapshot for this scope/tick (see services.rules.snapshot);
+    RuleContext-based rules read from it instead of issuing their own queries.
+    truth_cache: optional per-tick baseline truth memo shared by all rules of the tick.
+    """
     cfg = load_rule_config()
     params = cfg.rule_params(rule_id)
     rule_truth = build_rule_truth(
@@ -41,6 +50,7 @@ def _call_rule(
         org_id=org_id,
         home_id=home_id,
         subject_id=subject_id,
+        truth_cache=truth_cache,
     )
 
     ctx = RuleContext(
@@ -53,6 +63,7 @@ def _call_rule(
         home_id=home_id,
         subject_id=subject_id,
         subject_key=subject_key,
+        events=events,
     )
 
     if rule_truth.get("evaluation_truth") in {"NOT_EVALUATED", "WEAK_BASIS"}:
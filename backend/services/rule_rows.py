@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from models.rule import Rule, RuleType
+
+logger = logging.getLogger("rule_rows")
+
+# Process-wide map rule key ("R-002") -> rules.id. The mapping is effectively
+# immutable; it is only invalidated when routes/rules.py creates or patches rules.
+_RULE_ROW_IDS: dict[str, int] = {}
+_RULE_ROW_IDS_LOCK = threading.Lock()
+
+
+def resolve_rule_row_ids(db: Session, rule_keys: Iterable[str]) -> dict[str, int]:
+    """
+    Return {rule_key: rules.id} for rule_keys.
+
+    Cached keys cost nothing. Unknown keys are resolved with one SELECT; keys
+    without a row are created in bulk and committed, so cached ids always refer
+    to committed rows.
+
+    Rule.name is the string key ("R-002", ...) and maps to the FK via Rule.id.
+    If several rows share a name, the lowest id wins.
+    """
+    keys = list(dict.fromkeys(str(k) for k in rule_keys))
+
+    with _RULE_ROW_IDS_LOCK:
+        missing = [k for k in keys if k not in _RULE_ROW_IDS]
+        if not missing:
+            return {k: _RULE_ROW_IDS[k] for k in keys}
+
+        found: dict[str, int] = {}
+        for name, rid in (
+            db.query(Rule.name, Rule.id)
+            .filter(Rule.name.in_(missing))
+            .order_by(Rule.id.asc())
+            .all()
+        ):
+            found.setdefault(name, rid)
+
+        to_create = [k for k in missing if k not in found]
+        if to_create:
+            # Bro-løsning: RuleType har foreløpig kun NO_MOTION i modellen.
+            # Vi bruker den som placeholder for alle registry-regler, og lar name være identiteten.
+            rows = [
+                Rule(
+                    name=k,
+                    is_enabled=True,
+                    rule_type=RuleType.NO_MOTION,
+                    params={},
+                    severity=2,
+                )
+                for k in to_create
+            ]
+            db.add_all(rows)
+            db.flush()  # få r.id
+            # read ids before commit: expire_on_commit would make each r.id a SELECT
+            created = {r.name: r.id for r in rows}
+            db.commit()
+            found.update(created)
+            logger.info("rule_rows_created", extra={"rule_keys": to_create})
+
+        _RULE_ROW_IDS.update(found)
+        return {k: _RULE_ROW_IDS[k] for k in keys}
+
+
+def invalidate_rule_row_ids() -> None:
+    """Drop the cached mapping; next resolve_rule_row_ids re-reads rules."""
+    with _RULE_ROW_IDS_LOCK:
+        _RULE_ROW_IDS.clear()
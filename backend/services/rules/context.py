@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Mapping
+from typing import TYPE_CHECKING, Any, Mapping, Optional
 
 from sqlalchemy.orm import Session
 
+if TYPE_CHECKING:
+    from services.rules.snapshot import EventSnapshot
+
 
 @dataclass(frozen=True)
 class RuleContext:
@@ -16,6 +19,8 @@ class RuleContext:
     - Deterministic: rules must not call implicit "now"; use ctx.now.
     - Side-effect free: rules may read DB via ctx.session, but must not write.
     - Scope-aware: ctx.org_id/home_id/subject_id define the tenant slice.
+    - Snapshot-first: when ctx.events is set (scheduler ticks), rules read events
+      from it instead of ctx.session; see services.rules.snapshot.snapshot_for().
     """
 
     session: Session
@@ -29,3 +34,6 @@ class RuleContext:
     home_id: str = "default"
     subject_id: str = "default"
     subject_key: str = "default"
+
+    # shared per-tick event snapshot for this scope (None = query ctx.session)
+    events: Optional["EventSnapshot"] = None
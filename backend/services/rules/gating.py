@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import threading
 from typing import Any
 
 from sqlalchemy import text
@@ -115,6 +116,58 @@ def load_baseline_truth(
     }
 
 
+class TruthCache:
+    """
+    Baseline truth memo for one scheduler tick (or one request), keyed by scope.
+
+    baseline_model_status is only read once per (org_id, home_id, subject_id)
+    no matter how many baseline-dependent rules are evaluated. Thread-safe so one
+    instance can be shared by the scheduler's per-scope workers.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._baseline: dict[tuple[str, str, str], dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def baseline(
+        self,
+        db: Session,
+        *,
+        org_id: str,
+        home_id: str,
+        subject_id: str,
+    ) -> dict[str, Any]:
+        key = (org_id, home_id, subject_id)
+        with self._lock:
+            cached = self._baseline.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        # Query outside the lock; scopes are disjoint per worker so a duplicate
+        # load for the same key cannot happen within one tick.
+        value = load_baseline_truth(
+            db,
+            org_id=org_id,
+            home_id=home_id,
+            subject_id=subject_id,
+        )
+        with self._lock:
+            self._baseline.setdefault(key, value)
+        return value
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "scopes": len(self._baseline),
+            }
+
+
 def build_rule_truth(
     cfg: RuleConfig,
     rule_id: str,
@@ -123,6 +176,7 @@ def build_rule_truth(
     org_id: str,
     home_id: str,
     subject_id: str,
+    truth_cache: TruthCache | None = None,
 ) -> dict[str, Any]:
     mode = cfg.rule_evaluation_mode(rule_id)
     requires_baseline = cfg.rule_requires_baseline(rule_id)
@@ -152,7 +206,8 @@ def build_rule_truth(
     }
 
     if requires_baseline:
-        baseline = load_baseline_truth(
+        loader = truth_cache.baseline if truth_cache is not None else load_baseline_truth
+        baseline = loader(
             db,
             org_id=org_id,
             home_id=home_id,
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from services.rules.snapshot import EventSnapshot, load_snapshot_rows
+
+logger = logging.getLogger("rules.incremental")
+
+
+@dataclass
+class ScopeWindow:
+    """
+    Resident rule-input state for one scope across scheduler ticks.
+
+    - snapshot: indexed events in [since, ∞) that the rules evaluate on
+    - watermark_id: highest events.id consumed so far
+    - ticks_since_rebuild: delta ticks since the last full-window load
+    - epoch: events_scope_epoch at load time (None if unreadable)
+    """
+
+    snapshot: EventSnapshot
+    watermark_id: int
+    ticks_since_rebuild: int = 0
+    epoch: Optional[int] = None
+
+
+_WINDOWS: Dict[Tuple[str, str, str], ScopeWindow] = {}
+_WINDOWS_LOCK = threading.Lock()
+
+
+def _full_rows(db: Session, key: Tuple[str, str, str], since: datetime):
+    org_id, home_id, subject_id = key
+    return load_snapshot_rows(
+        db, org_id=org_id, home_id=home_id, subject_id=subject_id, since=since
+    )
+
+
+def load_scope_epoch(db: Session, key: Tuple[str, str, str]) -> Optional[int]:
+    """
+    events_scope_epoch for the scope (0 if never bumped, None if unreadable).
+
+    Deletes and updates of events bump it from any process (migration b9d4f6a8c2e7).
+    """
+    org_id, home_id, subject_id = key
+    try:
+        n = db.execute(
+            text(
+                """
+                SELECT epoch FROM events_scope_epoch
+                WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+                """
+            ),
+            {"org_id": org_id, "home_id": home_id, "subject_id": subject_id},
+        ).scalar()
+    except Exception:
+        db.rollback()
+        return None
+    return int(n or 0)
+
+
+def load_incremental_snapshot(
+    db: Session,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    since: datetime,
+    rebuild_every_ticks: int,
+    id_overlap: int,
+) -> Tuple[EventSnapshot, Dict[str, Any]]:
+    """
+    Event snapshot for this tick, reading only events past the scope watermark.
+
+    Modes (returned in stats["mode"]):
+    - full:   no resident state yet (first tick / after restart / invalidation)
+    - delta:  fetch id > watermark - id_overlap, merge by id, evict rows older than since
+    - verify: every rebuild_every_ticks ticks, reload the full window and compare event
+              ids with the delta-maintained state; the full load always wins
+
+    id_overlap re-reads the most recent ids each tick so rows whose transaction
+    committed after a higher id was already consumed are still picked up.
+
+    Only the DB read is incremental; the rules still evaluate the whole window.
+    Resident state is dropped (invalidate_incremental_windows) when the scope's
+    events_scope_epoch moved, i.e. rows were deleted or updated (retention, GDPR
+    delete, room_id backfill), or when the epoch cannot be read.
+    """
+    key = (org_id, home_id, subject_id)
+    with _WINDOWS_LOCK:
+        state = _WINDOWS.get(key)
+
+    stats: Dict[str, Any] = {"mode": "delta", "new_events": 0, "evicted": 0}
+
+    epoch = load_scope_epoch(db, key)
+    if state is not None and (epoch is None or epoch != state.epoch):
+        invalidate_incremental_windows(org_id, home_id, subject_id)
+        stats["invalidated"] = "events_changed" if epoch is not None else "epoch_unavailable"
+        state = None
+
+    if state is not None and state.ticks_since_rebuild < max(0, rebuild_every_ticks - 1):
+        rows = load_snapshot_rows(
+            db,
+            org_id=org_id,
+            home_id=home_id,
+            subject_id=subject_id,
+            since=max(since, state.snapshot.since),
+            after_id=max(0, state.watermark_id - max(0, id_overlap)),
+        )
+        snap = state.snapshot
+        stats["evicted"] = snap.evict_before(since)
+        stats["new_events"] = snap.append(rows)
+        state.watermark_id = max([state.watermark_id, *(r.id for r in rows)])
+        state.ticks_since_rebuild += 1
+        return snap, stats
+
+    rows = _full_rows(db, key, since)
+    snap = EventSnapshot(rows, since=since)
+
+    if state is None:
+        stats["mode"] = "full"
+    else:
+        stats["mode"] = "verify"
+        state.snapshot.evict_before(since)
+        expected = snap.ids
+        # Only ids up to the old watermark are comparable; newer ones are this tick's delta.
+        resident = state.snapshot.ids
+        comparable = {i for i in expected if i <= state.watermark_id}
+        missing = len(comparable - resident)
+        stale = len(resident - expected)
+        stats["drift"] = {"missing": missing, "stale": stale}
+        if missing or stale:
+            logger.warning(
+                "incremental_window_drift",
+                extra={"scope": key, "missing": missing, "stale": stale},
+            )
+
+    stats["new_events"] = len(snap)
+    with _WINDOWS_LOCK:
+        _WINDOWS[key] = ScopeWindow(
+            snapshot=snap,
+            watermark_id=snap.max_id or (state.watermark_id if state else 0),
+            epoch=epoch,
+        )
+    return snap, stats
+
+
+def invalidate_incremental_windows(
+    org_id: Optional[str] = None,
+    home_id: Optional[str] = None,
+    subject_id: Optional[str] = None,
+) -> None:
+    """Drop resident state (all scopes, or those matching the given scope parts)."""
+    with _WINDOWS_LOCK:
+        for key in list(_WINDOWS.keys()):
+            if (
+                (org_id is None or key[0] == org_id)
+                and (home_id is None or key[1] == home_id)
+                and (subject_id is None or key[2] == subject_id)
+            ):
+                del _WINDOWS[key]
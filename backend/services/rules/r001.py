@@ -5,6 +5,7 @@ from typing import List
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-001"
 
@@ -72,14 +73,18 @@ def _is_active_motion(payload: object, ctx: RuleContext) -> bool:
 def eval_r001_no_motion(ctx: RuleContext) -> List[DeviationV1]:
     cats = _motion_categories(ctx)
 
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.timestamp >= ctx.since)
-        .filter(EventDB.timestamp < ctx.until)  # until eksklusiv
-        .filter(EventDB.category.in_(cats))
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, ctx.since)
+    if snap is not None:
+        rows = snap.select(since=ctx.since, until=ctx.until, categories=cats)
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.timestamp >= ctx.since)
+            .filter(EventDB.timestamp < ctx.until)  # until eksklusiv
+            .filter(EventDB.category.in_(cats))
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     # Only count active motion-like signals
     active = [r for r in rows if _is_active_motion(r.payload, ctx)]
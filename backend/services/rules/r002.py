@@ -7,6 +7,7 @@ from typing import List
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-002"
 
@@ -117,14 +118,18 @@ def eval_r002_front_door_open_at_night(ctx: RuleContext) -> List[DeviationV1]:
     tv = _trigger_value(ctx)
     allowed = _allowed_entity_ids(ctx)
 
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.timestamp >= ctx.since)
-        .filter(EventDB.timestamp < ctx.until)  # until eksklusiv
-        .filter(EventDB.category == cat)
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, ctx.since)
+    if snap is not None:
+        rows = snap.select(since=ctx.since, until=ctx.until, categories=[cat])
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.timestamp >= ctx.since)
+            .filter(EventDB.timestamp < ctx.until)  # until eksklusiv
+            .filter(EventDB.category == cat)
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     evidence: List[str] = []
     for r in rows:
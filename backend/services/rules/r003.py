@@ -6,6 +6,7 @@ from typing import List
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-003"
 
@@ -78,14 +79,20 @@ def _get_first(payload: object, keys: list[str]) -> str | None:
 def eval_r003_front_door_open_no_motion_after(ctx: RuleContext) -> List[DeviationV1]:
     follow_minutes = _followup_minutes(ctx)
 
-    door_rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.timestamp >= ctx.since)
-        .filter(EventDB.timestamp < ctx.until)  # until eksklusiv
-        .filter(EventDB.category == _door_category(ctx))
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, ctx.since)
+    if snap is not None:
+        door_rows = snap.select(
+            since=ctx.since, until=ctx.until, categories=[_door_category(ctx)]
+        )
+    else:
+        door_rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.timestamp >= ctx.since)
+            .filter(EventDB.timestamp < ctx.until)  # until eksklusiv
+            .filter(EventDB.category == _door_category(ctx))
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     required_name = _required_door_name(ctx)
     door_open = _door_open_value(ctx)
@@ -105,14 +112,19 @@ def eval_r003_front_door_open_no_motion_after(ctx: RuleContext) -> List[Deviatio
 
         follow_until = d.timestamp + timedelta(minutes=follow_minutes)
 
-        motion_rows = (
-            ctx.session.query(EventDB)
-            .filter(EventDB.timestamp >= d.timestamp)
-            .filter(EventDB.timestamp < follow_until)  # follow_until eksklusiv
-            .filter(EventDB.category.in_(motion_cats))
-            .order_by(EventDB.timestamp.asc())
-            .all()
-        )
+        if snap is not None:
+            motion_rows = snap.select(
+                since=d.timestamp, until=follow_until, categories=motion_cats
+            )
+        else:
+            motion_rows = (
+                ctx.session.query(EventDB)
+                .filter(EventDB.timestamp >= d.timestamp)
+                .filter(EventDB.timestamp < follow_until)  # follow_until eksklusiv
+                .filter(EventDB.category.in_(motion_cats))
+                .order_by(EventDB.timestamp.asc())
+                .all()
+            )
 
         has_motion_on = False
         for m in motion_rows:
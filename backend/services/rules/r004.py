@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional, Tuple
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-004"
 
@@ -95,17 +96,23 @@ def _any_activity_after(
     )
     if not (isinstance(cats, list) and cats):
         cats = ["presence", "motion"]
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= after_ts)
-        .filter(EventDB.timestamp < until2)
-        .filter(EventDB.category.in_([str(x) for x in cats]))
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, after_ts)
+    if snap is not None:
+        rows = snap.select(
+            since=after_ts, until=until2, categories=[str(x) for x in cats]
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= after_ts)
+            .filter(EventDB.timestamp < until2)
+            .filter(EventDB.category.in_([str(x) for x in cats]))
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
     for r in rows:
         if isinstance(r.payload, dict):
             room = r.payload.get("room_id") or r.payload.get("room")
@@ -128,17 +135,23 @@ def eval_r004_prolonged_bathroom_presence(ctx: RuleContext) -> List[DeviationV1]
     night_end = _get_int(p, "night_end_hour", 7)
     tz_name = _get_tz_name(p)
 
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= ctx.since)
-        .filter(EventDB.timestamp < ctx.until)
-        .filter(EventDB.category == "presence")
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, ctx.since)
+    if snap is not None:
+        rows = snap.select(
+            since=ctx.since, until=ctx.until, categories=["presence"], room=room_id
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= ctx.since)
+            .filter(EventDB.timestamp < ctx.until)
+            .filter(EventDB.category == "presence")
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
     rows = [
         r
         for r in rows
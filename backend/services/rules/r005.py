@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 from services.rules.r009 import eval_r009_ingest_stopped
 
 RULE_ID = "R-005"
@@ -27,17 +28,27 @@ def _last_bathroom_presence_on_ts(
     ctx: RuleContext, room_id: str, since_ts: datetime
 ) -> Optional[datetime]:
     # Find latest presence "on" event in bathroom since since_ts
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= since_ts)
-        .filter(EventDB.timestamp < ctx.until)
-        .filter(EventDB.category == "presence")
-        .order_by(EventDB.timestamp.desc())
-        .all()
-    )
+    snap = snapshot_for(ctx, since_ts)
+    if snap is not None:
+        rows = snap.select(
+            since=since_ts,
+            until=ctx.until,
+            categories=["presence"],
+            room=room_id,
+            desc=True,
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= since_ts)
+            .filter(EventDB.timestamp < ctx.until)
+            .filter(EventDB.category == "presence")
+            .order_by(EventDB.timestamp.desc())
+            .all()
+        )
     for r in rows:
         if not isinstance(r.payload, dict):
             continue
@@ -75,6 +86,7 @@ def eval_r005_no_bathroom_activity_24h(ctx: RuleContext) -> List[DeviationV1]:
             home_id=ctx.home_id,
             subject_id=ctx.subject_id,
             subject_key=ctx.subject_key,
+            events=ctx.events,
         )
     ):
         return []
@@ -6,6 +6,7 @@ from typing import Any, Dict, List
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-006"
 
@@ -100,17 +101,23 @@ def eval_r006_no_livingroom_daytime_activity(ctx: RuleContext) -> List[Deviation
         return []
 
     # Query presence + door in window (single pass)
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= w_since)
-        .filter(EventDB.timestamp < w_until)
-        .filter(EventDB.category.in_(["presence", "motion", "door"]))
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, w_since)
+    if snap is not None:
+        rows = snap.select(
+            since=w_since, until=w_until, categories=["presence", "motion", "door"]
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= w_since)
+            .filter(EventDB.timestamp < w_until)
+            .filter(EventDB.category.in_(["presence", "motion", "door"]))
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     # "Mulig ute" suppression:
     # If front door event exists AND there is presence in any other room in the window -> do not trigger.
@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Tuple
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-007"
 
@@ -96,17 +97,23 @@ def eval_r007_night_wandering_room_switches(ctx: RuleContext) -> List[DeviationV
     else:
         activity_categories = ["presence", "motion"]
 
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= w_since)
-        .filter(EventDB.timestamp < w_until)
-        .filter(EventDB.category.in_(activity_categories + ["door"]))
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, w_since)
+    if snap is not None:
+        rows = snap.select(
+            since=w_since, until=w_until, categories=activity_categories + ["door"]
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= w_since)
+            .filter(EventDB.timestamp < w_until)
+            .filter(EventDB.category.in_(activity_categories + ["door"]))
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     # detect door involvement
     door_involved = any(
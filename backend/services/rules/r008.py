@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 
 RULE_ID = "R-008"
 
@@ -70,17 +71,21 @@ def _has_any_activity_after(
     until_ts: datetime,
     categories: List[str],
 ) -> bool:
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= after_ts)
-        .filter(EventDB.timestamp < until_ts)
-        .filter(EventDB.category.in_(categories))
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, after_ts)
+    if snap is not None:
+        rows = snap.select(since=after_ts, until=until_ts, categories=categories)
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= after_ts)
+            .filter(EventDB.timestamp < until_ts)
+            .filter(EventDB.category.in_(categories))
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     # Defensive filtering in Python as well (important for unit tests that stub DB filtering).
     cats = set(str(c) for c in categories)
@@ -127,17 +132,23 @@ def eval_r008_door_burst(ctx: RuleContext) -> List[DeviationV1]:
     w_until = ctx.until
 
     # Fetch door events in lookback window
-    door_rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.org_id == ctx.org_id)
-        .filter(EventDB.home_id == ctx.home_id)
-        .filter(EventDB.subject_id == ctx.subject_id)
-        .filter(EventDB.timestamp >= w_since)
-        .filter(EventDB.timestamp < w_until)
-        .filter(EventDB.category == "door")
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, w_since)
+    if snap is not None:
+        door_rows = snap.select(
+            since=w_since, until=w_until, categories=["door"], room=front_door_room
+        )
+    else:
+        door_rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.org_id == ctx.org_id)
+            .filter(EventDB.home_id == ctx.home_id)
+            .filter(EventDB.subject_id == ctx.subject_id)
+            .filter(EventDB.timestamp >= w_since)
+            .filter(EventDB.timestamp < w_until)
+            .filter(EventDB.category == "door")
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     door_ids: List[str] = []
     last_door_ts: Optional[datetime] = None
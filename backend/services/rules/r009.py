@@ -32,6 +32,13 @@ def _last_event_ts(
     categories: Optional[List[str]] = None,
     stream_id: Optional[str] = None,
 ) -> Optional[datetime]:
+    snap = getattr(ctx, "events", None)
+    if snap is not None:
+        row = snap.last(categories=categories, stream_id=stream_id)
+        if row is not None:
+            return row.timestamp
+        # Nothing inside the snapshot window: fall back to DB for the true last event.
+
     q = ctx.session.query(EventDB).order_by(EventDB.timestamp.desc())
     q = q.filter(EventDB.org_id == ctx.org_id)
     q = q.filter(EventDB.home_id == ctx.home_id)
@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional
 from models.db_event import EventDB
 from schemas.deviation_v1 import DeviationV1, Window
 from services.rules.context import RuleContext
+from services.rules.snapshot import snapshot_for
 from services.rules.r009 import eval_r009_ingest_stopped
 
 RULE_ID = "R-010"
@@ -88,14 +89,20 @@ def _find_last_presence_on_per_room(
     ctx: RuleContext, since_ts: datetime
 ) -> Dict[str, Any]:
     # Query presence events (since_ts..until), scan latest->earliest for last "on" per room.
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.timestamp >= since_ts)
-        .filter(EventDB.timestamp < ctx.until)
-        .filter(EventDB.category == "presence")
-        .order_by(EventDB.timestamp.desc())
-        .all()
-    )
+    snap = snapshot_for(ctx, since_ts)
+    if snap is not None:
+        rows = snap.select(
+            since=since_ts, until=ctx.until, categories=["presence"], desc=True
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.timestamp >= since_ts)
+            .filter(EventDB.timestamp < ctx.until)
+            .filter(EventDB.category == "presence")
+            .order_by(EventDB.timestamp.desc())
+            .all()
+        )
 
     filtered = _iter_presence_events(rows, since_ts=since_ts, until_ts=ctx.until)
     filtered.sort(key=lambda r: r.timestamp, reverse=True)
@@ -113,14 +120,20 @@ def _find_last_presence_on_per_room(
 
 def _has_presence_off_after(ctx: RuleContext, room_id: str, after_ts: datetime) -> bool:
     # Look for a presence "off" after after_ts (until ctx.until).
-    rows = (
-        ctx.session.query(EventDB)
-        .filter(EventDB.timestamp >= after_ts)
-        .filter(EventDB.timestamp < ctx.until)
-        .filter(EventDB.category == "presence")
-        .order_by(EventDB.timestamp.asc())
-        .all()
-    )
+    snap = snapshot_for(ctx, after_ts)
+    if snap is not None:
+        rows = snap.select(
+            since=after_ts, until=ctx.until, categories=["presence"], room=room_id
+        )
+    else:
+        rows = (
+            ctx.session.query(EventDB)
+            .filter(EventDB.timestamp >= after_ts)
+            .filter(EventDB.timestamp < ctx.until)
+            .filter(EventDB.category == "presence")
+            .order_by(EventDB.timestamp.asc())
+            .all()
+        )
 
     filtered = _iter_presence_events(rows, since_ts=after_ts, until_ts=ctx.until)
     filtered.sort(key=lambda r: r.timestamp)
@@ -156,6 +169,7 @@ def eval_r010_sensor_stuck_room_stuck(ctx: RuleContext) -> List[DeviationV1]:
             home_id=ctx.home_id,
             subject_id=ctx.subject_id,
             subject_key=ctx.subject_key,
+            events=ctx.events,
         )
     ):
         return []
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.db_event import EventDB
+
+
+def _payload_room(payload: object) -> str:
+    # Same room convention as the rules: payload.room_id, then payload.room.
+    if not isinstance(payload, dict):
+        return ""
+    return str(payload.get("room_id") or payload.get("room") or "")
+
+
+class _Series:
+    """Rows sorted by (timestamp, id) plus a parallel timestamp list for bisect."""
+
+    __slots__ = ("rows", "ts")
+
+    def __init__(self) -> None:
+        self.rows: List[Any] = []
+        self.ts: List[datetime] = []
+
+    def add(self, row: Any) -> None:
+        self.rows.append(row)
+        self.ts.append(row.timestamp)
+
+    def window(self, since: datetime, until: datetime) -> List[Any]:
+        lo = bisect_left(self.ts, since)
+        hi = bisect_left(self.ts, until)
+        return self.rows[lo:hi]
+
+    def evict_before(self, since: datetime) -> int:
+        lo = bisect_left(self.ts, since)
+        if lo:
+            del self.rows[:lo]
+            del self.ts[:lo]
+        return lo
+
+
+class EventSnapshot:
+    """
+    In-memory, read-only view of one scope's events for one scheduler tick.
+
+    Coverage: every event with timestamp >= since at load time (no upper bound),
+    so any window starting at/after `since` can be answered without Postgres.
+
+    Indexes: all rows, per category and per (category, room) where room is
+    payload.room_id or payload.room (the convention used by R-004..R-010).
+    """
+
+    def __init__(self, rows: Iterable[Any], *, since: datetime) -> None:
+        self.since = since
+        self._index(rows)
+
+    def _index(self, rows: Iterable[Any]) -> None:
+        self._all = _Series()
+        self._by_cat: Dict[str, _Series] = {}
+        self._by_cat_room: Dict[Tuple[str, str], _Series] = {}
+        self._ids: set = set()
+
+        ordered = sorted(rows, key=lambda r: (r.timestamp, r.id))
+        for r in ordered:
+            self._add(r)
+
+    def _add(self, r: Any) -> None:
+        cat = str(r.category)
+        self._ids.add(r.id)
+        self._all.add(r)
+        self._by_cat.setdefault(cat, _Series()).add(r)
+        self._by_cat_room.setdefault((cat, _payload_room(r.payload)), _Series()).add(r)
+
+    def __len__(self) -> int:
+        return len(self._all.rows)
+
+    @property
+    def ids(self) -> frozenset:
+        return frozenset(self._ids)
+
+    @property
+    def max_id(self) -> Optional[int]:
+        return max(self._ids) if self._ids else None
+
+    def append(self, rows: Iterable[Any]) -> int:
+        """
+        Add rows not yet in the snapshot (by id). Rows with timestamp < since are ignored.
+
+        In-order rows (after the current tail) are appended to the indexes in place;
+        a late row (older timestamp than the tail) triggers an in-memory re-index.
+        Returns the number of rows added.
+        """
+        fresh = sorted(
+            (r for r in rows if r.id not in self._ids and r.timestamp >= self.since),
+            key=lambda r: (r.timestamp, r.id),
+        )
+        if not fresh:
+            return 0
+
+        tail = self._all.rows[-1] if self._all.rows else None
+        if tail is not None and (fresh[0].timestamp, fresh[0].id) < (tail.timestamp, tail.id):
+            self._index([*self._all.rows, *fresh])
+        else:
+            for r in fresh:
+                self._add(r)
+        return len(fresh)
+
+    def evict_before(self, since: datetime) -> int:
+        """Advance coverage to `since` and drop older rows. Returns rows dropped."""
+        if since <= self.since:
+            return 0
+        self.since = since
+        lo = bisect_left(self._all.ts, since)
+        for r in self._all.rows[:lo]:
+            self._ids.discard(r.id)
+        dropped = self._all.evict_before(since)
+        for index in (self._by_cat, self._by_cat_room):
+            for key in list(index.keys()):
+                series = index[key]
+                series.evict_before(since)
+                if not series.rows:
+                    del index[key]
+        return dropped
+
+    def covers(self, since: datetime) -> bool:
+        return since >= self.since
+
+    def select(
+        self,
+        *,
+        since: datetime,
+        until: datetime,
+        categories: Optional[Sequence[str]] = None,
+        room: Optional[str] = None,
+        stream_id: Optional[str] = None,
+        desc: bool = False,
+    ) -> List[Any]:
+        """
+        Rows with since <= timestamp < until (until exclusive), ordered by timestamp.
+        - categories: restrict to these categories (None = all)
+        - room: restrict to payload room (requires categories)
+        """
+        if categories is None:
+            if room is not None:
+                raise ValueError("room filter requires categories")
+            out = self._all.window(since, until)
+        else:
+            parts: List[List[Any]] = []
+            for cat in dict.fromkeys(str(c) for c in categories):
+                series = (
+                    self._by_cat_room.get((cat, room))
+                    if room is not None
+                    else self._by_cat.get(cat)
+                )
+                if series is not None:
+                    part = series.window(since, until)
+                    if part:
+                        parts.append(part)
+            if len(parts) == 1:
+                out = parts[0]
+            else:
+                out = list(heapq.merge(*parts, key=lambda r: (r.timestamp, r.id)))
+
+        if stream_id is not None:
+            out = [r for r in out if r.stream_id == stream_id]
+        return list(reversed(out)) if desc else list(out)
+
+    def last(
+        self,
+        *,
+        categories: Optional[Sequence[str]] = None,
+        stream_id: Optional[str] = None,
+    ) -> Optional[Any]:
+        """Latest row (optionally by category/stream) inside the snapshot, or None."""
+        if categories is None:
+            candidates = [self._all]
+        else:
+            candidates = [
+                self._by_cat[c] for c in dict.fromkeys(str(x) for x in categories) if c in self._by_cat
+            ]
+
+        best = None
+        for series in candidates:
+            for r in reversed(series.rows):
+                if stream_id is not None and r.stream_id != stream_id:
+                    continue
+                if best is None or (r.timestamp, r.id) > (best.timestamp, best.id):
+                    best = r
+                break
+        return best
+
+
+def load_snapshot_rows(
+    db: Session,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    since: datetime,
+    after_id: Optional[int] = None,
+) -> List[Any]:
+    """Scope events with timestamp >= since (and id > after_id if given), all streams."""
+    q = (
+        db.query(
+            EventDB.id,
+            EventDB.event_id,
+            EventDB.timestamp,
+            EventDB.category,
+            EventDB.payload,
+            EventDB.room_id,
+            EventDB.stream_id,
+        )
+        .filter(EventDB.org_id == org_id)
+        .filter(EventDB.home_id == home_id)
+        .filter(EventDB.subject_id == subject_id)
+        .filter(EventDB.timestamp >= since)
+    )
+    if after_id is not None:
+        q = q.filter(EventDB.id > after_id)
+    return q.order_by(EventDB.timestamp.asc(), EventDB.id.asc()).all()
+
+
+def load_event_snapshot(
+    db: Session,
+    *,
+    org_id: str,
+    home_id: str,
+    subject_id: str,
+    since: datetime,
+) -> EventSnapshot:
+    """One query: all scope events with timestamp >= since (all streams, all categories)."""
+    rows = load_snapshot_rows(
+        db, org_id=org_id, home_id=home_id, subject_id=subject_id, since=since
+    )
+    return EventSnapshot(rows, since=since)
+
+
+def snapshot_for(ctx: Any, since: datetime) -> Optional[EventSnapshot]:
+    """Return ctx.events if it can answer a window starting at `since`; else None (use DB)."""
+    snap = getattr(ctx, "events", None)
+    if snap is not None and snap.covers(since):
+        return snap
+    return None
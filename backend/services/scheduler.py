@@ -9,6 +9,7 @@ import time
 import traceback
 import uuid
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from services.auth import AuthScope
 
@@ -16,16 +17,29 @@ from typing import Any
 
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from util.time import utcnow
 from db import SessionLocal
 from services.rules.registry import RULE_REGISTRY
 from services.rule_engine import _call_rule
+from services.rule_rows import resolve_rule_row_ids
+from services.rules.gating import TruthCache
+from services.rules.incremental import (
+    invalidate_incremental_windows,
+    load_incremental_snapshot,
+)
+from services.rules.snapshot import load_event_snapshot
 from services.proposals_miner import run_proposals_miner_job
 from services.proposals_expiry import run_proposals_expiry_job
+from services.events_partitions import run_events_partitions_job
+from services.episodes_svc_job import (
+    INTERVAL_S as EPISODES_SVC_INTERVAL_S,
+    episodes_svc_job_enabled,
+    run_episodes_svc_job,
+)
 from config.rule_config import load_rule_config
 
-from models.rule import Rule, RuleType
 from models.deviation import Deviation, DeviationStatus
 
 
@@ -172,29 +186,12 @@ def _severity_str_to_int(s: str) -> int:
     return 2
 
 
-def _get_or_create_rule_row(db: Session, rule_key: str) -> Rule:
-    # Vi bruker Rule.name som string-key ("R-002", osv.) og mapper til FK via Rule.id.
-    existing = db.query(Rule).filter(Rule.name == rule_key).one_or_none()
-    if existing:
-        return existing
-
-    # Bro-løsning: RuleType har foreløpig kun NO_MOTION i modellen.
-    # Vi bruker den som placeholder for alle registry-regler, og lar name være identiteten.
-    r = Rule(
-        name=rule_key,
-        is_enabled=True,
-        rule_type=RuleType.NO_MOTION,
-        params={},
-        severity=2,
-    )
-    db.add(r)
-    db.flush()  # få r.id
-    return r
+# Active-deviation identity: one OPEN/ACK row per rule + subject_key + scope.
+_ACTIVE_DEVIATION_KEY = ("rule_id", "subject_key", "org_id", "home_id", "subject_id")
 
 
-def _upsert_open_deviation(
-    db: Session,
-    rule_row: Rule,
+def _deviation_row(
+    rule_row_id: int,
     subject_key: str,
     now: datetime,
     deviation_v1: dict,
@@ -202,18 +199,8 @@ def _upsert_open_deviation(
     org_id: str = "default",
     home_id: str = "default",
     subject_id: str = "default",
-) -> None:
-    existing = (
-        db.query(Deviation)
-        .filter(Deviation.rule_id == rule_row.id)
-        .filter(Deviation.subject_key == subject_key)
-        .filter(Deviation.org_id == org_id)
-        .filter(Deviation.home_id == home_id)
-        .filter(Deviation.subject_id == subject_id)
-        .filter(Deviation.status.in_([DeviationStatus.OPEN, DeviationStatus.ACK]))
-        .one_or_none()
-    )
-
+) -> dict:
+    """Map one DeviationV1 (model_dump) to a deviations row for the bulk upsert."""
     context = {
         "rule_key": deviation_v1["rule_id"],
         "title": deviation_v1["title"],
@@ -238,28 +225,53 @@ def _upsert_open_deviation(
 
     evidence = {"event_ids": event_ids, **extra}
 
-    if existing:
-        existing.last_seen_at = now
-        existing.context = context
-        existing.evidence = evidence
-        # severity kan endres i fremtiden; oppdater for konsistens
-        existing.severity = _severity_str_to_int(deviation_v1["severity"])
-        return
+    return {
+        "rule_id": rule_row_id,
+        "status": DeviationStatus.OPEN,
+        "severity": _severity_str_to_int(deviation_v1["severity"]),
+        "started_at": now,
+        "last_seen_at": now,
+        "subject_key": subject_key,
+        "org_id": org_id,
+        "home_id": home_id,
+        "subject_id": subject_id,
+        "context": context,
+        "evidence": evidence,
+    }
+
 
-    dev = Deviation(
-        rule_id=rule_row.id,
-        status=DeviationStatus.OPEN,
-        severity=_severity_str_to_int(deviation_v1["severity"]),
-        started_at=now,
-        last_seen_at=now,
-        subject_key=subject_key,
-        org_id=org_id,
-        home_id=home_id,
-        subject_id=subject_id,
-        context=context,
-        evidence=evidence,
+def _bulk_upsert_open_deviations(db: Session, rows: list[dict]) -> int:
+    """
+    Persist all deviations of one scope/tick with a single INSERT ... ON CONFLICT.
+
+    Conflict target is the partial unique index uq_deviations_active_rule_subject_scope
+    (rule_id, subject_key, org_id, home_id, subject_id WHERE status IN OPEN/ACK):
+    - no active row: insert OPEN with started_at = last_seen_at = now
+    - active row (OPEN or ACK): refresh last_seen_at/context/evidence/severity,
+      keep status and started_at
+    Several deviations for the same key in one tick: the last one wins (as before).
+    Returns number of rows written.
+    """
+    if not rows:
+        return 0
+
+    by_key: dict[tuple, dict] = {}
+    for r in rows:
+        by_key[tuple(r[k] for k in _ACTIVE_DEVIATION_KEY)] = r
+
+    stmt = pg_insert(Deviation.__table__).values(list(by_key.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_ACTIVE_DEVIATION_KEY),
+        index_where=text("status IN ('OPEN','ACK')"),
+        set_={
+            "last_seen_at": stmt.excluded.last_seen_at,
+            "context": stmt.excluded.context,
+            "evidence": stmt.excluded.evidence,
+            "severity": stmt.excluded.severity,
+        },
     )
-    db.add(dev)
+    db.execute(stmt)
+    return len(by_key)
 
 
 def _close_stale_deviations(
@@ -278,35 +290,55 @@ def _close_stale_deviations(
     - Applies to status OPEN or ACK.
     - Only for the current subject_key (thin-slice: default subject).
     - Uses per-rule expire_after_minutes from rules.yaml via RuleConfig.
+
+    One UPDATE ... FROM rules: per-rule expiry is passed as a VALUES list keyed by
+    rule name; rules without a rules.yaml entry use defaults.expire_after_minutes.
     """
     cfg = load_rule_config()
-    closed_count = 0
-
-    candidates = (
-        db.query(Deviation)
-        .filter(Deviation.subject_key == subject_key)
-        .filter(Deviation.org_id == org_id)
-        .filter(Deviation.home_id == home_id)
-        .filter(Deviation.subject_id == subject_id)
-        .filter(Deviation.status.in_([DeviationStatus.OPEN, DeviationStatus.ACK]))
-        .all()
-    )
 
-    for dev in candidates:
-        # rules.yaml keys are the rule "key" like "R-002". In DB that is Rule.name.
-        rule_row = db.query(Rule).filter(Rule.id == dev.rule_id).one_or_none()
-        rule_key = rule_row.name if rule_row else None
-        if not rule_key:
-            continue
-
-        expire_minutes = cfg.rule_expire_after_minutes(rule_key)
-        cutoff = now - timedelta(minutes=expire_minutes)
-
-        if dev.last_seen_at < cutoff:
-            dev.status = DeviationStatus.CLOSED
-            closed_count += 1
-
-    return closed_count
+    rule_keys = list(
+        dict.fromkeys(
+            [*RULE_REGISTRY.keys(), *((cfg.raw.get("rules") or {}).keys())]
+        )
+    )
+    params: dict[str, Any] = {
+        "subject_key": subject_key,
+        "org_id": org_id,
+        "home_id": home_id,
+        "subject_id": subject_id,
+        "now": now,
+        "default_expire": cfg.defaults_expire_after_minutes(),
+    }
+    values_sql = []
+    for i, rule_key in enumerate(rule_keys):
+        params[f"k{i}"] = str(rule_key)
+        params[f"m{i}"] = int(cfg.rule_expire_after_minutes(rule_key))
+        values_sql.append(f"(CAST(:k{i} AS text), CAST(:m{i} AS integer))")
+    if not values_sql:
+        values_sql.append("(CAST(NULL AS text), CAST(NULL AS integer))")
+
+    rows = db.execute(
+        text(
+            f"""
+            UPDATE deviations AS d
+            SET status = 'CLOSED'
+            FROM rules AS r
+            LEFT JOIN (VALUES {", ".join(values_sql)}) AS e(rule_key, expire_minutes)
+              ON e.rule_key = r.name
+            WHERE d.rule_id = r.id
+              AND d.subject_key = :subject_key
+              AND d.org_id = :org_id
+              AND d.home_id = :home_id
+              AND d.subject_id = :subject_id
+              AND d.status IN ('OPEN', 'ACK')
+              AND d.last_seen_at < CAST(:now AS timestamptz)
+                  - make_interval(mins => COALESCE(e.expire_minutes, :default_expire))
+            RETURNING d.id
+            """
+        ),
+        params,
+    ).fetchall()
+    return len(rows)
 
 
 def _get_monitor_mode(
@@ -366,42 +398,126 @@ def _get_monitor_mode(
     return "ON"
 
 
-def run_rule_engine_job():
-    run_id = str(uuid.uuid4())
-    t0 = time.monotonic()
+def _list_active_scopes(db) -> list[AuthScope]:
+    """All distinct (org_id, home_id, subject_id) with an ACTIVE api key.
+
+    Fallback: the single scope from _anomaly_pick_one_scope when api_key_scopes
+    is missing (pre-fresh-install schema) or has no active rows.
+    """
+    from sqlalchemy.exc import ProgrammingError
 
-    db = SessionLocal()
     try:
-        scope = _anomaly_pick_one_scope(db)
-        cfg = load_rule_config()
-        interval_minutes = cfg.scheduler_interval_minutes()
-        subject_key = cfg.scheduler_default_subject_key()
-        org_id = scope.org_id
-        home_id = scope.home_id
-        subject_id = scope.subject_id
-        now = utcnow()
-        until = now
-        since = now - timedelta(minutes=interval_minutes)
+        rows = (
+            db.execute(
+                text(
+                    """
+                    SELECT DISTINCT org_id, home_id, subject_id
+                    FROM api_key_scopes
+                    WHERE active = true
+                    ORDER BY org_id, home_id, subject_id
+                    """
+                )
+            )
+            .mappings()
+            .all()
+        )
+    except ProgrammingError:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        rows = []
 
-        _log_event(
-            level="INFO",
-            event="scheduler_run_start",
-            run_id=run_id,
-            msg="scheduler run started",
-            interval_minutes=interval_minutes,
-            since=_utc_iso(since),
-            until=_utc_iso(until),
+    scopes = [
+        AuthScope(
+            org_id=str(r["org_id"]),
+            home_id=str(r["home_id"]),
+            subject_id=str(r["subject_id"]),
+            user_id="system",
+            role="system",
+            api_key_hash="scheduler",
         )
+        for r in rows
+    ]
+    if not scopes:
+        scopes = [_anomaly_pick_one_scope(db)]
+    return scopes
 
-        # Finn hvilke regler som faktisk kjøres av scheduler (enabled_in_scheduler=true)
-        enabled_rule_ids = [
-            rid for rid in RULE_REGISTRY.keys() if cfg.rule_enabled_in_scheduler(rid)
-        ]
+
+def _run_rules_for_scope(
+    scope: AuthScope,
+    *,
+    run_id: str,
+    cfg,
+    now: datetime,
+    enabled_rule_ids: list[str],
+    rule_row_ids: dict[str, int],
+    truth_cache: TruthCache | None = None,
+) -> dict:
+    """Evaluate all enabled rules for one scope in its own session.
+
+    Runs inside a worker thread. Rule failures are isolated per rule (savepoint);
+    anything else raises and is isolated per scope by the caller.
+    """
+    subject_key = cfg.scheduler_default_subject_key()
+    org_id = scope.org_id
+    home_id = scope.home_id
+    subject_id = scope.subject_id
+    scope_fields = {"org_id": org_id, "home_id": home_id, "subject_id": subject_id}
+
+    db = SessionLocal()
+    try:
+        # One events query per scope/tick; rules filter this snapshot in memory.
+        # Incremental mode reads only events past the scope watermark (full window
+        # on first tick and every rebuild_every_ticks as verification).
+        # Fail-soft: without a snapshot each rule falls back to its own query.
+        t_snap0 = time.monotonic()
+        snapshot_since = now - timedelta(
+            minutes=cfg.scheduler_snapshot_lookback_minutes()
+        )
+        incremental_stats = None
+        try:
+            if cfg.scheduler_incremental_enabled():
+                events, incremental_stats = load_incremental_snapshot(
+                    db,
+                    org_id=org_id,
+                    home_id=home_id,
+                    subject_id=subject_id,
+                    since=snapshot_since,
+                    rebuild_every_ticks=cfg.scheduler_incremental_rebuild_every_ticks(),
+                    id_overlap=cfg.scheduler_incremental_id_overlap(),
+                )
+            else:
+                events = load_event_snapshot(
+                    db,
+                    org_id=org_id,
+                    home_id=home_id,
+                    subject_id=subject_id,
+                    since=snapshot_since,
+                )
+        except Exception as e:
+            db.rollback()
+            events = None
+            invalidate_incremental_windows(org_id, home_id, subject_id)
+            _log_event(
+                level="WARN",
+                event="scheduler_snapshot_error",
+                run_id=run_id,
+                msg="event snapshot unavailable; rules query DB directly",
+                scope=scope_fields,
+                error={"type": type(e).__name__, "message": str(e)},
+            )
+        snapshot_stats = {
+            "events": len(events) if events is not None else None,
+            "since": _utc_iso(snapshot_since),
+            "load_ms": int((time.monotonic() - t_snap0) * 1000),
+            "incremental": incremental_stats,
+        }
 
         deviations_upserted = 0
-        rules_total = len(enabled_rule_ids)
         rules_ok = 0
         rules_failed = 0
+        pending_rows: list[dict] = []
 
         for rid in enabled_rule_ids:
             t_rule0 = time.monotonic()
@@ -417,12 +533,14 @@ def run_rule_engine_job():
                 msg="rule evaluation started",
                 rule_id=rid,
                 subject_key=subject_key,
+                scope=scope_fields,
                 since=_utc_iso(r_since),
                 until=_utc_iso(r_until),
             )
 
             try:
                 upserted_for_rule = 0
+                rule_rows: list[dict] = []
 
                 with db.begin_nested():
                     spec = RULE_REGISTRY[rid]
@@ -437,6 +555,8 @@ def run_rule_engine_job():
                         home_id=home_id,
                         subject_id=subject_id,
                         subject_key=subject_key,
+                        events=events,
+                        truth_cache=truth_cache,
                     )
 
                     mode = _get_monitor_mode(
@@ -450,8 +570,8 @@ def run_rule_engine_job():
                     if mode == "OFF":
                         rule_devs = []
 
-                    # Persist alle avvik fra regelen (kan være 0..N)
-                    rule_row = _get_or_create_rule_row(db, rule_key=rid)
+                    # Collect alle avvik fra regelen (kan være 0..N); persisted in bulk below.
+                    rule_row_id = rule_row_ids[rid]
 
                     for d in rule_devs:
                         dct = d.model_dump(mode="json")
@@ -471,18 +591,21 @@ def run_rule_engine_job():
                                     "_monitor_mode": "TEST",
                                 }
 
-                        _upsert_open_deviation(
-                            db,
-                            rule_row=rule_row,
-                            subject_key=subject_key,
-                            now=now,
-                            deviation_v1=dct,
-                            org_id=org_id,
-                            home_id=home_id,
-                            subject_id=subject_id,
+                        rule_rows.append(
+                            _deviation_row(
+                                rule_row_id,
+                                subject_key=subject_key,
+                                now=now,
+                                deviation_v1=dct,
+                                org_id=org_id,
+                                home_id=home_id,
+                                subject_id=subject_id,
+                            )
                         )
                         upserted_for_rule += 1
 
+                pending_rows.extend(rule_rows)
+
                 deviations_upserted += upserted_for_rule
                 rules_ok += 1
 
@@ -494,6 +617,7 @@ def run_rule_engine_job():
                     run_id=run_id,
                     msg="rule evaluation finished",
                     rule_id=rid,
+                    scope=scope_fields,
                     duration_ms=duration_ms,
                     counts={
                         "evaluated": 1,
@@ -512,6 +636,7 @@ def run_rule_engine_job():
                     msg="rule evaluation failed",
                     rule_id=rid,
                     subject_key=subject_key,
+                    scope=scope_fields,
                     duration_ms=duration_ms,
                     error={
                         "type": type(e).__name__,
@@ -521,6 +646,10 @@ def run_rule_engine_job():
                 )
                 continue
 
+        # Persist stage: one upsert for the whole scope, then one stale-close UPDATE
+        # (after the upsert so rows refreshed this tick are never closed).
+        _bulk_upsert_open_deviations(db, pending_rows)
+
         closed = _close_stale_deviations(
             db,
             subject_key=subject_key,
@@ -532,6 +661,137 @@ def run_rule_engine_job():
 
         db.commit()
 
+        return {
+            "rules_ok": rules_ok,
+            "rules_failed": rules_failed,
+            "deviations_upserted": deviations_upserted,
+            "deviations_closed": closed,
+            "snapshot": snapshot_stats,
+        }
+    except Exception:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        db.close()
+
+
+def run_rule_engine_job():
+    run_id = str(uuid.uuid4())
+    t0 = time.monotonic()
+
+    db = SessionLocal()
+    try:
+        cfg = load_rule_config()
+        interval_minutes = cfg.scheduler_interval_minutes()
+        max_parallel = cfg.scheduler_max_parallel_scopes()
+        now = utcnow()
+        until = now
+        since = now - timedelta(minutes=interval_minutes)
+
+        scopes = _list_active_scopes(db)
+
+        # Finn hvilke regler som faktisk kjøres av scheduler (enabled_in_scheduler=true)
+        enabled_rule_ids = [
+            rid for rid in RULE_REGISTRY.keys() if cfg.rule_enabled_in_scheduler(rid)
+        ]
+
+        # Rule key -> rules.id from the process-wide registry (warmed at startup);
+        # resolved before fan-out so workers never race on creating rule rows.
+        rule_row_ids = resolve_rule_row_ids(db, enabled_rule_ids)
+
+        workers = max(1, min(max_parallel, len(scopes)))
+
+        _log_event(
+            level="INFO",
+            event="scheduler_run_start",
+            run_id=run_id,
+            msg="scheduler run started",
+            interval_minutes=interval_minutes,
+            since=_utc_iso(since),
+            until=_utc_iso(until),
+            scopes_total=len(scopes),
+            workers=workers,
+        )
+
+        rules_total = len(enabled_rule_ids)
+        counts = {
+            "scopes_total": len(scopes),
+            "scopes_ok": 0,
+            "scopes_failed": 0,
+            "rules_total": rules_total,
+            "rules_ok": 0,
+            "rules_failed": 0,
+            "deviations_upserted": 0,
+            "deviations_closed": 0,
+        }
+        snapshot_events = 0
+        snapshot_load_ms = 0
+        snapshot_new_events = 0
+        snapshot_modes: dict[str, int] = {}
+        # baseline_model_status is read once per scope per tick, shared by all rules.
+        truth_cache = TruthCache()
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="rule-engine"
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _run_rules_for_scope,
+                    scope,
+                    run_id=run_id,
+                    cfg=cfg,
+                    now=now,
+                    enabled_rule_ids=enabled_rule_ids,
+                    rule_row_ids=rule_row_ids,
+                    truth_cache=truth_cache,
+                ): scope
+                for scope in scopes
+            }
+            for fut in as_completed(futures):
+                scope = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    counts["scopes_failed"] += 1
+                    _log_event(
+                        level="ERROR",
+                        event="scheduler_scope_error",
+                        run_id=run_id,
+                        msg="scope evaluation failed",
+                        scope={
+                            "org_id": scope.org_id,
+                            "home_id": scope.home_id,
+                            "subject_id": scope.subject_id,
+                        },
+                        error={
+                            "type": type(e).__name__,
+                            "message": str(e),
+                            "stacktrace": "".join(
+                                traceback.format_exception(type(e), e, e.__traceback__)
+                            ),
+                        },
+                    )
+                    continue
+
+                counts["scopes_ok"] += 1
+                for k in (
+                    "rules_ok",
+                    "rules_failed",
+                    "deviations_upserted",
+                    "deviations_closed",
+                ):
+                    counts[k] += int(res.get(k) or 0)
+                snap = res.get("snapshot") or {}
+                snapshot_events += int(snap.get("events") or 0)
+                snapshot_load_ms += int(snap.get("load_ms") or 0)
+                inc = snap.get("incremental")
+                if inc:
+                    snapshot_new_events += int(inc.get("new_events") or 0)
+                    snapshot_modes[inc["mode"]] = snapshot_modes.get(inc["mode"], 0) + 1
+
         duration_ms = int((time.monotonic() - t0) * 1000)
 
         _log_event(
@@ -540,13 +800,14 @@ def run_rule_engine_job():
             run_id=run_id,
             msg="scheduler run finished",
             duration_ms=duration_ms,
-            counts={
-                "rules_total": rules_total,
-                "rules_ok": rules_ok,
-                "rules_failed": rules_failed,
-                "deviations_upserted": deviations_upserted,
-                "deviations_closed": closed,
+            counts=counts,
+            snapshot={
+                "events": snapshot_events,
+                "load_ms": snapshot_load_ms,
+                "new_events": snapshot_new_events,
+                "modes": snapshot_modes,
             },
+            truth_cache=truth_cache.stats(),
         )
 
     except Exception as e:
@@ -631,12 +892,55 @@ def run_anomalies_job_safe():
         return
 
 
+def run_episodes_svc_job_safe():
+    """Fail-safe wrapper for APScheduler: never raise; logs only when work was done."""
+    t0 = time.monotonic()
+    try:
+        out = run_episodes_svc_job()
+    except Exception as e:
+        _log_event(
+            level="ERROR",
+            event="episodes_svc_job_error",
+            run_id="n/a",
+            msg="episodes_svc job failed",
+            error={"type": type(e).__name__, "message": str(e)},
+        )
+        return
+
+    if out["scopes"] or out["errors"]:
+        _log_event(
+            level="WARN" if out["errors"] else "INFO",
+            event="episodes_svc_job_tick",
+            run_id="n/a",
+            msg="episodes_svc job tick",
+            duration_ms=int((time.monotonic() - t0) * 1000),
+            **out,
+        )
+
+
 def setup_scheduler():
     cfg = load_rule_config()
     interval_minutes = cfg.scheduler_interval_minutes()
 
     # This is still useful on startup.
     run_id = "startup"
+
+    # Resolve every registry rule to its rules.id once (bulk-creating missing rows).
+    # Fail-soft: run_rule_engine_job resolves lazily if the DB is not ready yet.
+    db = SessionLocal()
+    try:
+        resolve_rule_row_ids(db, RULE_REGISTRY.keys())
+    except Exception as e:
+        db.rollback()
+        _log_event(
+            level="WARN",
+            event="scheduler_rule_rows_error",
+            run_id=run_id,
+            msg="rule row registry not warmed at startup",
+            error={"type": type(e).__name__, "message": str(e)},
+        )
+    finally:
+        db.close()
     _log_event(
         level="INFO",
         event="scheduler_configured",
@@ -673,6 +977,24 @@ def setup_scheduler():
         replace_existing=True,
     )
 
+    scheduler.add_job(
+        run_events_partitions_job,
+        trigger=IntervalTrigger(hours=24),
+        id="events_partitions_job",
+        replace_existing=True,
+        next_run_time=utcnow(),
+    )
+
+    if episodes_svc_job_enabled():
+        scheduler.add_job(
+            run_episodes_svc_job_safe,
+            trigger=IntervalTrigger(seconds=EPISODES_SVC_INTERVAL_S),
+            id="episodes_svc_job",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
 
 # --- Anomalies runner (ID003_10) ---
 # Minimal deterministic runner helpers. Wiring into APScheduler comes in a later step.
@@ -747,10 +1069,13 @@ def run_anomalies_job_one(
     close_after_green_buckets: int = 2,
     pet_weight: float = 0.25,
     unknown_weight: float = 0.50,
+    scored=None,
 ) -> dict:
     """
     Score exactly one (room, bucket_start) and persist lifecycle via upsert_bucket_result.
     Deterministic given explicit args. Intended to be used by scheduler-job later.
+
+    scored: precomputed BucketScore (from score_buckets_batch); None = score this room now.
     """
     from datetime import datetime
 
@@ -763,14 +1088,15 @@ def run_anomalies_job_one(
     from services.anomaly_scoring import score_room_bucket
     from services.anomalies_repo_lifecycle import upsert_bucket_result
 
-    scored = score_room_bucket(
-        db,
-        scope=scope,
-        room=room,
-        bucket_start=dt,
-        pet_weight=pet_weight,
-        unknown_weight=unknown_weight,
-    )
+    if scored is None:
+        scored = score_room_bucket(
+            db,
+            scope=scope,
+            room=room,
+            bucket_start=dt,
+            pet_weight=pet_weight,
+            unknown_weight=unknown_weight,
+        )
 
     ep = upsert_bucket_result(
         db,
@@ -989,10 +1315,48 @@ def run_anomalies_job() -> dict:
     try:
         scope = _anomaly_pick_one_scope(db)
         rooms = _anomaly_list_room_ids(db, scope=scope)
+
+        # All rooms of the bucket in one pass (grouped queries). On failure each room
+        # falls back to the per-room reference path in run_anomalies_job_one.
+        from services.anomaly_scoring import score_buckets_batch
+
+        try:
+            scored_by_room = score_buckets_batch(
+                db, scope=scope, bucket_start=bucket_start, rooms=rooms
+            )
+        except Exception as e:
+            scored_by_room = {}
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            _log_event(
+                level="WARN",
+                event="anomalies_batch_score_error",
+                run_id=run_id,
+                msg="batch scoring failed; scoring rooms one by one",
+                scope={
+                    "org_id": scope.org_id,
+                    "home_id": scope.home_id,
+                    "subject_id": scope.subject_id,
+                },
+                bucket_start=bucket_start.isoformat(),
+                rooms=len(rooms),
+                error={
+                    "type": type(e).__name__,
+                    "message": str(e),
+                    "stacktrace": traceback.format_exc(),
+                },
+            )
+
         for room_id in rooms:
             try:
                 res = run_anomalies_job_one(
-                    db, scope=scope, room=room_id, bucket_start=bucket_start
+                    db,
+                    scope=scope,
+                    room=room_id,
+                    bucket_start=bucket_start,
+                    scored=scored_by_room.get(str(room_id).strip()),
                 )
                 rooms_scored += 1
                 a = str(res.get("action") or "NOOP").upper()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from services.rules.context import RuleContext
+from services.rules.r001 import eval_r001_no_motion
+from services.rules.r004 import eval_r004_prolonged_bathroom_presence
+from services.rules.r010 import eval_r010_sensor_stuck_room_stuck
+from services.rules.snapshot import EventSnapshot
+
+T0 = datetime(2026, 2, 22, 8, 0, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class _Row:
+    id: int
+    timestamp: datetime
+    category: str
+    payload: dict = field(default_factory=dict)
+    stream_id: str = "prod"
+
+    @property
+    def event_id(self) -> str:
+        return f"e{self.id}"
+
+
+class _NoDB:
+    def query(self, *a, **k):
+        raise AssertionError("rule queried DB although snapshot covers the window")
+
+
+def _rows():
+    return [
+        _Row(3, T0 + timedelta(minutes=10), "presence", {"room_id": "baderom", "state": "off"}),
+        _Row(1, T0, "presence", {"room_id": "baderom", "state": "on"}),
+        _Row(2, T0 + timedelta(minutes=5), "door", {"room": "inngang", "state": "open"}),
+        _Row(4, T0 + timedelta(minutes=20), "motion", {"room": "stue", "state": "on"}),
+        _Row(5, T0 + timedelta(minutes=30), "ha_snapshot", {}, stream_id="test"),
+    ]
+
+
+def test_select_orders_and_filters_window_until_exclusive():
+    snap = EventSnapshot(_rows(), since=T0)
+
+    ids = [r.id for r in snap.select(since=T0, until=T0 + timedelta(minutes=20))]
+    assert ids == [1, 2, 3]
+
+    ids = [
+        r.id
+        for r in snap.select(
+            since=T0, until=T0 + timedelta(hours=1), categories=["motion", "presence"]
+        )
+    ]
+    assert ids == [1, 3, 4]
+
+    ids = [
+        r.id
+        for r in snap.select(
+            since=T0,
+            until=T0 + timedelta(hours=1),
+            categories=["presence"],
+            room="baderom",
+            desc=True,
+        )
+    ]
+    assert ids == [3, 1]
+
+
+def test_last_respects_categories_and_stream():
+    snap = EventSnapshot(_rows(), since=T0)
+
+    assert snap.last().id == 5
+    assert snap.last(stream_id="prod").id == 4
+    assert snap.last(categories=["door", "presence"]).id == 3
+    assert snap.last(categories=["heartbeat"]) is None
+
+
+def test_covers_only_windows_inside_snapshot():
+    snap = EventSnapshot([], since=T0)
+    assert snap.covers(T0)
+    assert not snap.covers(T0 - timedelta(seconds=1))
+
+
+def test_rules_read_snapshot_instead_of_db():
+    now = T0 + timedelta(hours=2)
+    snap = EventSnapshot(
+        [
+            _Row(1, T0, "presence", {"room_id": "baderom", "state": "on"}),
+            _Row(2, T0 + timedelta(minutes=60), "presence", {"room_id": "baderom", "state": "off"}),
+            _Row(3, T0 + timedelta(minutes=61), "motion", {"room_id": "stue", "state": "on"}),
+        ],
+        since=T0 - timedelta(hours=24),
+    )
+    ctx = RuleContext(
+        session=_NoDB(),
+        since=T0 - timedelta(minutes=30),
+        until=now,
+        now=now,
+        params={"tz": "UTC"},
+        events=snap,
+    )
+
+    assert eval_r001_no_motion(ctx) == []
+    devs = eval_r004_prolonged_bathroom_presence(ctx)
+    assert len(devs) == 1
+    assert devs[0].evidence["event_ids"] == ["e1", "e2"]
+    # nested R-009 liveness gate inherits the snapshot (ingest stale -> suppressed)
+    assert eval_r010_sensor_stuck_room_stuck(ctx) == []
+
+
+def test_rule_falls_back_to_db_when_window_outside_snapshot():
+    now = T0 + timedelta(hours=2)
+
+    class _Q:
+        def filter(self, *a, **k):
+            return self
+
+        def order_by(self, *a, **k):
+            return self
+
+        def all(self):
+            return []
+
+    class _DB:
+        calls = 0
+
+        def query(self, *a, **k):
+            _DB.calls += 1
+            return _Q()
+
+    ctx = RuleContext(
+        session=_DB(),
+        since=T0 - timedelta(hours=1),
+        until=now,
+        now=now,
+        params={},
+        events=EventSnapshot([], since=T0),
+    )
+    devs = eval_r001_no_motion(ctx)
+    assert len(devs) == 1
+    assert _DB.calls == 1
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import services.rules.incremental as inc
+from services.rules.incremental import (
+    invalidate_incremental_windows,
+    load_incremental_snapshot,
+)
+from services.rules.snapshot import EventSnapshot
+
+T0 = datetime(2026, 2, 22, 8, 0, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class _Row:
+    id: int
+    timestamp: datetime
+    category: str = "motion"
+    payload: dict = field(default_factory=lambda: {"room": "stue"})
+    stream_id: str = "prod"
+
+
+class _Table:
+    """Stand-in for load_snapshot_rows over an in-memory events table."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.calls = []
+
+    def __call__(self, db, *, org_id, home_id, subject_id, since, after_id=None):
+        self.calls.append({"since": since, "after_id": after_id})
+        return sorted(
+            (
+                r
+                for r in self.rows
+                if r.timestamp >= since and (after_id is None or r.id > after_id)
+            ),
+            key=lambda r: (r.timestamp, r.id),
+        )
+
+
+@pytest.fixture(autouse=True)
+def _clean(monkeypatch):
+    epochs = {}
+    monkeypatch.setattr(inc, "load_scope_epoch", lambda db, key: epochs.get(key, 0))
+    invalidate_incremental_windows()
+    yield epochs
+    invalidate_incremental_windows()
+
+
+def _load(table, monkeypatch, since, *, rebuild=100, overlap=0):
+    monkeypatch.setattr(inc, "load_snapshot_rows", table)
+    return load_incremental_snapshot(
+        None,
+        org_id="o",
+        home_id="h",
+        subject_id="s",
+        since=since,
+        rebuild_every_ticks=rebuild,
+        id_overlap=overlap,
+    )
+
+
+def _ids(snap: EventSnapshot, since, until):
+    return [r.id for r in snap.select(since=since, until=until)]
+
+
+def test_delta_ticks_match_full_window(monkeypatch):
+    table = _Table([_Row(i, T0 + timedelta(minutes=i)) for i in range(1, 6)])
+
+    snap, stats = _load(table, monkeypatch, T0)
+    assert stats["mode"] == "full"
+    assert len(snap) == 5
+
+    # New in-order event, a late event (older timestamp, higher id) and window advance.
+    table.rows += [_Row(6, T0 + timedelta(minutes=10)), _Row(7, T0 + timedelta(minutes=3, seconds=30))]
+    since2 = T0 + timedelta(minutes=2)
+    snap2, stats2 = _load(table, monkeypatch, since2)
+
+    assert stats2["mode"] == "delta"
+    assert stats2["new_events"] == 2
+    assert stats2["evicted"] == 1
+    assert table.calls[-1]["after_id"] == 5
+
+    full = EventSnapshot(table(None, org_id="o", home_id="h", subject_id="s", since=since2), since=since2)
+    end = T0 + timedelta(hours=1)
+    assert _ids(snap2, since2, end) == _ids(full, since2, end) == [2, 3, 7, 4, 5, 6]
+    assert [r.id for r in snap2.select(since=since2, until=end, categories=["motion"], room="stue")] == [
+        2, 3, 7, 4, 5, 6
+    ]
+
+
+def test_overlap_picks_up_late_committed_lower_id(monkeypatch):
+    table = _Table([_Row(1, T0), _Row(3, T0 + timedelta(minutes=2))])
+    _load(table, monkeypatch, T0, overlap=5)
+
+    # id 2 committed after id 3 was already consumed
+    table.rows.append(_Row(2, T0 + timedelta(minutes=1)))
+    snap, stats = _load(table, monkeypatch, T0, overlap=5)
+
+    assert stats["new_events"] == 1
+    assert _ids(snap, T0, T0 + timedelta(hours=1)) == [1, 2, 3]
+
+
+def test_verify_tick_reloads_full_window_and_reports_drift(monkeypatch):
+    table = _Table([_Row(1, T0), _Row(2, T0 + timedelta(minutes=1))])
+    _load(table, monkeypatch, T0, rebuild=2)
+    _, stats1 = _load(table, monkeypatch, T0, rebuild=2)
+    assert stats1["mode"] == "delta"
+
+    # Row 1 deleted behind our back (e.g. retention) -> resident state is stale.
+    table.rows = [r for r in table.rows if r.id != 1]
+    snap, stats = _load(table, monkeypatch, T0, rebuild=2)
+
+    assert stats["mode"] == "verify"
+    assert stats["drift"] == {"missing": 0, "stale": 1}
+    assert _ids(snap, T0, T0 + timedelta(hours=1)) == [2]
+    assert table.calls[-1]["after_id"] is None
+
+    _, stats3 = _load(table, monkeypatch, T0, rebuild=2)
+    assert stats3["mode"] == "delta"
+
+
+def test_epoch_bump_drops_resident_window(monkeypatch, _clean):
+    table = _Table([_Row(1, T0), _Row(2, T0 + timedelta(minutes=1))])
+    _load(table, monkeypatch, T0)
+    _, stats = _load(table, monkeypatch, T0)
+    assert stats["mode"] == "delta"
+
+    # Another process (retention/GDPR delete/room_id backfill) deletes row 1; the
+    # events trigger bumps events_scope_epoch, so the next tick reloads in full.
+    table.rows = [r for r in table.rows if r.id != 1]
+    _clean[("o", "h", "s")] = 1
+    snap, stats = _load(table, monkeypatch, T0)
+
+    assert stats["mode"] == "full"
+    assert stats["invalidated"] == "events_changed"
+    assert table.calls[-1]["after_id"] is None
+    assert _ids(snap, T0, T0 + timedelta(hours=1)) == [2]
+
+    _, stats = _load(table, monkeypatch, T0)
+    assert stats["mode"] == "delta"
+
+
+def test_unreadable_epoch_forces_full_load(monkeypatch):
+    table = _Table([_Row(1, T0)])
+    _load(table, monkeypatch, T0)
+    monkeypatch.setattr(inc, "load_scope_epoch", lambda db, key: None)
+
+    _, stats = _load(table, monkeypatch, T0)
+    assert stats["mode"] == "full"
+    assert stats["invalidated"] == "epoch_unavailable"
@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from config.rule_config import RuleConfig
-from services.rules.gating import build_rule_truth
+from services.rules.gating import TruthCache, build_rule_truth
 
 
 @dataclass
@@ -142,3 +142,53 @@ def test_baseline_truth_missing_columns_degrades_without_crash():
 
     assert out["evaluation_truth"] == "NOT_EVALUATED"
     assert out["gating_reason"] == "baseline_status_missing"
+
+
+class _CountingDB(_DB):
+    def __init__(self, row: dict | None):
+        super().__init__(row)
+        self.calls = 0
+
+    def execute(self, *args, **kwargs):
+        self.calls += 1
+        return super().execute(*args, **kwargs)
+
+
+def test_truth_cache_reads_baseline_once_per_scope():
+    cfg = RuleConfig(
+        raw={
+            "rules": {
+                rid: {"evaluation_mode": "baseline_dependent", "requires_baseline": True}
+                for rid in ("R-001", "R-005", "R-006")
+            }
+        }
+    )
+    db = _CountingDB(
+        {
+            "baseline_ready": True,
+            "days_with_data": 5,
+            "room_bucket_rows": 10,
+            "room_bucket_supported": 6,
+            "transition_rows": 10,
+            "transition_supported": 7,
+        }
+    )
+    cache = TruthCache()
+
+    outs = [
+        build_rule_truth(
+            cfg,
+            rid,
+            db=db,
+            org_id="o",
+            home_id="h",
+            subject_id=sid,
+            truth_cache=cache,
+        )
+        for sid in ("s1", "s2")
+        for rid in ("R-001", "R-005", "R-006")
+    ]
+
+    assert db.calls == 2
+    assert all(o["evaluation_truth"] == "FULLY_EVALUATED" for o in outs)
+    assert cache.stats() == {"hits": 4, "misses": 2, "scopes": 2}
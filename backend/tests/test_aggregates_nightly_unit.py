@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import routes.aggregates as agg
+from routes.aggregates import nightly_aggregates, nightly_windows
+from services.auth import AuthScope
+
+OSLO = ZoneInfo("Europe/Oslo")
+NOW = datetime(2026, 3, 10, 8, 30, tzinfo=timezone.utc)  # 09:30 Oslo (CET)
+SCOPE = AuthScope(
+    org_id="o", home_id="h", subject_id="s", role="readonly", api_key_hash="x", user_id=None
+)
+
+
+def test_nightly_windows_match_ai_bot_definition():
+    ws = nightly_windows(NOW, nights=2, tz=OSLO)
+
+    assert [w["offset"] for w in ws] == [0, 1, 2]
+    # night 0: 22:00 local (21:00Z) previous day -> 07:00 local (06:00Z)
+    assert ws[0]["night"] == (
+        datetime(2026, 3, 9, 21, 0, tzinfo=timezone.utc),
+        datetime(2026, 3, 10, 6, 0, tzinfo=timezone.utc),
+    )
+    assert ws[2]["night"][0] == datetime(2026, 3, 7, 21, 0, tzinfo=timezone.utc)
+    # morning 0 capped at now; morning 1 full 05:00-12:00 local
+    assert ws[0]["morning"] == (datetime(2026, 3, 10, 4, 0, tzinfo=timezone.utc), NOW)
+    assert ws[1]["morning"] == (
+        datetime(2026, 3, 9, 4, 0, tzinfo=timezone.utc),
+        datetime(2026, 3, 9, 11, 0, tzinfo=timezone.utc),
+    )
+
+
+def test_nightly_windows_skip_morning_before_start():
+    early = datetime(2026, 3, 10, 2, 0, tzinfo=timezone.utc)  # 03:00 Oslo
+    assert nightly_windows(early, nights=1, tz=OSLO)[0]["morning"] is None
+
+
+class _Res:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _FakeDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def execute(self, stmt, params):
+        self.calls.append(params)
+        self.sql = str(stmt)
+        return _Res(self.rows)
+
+    def close(self):
+        pass
+
+
+def test_nightly_aggregates_one_query_folds_rows(monkeypatch):
+    rows = [
+        {"kind": "night", "offset_d": 0, "room": "stue", "n": 3, "first_ts": None},
+        {"kind": "night", "offset_d": 0, "room": None, "n": 2, "first_ts": None},
+        {"kind": "night", "offset_d": 1, "room": "bad", "n": 4, "first_ts": None},
+        {
+            "kind": "morning",
+            "offset_d": 1,
+            "room": "stue",
+            "n": 5,
+            "first_ts": datetime(2026, 3, 9, 6, 15, tzinfo=timezone.utc),
+        },
+        {
+            "kind": "morning",
+            "offset_d": 1,
+            "room": "bad",
+            "n": 1,
+            "first_ts": datetime(2026, 3, 9, 5, 50, tzinfo=timezone.utc),
+        },
+    ]
+    db = _FakeDB(rows)
+    monkeypatch.setattr(agg, "SessionLocal", lambda: db)
+
+    out = nightly_aggregates(
+        nights=2,
+        until=NOW,
+        tz="Europe/Oslo",
+        categories="Motion, presence",
+        night_start_hour=22,
+        night_end_hour=7,
+        morning_start_hour=5,
+        morning_end_hour=12,
+        stream_id="prod",
+        scope=SCOPE,
+    )
+
+    assert len(db.calls) == 1
+    params = db.calls[0]
+    assert params["cats"] == ["motion", "presence"]
+    # categories lower-cased in Python; column compared as-is (index-friendly)
+    assert "e.category = ANY(" in db.sql and "lower(e.category)" not in db.sql
+    assert "GROUP BY w.kind, w.offset_d, (e.payload->>'room')" in db.sql
+    assert len(params["kinds"]) == 6  # 3 nights + 3 mornings
+
+    nights = {n["offset"]: n for n in out["nights"]}
+    assert nights[0]["night"]["total"] == 5
+    assert nights[0]["night"]["by_room"] == {"stue": 3}
+    assert nights[1]["night"]["by_room"] == {"bad": 4}
+    assert nights[2]["night"]["total"] == 0
+    assert nights[1]["morning"]["count"] == 6
+    assert nights[1]["morning"]["first_minute"] == 6 * 60 + 50  # 06:50 Oslo
+    assert nights[0]["morning"]["first_minute"] is None
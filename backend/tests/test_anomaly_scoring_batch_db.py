@@ -0,0 +1,124 @@
+"""
+score_buckets_batch vs score_room_bucket against real events rows (needs Postgres).
+
+Both paths read the same committed rows: the aligned bucket goes through the
+event_bucket_counts rollup, the unaligned one through the grouped events scan.
+Only the test scope below is written to and cleaned up.
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from db import SessionLocal
+from services.anomaly_scoring import score_buckets_batch, score_room_bucket
+from services.auth import AuthScope
+
+SCOPE = AuthScope(
+    org_id="test",
+    home_id="test-anomaly-batch",
+    subject_id="test",
+    role="system",
+    api_key_hash="x",
+    user_id="system",
+)
+B0 = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)  # Monday 10:00 Oslo
+ROOMS = ["kitchen", "gang", "bad", "tom"]
+
+
+def _cleanup(db) -> None:
+    db.execute(
+        text(
+            """
+            DELETE FROM events
+            WHERE org_id = :org_id AND home_id = :home_id AND subject_id = :subject_id
+            """
+        ),
+        {"org_id": SCOPE.org_id, "home_id": SCOPE.home_id, "subject_id": SCOPE.subject_id},
+    )
+    db.commit()
+
+
+def _insert(db, rows) -> None:
+    for category, minute, room_id in rows:
+        db.execute(
+            text(
+                """
+                INSERT INTO events
+                  (event_id, "timestamp", category, payload,
+                   org_id, home_id, subject_id, stream_id, room_id)
+                VALUES
+                  (:event_id, :ts, :category, CAST(:payload AS jsonb),
+                   :org_id, :home_id, :subject_id, 'prod', :room_id)
+                """
+            ),
+            {
+                "event_id": str(uuid.uuid4()),
+                "ts": B0 + timedelta(minutes=minute),
+                "category": category,
+                "payload": "{}",
+                "org_id": SCOPE.org_id,
+                "home_id": SCOPE.home_id,
+                "subject_id": SCOPE.subject_id,
+                "room_id": room_id,
+            },
+        )
+    db.commit()
+
+
+@pytest.fixture
+def db():
+    s = SessionLocal()
+    _cleanup(s)
+    _insert(
+        s,
+        [
+            ("door", 1, "gang"),
+            ("door", 2, "gang"),
+            ("door", 3, "kitchen"),
+            ("motion", 4, "bad"),
+            ("presence", 5, "bad"),
+            ("motion", 6, None),  # unresolved room: counted nowhere
+            ("motion", 9, "kitchen"),
+            ("motion", 20, "bad"),
+        ],
+    )
+    try:
+        yield s
+    finally:
+        s.rollback()
+        _cleanup(s)
+        s.close()
+
+
+@pytest.mark.parametrize("offset_min", [0, 7])
+def test_batch_matches_per_room_on_real_rows(db, offset_min):
+    start = B0 + timedelta(minutes=offset_min)
+
+    expected = {r: score_room_bucket(db, scope=SCOPE, room=r, bucket_start=start) for r in ROOMS}
+    got = score_buckets_batch(db, scope=SCOPE, bucket_start=start, rooms=ROOMS)
+
+    assert got == expected
+    observed = {
+        r: (s.details["observed"]["door_obs"], s.details["observed"]["activity_obs"])
+        for r, s in got.items()
+    }
+    if offset_min == 0:
+        assert observed == {
+            "kitchen": (1, 1.0),
+            "gang": (2, 0.0),
+            "bad": (0, 2.0),
+            "tom": (0, 0.0),
+        }
+    else:
+        # [B0+7m, B0+22m): kitchen motion at 9, bad motion at 20
+        assert observed == {
+            "kitchen": (0, 1.0),
+            "gang": (0, 0.0),
+            "bad": (0, 1.0),
+            "tom": (0, 0.0),
+        }
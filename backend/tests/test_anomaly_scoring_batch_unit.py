@@ -0,0 +1,302 @@
+"""
+score_buckets_batch against a fake Session.
+
+The fake answers per-room and grouped queries from the same in-memory tables, so
+these tests pin the batch path's call pattern, bound parameters and SQL shape and
+check it feeds the shared scoring core the same inputs; row-level equivalence on
+Postgres is covered by test_anomaly_scoring_batch_db.py.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.anomaly_scoring import score_buckets_batch, score_room_bucket
+from services.auth import AuthScope
+
+SCOPE = AuthScope(
+    org_id="o",
+    home_id="h",
+    subject_id="s",
+    role="system",
+    api_key_hash="x",
+    user_id="system",
+)
+B0 = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)  # Monday 10:00 Oslo
+
+
+class _Res:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self):
+        return list(self._rows)
+
+
+def _event_rooms(e):
+    # hot queries match events.room_id only (resolved at write time)
+    return {e.get("room_id")} - {None}
+
+
+class _FakeDB:
+    """Answers both the per-room and the grouped queries from in-memory tables."""
+
+    def __init__(
+        self, *, status, episodes, events, room_buckets, transitions, prev_room,
+        bucket_counts=True,
+    ):
+        self.bucket_counts = bucket_counts
+        self.status = status
+        self.episodes = episodes
+        self.events = events
+        self.room_buckets = room_buckets
+        self.transitions = transitions
+        self.prev_room = prev_room
+        self.queries = 0
+        self.events_scanned = 0
+        self.calls = []
+
+    def rollback(self):
+        pass
+
+    def execute(self, stmt, params):
+        self.queries += 1
+        sql = str(stmt)
+        self.calls.append((sql, dict(params)))
+        if "FROM baseline_model_status" in sql:
+            return _Res([self.status] if self.status else [])
+        if "FROM anomaly_episodes" in sql:
+            return _Res([{"room": self.prev_room}] if self.prev_room else [])
+        if "FROM episodes" in sql:
+            rooms = params.get("rooms") or [params.get("room")]
+            rows = [
+                e
+                for e in self.episodes
+                if e["room"] in rooms
+                and e["start_ts"] < params["end"]
+                and e["end_ts"] > params["start"]
+            ]
+            return _Res(sorted(rows, key=lambda e: (e["room"], e["start_ts"])))
+        if "FROM baseline_room_bucket" in sql:
+            rooms = params.get("rooms") or [params.get("room")]
+            return _Res([r for r in self.room_buckets if r["room_id"] in rooms])
+        if "FROM baseline_transition" in sql:
+            tos = params.get("rooms") or [params.get("to_room")]
+            return _Res(
+                [
+                    t
+                    for t in self.transitions
+                    if t["from_room_id"] == params["from_room"] and t["to_room_id"] in tos
+                ]
+            )
+        if "FROM event_bucket_counts" in sql:
+            if not self.bucket_counts:
+                raise RuntimeError('relation "event_bucket_counts" does not exist')
+            evs = [e for e in self.events if params["start"] <= e["timestamp"] < params["end"]]
+            out = []
+            for room in params["rooms"]:
+                mine = [e for e in evs if room in _event_rooms(e)]
+                if mine:
+                    out.append(
+                        {
+                            "room": room,
+                            "door_n": sum(1 for e in mine if e["category"] == "door"),
+                            "activity_n": float(
+                                sum(1 for e in mine if e["category"] in ("presence", "motion"))
+                            ),
+                        }
+                    )
+            return _Res(out)
+        if "FROM events" in sql or "JOIN events" in sql:
+            self.events_scanned += 1
+            t0 = params.get("start", params.get("t0"))
+            t1 = params.get("end", params.get("t1"))
+            evs = [e for e in self.events if t0 <= e["timestamp"] < t1]
+            if "rooms" in params:
+                out = []
+                for room in params["rooms"]:
+                    mine = [e for e in evs if room in _event_rooms(e)]
+                    door = sum(1 for e in mine if e["category"] == "door")
+                    act = sum(1 for e in mine if e["category"] in ("presence", "motion"))
+                    if mine:
+                        out.append({"room": room, "door_n": door, "activity_n": float(act)})
+                return _Res(out)
+            mine = [e for e in evs if params["room"] in _event_rooms(e)]
+            if "category = 'door'" in sql:
+                return _Res([{"n": sum(1 for e in mine if e["category"] == "door")}])
+            return _Res(
+                [{"n": float(sum(1 for e in mine if e["category"] in ("presence", "motion")))}]
+            )
+        raise AssertionError(f"unexpected SQL: {sql}")
+
+
+def _ep(room, start_min, end_min, rate, p_h=0.7, p_p=0.2, p_u=0.1):
+    return {
+        "room": room,
+        "start_ts": B0 + timedelta(minutes=start_min),
+        "end_ts": B0 + timedelta(minutes=end_min),
+        "event_rate_per_min": rate,
+        "class": "human",
+        "p_human": p_h,
+        "p_pet": p_p,
+        "p_unknown": p_u,
+    }
+
+
+def _ev(cat, minute, **kw):
+    return {"category": cat, "timestamp": B0 + timedelta(minutes=minute), **kw}
+
+
+def _rb(room, **kw):
+    row = {
+        "room_id": room,
+        "activity_median": 1.0,
+        "activity_sigma": 0.5,
+        "activity_support_n": 10,
+        "sigma_floor": 0.1,
+        "door_median": 0.0,
+        "door_sigma": 0.2,
+        "door_support_n": 10,
+    }
+    row.update(kw)
+    return row
+
+
+def _db(**overrides):
+    data = dict(
+        status={"model_end": "2026-03-01", "baseline_ready": True},
+        episodes=[
+            _ep("kitchen", -5, 7, 3.0),
+            _ep("kitchen", 8, 30, 1.5),
+            _ep("stue", 2, 4, 0.5, p_h=0.1, p_p=0.9, p_u=0.0),
+        ],
+        events=[
+            _ev("door", 1, room_id="gang"),
+            _ev("door", 2, room_id="gang", payload={"area": "gang"}),
+            _ev("door", 3, room_id="kitchen", payload={"room": "gang"}),  # kitchen only
+            _ev("motion", 4, room_id="bad", payload={"room": "bad"}),
+            _ev("presence", 5, room_id="bad"),
+            _ev("motion", 6, payload={"room": "gang"}),  # unresolved: no room
+            _ev("motion", 20, room_id="bad"),  # outside bucket
+        ],
+        room_buckets=[
+            _rb("kitchen"),
+            _rb("gang", door_median=None),
+            _rb("stue", activity_median=None),
+        ],
+        transitions=[
+            {"from_room_id": "stue", "to_room_id": "kitchen", "p_smoothed": 1e-5,
+             "trans_count": 1, "from_total": 100, "alpha": 0.5},
+            {"from_room_id": "stue", "to_room_id": "gang", "p_smoothed": 0.3,
+             "trans_count": 30, "from_total": 100, "alpha": 0.5},
+        ],
+        prev_room="stue",
+    )
+    data.update(overrides)
+    return _FakeDB(**data)
+
+
+ROOMS = ["kitchen", "gang", "stue", "bad", "tom"]
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {},
+        {"status": None},
+        {"prev_room": None},
+        {"room_buckets": []},
+    ],
+)
+def test_batch_feeds_scoring_core_like_per_room_path(overrides):
+    ref_db = _db(**overrides)
+    expected = {
+        r: score_room_bucket(ref_db, scope=SCOPE, room=r, bucket_start=B0) for r in ROOMS
+    }
+
+    batch_db = _db(**overrides)
+    got = score_buckets_batch(batch_db, scope=SCOPE, bucket_start=B0, rooms=ROOMS + [" kitchen "])
+
+    assert list(got) == ROOMS
+    assert got == expected
+    assert batch_db.queries <= 6 < ref_db.queries
+
+
+def test_batch_sanity_on_scores():
+    got = score_buckets_batch(_db(), scope=SCOPE, bucket_start=B0, rooms=ROOMS)
+
+    assert got["kitchen"].score_sequence > 0
+    assert got["gang"].score_event > 0
+    assert got["bad"].details["observed"]["activity_obs"] == 2.0
+    assert score_buckets_batch(_db(), scope=SCOPE, bucket_start=B0, rooms=[" "]) == {}
+
+
+def test_aligned_bucket_counts_come_from_rollup():
+    ref_db = _db()
+    batch_db = _db()
+    ref = {r: score_room_bucket(ref_db, scope=SCOPE, room=r, bucket_start=B0) for r in ROOMS}
+    got = score_buckets_batch(batch_db, scope=SCOPE, bucket_start=B0, rooms=ROOMS)
+
+    assert got == ref
+    assert ref_db.events_scanned == 0
+    assert batch_db.events_scanned == 0
+
+
+def test_missing_rollup_falls_back_to_events():
+    with_rollup = score_buckets_batch(_db(), scope=SCOPE, bucket_start=B0, rooms=ROOMS)
+
+    ref_db = _db(bucket_counts=False)
+    batch_db = _db(bucket_counts=False)
+    ref = {r: score_room_bucket(ref_db, scope=SCOPE, room=r, bucket_start=B0) for r in ROOMS}
+    got = score_buckets_batch(batch_db, scope=SCOPE, bucket_start=B0, rooms=ROOMS)
+
+    assert got == ref == with_rollup
+    assert batch_db.events_scanned == 1
+
+
+def test_unaligned_bucket_scans_events():
+    db = _db()
+    start = B0 + timedelta(minutes=7)
+    score_buckets_batch(db, scope=SCOPE, bucket_start=start, rooms=ROOMS)
+
+    assert db.events_scanned == 1
+
+
+def _call(db, table):
+    return [(sql, p) for sql, p in db.calls if f"FROM {table}" in sql]
+
+
+def test_grouped_queries_bind_rooms_scope_and_bucket_bounds():
+    db = _db(bucket_counts=False)
+    score_buckets_batch(db, scope=SCOPE, bucket_start=B0, rooms=ROOMS + [" kitchen ", ""])
+
+    scope_params = {"org_id": "o", "home_id": "h", "subject_id": "s"}
+    end = B0 + timedelta(minutes=15)
+    for table in ("episodes", "event_bucket_counts", "events", "baseline_room_bucket"):
+        [(sql, params)] = _call(db, table)
+        assert params["rooms"] == ROOMS
+        assert {k: params[k] for k in scope_params} == scope_params
+        assert "= ANY(:rooms)" in sql
+
+    [(ep_sql, ep_params)] = _call(db, "episodes")
+    assert (ep_params["start"], ep_params["end"]) == (B0, end)
+    assert "ORDER BY room ASC, start_ts ASC" in ep_sql
+
+    [(ev_sql, ev_params)] = _call(db, "events")
+    assert (ev_params["start"], ev_params["end"]) == (B0, end)
+    # same room predicate as the per-room queries: resolved room_id, never payload
+    assert "room_id = ANY(:rooms)" in ev_sql and "payload" not in ev_sql
+    assert "GROUP BY" in ev_sql
+
+    [(_, rb_params)] = _call(db, "baseline_room_bucket")
+    assert rb_params["model_end"] == "2026-03-01"
+    assert (rb_params["dow"], rb_params["is_weekend"]) == (1, False)
+
+    [(_, tr_params)] = _call(db, "baseline_transition")
+    assert tr_params["from_room"] == "stue" and tr_params["rooms"] == ROOMS
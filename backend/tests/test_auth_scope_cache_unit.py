@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import pytest
+
+from services import auth
+from services.auth import (
+    AuthScope,
+    _lookup_scope_by_api_key,
+    _sha256_hex,
+    invalidate_scope_cache,
+    scope_cache_stats,
+)
+
+
+def _scope(h: str) -> AuthScope:
+    return AuthScope(
+        org_id="o1",
+        home_id="h1",
+        subject_id="s1",
+        role="operator",
+        api_key_hash=h,
+        user_id=None,
+    )
+
+
+@pytest.fixture
+def db_lookups(monkeypatch):
+    calls: list[str] = []
+    known = {_sha256_hex("good-key")}
+
+    def _fake(h: str):
+        calls.append(h)
+        return _scope(h) if h in known else None
+
+    monkeypatch.setattr(auth, "_lookup_scope_by_hash", _fake)
+    for k in auth._SCOPE_CACHE_STATS:
+        monkeypatch.setitem(auth._SCOPE_CACHE_STATS, k, 0)
+    invalidate_scope_cache()
+    yield calls
+    invalidate_scope_cache()
+
+
+def test_positive_lookup_is_cached(db_lookups):
+    for _ in range(5):
+        scope = _lookup_scope_by_api_key("good-key")
+        assert scope is not None and scope.org_id == "o1"
+
+    assert len(db_lookups) == 1
+    stats = scope_cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 4
+
+
+def test_negative_lookup_is_cached_with_short_ttl(db_lookups, monkeypatch):
+    assert _lookup_scope_by_api_key("bad-key") is None
+    assert _lookup_scope_by_api_key("bad-key") is None
+    assert len(db_lookups) == 1
+    assert scope_cache_stats()["negative_hits"] == 1
+
+    monkeypatch.setattr(auth, "_SCOPE_CACHE_NEG_TTL_S", 0.0)
+    invalidate_scope_cache()
+    _lookup_scope_by_api_key("bad-key")
+    _lookup_scope_by_api_key("bad-key")
+    assert len(db_lookups) == 3
+
+
+def test_invalidate_single_key_forces_reload(db_lookups):
+    _lookup_scope_by_api_key("good-key")
+    invalidate_scope_cache(_sha256_hex("good-key"))
+    _lookup_scope_by_api_key("good-key")
+
+    assert len(db_lookups) == 2
+
+
+def test_cache_is_bounded_lru(db_lookups, monkeypatch):
+    monkeypatch.setattr(auth, "_SCOPE_CACHE_MAX", 2)
+
+    _lookup_scope_by_api_key("k1")
+    _lookup_scope_by_api_key("k2")
+    _lookup_scope_by_api_key("k1")  # k1 becomes most recent
+    _lookup_scope_by_api_key("k3")  # evicts k2
+
+    stats = scope_cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+
+    _lookup_scope_by_api_key("k1")
+    assert db_lookups.count(_sha256_hex("k1")) == 1
+    _lookup_scope_by_api_key("k2")
+    assert db_lookups.count(_sha256_hex("k2")) == 2
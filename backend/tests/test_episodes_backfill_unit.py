@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+import episodes_backfill as bf
+import episodes_build as eb
+
+DAY = date(2026, 1, 2)
+DAY_START = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def _ev(i: int, ts: datetime, category: str, state: str = "on", room: str = "hall"):
+    return eb.RawEvent(
+        id=i, ts=ts, category=category, payload={"room": room, "state": state}
+    )
+
+
+def test_plan_shards_covers_scope_x_day_without_duplicates():
+    scopes = [("o", "h", "s1"), ("o", "h", "s2"), ("o", "h", "s1")]
+    shards = bf.plan_shards(scopes, date(2026, 1, 1), date(2026, 1, 4))
+
+    assert len(shards) == 6
+    assert [s.day for s in shards[:2]] == [date(2026, 1, 1)] * 2
+    assert shards[0].day_end - shards[0].day_start == timedelta(days=1)
+    assert shards[0].day_start.tzinfo is timezone.utc
+
+
+def test_shards_from_reset_points_reproduce_contiguous_run_across_midnight():
+    # Presence episode spans midnight; a quiet gap >= PRESENCE_HOLD_S precedes and
+    # follows the shard day (the reset points read_bounds looks for).
+    hold = timedelta(seconds=eb.PRESENCE_HOLD_S)
+    t = DAY_START - timedelta(hours=2)
+    events = [
+        _ev(1, t - hold - timedelta(hours=1), "motion"),  # prior day, before reset
+        _ev(2, t, "presence", "on"),  # reset point (gap >= hold), starts prev-day episode
+        _ev(3, DAY_START + timedelta(minutes=30), "motion"),  # carried over midnight
+        _ev(4, DAY_START + timedelta(hours=1), "presence", "off"),
+        _ev(5, DAY_START + timedelta(hours=3), "motion", room="kitchen"),
+        _ev(6, DAY_START + timedelta(hours=23, minutes=59), "presence", "on"),
+        _ev(7, DAY_START + timedelta(days=1, hours=2), "presence", "off"),  # next day
+        _ev(8, DAY_START + timedelta(days=1, hours=8), "motion"),  # reset after
+    ]
+    full = list(eb.build_episodes(iter(events)))
+    day_end = DAY_START + timedelta(days=1)
+    expected = [e for e in full if DAY_START <= e.start_ts < day_end]
+
+    shard_events = [e for e in events if e.ts >= events[1].ts and e.ts <= events[7].ts]
+    got = list(
+        bf.owned_episodes(eb.build_episodes(iter(shard_events)), DAY_START, day_end)
+    )
+
+    def key(e):
+        return (e.room, e.start_ts, e.end_ts, e.total, e.close_reason)
+
+    assert [key(e) for e in got] == [key(e) for e in expected]
+    # The episode open at midnight belongs to the previous day, not this shard.
+    assert all(e.start_ts >= DAY_START for e in got)
+    assert [e.room for e in got] == ["hall", "kitchen"]
+    assert got[0].end_ts == events[6].ts
+
+
+def test_run_shard_marks_failed_and_rolls_back(monkeypatch):
+    calls = []
+
+    class _Cur:
+        def execute(self, sql, params=None):
+            calls.append(sql.split()[0])
+            if "episode_backfill_shards" not in sql:
+                raise RuntimeError("boom")
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *a):
+            return False
+
+    class _Conn:
+        def cursor(self, **kw):
+            return _Cur()
+
+        def rollback(self):
+            calls.append("ROLLBACK")
+
+        def commit(self):
+            calls.append("COMMIT")
+
+        def close(self):
+            calls.append("CLOSE")
+
+    monkeypatch.setattr(bf.psycopg2, "connect", lambda dsn: _Conn())
+    shard = bf.Shard("o", "h", "s", DAY)
+    out = bf.run_shard(
+        "dsn",
+        "rk",
+        shard,
+        {
+            "stream_id": "prod",
+            "max_carry_s": 86400,
+            "insert_mode": "bulk",
+            "page_size": 10,
+            "itersize": 10,
+        },
+    )
+
+    assert out["status"] == "failed"
+    assert "boom" in out["error"]
+    assert calls[-4:] == ["ROLLBACK", "INSERT", "COMMIT", "CLOSE"]
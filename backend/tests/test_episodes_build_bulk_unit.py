@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+
+import episodes_build as eb
+
+T0 = datetime(2026, 1, 1, 22, 0, tzinfo=timezone.utc)
+
+
+def _ep(i: int) -> eb.EpisodeDraft:
+    start = T0 + timedelta(minutes=10 * i)
+    return eb.EpisodeDraft(
+        room=f"room{i % 2}",
+        primary_sensor="binary_sensor.m",
+        sensor_set=["binary_sensor.m"],
+        start_ts=start,
+        last_activity_ts=start + timedelta(seconds=30),
+        end_ts=start + timedelta(seconds=120),
+        total=3,
+        motion=3,
+        close_reason="timeout",
+        quality="low",
+        quality_flags=["missing_off"],
+    )
+
+
+class _FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params):
+        self.log.append(("execute", sql, params))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+
+class _FakeConn:
+    def __init__(self):
+        self.log = []
+        self.commits = 0
+
+    def cursor(self):
+        return _FakeCursor(self.log)
+
+    def commit(self):
+        self.commits += 1
+
+
+def _adapted(params):
+    return [p.adapted if isinstance(p, psycopg2.extras.Json) else p for p in params]
+
+
+def test_bulk_writes_same_rows_as_row_mode_in_pages(monkeypatch):
+    pages = []
+
+    def fake_execute_values(cur, sql, rows, template=None, page_size=100):
+        assert "VALUES %s" in sql
+        assert template == eb._EPISODE_INSERT_TEMPLATE
+        pages.append(list(rows))
+
+    monkeypatch.setattr(psycopg2.extras, "execute_values", fake_execute_values)
+
+    eps = [_ep(i) for i in range(5)]
+
+    row_conn = _FakeConn()
+    n_row = eb.insert_episodes(
+        row_conn, eps, dry_run=False, org_id="o", home_id="h", subject_id="s", mode="row"
+    )
+    bulk_conn = _FakeConn()
+    n_bulk = eb.insert_episodes(
+        bulk_conn,
+        eps,
+        dry_run=False,
+        org_id="o",
+        home_id="h",
+        subject_id="s",
+        mode="bulk",
+        page_size=2,
+    )
+
+    assert n_row == n_bulk == 5
+    assert len(row_conn.log) == 5
+    assert [len(p) for p in pages] == [2, 2, 1]
+    assert row_conn.commits == bulk_conn.commits == 1
+
+    row_params = [_adapted(params) for _, _, params in row_conn.log]
+    bulk_params = [_adapted(r) for page in pages for r in page]
+    assert bulk_params == row_params
+    assert bulk_params[0][-3:] == ["o", "h", "s"]
+
+
+def test_dry_run_writes_nothing():
+    conn = _FakeConn()
+    assert eb.insert_episodes(conn, [_ep(0)], dry_run=True) == 0
+    assert conn.log == [] and conn.commits == 0
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import episodes_build as eb
+
+T0 = datetime(2026, 1, 1, 22, 0, tzinfo=timezone.utc)
+
+
+def _ev(i: int, sec: int, category: str, state: str = "on", room: str = "hall"):
+    return eb.RawEvent(
+        id=i,
+        ts=T0 + timedelta(seconds=sec),
+        category=category,
+        payload={"room": room, "state": state, "entity_id": f"sensor.{category}"},
+    )
+
+
+def test_build_episodes_is_lazy_and_holds_episode_for_door_after_window():
+    consumed = []
+    events = [
+        _ev(1, 0, "door"),
+        _ev(2, 10, "presence", "on"),
+        _ev(3, 100, "presence", "off"),
+        _ev(4, 130, "door"),
+        _ev(5, 500, "motion", room="kitchen"),
+        _ev(6, 5000, "motion", room="kitchen"),
+    ]
+
+    def stream():
+        for ev in events:
+            consumed.append(ev.id)
+            yield ev
+
+    gen = eb.build_episodes(stream())
+    first = next(gen)
+
+    # hall closes at t=100 but is only released once the stream is past t=160
+    assert consumed == [1, 2, 3, 4, 5]
+    assert first.room == "hall"
+    assert first.close_reason == "off_event"
+    assert first.door_before_s == 10
+    assert first.door_after_s == 30
+
+    rest = list(gen)
+    assert [ep.room for ep in rest] == ["kitchen", "kitchen"]
+
+
+def test_door_at_same_timestamp_after_start_counts_as_door_before():
+    events = [
+        _ev(1, 0, "motion"),
+        _ev(2, 0, "door"),
+        _ev(3, 5, "motion"),
+    ]
+    (ep,) = list(eb.build_episodes(iter(events)))
+    assert ep.door_before_s == 0
+    assert ep.door_during is True
+
+
+def test_empty_stream_yields_nothing():
+    assert list(eb.build_episodes(iter([]))) == []
+
+
+class _NamedCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+        self.executed = None
+
+    def execute(self, sql, params):
+        self.executed = (sql, params)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+
+class _Conn:
+    def __init__(self, rows):
+        self.cur = _NamedCursor(rows)
+        self.kwargs = None
+
+    def cursor(self, **kwargs):
+        self.kwargs = kwargs
+        return self.cur
+
+
+def test_fetch_events_uses_named_cursor_with_itersize():
+    rows = [
+        {"id": 1, "ts": T0, "category": "motion", "payload": {"room": "hall"}},
+        {"id": 2, "ts": T0, "category": "door", "payload": {"room": "hall"}},
+    ]
+    conn = _Conn(rows)
+
+    it = eb.fetch_events(conn, T0, T0 + timedelta(days=1), "o", "h", "s", itersize=250)
+    assert conn.kwargs is None  # nothing runs until the stream is consumed
+
+    out = list(it)
+    assert conn.kwargs["name"]
+    assert conn.cur.itersize == 250
+    assert [e.id for e in out] == [1, 2]
+    assert out[1].category == "door"
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services import episodes_svc_builder as b
+
+T0 = datetime(2026, 1, 1, 22, 0, tzinfo=timezone.utc)
+
+
+def _ev(i: int, room: str, state: str):
+    return {
+        "id": i,
+        "event_id": f"e{i}",
+        "ts": T0 + timedelta(seconds=i),
+        "payload": {"room": room, "state": state, "entity_id": f"binary_sensor.{room}"},
+    }
+
+
+class _FakeConn:
+    def __init__(self, log):
+        self.log = log
+        self.autocommit = True
+
+    def cursor(self, **kw):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def commit(self):
+        self.log.append(("commit",))
+
+    def rollback(self):
+        self.log.append(("rollback",))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = {
+        "wm": (None, None),
+        "events": [],
+        "log": [],
+        "rows": [],
+        "moved_by": None,
+        "episodes": {},
+    }
+
+    def read_wm(cur, *, lock=True, **scope):
+        db["log"].append(("lock" if lock else "read",))
+        if lock and db["moved_by"] is not None:
+            db["wm"] = db["moved_by"]
+        return db["wm"]
+
+    def fetch(cur, *, wm_ts, wm_id, since, until, batch, after_ts=None, after_id=None, **kw):
+        k_ts, k_id = (wm_ts, wm_id) if since is None and until is None else (after_ts, after_id)
+        out = [
+            e
+            for e in db["events"]
+            if k_ts is None or (e["ts"], e["id"]) > (k_ts, k_id or 0)
+        ]
+        db["log"].append(("fetch",))
+        return out[:batch]
+
+    def upsert(cur, *, rows, **kw):
+        db["log"].append(("upsert", len(rows)))
+        db["rows"].append(rows)
+        for r in rows:
+            ep = db["episodes"].setdefault((r["room_id"], r["start_ts"]), dict(r))
+            ep.update(
+                {k: r[k] for k in ("end_ts", "end_row_id", "is_open")},
+                event_n=max(ep["event_n"], r["event_n"]),
+            )
+        return len(rows)
+
+    def load_open(cur, **scope):
+        return {
+            room: {
+                "start_ts": ep["start_ts"],
+                "start_row_id": ep["start_row_id"],
+                "start_event_id": ep["start_event_id"],
+                "event_n": ep["event_n"],
+            }
+            for (room, _), ep in sorted(db["episodes"].items(), key=lambda kv: kv[0][1])
+            if ep["is_open"]
+        }
+
+    def update_state(cur, *, last_ts, last_id, **kw):
+        db["wm"] = (last_ts, last_id)
+
+    monkeypatch.setattr(b.psycopg2, "connect", lambda dsn: _FakeConn(db["log"]))
+    monkeypatch.setattr(b, "ensure_state_row", lambda cur, **kw: None)
+    monkeypatch.setattr(b, "read_watermark_for_update", read_wm)
+    monkeypatch.setattr(b, "fetch_events", fetch)
+    monkeypatch.setattr(b, "upsert_episodes", upsert)
+    monkeypatch.setattr(b, "load_open_episodes", load_open)
+    monkeypatch.setattr(b, "update_builder_state", update_state)
+    return db
+
+
+def _build(**kw):
+    return b.build_presence_room_v1(db_dsn="x", org_id="o", home_id="h", subject_id="s", **kw)
+
+
+def test_loop_commits_and_advances_watermark_per_batch(fake_db):
+    fake_db["events"] = [
+        _ev(1, "hall", "on"),
+        _ev(2, "hall", "on"),
+        _ev(3, "kitchen", "on"),
+        _ev(4, "hall", "off"),
+        _ev(5, "kitchen", "off"),
+    ]
+    res = _build(loop=True, batch=2)
+
+    assert res.batches == 3
+    assert res.events_read == 5
+    assert res.stopped_reason is None
+    assert (res.watermark_after_id, fake_db["wm"][1]) == (5, 5)
+    # one logical upsert per on/off, collapsed to one row per episode per batch
+    assert res.episodes_upserted == 5
+    assert [len(r) for r in fake_db["rows"]] == [1, 2, 1]
+
+    # the lock is only taken after the batch has been fetched, and released by the commit
+    log = [x[0] for x in fake_db["log"]]
+    assert log[:3] == ["commit", "read", "commit"]
+    for i, op in enumerate(log):
+        if op == "lock":
+            assert log[i - 2 : i] == ["fetch", "commit"]
+            assert log[i + 1 : i + 3] == ["upsert", "commit"]
+
+    # open episode from batch 1 is closed in batch 2 (state carried across batches)
+    (hall,) = [r for r in fake_db["rows"][1] if r["room_id"] == "hall"]
+    assert hall["start_row_id"] == 1
+    assert hall["is_open"] is False
+    assert hall["event_n"] == 3
+    assert hall["meta"]["close_reason"] == "off_event"
+
+
+def test_loop_collapse_matches_single_batch(fake_db):
+    fake_db["events"] = [_ev(1, "hall", "on"), _ev(2, "hall", "on"), _ev(3, "hall", "off")]
+    _build(batch=10)
+    (row,) = fake_db["rows"][0]
+    assert (row["start_ts"], row["end_row_id"], row["event_n"]) == (T0 + timedelta(seconds=1), 3, 3)
+    assert row["meta"] == {"entity_id": "binary_sensor.hall", "close_reason": "off_event"}
+
+
+def test_loop_stops_when_watermark_moved_concurrently(fake_db):
+    fake_db["events"] = [_ev(i, "hall", "on") for i in range(1, 5)]
+    fake_db["moved_by"] = (T0, 99)
+
+    res = _build(loop=True, batch=2)
+
+    assert res.stopped_reason == "watermark_moved"
+    assert res.batches == 0
+    assert fake_db["rows"] == []
+    assert ("rollback",) in fake_db["log"]
+
+
+def test_loop_max_batches_and_window_does_not_advance(fake_db):
+    fake_db["events"] = [_ev(i, "hall", "on") for i in range(1, 7)]
+    res = _build(
+        loop=True,
+        batch=2,
+        max_batches=2,
+        since=T0,
+        until=T0 + timedelta(hours=1),
+    )
+    assert res.batches == 2
+    assert res.events_read == 4
+    assert res.stopped_reason == "max_batches"
+    assert fake_db["wm"] == (None, None)
+
+
+@pytest.mark.parametrize("loop", [True, False])
+def test_episode_opened_in_one_run_closes_in_the_next(fake_db, loop):
+    fake_db["events"] = [_ev(1, "hall", "on"), _ev(2, "hall", "on")]
+    _build(loop=loop)
+    fake_db["events"] += [_ev(3, "hall", "off"), _ev(4, "hall", "on")]
+    _build(loop=loop)
+
+    eps = fake_db["episodes"]
+    assert len(eps) == 2
+    first = eps[("hall", T0 + timedelta(seconds=1))]
+    assert (first["is_open"], first["end_row_id"], first["event_n"]) == (False, 3, 3)
+    assert eps[("hall", T0 + timedelta(seconds=4))]["is_open"] is True
+
+
+def test_window_replay_does_not_resume_open_episodes(fake_db):
+    fake_db["episodes"][("hall", T0)] = {
+        "room_id": "hall",
+        "start_ts": T0,
+        "start_row_id": 0,
+        "start_event_id": "e0",
+        "event_n": 1,
+        "is_open": True,
+    }
+    fake_db["events"] = [_ev(1, "hall", "off")]
+
+    res = _build(loop=True, since=T0, until=T0 + timedelta(hours=1))
+
+    assert res.episodes_upserted == 0
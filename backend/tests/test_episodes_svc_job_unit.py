@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pytest
+
+from services import episodes_svc_job as job
+from services.episodes_svc_builder import BuildResult
+
+
+@pytest.fixture(autouse=True)
+def _clear_dirty():
+    job._DIRTY.clear()
+    yield
+    job._DIRTY.clear()
+
+
+def _res(n: int) -> BuildResult:
+    return BuildResult(n, n, 0, 0, 0, None, None, None, None)
+
+
+def test_debounce_waits_for_quiet_but_caps_delay(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(job.time, "monotonic", lambda: clock[0])
+
+    job.mark_scope_dirty("o", "h", "s1")
+    clock[0] = 101.0
+    job.mark_scope_dirty("o", "h", "s1")  # still busy
+    assert job.take_ready_scopes(debounce_s=2, max_delay_s=30) == []
+
+    clock[0] = 103.0
+    assert job.take_ready_scopes(debounce_s=2, max_delay_s=30) == [("o", "h", "s1")]
+    assert job._DIRTY == {}
+
+    # continuous stream: never quiet, released after max_delay_s
+    for t in range(200, 231):
+        clock[0] = float(t)
+        job.mark_scope_dirty("o", "h", "s2")
+        ready = job.take_ready_scopes(debounce_s=2, max_delay_s=30)
+        assert ready == ([("o", "h", "s2")] if t == 230 else [])
+
+
+def test_job_builds_ready_scopes_in_loop_mode_and_retries_failures(monkeypatch):
+    monkeypatch.setattr(job.time, "monotonic", lambda: 1000.0)
+    job._DIRTY[("o", "h", "ok")] = [0.0, 0.0]
+    job._DIRTY[("o", "h", "bad")] = [0.0, 0.0]
+    calls = []
+
+    def fake_build(**kw):
+        calls.append(kw)
+        if kw["subject_id"] == "bad":
+            raise RuntimeError("db down")
+        return _res(7)
+
+    out = job.run_episodes_svc_job(build=fake_build, sweep=False)
+
+    assert out["scopes"] == 2
+    assert out["events_read"] == 7
+    assert all(c["loop"] is True and c["builder_name"] == job.BUILDER_NAME for c in calls)
+    assert [e["scope"] for e in out["errors"]] == [["o", "h", "bad"]]
+    assert list(job._DIRTY) == [("o", "h", "bad")]
+
+
+def test_job_without_dirty_scopes_does_nothing():
+    out = job.run_episodes_svc_job(build=lambda **kw: pytest.fail("no build"), sweep=False)
+    assert out["scopes"] == 0 and out["errors"] == []
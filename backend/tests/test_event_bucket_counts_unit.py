@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+from services.event_bucket_counts import (
+    ALL_ROOMS,
+    bucket_floor,
+    is_bucket_aligned,
+    room_counts,
+    window_totals,
+)
+
+T0 = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+SCOPE = {"org_id": "o", "home_id": "h", "subject_id": "s"}
+
+
+class _Res:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def one(self):
+        return self._rows[0]
+
+    def all(self):
+        return list(self._rows)
+
+
+class _FakeDB:
+    def __init__(self, rows=None, fail=False):
+        self.rows = rows or []
+        self.fail = fail
+        self.calls = []
+        self.rolled_back = 0
+
+    def execute(self, stmt, params):
+        self.calls.append((str(stmt), params))
+        if self.fail:
+            raise RuntimeError('relation "event_bucket_counts" does not exist')
+        return _Res(self.rows)
+
+    def rollback(self):
+        self.rolled_back += 1
+
+
+def test_bucket_floor_matches_15_minute_utc_grid():
+    assert bucket_floor(T0 + timedelta(minutes=14, seconds=59)) == T0
+    assert bucket_floor(T0 + timedelta(minutes=15)) == T0 + timedelta(minutes=15)
+    assert is_bucket_aligned(T0)
+    assert not is_bucket_aligned(T0 + timedelta(minutes=1))
+    assert not is_bucket_aligned(T0.replace(tzinfo=None))
+
+
+def test_room_counts_unaligned_window_does_not_query():
+    db = _FakeDB()
+    out = room_counts(
+        db, **SCOPE, rooms=["kitchen"], start=T0 + timedelta(minutes=5),
+        end=T0 + timedelta(minutes=20),
+    )
+    assert out is None
+    assert db.calls == []
+
+
+def test_room_counts_reads_rollup_by_bucket_range():
+    db = _FakeDB(rows=[{"room": "kitchen", "door_n": 2, "activity_n": 5}])
+    out = room_counts(
+        db, **SCOPE, rooms=["kitchen", "gang"], start=T0, end=T0 + timedelta(minutes=15)
+    )
+
+    assert out == {"kitchen": {"door_n": 2, "activity_n": 5.0}}
+    sql, params = db.calls[0]
+    assert "FROM event_bucket_counts" in sql and "FROM events" not in sql
+    assert params["rooms"] == ["kitchen", "gang"]
+
+
+def test_room_counts_missing_table_returns_none():
+    db = _FakeDB(fail=True)
+    assert room_counts(db, **SCOPE, rooms=["k"], start=T0, end=T0 + timedelta(minutes=15)) is None
+    assert db.rolled_back == 1
+
+
+def test_window_totals_counts_only_partial_head_bucket_from_events():
+    db = _FakeDB(rows=[{"events": 42, "days_with_data": 3}])
+    since = T0 + timedelta(minutes=3, seconds=20)
+    out = window_totals(db, **SCOPE, stream_id="prod", since=since)
+
+    assert out == {"events": 42, "days_with_data": 3}
+    _, params = db.calls[0]
+    assert params["since"] == since
+    assert params["head_end"] == T0 + timedelta(minutes=15)
+    assert params["all_rooms"] == ALL_ROOMS
+
+
+def test_window_totals_aligned_since_has_empty_head():
+    db = _FakeDB(rows=[{"events": 0, "days_with_data": 0}])
+    window_totals(db, **SCOPE, stream_id="prod", since=T0)
+    assert db.calls[0][1]["head_end"] == T0
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from main import _batch_dedup_results
+
+
+def test_batch_results_mark_existing_rows_as_deduped():
+    out = _batch_dedup_results(["a", "b", "c"], inserted_ids={"a", "c"})
+
+    assert [r["id"] for r in out] == ["a", "b", "c"]
+    assert all(r["received"] for r in out)
+    assert [r["deduped"] for r in out] == [False, True, False]
+
+
+def test_batch_results_mark_repeat_within_batch_as_deduped():
+    out = _batch_dedup_results(["a", "a", "b"], inserted_ids={"a", "b"})
+
+    assert [r["deduped"] for r in out] == [False, True, False]
+
+
+def test_batch_results_empty():
+    assert _batch_dedup_results([], inserted_ids=set()) == []
+
+
+def test_batch_results_restamped_resend_is_deduped():
+    # same event_id, different timestamp: events_dedup keeps only the first row
+    out = _batch_dedup_results(["a", "a", "b"], inserted_ids={"a", "b"})
+    assert [r["deduped"] for r in out] == [False, True, False]
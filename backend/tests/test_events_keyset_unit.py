@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from starlette.responses import Response
+
+import main
+from services.auth import AuthScope
+
+T0 = datetime(2026, 1, 1, 0, 0, tzinfo=timezone.utc)
+
+SCOPE = AuthScope(
+    org_id="o", home_id="h", subject_id="s", role="user", api_key_hash="x", user_id=None
+)
+
+
+def _row(i: int, ts: datetime):
+    return SimpleNamespace(
+        id=i, event_id=f"e{i}", timestamp=ts, category="motion", payload={"room": "k"}
+    )
+
+
+class _FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.limit_n = None
+
+    def filter(self, *a):
+        self.filters.extend(a)
+        return self
+
+    def order_by(self, *a):
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def all(self):
+        return self.rows[: self.limit_n]
+
+    def yield_per(self, n):
+        return iter(self.rows[: self.limit_n])
+
+
+class _FakeDB:
+    def __init__(self, rows):
+        self.q = _FakeQuery(rows)
+        self.closed = False
+
+    def query(self, *a):
+        return self.q
+
+    def close(self):
+        self.closed = True
+
+
+def test_cursor_roundtrip():
+    c = main._encode_events_cursor(T0, 42, "asc")
+    assert "=" not in c
+    assert main._decode_events_cursor(c) == (T0, 42, "asc")
+
+
+@pytest.mark.parametrize("bad", ["", "not-base64!", "eyJ0cyI6MX0"])
+def test_invalid_cursor_is_400(bad):
+    with pytest.raises(HTTPException) as ei:
+        main._decode_events_cursor(bad)
+    assert ei.value.status_code == 400
+
+
+def test_cursor_order_mismatch_is_400():
+    c = main._encode_events_cursor(T0, 1, "asc")
+    with pytest.raises(HTTPException) as ei:
+        main._events_filters(
+            scope=SCOPE,
+            stream_id="prod",
+            category=None,
+            since=None,
+            until=None,
+            before=None,
+            cursor=c,
+            order="desc",
+        )
+    assert ei.value.status_code == 400
+
+
+def test_list_events_sets_next_cursor_only_when_more_rows(monkeypatch):
+    # Three rows share a timestamp: the cursor must carry the id to split them.
+    rows = [_row(1, T0), _row(2, T0), _row(3, T0), _row(4, T0 + timedelta(seconds=1))]
+    db = _FakeDB(rows)
+    monkeypatch.setattr(main, "SessionLocal", lambda: db)
+
+    resp = Response()
+    out = main.list_events(
+        response=resp,
+        category=None,
+        since=None,
+        until=None,
+        before=None,
+        limit=2,
+        cursor=None,
+        order="asc",
+        stream_id="prod",
+        scope=SCOPE,
+    )
+    assert [e.id for e in out] == ["e1", "e2"]
+    assert db.q.limit_n == 3
+    assert main._decode_events_cursor(resp.headers["X-Next-Cursor"]) == (T0, 2, "asc")
+    assert db.closed
+
+    db = _FakeDB(rows[:2])
+    monkeypatch.setattr(main, "SessionLocal", lambda: db)
+    resp = Response()
+    main.list_events(
+        response=resp,
+        category=None,
+        since=None,
+        until=None,
+        before=None,
+        limit=2,
+        cursor=None,
+        order="asc",
+        stream_id="prod",
+        scope=SCOPE,
+    )
+    assert "X-Next-Cursor" not in resp.headers
+
+
+def test_stream_events_writes_ndjson_with_per_line_cursor(monkeypatch):
+    rows = [_row(1, T0), _row(2, T0 + timedelta(seconds=1))]
+    db = _FakeDB(rows)
+    monkeypatch.setattr(main, "SessionLocal", lambda: db)
+
+    resp = main.stream_events_v1(
+        category=None,
+        since=None,
+        until=None,
+        cursor=None,
+        order="asc",
+        limit=None,
+        stream_id="prod",
+        scope=SCOPE,
+    )
+    assert resp.media_type == "application/x-ndjson"
+
+    async def _collect():
+        return [json.loads(chunk) async for chunk in resp.body_iterator]
+
+    lines = asyncio.run(_collect())
+    assert [x["id"] for x in lines] == ["e1", "e2"]
+    assert lines[0]["timestamp"] == "2026-01-01T00:00:00Z"
+    assert main._decode_events_cursor(lines[-1]["cursor"])[1] == 2
+    assert db.closed
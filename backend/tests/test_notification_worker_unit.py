@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import copy
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tools"))
+
+import notification_worker as nw  # noqa: E402
+from notification_delivery import (  # noqa: E402
+    DeliveryExecutor,
+    DeliveryResult,
+    StubRoute,
+    deliver_webhook,
+)
+
+WORKER = "w1"
+
+
+class NotNullViolation(Exception):
+    pass
+
+
+class _FakeCursor:
+    """
+    notification_outbox/notification_deliveries in memory, with savepoints.
+
+    Only the statements write_delivery_results issues are understood; the receipt
+    insert enforces NOT NULL on route_key/idempotency_key like the table does.
+    """
+
+    def __init__(self, outbox):
+        self.outbox = {r["id"]: dict(r) for r in outbox}
+        self.deliveries = {}
+        self._savepoints = []
+        self.fail_ids = set()
+
+    def _state(self):
+        return copy.deepcopy((self.outbox, self.deliveries))
+
+    def execute(self, sql, params=None):
+        op, _, name = sql.strip().rstrip(";").partition(" SAVEPOINT ")
+        if sql.startswith("SAVEPOINT"):
+            self._savepoints.append((sql.split()[1].rstrip(";"), self._state()))
+        elif op == "ROLLBACK TO":
+            state = next(st for n, st in reversed(self._savepoints) if n == name)
+            self.outbox, self.deliveries = copy.deepcopy(state)
+        elif op == "RELEASE":
+            while self._savepoints.pop()[0] != name:
+                pass
+        else:
+            raise AssertionError(sql)
+
+    def execute_values(self, sql, argslist):
+        rows = list(argslist)
+        if "INSERT INTO notification_deliveries" in sql:
+            for v in rows:
+                if v[0] in self.fail_ids:
+                    raise RuntimeError(f"boom {v[0]}")
+                if v[5] is None or v[6] is None:
+                    raise NotNullViolation("null value in column violates not-null")
+                self.deliveries.setdefault(tuple(v[1:7]), v[0])
+        elif "SET status='DELIVERED'" in sql:
+            for oid, locked_by in rows:
+                o = self.outbox[oid]
+                if o["status"] == "IN_FLIGHT" and o["locked_by"] == locked_by:
+                    o.update(status="DELIVERED", locked_by=None)
+        else:
+            for oid, locked_by, dead, attempt_n, _delay, err in rows:
+                o = self.outbox[oid]
+                if o["status"] == "IN_FLIGHT" and o["locked_by"] == locked_by:
+                    o.update(
+                        status="DEAD" if dead else "RETRY",
+                        attempt_n=o["attempt_n"] if dead else attempt_n,
+                        last_error=err,
+                        locked_by=None,
+                    )
+
+
+@pytest.fixture(autouse=True)
+def _execute_values(monkeypatch):
+    def fake(cur, sql, argslist, template=None):
+        cur.execute_values(sql, argslist)
+
+    monkeypatch.setattr(nw.psycopg2.extras, "execute_values", fake)
+
+
+def _row(i, **kw):
+    row = {
+        "id": i,
+        "org_id": "o",
+        "home_id": "h",
+        "subject_id": "s",
+        "route_type": "webhook",
+        "route_key": f"rk{i}",
+        "idempotency_key": f"ik{i}",
+        "attempt_n": 0,
+        "max_attempts": 3,
+        "status": "IN_FLIGHT",
+        "locked_by": WORKER,
+    }
+    row.update(kw)
+    return row
+
+
+def _ok(row):
+    return DeliveryResult(row=row, ok=True, response={"status_code": 200})
+
+
+def test_receipt_keys_fall_back_like_the_delivery_handler():
+    assert nw.receipt_keys(_row(7, route_key=None, idempotency_key=None)) == (
+        "",
+        "outbox-7",
+    )
+    assert nw.receipt_keys(_row(7, idempotency_key="")) == ("rk7", "outbox-7")
+    assert nw.receipt_keys(_row(7)) == ("rk7", "ik7")
+
+
+def test_null_keys_are_coalesced_in_bulk_receipt_insert():
+    rows = [_row(1), _row(2, route_key=None, idempotency_key=None)]
+    cur = _FakeCursor(rows)
+
+    nw.write_delivery_results(cur, WORKER, [_ok(r) for r in rows])
+
+    assert {o["status"] for o in cur.outbox.values()} == {"DELIVERED"}
+    assert ("o", "h", "s", "webhook", "", "outbox-2") in cur.deliveries
+    assert cur._savepoints == []
+
+
+def test_failing_row_does_not_hold_back_the_batch():
+    rows = [_row(1), _row(2), _row(3, attempt_n=2)]
+    cur = _FakeCursor(rows)
+    cur.fail_ids = {2}
+    results = [
+        _ok(rows[0]),
+        _ok(rows[1]),
+        DeliveryResult(row=rows[2], ok=False, error="HTTPStatusError: 503"),
+    ]
+
+    nw.write_delivery_results(cur, WORKER, results)
+
+    assert cur.outbox[1]["status"] == "DELIVERED"
+    # delivered but receipt write failed: recorded as a failed attempt, not IN_FLIGHT
+    assert cur.outbox[2]["status"] == "RETRY"
+    assert cur.outbox[2]["attempt_n"] == 1
+    assert cur.outbox[2]["last_error"].startswith("write_back_failed: RuntimeError")
+    assert cur.outbox[3]["status"] == "DEAD"
+    assert [v for v in cur.deliveries.values()] == [1]
+    assert cur._savepoints == []
+
+
+def _executor(limit=2, timeout_s=5.0):
+    """DeliveryExecutor whose webhook handler records how many calls overlap."""
+    state = {"inflight": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def handler(client, row, t):
+        with lock:
+            state["inflight"] += 1
+            state["peak"] = max(state["peak"], state["inflight"])
+        try:
+            return deliver_webhook(client, row, t)
+        finally:
+            with lock:
+                state["inflight"] -= 1
+
+    ex = DeliveryExecutor(
+        limits={"webhook": limit},
+        timeouts={"webhook": timeout_s},
+        handlers={"webhook": handler},
+    )
+    return ex, state
+
+
+def test_executor_delivers_concurrently_up_to_route_limit():
+    ex, state = _executor(limit=2)
+    with StubRoute(delay_s=0.2) as stub:
+        rows = [_row(i, destination=stub.url) for i in range(1, 6)]
+        try:
+            results = ex.run(rows)
+        finally:
+            ex.close()
+
+    assert [r.row["id"] for r in results] == [1, 2, 3, 4, 5]
+    assert all(r.ok for r in results)
+    assert state["peak"] == 2
+    assert sorted(q["idempotency_key"] for q in stub.requests) == [
+        f"ik{i}" for i in range(1, 6)
+    ]
+
+
+def test_5xx_is_retried_then_dead_lettered():
+    ex, _ = _executor()
+    with StubRoute(status=503) as stub:
+        rows = [
+            _row(1, destination=stub.url, idempotency_key=None),
+            _row(2, destination=stub.url, attempt_n=2),
+        ]
+        try:
+            results = ex.run(rows)
+        finally:
+            ex.close()
+
+    assert not any(r.ok for r in results)
+    assert "503" in results[0].error
+    assert sorted(q["idempotency_key"] for q in stub.requests) == ["ik2", "outbox-1"]
+
+    cur = _FakeCursor(rows)
+    nw.write_delivery_results(cur, WORKER, results)
+
+    assert cur.outbox[1]["status"] == "RETRY"
+    assert cur.outbox[1]["attempt_n"] == 1
+    assert cur.outbox[2]["status"] == "DEAD"
+    assert cur.outbox[2]["last_error"].startswith("max_attempts_reached: HTTPStatusError")
+    assert cur.deliveries == {}
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import datetime as dt
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tools"))
+
+import retention_runner as rr  # noqa: E402
+
+SCOPE = ("o", "h", "s")
+BEFORE = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+
+
+class _Cur:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def execute(self, sql, params):
+        self.conn.calls.append((sql, params))
+        self._n = self.conn.answers.pop(0)
+
+    def fetchone(self):
+        return (self._n,)
+
+
+class _Conn:
+    """Answers each retention_prune_* call with the next deleted-row count."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def cursor(self):
+        return _Cur(self)
+
+
+def _clock(monkeypatch, step_s):
+    t = {"now": 0.0}
+
+    def mono():
+        t["now"] += step_s
+        return t["now"]
+
+    monkeypatch.setattr(rr.time, "monotonic", mono)
+
+
+@pytest.mark.parametrize(
+    "limit,elapsed,target,expected",
+    [
+        (1000, 0.5, 1.0, 2000),  # fast batch: grow towards target
+        (1000, 0.1, 1.0, 2000),  # growth capped at 2x per step
+        (1000, 2.0, 1.0, 500),  # slow batch: shrink
+        (1000, 10.0, 1.0, 500),  # shrink capped at 0.5x per step
+        (1000, 0.0, 1.0, 2000),  # no timing: treat as fast
+        (150, 10.0, 1.0, rr.MIN_LIMIT),
+        (40000, 0.1, 1.0, rr.MAX_LIMIT),
+    ],
+)
+def test_next_limit_backoff(limit, elapsed, target, expected):
+    assert rr.next_limit(limit, elapsed, target) == expected
+
+
+def test_prune_table_stops_on_short_batch_and_adapts_limit(monkeypatch):
+    _clock(monkeypatch, 0.25)  # every batch "takes" well under target: limit doubles
+    conn = _Conn([100, 200, 50])
+
+    out = rr.prune_table(
+        conn, SCOPE, BEFORE, "retention_prune_events",
+        limit=100, target_s=10.0, max_rounds=10, deadline=None,
+    )
+
+    assert out["deleted"] == 350
+    assert out["batches"] == 3
+    assert out["stopped"] == "done"
+    assert [c[1][-1] for c in conn.calls] == [100, 200, 400]
+    assert all("retention_prune_events" in c[0] for c in conn.calls)
+
+
+def test_prune_table_respects_max_rounds(monkeypatch):
+    _clock(monkeypatch, 0.25)
+    conn = _Conn([100] * 5)
+
+    out = rr.prune_table(
+        conn, SCOPE, BEFORE, "retention_prune_events",
+        limit=100, target_s=0.25, max_rounds=2, deadline=None,
+    )
+
+    assert out["batches"] == 2 and out["deleted"] == 200
+    assert out["stopped"] == "max_rounds"
+
+
+def test_prune_table_respects_deadline(monkeypatch):
+    _clock(monkeypatch, 1.0)
+    conn = _Conn([100] * 5)
+
+    out = rr.prune_table(
+        conn, SCOPE, BEFORE, "retention_prune_events",
+        limit=100, target_s=1.0, max_rounds=10, deadline=3.5,
+    )
+
+    assert out["stopped"] == "deadline"
+    assert 0 < out["batches"] < 5
+
+
+def test_db_dsn_requires_database_url_or_pghost(monkeypatch):
+    for k in ("DATABASE_URL", "PGHOST", "PGPORT", "PGUSER", "PGPASSWORD", "PGDATABASE"):
+        monkeypatch.delenv(k, raising=False)
+    with pytest.raises(SystemExit, match="DATABASE_URL or PGHOST"):
+        rr.db_dsn()
+
+    monkeypatch.setenv("PGHOST", "db")
+    assert rr.db_dsn() == "postgresql://agingos:agingos@db:5432/agingos"
+
+    monkeypatch.setenv("DATABASE_URL", "postgresql://u:p@h:5433/d")
+    assert rr.db_dsn() == "postgresql://u:p@h:5433/d"
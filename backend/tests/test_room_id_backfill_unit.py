@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import room_id_backfill as bf
+from util.room_id import invalidate_room_index
+
+T0 = datetime(2026, 1, 2, tzinfo=timezone.utc)
+SCOPE = bf.Scope("o", "h", "s")
+
+
+class _Res:
+    def __init__(self, rows=None, scalar=None):
+        self._rows = rows or []
+        self._scalar = scalar
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+    def scalar(self):
+        return self._scalar
+
+
+class _FakeDB:
+    """events + rooms tables in memory; answers the backfill's queries."""
+
+    def __init__(self, events, rooms=(), fail_update_after=None):
+        self.events = events
+        self.rooms = [{"room_id": r, "display_name": d} for r, d in rooms]
+        self.progress = {}
+        self.commits = 0
+        self.updates = 0
+        self.fail_update_after = fail_update_after
+        self._pending = None
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        params = params or {}
+        if "FROM public.rooms" in sql:
+            return _Res(self.rooms)
+        if "sensor_room_map" in sql:
+            return _Res([])
+        if "FROM event_bucket_counts" in sql:
+            return _Res(scalar=len(self.events))
+        if sql.lstrip().startswith("SELECT id"):
+            rows = sorted(self.events, key=lambda e: (e["timestamp"], e["id"]))
+            if "after_ts" in params:
+                cur = (params["after_ts"], params["after_id"])
+                rows = [e for e in rows if (e["timestamp"], e["id"]) > cur]
+            if "room_id IS NULL" in sql:
+                rows = [e for e in rows if not e["room_id"]]
+            return _Res([dict(e) for e in rows[: params["limit"]]])
+        if sql.lstrip().startswith("UPDATE events"):
+            if self.fail_update_after is not None and self.updates >= self.fail_update_after:
+                raise RuntimeError("connection lost")
+            self.updates += 1
+            self._pending = list(zip(params["ids"], params["rooms"]))
+            return _Res()
+        if "INSERT INTO room_id_backfill_progress" in sql:
+            self._pending_progress = dict(params)
+            return _Res()
+        raise AssertionError(f"unexpected SQL: {sql}")
+
+    def commit(self):
+        by_id = {e["id"]: e for e in self.events}
+        for i, rid in self._pending or []:
+            by_id[i]["room_id"] = rid
+        self._pending = None
+        p = self._pending_progress
+        self.progress[(p["org_id"], p["home_id"], p["subject_id"])] = bf.Progress(
+            last_ts=p["last_ts"],
+            last_id=p["last_id"],
+            scanned=p["scanned"],
+            updated=p["updated"],
+            done=p["done"],
+        )
+        self.commits += 1
+
+    def rollback(self):
+        self._pending = None
+
+
+def _ev(i, room_id=None, **payload):
+    return {"id": i, "timestamp": T0 + timedelta(minutes=i), "room_id": room_id, "payload": payload}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_room_index():
+    invalidate_room_index()
+    yield
+    invalidate_room_index()
+
+
+def _events():
+    return [
+        _ev(1, room="Kjøkken"),  # display name -> room_id
+        _ev(2, area="gang"),  # unknown name -> payload fallback
+        _ev(3, room_id="kjokken", room="Kjøkken"),  # already right
+        _ev(4),  # nothing to derive: stays NULL
+        _ev(5, room_id="Kjøkken", room="Kjøkken"),  # older payload-only value
+    ]
+
+
+def test_backfill_resolves_room_id_with_ingest_derivation():
+    db = _FakeDB(_events(), rooms=[("kjokken", "Kjøkken")])
+    out = bf.backfill_scope(db, "r1", SCOPE, bf.Progress(), batch=2, report=lambda _: None)
+
+    assert [e["room_id"] for e in db.events] == ["kjokken", "gang", "kjokken", None, "kjokken"]
+    assert out["done"] and out["scanned"] == 5 and out["updated"] == 3
+    assert out["batches"] == 3 and db.commits == 3
+
+
+def test_backfill_resumes_from_saved_cursor():
+    # batch 1 updates, batch 2 has nothing to change, batch 3's UPDATE fails
+    db = _FakeDB(_events(), rooms=[("kjokken", "Kjøkken")], fail_update_after=1)
+    with pytest.raises(RuntimeError):
+        bf.backfill_scope(db, "r1", SCOPE, bf.Progress(), batch=2, report=lambda _: None)
+    saved = db.progress[SCOPE.key]
+    assert saved.scanned == 4 and saved.last_id == 4 and not saved.done
+
+    db.fail_update_after = None
+    lines = []
+    out = bf.backfill_scope(db, "r1", SCOPE, saved, batch=2, report=lines.append)
+
+    assert out["done"] and out["scanned"] == 5 and out["batches"] == 1
+    assert [e["room_id"] for e in db.events] == ["kjokken", "gang", "kjokken", None, "kjokken"]
+    assert lines[-1].startswith("done o/h/s scanned=5/5 (100.0%) updated=3")
+
+
+def test_missing_only_leaves_existing_room_ids():
+    db = _FakeDB(_events(), rooms=[("kjokken", "Kjøkken")])
+    bf.backfill_scope(
+        db, "r1", SCOPE, bf.Progress(), batch=10, missing_only=True, report=lambda _: None
+    )
+    assert db.events[4]["room_id"] == "Kjøkken"
+    assert db.events[0]["room_id"] == "kjokken"
+
+
+def test_max_batches_pauses_without_marking_done():
+    db = _FakeDB(_events())
+    out = bf.backfill_scope(
+        db, "r1", SCOPE, bf.Progress(), batch=2, max_batches=1, report=lambda _: None
+    )
+    assert not out["done"] and db.progress[SCOPE.key].last_id == 2
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import pytest
+
+from util import room_id as room_id_mod
+from util.room_id import derive_room_id_scoped, invalidate_room_index
+
+
+@dataclass(frozen=True)
+class _Scope:
+    org_id: str = "o1"
+    home_id: str = "h1"
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _DB:
+    def __init__(self, rooms, mappings):
+        self.rooms = rooms
+        self.mappings = mappings
+        self.execute_calls = 0
+
+    def execute(self, stmt, _params=None):
+        self.execute_calls += 1
+        if "sensor_room_map" in str(stmt):
+            return _Result(self.mappings)
+        return _Result(self.rooms)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    invalidate_room_index()
+    yield
+    invalidate_room_index()
+
+
+def _db():
+    return _DB(
+        rooms=[
+            {"room_id": "bad", "display_name": "Bad"},
+            {"room_id": "stue", "display_name": "Stue"},
+            {"room_id": "stue2", "display_name": "stue"},
+        ],
+        mappings=[{"entity_id": "binary_sensor.kjokken", "room_id": "stue"}],
+    )
+
+
+def test_scoped_derivation_order_matches_db_semantics():
+    db = _db()
+    scope = _Scope()
+
+    assert derive_room_id_scoped(db, scope, {"room_id": "bad"}) == "bad"
+    # case-insensitive display_name, lowest room_id wins on ties
+    assert derive_room_id_scoped(db, scope, {"room": "STUE"}) == "stue"
+    assert derive_room_id_scoped(db, scope, {"entity_id": "binary_sensor.kjokken"}) == "stue"
+    # unknown room_id falls through to payload-only fallback
+    assert derive_room_id_scoped(db, scope, {"room_id": "ukjent"}) == "ukjent"
+
+
+def test_scoped_derivation_hits_db_once_per_scope():
+    db = _db()
+    scope = _Scope()
+
+    for _ in range(20):
+        derive_room_id_scoped(db, scope, {"room": "Bad"})
+
+    # one rooms query + one sensor_room_map query
+    assert db.execute_calls == 2
+
+    derive_room_id_scoped(db, _Scope(home_id="h2"), {"room": "Bad"})
+    assert db.execute_calls == 4
+
+
+def test_invalidate_forces_reload():
+    db = _db()
+    scope = _Scope()
+
+    assert derive_room_id_scoped(db, scope, {"entity_id": "binary_sensor.ny"}) is None
+
+    db.mappings = [{"entity_id": "binary_sensor.ny", "room_id": "bad"}]
+    assert derive_room_id_scoped(db, scope, {"entity_id": "binary_sensor.ny"}) is None
+
+    invalidate_room_index(scope.org_id, scope.home_id)
+    assert derive_room_id_scoped(db, scope, {"entity_id": "binary_sensor.ny"}) == "bad"
+
+
+def test_ttl_expiry_forces_reload(monkeypatch):
+    db = _db()
+    scope = _Scope()
+
+    derive_room_id_scoped(db, scope, {"room": "Bad"})
+    monkeypatch.setattr(room_id_mod, "_ROOM_INDEX_TTL_S", 0.0)
+    derive_room_id_scoped(db, scope, {"room": "Bad"})
+
+    assert db.execute_calls == 4
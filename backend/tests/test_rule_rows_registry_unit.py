@@ -0,0 +1,92 @@
+import pytest
+
+import services.rule_rows as rule_rows
+from services.rule_rows import invalidate_rule_row_ids, resolve_rule_row_ids
+
+
+class _Query:
+    def __init__(self, db):
+        self.db = db
+
+    def filter(self, *_args):
+        return self
+
+    def order_by(self, *_args):
+        return self
+
+    def all(self):
+        self.db.selects += 1
+        return list(self.db.existing)
+
+
+class _FakeDB:
+    def __init__(self, existing):
+        self.existing = existing
+        self.selects = 0
+        self.added = []
+        self.commits = 0
+        self._next_id = 100
+
+    def query(self, *_args):
+        return _Query(self)
+
+    def add_all(self, rows):
+        self.added.extend(rows)
+
+    def flush(self):
+        for r in self.added:
+            if r.id is None:
+                r.id = self._next_id
+                self._next_id += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture(autouse=True)
+def _clean_registry():
+    invalidate_rule_row_ids()
+    yield
+    invalidate_rule_row_ids()
+
+
+def test_resolves_existing_and_bulk_creates_missing_once():
+    db = _FakeDB(existing=[("R-001", 1), ("R-001", 9), ("R-002", 2)])
+
+    ids = resolve_rule_row_ids(db, ["R-001", "R-002", "R-003", "R-004"])
+
+    assert ids == {"R-001": 1, "R-002": 2, "R-003": 100, "R-004": 101}
+    assert db.selects == 1
+    assert [r.name for r in db.added] == ["R-003", "R-004"]
+    assert db.commits == 1
+
+    # Subsequent ticks: no DB round-trips at all.
+    again = resolve_rule_row_ids(db, ["R-004", "R-001"])
+    assert again == {"R-004": 101, "R-001": 1}
+    assert db.selects == 1
+
+
+def test_invalidate_forces_reload():
+    db = _FakeDB(existing=[("R-001", 1)])
+    resolve_rule_row_ids(db, ["R-001"])
+
+    db.existing = [("R-001", 7)]
+    assert resolve_rule_row_ids(db, ["R-001"]) == {"R-001": 1}
+
+    invalidate_rule_row_ids()
+    assert resolve_rule_row_ids(db, ["R-001"]) == {"R-001": 7}
+    assert db.selects == 2
+    assert rule_rows._RULE_ROW_IDS == {"R-001": 7}
+
+
+def test_new_ids_are_read_before_commit():
+    class _ExpiringDB(_FakeDB):
+        def commit(self):
+            super().commit()
+            # expire_on_commit: a later r.id would need its own SELECT
+            for r in self.added:
+                r.id = None
+
+    db = _ExpiringDB(existing=[])
+
+    assert resolve_rule_row_ids(db, ["R-010", "R-011"]) == {"R-010": 100, "R-011": 101}
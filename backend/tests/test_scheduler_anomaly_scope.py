@@ -69,10 +69,13 @@ def test_run_anomalies_job_rolls_back_and_continues_per_room(monkeypatch):
         lambda _db: type("S", (), {"org_id": "o", "home_id": "h", "subject_id": "s"})(),
     )
     monkeypatch.setattr("services.scheduler._anomaly_list_room_ids", lambda _db, scope: ["r1", "r2"])
+    monkeypatch.setattr(
+        "services.anomaly_scoring.score_buckets_batch", lambda _db, **_kw: {}
+    )
 
     calls = {"n": 0}
 
-    def _run_one(_db, *, scope, room, bucket_start):
+    def _run_one(_db, *, scope, room, bucket_start, scored=None):
         calls["n"] += 1
         if room == "r1":
             raise RuntimeError("boom")
@@ -87,3 +90,38 @@ def test_run_anomalies_job_rolls_back_and_continues_per_room(monkeypatch):
     assert db.commit_calls == 1
     assert out["counts"]["ERROR"] == 1
     assert out["counts"]["OPEN"] == 1
+
+
+def test_run_anomalies_job_logs_batch_failure_and_scores_per_room(monkeypatch):
+    db = _FakeDB()
+    events = []
+
+    monkeypatch.setattr("db.SessionLocal", lambda: db)
+    monkeypatch.setattr(
+        "services.scheduler._anomaly_pick_one_scope",
+        lambda _db: type("S", (), {"org_id": "o", "home_id": "h", "subject_id": "s"})(),
+    )
+    monkeypatch.setattr("services.scheduler._anomaly_list_room_ids", lambda _db, scope: ["r1"])
+
+    def _batch(_db, **_kw):
+        raise RuntimeError("grouped query failed")
+
+    monkeypatch.setattr("services.anomaly_scoring.score_buckets_batch", _batch)
+    monkeypatch.setattr("services.scheduler._log_event", lambda **kw: events.append(kw))
+
+    passed = []
+
+    def _run_one(_db, *, scope, room, bucket_start, scored=None):
+        passed.append(scored)
+        return {"action": "NOOP"}
+
+    monkeypatch.setattr("services.scheduler.run_anomalies_job_one", _run_one)
+
+    out = run_anomalies_job()
+
+    assert passed == [None]  # per-room reference path
+    assert out["counts"]["NOOP"] == 1
+    (ev,) = [e for e in events if e["event"] == "anomalies_batch_score_error"]
+    assert ev["level"] == "WARN"
+    assert ev["error"]["type"] == "RuntimeError"
+    assert ev["scope"] == {"org_id": "o", "home_id": "h", "subject_id": "s"}
@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+import services.scheduler as sched
+from config.rule_config import RuleConfig
+from services.scheduler import (
+    _bulk_upsert_open_deviations,
+    _close_stale_deviations,
+    _deviation_row,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeDB:
+    def __init__(self, rows=None):
+        self.calls = []
+        self.rows = rows or []
+
+    def execute(self, stmt, params=None):
+        self.calls.append((stmt, params))
+        return _Rows(self.rows)
+
+
+def _dev(rule_id="R-001", severity="HIGH", evidence=None):
+    return {
+        "rule_id": rule_id,
+        "title": "t",
+        "explanation": "e",
+        "window": {"since": "a", "until": "b"},
+        "timestamp": NOW.isoformat(),
+        "severity": severity,
+        "evidence": evidence if evidence is not None else {"event_ids": [1], "x": 2},
+    }
+
+
+def test_deviation_row_maps_context_and_evidence():
+    row = _deviation_row(7, "default", NOW, _dev(evidence=[5, 6]), org_id="o")
+
+    assert row["rule_id"] == 7
+    assert row["severity"] == 3
+    assert row["org_id"] == "o" and row["home_id"] == "default"
+    assert row["evidence"] == {"event_ids": [5, 6]}
+    assert row["context"]["rule_key"] == "R-001"
+    assert row["started_at"] == row["last_seen_at"] == NOW
+
+
+def test_bulk_upsert_is_one_statement_with_last_wins_dedup():
+    db = _FakeDB()
+    rows = [
+        _deviation_row(1, "default", NOW, _dev(severity="LOW")),
+        _deviation_row(1, "default", NOW, _dev(severity="HIGH")),
+        _deviation_row(2, "default", NOW, _dev("R-002")),
+        _deviation_row(1, "default", NOW, _dev(), home_id="h2"),
+    ]
+
+    n = _bulk_upsert_open_deviations(db, rows)
+
+    assert n == 3
+    assert len(db.calls) == 1
+    stmt = db.calls[0][0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert (
+        "ON CONFLICT (rule_id, subject_key, org_id, home_id, subject_id) "
+        "WHERE status IN ('OPEN','ACK') DO UPDATE" in sql
+    )
+    assert "started_at" not in sql.split("DO UPDATE")[1]
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert sorted(v for k, v in params.items() if k.startswith("severity")) == [3, 3, 3]
+
+
+def test_bulk_upsert_noop_without_rows():
+    db = _FakeDB()
+    assert _bulk_upsert_open_deviations(db, []) == 0
+    assert db.calls == []
+
+
+def test_close_stale_is_one_update_with_per_rule_expiry(monkeypatch):
+    cfg = RuleConfig(
+        raw={
+            "defaults": {"expire_after_minutes": 60},
+            "rules": {"R-002": {"expire_after_minutes": 720}, "R-X": {}},
+        }
+    )
+    monkeypatch.setattr(sched, "load_rule_config", lambda: cfg)
+    db = _FakeDB(rows=[(1,), (2,)])
+
+    closed = _close_stale_deviations(
+        db, subject_key="default", now=NOW, org_id="o", home_id="h", subject_id="s"
+    )
+
+    assert closed == 2
+    assert len(db.calls) == 1
+    stmt, params = db.calls[0]
+    sql = str(stmt)
+    assert "UPDATE deviations" in sql and "FROM rules" in sql and "VALUES" in sql
+    expiry = {
+        params[k]: params["m" + k[1:]] for k in params if k.startswith("k") and k[1:].isdigit()
+    }
+    assert expiry["R-002"] == 720
+    assert expiry["R-X"] == 60
+    assert expiry["R-001"] == 60
+    assert params["default_expire"] == 60
+    assert (params["org_id"], params["home_id"], params["subject_id"]) == ("o", "h", "s")
@@ -0,0 +1,139 @@
+import threading
+
+from sqlalchemy.exc import ProgrammingError
+
+import services.scheduler as sched
+from services.scheduler import _list_active_scopes, run_rule_engine_job
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+
+class _FakeDB:
+    def __init__(self, rows=None, exc=None):
+        self.rows = rows or []
+        self.exc = exc
+        self.rollback_calls = 0
+        self.commit_calls = 0
+        self.close_calls = 0
+
+    def execute(self, *args, **kwargs):
+        if self.exc:
+            raise self.exc
+        return _FakeResult(self.rows)
+
+    def rollback(self):
+        self.rollback_calls += 1
+
+    def commit(self):
+        self.commit_calls += 1
+
+    def close(self):
+        self.close_calls += 1
+
+
+class _Cfg:
+    def __init__(self, max_parallel):
+        self.max_parallel = max_parallel
+
+    def scheduler_interval_minutes(self):
+        return 5
+
+    def scheduler_max_parallel_scopes(self):
+        return self.max_parallel
+
+    def rule_enabled_in_scheduler(self, rid):
+        return rid == "R-001"
+
+
+def _rows(n):
+    return [{"org_id": "o", "home_id": f"h{i}", "subject_id": "s"} for i in range(n)]
+
+
+def test_list_active_scopes_reads_api_key_scopes():
+    db = _FakeDB(rows=_rows(3))
+
+    scopes = _list_active_scopes(db)
+
+    assert [s.home_id for s in scopes] == ["h0", "h1", "h2"]
+    assert all(s.role == "system" for s in scopes)
+
+
+def test_list_active_scopes_falls_back_to_single_scope(monkeypatch):
+    db = _FakeDB(exc=ProgrammingError("select", {}, Exception("no table")))
+    picked = object()
+    monkeypatch.setattr(sched, "_anomaly_pick_one_scope", lambda _db: picked)
+
+    assert _list_active_scopes(db) == [picked]
+    assert db.rollback_calls == 1
+
+
+def test_run_rule_engine_job_fans_out_bounded_and_isolates_failures(monkeypatch):
+    db = _FakeDB(rows=_rows(6))
+    events = []
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+    barrier = threading.Barrier(2, timeout=5)
+
+    monkeypatch.setattr(sched, "SessionLocal", lambda: db)
+    monkeypatch.setattr(sched, "load_rule_config", lambda: _Cfg(max_parallel=2))
+    monkeypatch.setattr(
+        sched, "resolve_rule_row_ids", lambda _db, keys: {k: 1 for k in keys}
+    )
+    monkeypatch.setattr(sched, "_log_event", lambda **kw: events.append(kw))
+
+    def _run_scope(
+        scope, *, run_id, cfg, now, enabled_rule_ids, rule_row_ids, truth_cache=None
+    ):
+        assert enabled_rule_ids == ["R-001"]
+        assert rule_row_ids == {"R-001": 1}
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        try:
+            if scope.home_id in ("h0", "h1"):
+                # Both workers must be busy at the same time.
+                barrier.wait()
+            if scope.home_id == "h3":
+                raise RuntimeError("boom")
+            return {
+                "rules_ok": 1,
+                "rules_failed": 0,
+                "deviations_upserted": 1,
+                "deviations_closed": 0,
+                "snapshot": {"events": 10, "load_ms": 1},
+            }
+        finally:
+            with lock:
+                active["now"] -= 1
+
+    monkeypatch.setattr(sched, "_run_rules_for_scope", _run_scope)
+
+    run_rule_engine_job()
+
+    assert active["max"] == 2
+
+    end = [e for e in events if e["event"] == "scheduler_run_end"]
+    assert len(end) == 1 and end[0]["level"] == "INFO"
+    counts = end[0]["counts"]
+    assert counts["scopes_total"] == 6
+    assert counts["scopes_ok"] == 5
+    assert counts["scopes_failed"] == 1
+    assert counts["rules_ok"] == 5
+    assert counts["deviations_upserted"] == 5
+    assert end[0]["snapshot"]["events"] == 50
+    assert end[0]["truth_cache"] == {"hits": 0, "misses": 0, "scopes": 0}
+
+    errs = [e for e in events if e["event"] == "scheduler_scope_error"]
+    assert len(errs) == 1 and errs[0]["scope"]["home_id"] == "h3"
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Mapping, Optional
 
@@ -61,6 +65,117 @@ def derive_room_id(payload: Mapping[str, Any]) -> Optional[str]:
     return None
 
 
+# ---------------------------------------------------------------------------
+# Scoped room index cache (ingest hot path)
+# ---------------------------------------------------------------------------
+#
+# rooms / sensor_room_map change rarely; derive_room_id_scoped runs per event.
+# We keep one small index per (org_id, home_id) and refresh it on TTL expiry or
+# explicit invalidation from the routes that write those tables.
+
+_ROOM_INDEX_TTL_S = float(os.getenv("AGINGOS_ROOM_INDEX_TTL_S", "60"))
+
+_ROOM_INDEX_LOCK = threading.Lock()
+_ROOM_INDEX_CACHE: dict[tuple[str, str], "RoomIndex"] = {}
+
+
+@dataclass(frozen=True)
+class RoomIndex:
+    room_ids: frozenset[str]
+    room_id_by_name: Mapping[str, str]  # lower(display_name) -> room_id (min room_id on ties)
+    room_id_by_entity: Mapping[str, str]  # active sensor_room_map entity_id -> room_id
+    loaded_at: float
+
+
+def _load_room_index(db: Any, org_id: str, home_id: str) -> RoomIndex:
+    from sqlalchemy import text  # imported here to avoid hard dependency for pure utility usage
+
+    params = {"org_id": org_id, "home_id": home_id}
+
+    rooms = (
+        db.execute(
+            text(
+                """
+                SELECT room_id, display_name
+                FROM public.rooms
+                WHERE org_id=:org_id AND home_id=:home_id
+                ORDER BY room_id
+                """
+            ),
+            params,
+        )
+        .mappings()
+        .all()
+    )
+    mappings = (
+        db.execute(
+            text(
+                """
+                SELECT entity_id, room_id
+                FROM public.sensor_room_map
+                WHERE org_id=:org_id AND home_id=:home_id AND active=true
+                """
+            ),
+            params,
+        )
+        .mappings()
+        .all()
+    )
+
+    room_ids: set[str] = set()
+    by_name: dict[str, str] = {}
+    for r in rooms:
+        rid = str(r["room_id"])
+        room_ids.add(rid)
+        name = r.get("display_name")
+        if name is not None:
+            # rows are ordered by room_id: first hit wins (matches ORDER BY room_id LIMIT 1)
+            by_name.setdefault(str(name).lower(), rid)
+
+    by_entity = {
+        str(m["entity_id"]): str(m["room_id"])
+        for m in mappings
+        if m.get("entity_id") and m.get("room_id")
+    }
+
+    return RoomIndex(
+        room_ids=frozenset(room_ids),
+        room_id_by_name=by_name,
+        room_id_by_entity=by_entity,
+        loaded_at=time.monotonic(),
+    )
+
+
+def get_room_index(db: Any, org_id: str, home_id: str) -> RoomIndex:
+    """Return cached RoomIndex for (org_id, home_id), loading it if missing or expired."""
+    key = (str(org_id), str(home_id))
+    now = time.monotonic()
+    with _ROOM_INDEX_LOCK:
+        idx = _ROOM_INDEX_CACHE.get(key)
+    if idx is not None and (now - idx.loaded_at) < _ROOM_INDEX_TTL_S:
+        return idx
+
+    idx = _load_room_index(db, key[0], key[1])
+    with _ROOM_INDEX_LOCK:
+        _ROOM_INDEX_CACHE[key] = idx
+    return idx
+
+
+def invalidate_room_index(org_id: str | None = None, home_id: str | None = None) -> None:
+    """
+    Drop cached room indexes.
+    - org_id + home_id: drop that scope only
+    - no args: drop everything
+    """
+    with _ROOM_INDEX_LOCK:
+        if org_id is None and home_id is None:
+            _ROOM_INDEX_CACHE.clear()
+            return
+        for key in list(_ROOM_INDEX_CACHE.keys()):
+            if (org_id is None or key[0] == org_id) and (home_id is None or key[1] == home_id):
+                _ROOM_INDEX_CACHE.pop(key, None)
+
+
 def derive_room_id_scoped(db: Any, scope: Any, payload: Mapping[str, Any]) -> Optional[str]:
     """
     Deterministic room_id derivation (DB + scope aware) for Fixpack-3.
@@ -71,10 +186,10 @@ def derive_room_id_scoped(db: Any, scope: Any, payload: Mapping[str, Any]) -> Op
       3) sensor_room_map lookup by payload.entity_id (active=true)
       4) fallback to derive_room_id(payload) (payload-only + yaml)
 
+    Lookups 1-3 are served from the cached per-scope RoomIndex (see get_room_index).
+
     Returns room_id or None.
     """
-    from sqlalchemy import text  # imported here to avoid hard dependency for pure utility usage
-
     def _norm(v: Any) -> Optional[str]:
         if v is None:
             return None
@@ -87,61 +202,26 @@ def derive_room_id_scoped(db: Any, scope: Any, payload: Mapping[str, Any]) -> Op
         # Can't scope safely → fallback to payload-only
         return derive_room_id(payload)
 
-    params_base = {"org_id": org_id, "home_id": home_id}
+    idx = get_room_index(db, org_id, home_id)
 
     # 1) payload.room_id (validate exists)
     rid = _norm(payload.get("room_id"))
-    if rid:
-        r = db.execute(
-            text(
-                """
-                SELECT 1
-                FROM public.rooms
-                WHERE org_id=:org_id AND home_id=:home_id AND room_id=:room_id
-                LIMIT 1
-                """
-            ),
-            {**params_base, "room_id": rid},
-        ).scalar()
-        if r is not None:
-            return rid
+    if rid and rid in idx.room_ids:
+        return rid
 
     # 2) payload.room / payload.area → match display_name
     name = _norm(payload.get("room")) or _norm(payload.get("area"))
     if name:
-        rid2 = db.execute(
-            text(
-                """
-                SELECT room_id
-                FROM public.rooms
-                WHERE org_id=:org_id AND home_id=:home_id
-                  AND lower(display_name) = lower(:display_name)
-                ORDER BY room_id
-                LIMIT 1
-                """
-            ),
-            {**params_base, "display_name": name},
-        ).scalar()
+        rid2 = idx.room_id_by_name.get(name.lower())
         if rid2:
-            return str(rid2)
+            return rid2
 
     # 3) entity_id mapping
     entity_id = _norm(payload.get("entity_id"))
     if entity_id:
-        rid3 = db.execute(
-            text(
-                """
-                SELECT room_id
-                FROM public.sensor_room_map
-                WHERE org_id=:org_id AND home_id=:home_id
-                  AND entity_id=:entity_id AND active=true
-                LIMIT 1
-                """
-            ),
-            {**params_base, "entity_id": entity_id},
-        ).scalar()
+        rid3 = idx.room_id_by_entity.get(entity_id)
         if rid3:
-            return str(rid3)
+            return rid3
 
     # 4) fallback (payload-only + yaml)
     return derive_room_id(payload)
@@ -613,25 +613,7 @@ def score_episode(ep: EpisodeDraft) -> tuple[str, float, float, float, list[dict
 # -----------------------------------------------------------------------------
 
 
-def insert_episodes(conn, eps: List[EpisodeDraft], dry_run: bool = True) -> int:
-    """
-    Insert episodes with classification=unknown (rules later).
-    """
-    if dry_run:
-        return 0
-
-    with conn.cursor() as cur:
-        for ep in eps:
-            assert ep.end_ts is not None
-            duration_s = max(0, int((ep.end_ts - ep.start_ts).total_seconds()))
-            rate = 0.0
-            if duration_s > 0:
-                rate = ep.total / (duration_s / 60.0)
-
-            klass, p_h, p_p, p_u, reasons, reason_summary = score_episode(ep)
-            cur.execute(
-                """
-                INSERT INTO episodes (
+_EPISODE_INSERT_COLUMNS = """
                   start_ts, end_ts, duration_s,
                   room, primary_sensor, sensor_set,
                   close_reason, timeout_s, quality, quality_flags,
@@ -643,7 +625,10 @@ def insert_episodes(conn, eps: List[EpisodeDraft], dry_run: bool = True) -> int:
                   room_type, room_sequence,
                   class, p_human, p_pet, p_unknown,
                   classifier_version, reasons, reason_summary, score_debug
-                ) VALUES (
+"""
+
+# One row of placeholders matching _EPISODE_INSERT_COLUMNS / episode_row().
+_EPISODE_INSERT_TEMPLATE = """(
                   %s, %s, %s,
                   %s, %s, %s::jsonb,
                   %s, %s, %s, %s::jsonb,
@@ -655,50 +640,100 @@ def insert_episodes(conn, eps: List[EpisodeDraft], dry_run: bool = True) -> int:
                   NULL, '[]'::jsonb,
                   %s, %s, %s, %s,
                   %s, %s::jsonb, %s, %s::jsonb
+                )"""
+
+
+def episode_row(ep: EpisodeDraft) -> tuple:
+    """Scored INSERT parameters for one episode (shared by row and bulk writers)."""
+    assert ep.end_ts is not None
+    duration_s = max(0, int((ep.end_ts - ep.start_ts).total_seconds()))
+    rate = 0.0
+    if duration_s > 0:
+        rate = ep.total / (duration_s / 60.0)
+
+    klass, p_h, p_p, p_u, reasons, reason_summary = score_episode(ep)
+    return (
+        ep.start_ts,
+        ep.end_ts,
+        duration_s,
+        ep.room,
+        ep.primary_sensor,
+        psycopg2.extras.Json(ep.sensor_set),
+        ep.close_reason,
+        ep.timeout_s,
+        ep.quality,
+        psycopg2.extras.Json(ep.quality_flags),
+        ep.total,
+        ep.motion,
+        ep.presence_on,
+        ep.presence_off,
+        rate,
+        ep.first_event_id,
+        ep.last_event_id,
+        ep.door_before_s,
+        ep.door_during,
+        ep.door_after_s,
+        tod_bucket_utc(ep.start_ts),
+        int(ep.start_ts.isoweekday()),
+        klass,
+        p_h,
+        p_p,
+        p_u,
+        "rules_v1",
+        psycopg2.extras.Json(reasons),
+        reason_summary,
+        psycopg2.extras.Json(
+            {
+                "event_rate_per_min": rate,
+                "duration_s": duration_s,
+                "close_reason": ep.close_reason,
+                "timeout_s": ep.timeout_s,
+            }
+        ),
+    )
+
+
+INSERT_MODES = ("row", "bulk")
+
+
+def insert_episodes(
+    conn,
+    eps: List[EpisodeDraft],
+    dry_run: bool = True,
+    mode: str = "bulk",
+    page_size: int = 1000,
+) -> int:
+    """
+    Insert episodes with classification=unknown (rules later).
+
+    mode:
+    - bulk: multi-row INSERT via execute_values, page_size rows per statement
+    - row:  one INSERT per episode (reference path)
+    """
+    if mode not in INSERT_MODES:
+        raise ValueError(f"mode must be one of {INSERT_MODES}")
+    if dry_run:
+        return 0
+
+    rows = [episode_row(ep) for ep in eps]
+    with conn.cursor() as cur:
+        if mode == "bulk":
+            if rows:
+                psycopg2.extras.execute_values(
+                    cur,
+                    f"INSERT INTO episodes ({_EPISODE_INSERT_COLUMNS}) VALUES %s",
+                    rows,
+                    template=_EPISODE_INSERT_TEMPLATE,
+                    page_size=page_size,
+                )
+        else:
+            for row in rows:
+                cur.execute(
+                    f"INSERT INTO episodes ({_EPISODE_INSERT_COLUMNS}) VALUES {_EPISODE_INSERT_TEMPLATE}",
+                    row,
                 )
-                """,
-                (
-                    ep.start_ts,
-                    ep.end_ts,
-                    duration_s,
-                    ep.room,
-                    ep.primary_sensor,
-                    psycopg2.extras.Json(ep.sensor_set),
-                    ep.close_reason,
-                    ep.timeout_s,
-                    ep.quality,
-                    psycopg2.extras.Json(ep.quality_flags),
-                    ep.total,
-                    ep.motion,
-                    ep.presence_on,
-                    ep.presence_off,
-                    rate,
-                    ep.first_event_id,
-                    ep.last_event_id,
-                    ep.door_before_s,
-                    ep.door_during,
-                    ep.door_after_s,
-                    tod_bucket_utc(ep.start_ts),
-                    int(ep.start_ts.isoweekday()),
-                    klass,
-                    p_h,
-                    p_p,
-                    p_u,
-                    "rules_v1",
-                    psycopg2.extras.Json(reasons),
-                    reason_summary,
-                    psycopg2.extras.Json(
-                        {
-                            "event_rate_per_min": rate,
-                            "duration_s": duration_s,
-                            "close_reason": ep.close_reason,
-                            "timeout_s": ep.timeout_s,
-                        }
-                    ),
-                ),
-            )
         conn.commit()
-    return len(eps)
+    return len(rows)
 
 
 def main() -> int:
@@ -707,6 +742,18 @@ def main() -> int:
         "--last", default="24h", help="Window to read events from (e.g. 24h, 7d)"
     )
     ap.add_argument("--dry-run", action="store_true", help="Do not write to DB")
+    ap.add_argument(
+        "--insert-mode",
+        choices=INSERT_MODES,
+        default="bulk",
+        help="bulk = multi-row INSERT pages (execute_values); row = one INSERT per episode",
+    )
+    ap.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Rows per INSERT statement in --insert-mode bulk",
+    )
     args = ap.parse_args()
 
     seconds = parse_duration_seconds(args.last)
@@ -730,7 +777,13 @@ def main() -> int:
                     f"- room={ep.room} start={ep.start_ts.isoformat()} end={ep.end_ts.isoformat() if ep.end_ts else None} dur_s={dur} total={ep.total} motion={ep.motion} p_on={ep.presence_on} p_off={ep.presence_off} close={ep.close_reason} q={ep.quality}"
                 )
 
-        written = insert_episodes(conn, eps, dry_run=args.dry_run)
+        written = insert_episodes(
+            conn,
+            eps,
+            dry_run=args.dry_run,
+            mode=args.insert_mode,
+            page_size=max(1, args.page_size),
+        )
         if args.dry_run:
             print("dry-run: no DB writes")
         else:
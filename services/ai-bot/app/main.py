@@ -1,4 +1,8 @@
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Any
 
@@ -43,13 +47,62 @@ def _night_window_utc(now: datetime) -> tuple[datetime, datetime]:
     return start_local.astimezone(timezone.utc), end_local.astimezone(timezone.utc)
 
 
-def _agingos_client() -> httpx.Client:
+_HTTP_CLIENT: Optional[httpx.Client] = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+# Bounded parallelism for independent window fetches (baseline nights/mornings etc.)
+_FETCH_CONCURRENCY = max(1, int(os.getenv("AGINGOS_FETCH_CONCURRENCY", "8")))
+_FETCH_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _new_agingos_client() -> httpx.Client:
     base = os.getenv("AGINGOS_API_BASE_URL", "http://backend:8000").rstrip("/")
     key = os.getenv("AGINGOS_API_KEY", "").strip()
     headers = {}
     if key:
         headers["X-API-Key"] = key
-    return httpx.Client(base_url=base, headers=headers, timeout=5.0)
+    max_conn = max(1, int(os.getenv("AGINGOS_HTTP_MAX_CONNECTIONS", "10")))
+    return httpx.Client(
+        base_url=base,
+        headers=headers,
+        timeout=5.0,
+        limits=httpx.Limits(
+            max_connections=max_conn, max_keepalive_connections=max_conn
+        ),
+    )
+
+
+def _agingos_client() -> httpx.Client:
+    """
+    Shared keep-alive client (connection pool) for all backend calls.
+    Created at startup; lazily (re)created if used before startup or after shutdown.
+    Thread-safe: used concurrently by _fetch_events_many. Do not close per call.
+    """
+    global _HTTP_CLIENT
+    client = _HTTP_CLIENT
+    if client is None or client.is_closed:
+        with _HTTP_CLIENT_LOCK:
+            if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+                _HTTP_CLIENT = _new_agingos_client()
+            client = _HTTP_CLIENT
+    return client
+
+
+@app.on_event("startup")
+def _startup_http_client() -> None:
+    _agingos_client()
+
+
+@app.on_event("shutdown")
+def _shutdown_http_client() -> None:
+    global _HTTP_CLIENT, _FETCH_POOL
+    with _HTTP_CLIENT_LOCK:
+        if _FETCH_POOL is not None:
+            _FETCH_POOL.shutdown(wait=True)
+            _FETCH_POOL = None
+        if _HTTP_CLIENT is not None:
+            _HTTP_CLIENT.close()
+            _HTTP_CLIENT = None
 
 
 def _fetch_events(
@@ -75,42 +128,149 @@ def _fetch_events(
             params["category"] = category
         return params
 
+    client = _agingos_client()
+
     # Single call
     if requested <= MAX_LIMIT:
-        with _agingos_client() as client:
-            r = client.get("/events", params=_params(since, requested))
-            r.raise_for_status()
-            return r.json()
+        r = client.get("/events", params=_params(since, requested))
+        r.raise_for_status()
+        return r.json()
 
-    # Paging mode
+    # Paging mode: oldest first, following the backend keyset cursor (X-Next-Cursor)
+    # so same-timestamp events are neither skipped nor re-scanned.
     out: list[dict[str, Any]] = []
-    cursor = since
-
-    with _agingos_client() as client:
-        while len(out) < requested and cursor < until:
-            batch_limit = min(MAX_LIMIT, requested - len(out))
-            r = client.get("/events", params=_params(cursor, batch_limit))
-            r.raise_for_status()
-            batch = r.json()
-            if not batch:
-                break
-            out.extend(batch)
-
-            # Advance cursor to just after last timestamp to avoid duplicates
-            last_ts = batch[-1].get("timestamp")
-            if not last_ts:
-                break
-            try:
-                cursor = _parse_iso_z(last_ts) + timedelta(microseconds=1)
-            except Exception:
-                break
-
-            if len(batch) < batch_limit:
-                break
+    params = _params(since, MAX_LIMIT)
+    params["order"] = "asc"
+
+    while len(out) < requested:
+        batch_limit = min(MAX_LIMIT, requested - len(out))
+        params["limit"] = batch_limit
+        r = client.get("/events", params=params)
+        r.raise_for_status()
+        batch = r.json()
+        if not batch:
+            break
+        out.extend(batch)
+
+        next_cursor = r.headers.get("X-Next-Cursor")
+        if next_cursor:
+            params["cursor"] = next_cursor
+            continue
+        if len(batch) < batch_limit:
+            break
+
+        # Full page without cursor: older backend. Advance `since` to just after
+        # the last timestamp (may skip events sharing that timestamp).
+        last_ts = max((ev.get("timestamp") or "" for ev in batch), default="")
+        if not last_ts:
+            break
+        try:
+            cursor = _parse_iso_z(last_ts) + timedelta(microseconds=1)
+        except Exception:
+            break
+        if cursor >= until:
+            break
+        params = _params(cursor, batch_limit)
+        params["order"] = "asc"
 
     return out
 
 
+def _fetch_pool() -> ThreadPoolExecutor:
+    """Process-wide bounded pool for concurrent backend fetches (AGINGOS_FETCH_CONCURRENCY)."""
+    global _FETCH_POOL
+    with _HTTP_CLIENT_LOCK:
+        if _FETCH_POOL is None:
+            _FETCH_POOL = ThreadPoolExecutor(
+                max_workers=_FETCH_CONCURRENCY, thread_name_prefix="agingos-fetch"
+            )
+        return _FETCH_POOL
+
+
+def _fetch_events_many(
+    windows: list[tuple[datetime, datetime]],
+    limit: int = 1000,
+    category: Optional[str] = None,
+) -> list[list[dict[str, Any]]]:
+    """
+    _fetch_events for several independent windows concurrently over the pooled
+    client. Results keep input order; the first failure is raised like a
+    sequential fetch would. Must not be called from inside a pool worker.
+    """
+    if len(windows) <= 1 or _FETCH_CONCURRENCY <= 1:
+        return [_fetch_events(s, e, limit=limit, category=category) for s, e in windows]
+
+    pool = _fetch_pool()
+    futures = [
+        pool.submit(_fetch_events, s, e, limit=limit, category=category)
+        for s, e in windows
+    ]
+    return [f.result() for f in futures]
+
+
+def _fetch_nightly_aggregates(now: datetime, nights: int) -> dict[str, Any]:
+    """
+    Fetch per-night, per-room motion/presence counts and first morning activity
+    for nights 0..N from backend /v1/aggregates/nightly (one request, one GROUP BY).
+
+    Returns {offset: {"night": {...}, "morning": {...} | None}}.
+    """
+    params = {
+        "nights": int(nights),
+        "until": now.isoformat().replace("+00:00", "Z"),
+        "tz": os.getenv("AGINGOS_TIMEZONE", "Europe/Oslo"),
+        "categories": "motion,presence",
+    }
+    r = _agingos_client().get("/v1/aggregates/nightly", params=params)
+    r.raise_for_status()
+    body = r.json()
+    return {int(n["offset"]): n for n in body.get("nights") or []}
+
+
+# Per-window results for finished nights/mornings (they never change once closed).
+# Key: (backend scope, kind, since, until); value: ("night") (total, by_room) or
+# ("morning") (first_minute, count). Bounded LRU.
+_NIGHT_CACHE_MAX = max(0, int(os.getenv("AGINGOS_NIGHT_CACHE_MAX", "4096")))
+# A window is only cached once it ended at least this long ago (late-arriving events).
+_NIGHT_CACHE_GRACE = timedelta(
+    minutes=max(0, int(os.getenv("AGINGOS_NIGHT_CACHE_GRACE_MINUTES", "30")))
+)
+_NIGHT_CACHE: "OrderedDict[tuple[str, str, str, str], tuple]" = OrderedDict()
+_NIGHT_CACHE_LOCK = threading.Lock()
+
+
+def _night_cache_scope() -> str:
+    # The bot reads one scope per API key; key hash keeps the secret out of memory dumps.
+    base = os.getenv("AGINGOS_API_BASE_URL", "http://backend:8000").rstrip("/")
+    key = os.getenv("AGINGOS_API_KEY", "").strip()
+    return base + "#" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _night_cache_key(kind: str, since: datetime, until: datetime) -> tuple[str, str, str, str]:
+    return (_night_cache_scope(), kind, since.isoformat(), until.isoformat())
+
+
+def _night_cache_get(kind: str, since: datetime, until: datetime) -> Optional[tuple]:
+    key = _night_cache_key(kind, since, until)
+    with _NIGHT_CACHE_LOCK:
+        value = _NIGHT_CACHE.get(key)
+        if value is not None:
+            _NIGHT_CACHE.move_to_end(key)
+        return value
+
+
+def _night_cache_put(kind: str, since: datetime, until: datetime, value: tuple) -> None:
+    """Store a window result; ignored while the window is still open (or within grace)."""
+    if _NIGHT_CACHE_MAX <= 0 or until > _utc_now() - _NIGHT_CACHE_GRACE:
+        return
+    key = _night_cache_key(kind, since, until)
+    with _NIGHT_CACHE_LOCK:
+        _NIGHT_CACHE[key] = value
+        _NIGHT_CACHE.move_to_end(key)
+        while len(_NIGHT_CACHE) > _NIGHT_CACHE_MAX:
+            _NIGHT_CACHE.popitem(last=False)
+
+
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
@@ -185,19 +345,25 @@ def occupancy(
 
     try:
         occ_limit = 5000
-        door_events = _fetch_events(since, now, limit=occ_limit, category="door")
-        presence_events = _fetch_events(
-            since, now, limit=occ_limit, category="presence"
-        )
-        events = door_events + presence_events
-
         live_since = now - timedelta(hours=12)
-        heartbeat_events = _fetch_events(
-            live_since, now, limit=1000, category="heartbeat"
+        # Independent category fetches -> run concurrently over the pooled client.
+        pool = _fetch_pool()
+        door_f = pool.submit(_fetch_events, since, now, limit=occ_limit, category="door")
+        presence_f = pool.submit(
+            _fetch_events, since, now, limit=occ_limit, category="presence"
+        )
+        heartbeat_f = pool.submit(
+            _fetch_events, live_since, now, limit=1000, category="heartbeat"
         )
-        snapshot_events = _fetch_events(
-            live_since, now, limit=1000, category="ha_snapshot"
+        snapshot_f = pool.submit(
+            _fetch_events, live_since, now, limit=1000, category="ha_snapshot"
         )
+        door_events = door_f.result()
+        presence_events = presence_f.result()
+        events = door_events + presence_events
+
+        heartbeat_events = heartbeat_f.result()
+        snapshot_events = snapshot_f.result()
     except Exception as e:
         return {
             "schema_version": "v1",
@@ -511,18 +677,80 @@ def anomalies(
             if (ev.get("category") or "").lower() in ("motion", "presence")
         )
 
+    from zoneinfo import ZoneInfo
+
+    tz_name = os.getenv("AGINGOS_TIMEZONE", "Europe/Oslo")
+    tz = ZoneInfo(tz_name)
+    now_local = now.astimezone(tz)
+
+    # Morning window (local time)
+    morning_start_h = 5
+    morning_end_h = 12
+
+    # Baseline mornings (d = 1..N), same offsets as baseline nights
+    morning_windows = []
+    for d in range(1, window_days + 1):
+        day = now_local.date() - timedelta(days=d)
+        s_local = datetime(day.year, day.month, day.day, morning_start_h, 0, 0, tzinfo=tz)
+        e_local = datetime(day.year, day.month, day.day, morning_end_h, 0, 0, tzinfo=tz)
+        morning_windows.append(
+            (s_local.astimezone(timezone.utc), e_local.astimezone(timezone.utc))
+        )
+
+    # Finished nights/mornings come from the window cache; only offsets up to the
+    # oldest uncached one are aggregated (normally just the current night + 1).
+    uncached = [
+        d
+        for d in range(1, window_days + 1)
+        if _night_cache_get("night", *baseline_night_windows[d - 1]) is None
+        or _night_cache_get("morning", *morning_windows[d - 1]) is None
+    ]
+
+    # Server-side aggregates: all needed nights + mornings in one request.
+    # Fallback (older backend without /v1/aggregates/nightly): one /events fetch per window.
+    try:
+        nightly = _fetch_nightly_aggregates(now, max(uncached, default=1))
+    except Exception:
+        nightly = None
+
+    def night_counts(d: int, s: datetime, e: datetime) -> tuple[int, dict[str, int]]:
+        cached = _night_cache_get("night", s, e)
+        if cached is not None:
+            return cached[0], dict(cached[1])
+        # Offsets the aggregate did not return are fetched like the morning path, never
+        # read as an empty night (that would be cached as total=0 for good).
+        night = (nightly.get(d) or {}).get("night") if nightly is not None else None
+        if night is not None:
+            total, by_room = int(night.get("total") or 0), dict(night.get("by_room") or {})
+        else:
+            evs = fallback_nights.get(d)
+            if evs is None:
+                evs = _fetch_events(s, e, limit=1000)
+            total, by_room = motion_presence_count(evs), motion_presence_count_by_room(evs)
+        _night_cache_put("night", s, e, (total, dict(by_room)))
+        return total, by_room
+
+    fallback_nights: dict[int, list[dict[str, Any]]] = {}
+
     # Fail-soft: if backend unreachable, return structured empty response
     try:
-        recent_events = _fetch_events(recent_since, recent_until, limit=1000)
-        recent_mp = motion_presence_count(recent_events)
-        recent_by_room = motion_presence_count_by_room(recent_events)
+        if nightly is None:
+            # Night windows are independent: fetch the uncached ones concurrently (bounded).
+            todo = [
+                (d, w)
+                for d, w in enumerate([(recent_since, recent_until), *baseline_night_windows])
+                if d == 0 or d in uncached
+            ]
+            fallback_nights.update(
+                zip([d for d, _ in todo], _fetch_events_many([w for _, w in todo]))
+            )
+        recent_mp, recent_by_room = night_counts(0, recent_since, recent_until)
 
         baseline_counts = []
         baseline_by_room: dict[str, list[int]] = {}
-        for s, e in baseline_night_windows:
-            evs = _fetch_events(s, e, limit=1000)
-            baseline_counts.append(motion_presence_count(evs))
-            by_room = motion_presence_count_by_room(evs)
+        for d, (s, e) in enumerate(baseline_night_windows, start=1):
+            night_total, by_room = night_counts(d, s, e)
+            baseline_counts.append(night_total)
             # ensure every seen room gets a value for this night
             rooms = (
                 set(baseline_by_room.keys())
@@ -787,15 +1015,7 @@ def anomalies(
 
         # --- Morning routine anomaly (Sprint 2) ---
         # Conservative, explainable: compare first motion/presence in the morning window vs baseline median.
-        from zoneinfo import ZoneInfo
-
-        tz_name = os.getenv("AGINGOS_TIMEZONE", "Europe/Oslo")
-        tz = ZoneInfo(tz_name)
-        now_local = now.astimezone(tz)
-
-        # Morning window (local time)
-        morning_start_h = 5
-        morning_end_h = 12
+        # (tz, morning window hours and baseline morning_windows are set up above.)
 
         # Trigger if today's first activity is >= this many minutes later than baseline median
         delay_threshold_minutes = 60
@@ -803,46 +1023,53 @@ def anomalies(
         # Require baseline observations to avoid noise
         min_baseline_days = 5
 
-        def _first_motion_presence_minute_in_window(s_utc, e_utc):
-            events = _fetch_events(s_utc, e_utc, limit=1000)
-            times = []
-            for ev in events:
-                if (ev.get("category") or "").lower() in ("motion", "presence"):
-                    ts = ev.get("timestamp")
-                    if ts:
-                        try:
-                            times.append(_parse_iso_z(ts))
-                        except Exception:
-                            pass
-            if not times:
-                return None, {
-                    "since": s_utc.isoformat(),
-                    "until": e_utc.isoformat(),
-                    "count": 0,
-                }
-            first = min(times)
-            first_local = first.astimezone(tz)
-            minute = first_local.hour * 60 + first_local.minute
+        def _first_motion_presence_minute_in_window(s_utc, e_utc, d=None, events=None):
+            cached = _night_cache_get("morning", s_utc, e_utc)
+            if cached is not None:
+                minute, count = cached
+            else:
+                morning = (
+                    (nightly.get(d) or {}).get("morning") if nightly is not None else None
+                )
+                if morning is not None:
+                    minute, count = morning.get("first_minute"), int(morning.get("count") or 0)
+                else:
+                    if events is None:
+                        events = _fetch_events(s_utc, e_utc, limit=1000)
+                    times = []
+                    for ev in events:
+                        if (ev.get("category") or "").lower() in ("motion", "presence"):
+                            ts = ev.get("timestamp")
+                            if ts:
+                                try:
+                                    times.append(_parse_iso_z(ts))
+                                except Exception:
+                                    pass
+                    minute, count = None, len(times)
+                    if times:
+                        first_local = min(times).astimezone(tz)
+                        minute = first_local.hour * 60 + first_local.minute
+                _night_cache_put("morning", s_utc, e_utc, (minute, count))
             return minute, {
                 "since": s_utc.isoformat(),
                 "until": e_utc.isoformat(),
-                "count": len(times),
+                "count": count,
             }
 
         # Baseline: previous N mornings
         baseline_minutes = []
         baseline_meta = []
-        for d in range(1, window_days + 1):
-            day = now_local.date() - timedelta(days=d)
-            s_local = datetime(
-                day.year, day.month, day.day, morning_start_h, 0, 0, tzinfo=tz
-            )
-            e_local = datetime(
-                day.year, day.month, day.day, morning_end_h, 0, 0, tzinfo=tz
+        morning_events: list[Optional[list[dict[str, Any]]]] = [None] * len(morning_windows)
+        if nightly is None:
+            todo = list(uncached)
+            for d, evs in zip(todo, _fetch_events_many([morning_windows[d - 1] for d in todo])):
+                morning_events[d - 1] = evs
+        for d, (s_utc, e_utc), evs in zip(
+            range(1, window_days + 1), morning_windows, morning_events
+        ):
+            minute, meta = _first_motion_presence_minute_in_window(
+                s_utc, e_utc, d, events=evs
             )
-            s_utc = s_local.astimezone(timezone.utc)
-            e_utc = e_local.astimezone(timezone.utc)
-            minute, meta = _first_motion_presence_minute_in_window(s_utc, e_utc)
             baseline_meta.append(meta)
             if minute is not None:
                 baseline_minutes.append(minute)
@@ -862,7 +1089,7 @@ def anomalies(
             s_utc = s_local.astimezone(timezone.utc)
             e_utc = end_local.astimezone(timezone.utc)
             recent_minute, recent_window = _first_motion_presence_minute_in_window(
-                s_utc, e_utc
+                s_utc, e_utc, 0
             )
 
         def _fmt_minute(m):
@@ -1111,6 +1338,14 @@ def insights(
     findings = []
     proposals = []
 
+    # The last-24h window (summary below) is independent of the period window:
+    # start it now so both fetches run concurrently over the pooled client.
+    last24_since = now - timedelta(hours=24)
+    last24_until = now
+    events_24h_f = _fetch_pool().submit(
+        _fetch_events, last24_since, last24_until, limit=1000
+    )
+
     # Try fetching events; fail soft if backend unreachable/auth fails
     try:
         events = _fetch_events(period_since, period_until, limit=1000)
@@ -1174,11 +1409,8 @@ def insights(
         }
     )
     # --- Last 24 hours summary + sensor health (Sprint 1) ---
-    last24_since = now - timedelta(hours=24)
-    last24_until = now
-
     try:
-        events_24h = _fetch_events(last24_since, last24_until, limit=1000)
+        events_24h = events_24h_f.result()
         total_24h = len(events_24h)
         motion_24h = sum(
             1
@@ -55,6 +55,8 @@ def scope_counts(org_id: str, home_id: str, subject_id: str) -> Dict[str, int]:
       SELECT 'events'::text AS t, COUNT(*)::bigint AS n
         FROM public.events WHERE org_id='{org_id}' AND home_id='{home_id}' AND subject_id='{subject_id}'
       UNION ALL
+      SELECT 'event_bucket_counts', COUNT(*) FROM public.event_bucket_counts WHERE org_id='{org_id}' AND home_id='{home_id}' AND subject_id='{subject_id}'
+      UNION ALL
       SELECT 'episodes', COUNT(*) FROM public.episodes WHERE org_id='{org_id}' AND home_id='{home_id}' AND subject_id='{subject_id}'
       UNION ALL
       SELECT 'episodes_svc', COUNT(*) FROM public.episodes_svc WHERE org_id='{org_id}' AND home_id='{home_id}' AND subject_id='{subject_id}'
@@ -87,6 +89,8 @@ def scope_counts(org_id: str, home_id: str, subject_id: str) -> Dict[str, int]:
 def vacuum_analyze_tables():
     sql = """
     VACUUM (ANALYZE) public.events;
+    VACUUM (ANALYZE) public.event_bucket_counts;
+    VACUUM (ANALYZE) public.events_dedup;
     VACUUM (ANALYZE) public.episodes;
     VACUUM (ANALYZE) public.episodes_svc;
     VACUUM (ANALYZE) public.anomaly_episodes;
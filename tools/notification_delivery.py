@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Concurrent delivery executor for network notification routes.
+
+Used by tools/notification_worker.py. Rows for these routes are claimed (IN_FLIGHT)
+and committed first; the executor then calls the route handlers outside any DB
+transaction and the worker writes all results back in bulk.
+
+- one bounded thread pool per route_type (per-route concurrency limit)
+- per-route timeout (NOTIFICATION_ROUTE_TIMEOUTS, seconds)
+- route_type='webhook': POST JSON to destination, 2xx = delivered
+- StubRoute: local HTTP stand-in endpoint for dev/tests
+  (python3 tools/notification_delivery.py stub --port 8099)
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+DEFAULT_LIMIT = 4
+DEFAULT_TIMEOUT_S = 10.0
+
+
+def _parse_route_map(raw: str, cast: Callable[[str], Any]) -> Dict[str, Any]:
+    """'webhook=8,sms=2' -> {'webhook': 8, 'sms': 2} (bad entries ignored)."""
+    out: Dict[str, Any] = {}
+    for part in (raw or "").split(","):
+        k, sep, v = part.partition("=")
+        if not sep or not k.strip():
+            continue
+        try:
+            out[k.strip()] = cast(v.strip())
+        except ValueError:
+            continue
+    return out
+
+
+@dataclass
+class DeliveryResult:
+    row: Dict[str, Any]
+    ok: bool
+    response: Dict[str, Any] = field(default_factory=dict)
+    provider_msg_id: Optional[str] = None
+    error: Optional[str] = None
+    ms: int = 0
+
+
+def deliver_webhook(
+    client: httpx.Client, row: Dict[str, Any], timeout_s: float
+) -> dict:
+    url = row.get("destination")
+    if not url:
+        raise RuntimeError("webhook route without destination")
+    body = {
+        "outbox_id": row["id"],
+        "org_id": row["org_id"],
+        "home_id": row["home_id"],
+        "subject_id": row["subject_id"],
+        "route_key": row.get("route_key"),
+        "message_type": row.get("message_type"),
+        "severity": row.get("severity"),
+        "payload": row.get("payload") or {},
+    }
+    r = client.post(
+        url,
+        json=body,
+        # receivers dedupe on this; a stale IN_FLIGHT reclaim may resend
+        headers={
+            "Idempotency-Key": row.get("idempotency_key") or f"outbox-{row['id']}"
+        },
+        timeout=timeout_s,
+    )
+    r.raise_for_status()
+    return {
+        "status_code": r.status_code,
+        "provider_msg_id": r.headers.get("X-Message-Id"),
+    }
+
+
+ROUTE_HANDLERS: Dict[str, Callable[[httpx.Client, Dict[str, Any], float], dict]] = {
+    "webhook": deliver_webhook,
+}
+
+
+class DeliveryExecutor:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        handlers: Optional[Dict[str, Callable]] = None,
+    ):
+        self.limits = (
+            limits
+            if limits is not None
+            else _parse_route_map(os.getenv("NOTIFICATION_ROUTE_LIMITS", ""), int)
+        )
+        self.timeouts = (
+            timeouts
+            if timeouts is not None
+            else _parse_route_map(os.getenv("NOTIFICATION_ROUTE_TIMEOUTS", ""), float)
+        )
+        self.handlers = dict(ROUTE_HANDLERS if handlers is None else handlers)
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._client = httpx.Client()
+
+    def handles(self, route_type: str) -> bool:
+        return route_type in self.handlers
+
+    def _pool(self, route_type: str) -> ThreadPoolExecutor:
+        with self._lock:
+            pool = self._pools.get(route_type)
+            if pool is None:
+                n = max(1, int(self.limits.get(route_type, DEFAULT_LIMIT)))
+                pool = self._pools[route_type] = ThreadPoolExecutor(
+                    max_workers=n, thread_name_prefix=f"deliver-{route_type}"
+                )
+            return pool
+
+    def _call(self, row: Dict[str, Any], timeout_s: float) -> DeliveryResult:
+        t0 = time.monotonic()
+        try:
+            resp = self.handlers[row["route_type"]](self._client, row, timeout_s)
+            return DeliveryResult(
+                row=row,
+                ok=True,
+                response={"route_type": row["route_type"], **resp},
+                provider_msg_id=resp.get("provider_msg_id"),
+                ms=int((time.monotonic() - t0) * 1000),
+            )
+        except Exception as e:
+            return DeliveryResult(
+                row=row,
+                ok=False,
+                error=f"{type(e).__name__}: {e}",
+                ms=int((time.monotonic() - t0) * 1000),
+            )
+
+    def run(self, rows: List[Dict[str, Any]]) -> List[DeliveryResult]:
+        """Deliver rows concurrently (bounded per route_type); results in input order."""
+        t0 = time.monotonic()
+        per_route: Dict[str, int] = {}
+        for row in rows:
+            per_route[row["route_type"]] = per_route.get(row["route_type"], 0) + 1
+
+        futures = []
+        for row in rows:
+            rt = row["route_type"]
+            timeout_s = float(self.timeouts.get(rt, DEFAULT_TIMEOUT_S))
+            limit = max(1, int(self.limits.get(rt, DEFAULT_LIMIT)))
+            # Handlers enforce timeout_s themselves. This guard covers one that
+            # does not: queued rows get one timeout per wave ahead of them.
+            waves = -(-per_route[rt] // limit)
+            deadline = t0 + timeout_s * waves + 1.0
+            fut = self._pool(rt).submit(self._call, row, timeout_s)
+            futures.append((row, timeout_s, deadline, fut))
+
+        out: List[DeliveryResult] = []
+        for row, timeout_s, deadline, fut in futures:
+            try:
+                out.append(fut.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                out.append(
+                    DeliveryResult(
+                        row=row,
+                        ok=False,
+                        error=f"TimeoutError: {row['route_type']} exceeded {timeout_s}s",
+                        ms=int((time.monotonic() - t0) * 1000),
+                    )
+                )
+        return out
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+        self._pools.clear()
+        self._client.close()
+
+
+class StubRoute:
+    """
+    Local HTTP stand-in for a webhook receiver.
+
+    Records every request; status/delay_s control the answer. Use its url as the
+    outbox destination with route_type='webhook'.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        status: int = 200,
+        delay_s: float = 0.0,
+    ):
+        self.status = status
+        self.delay_s = delay_s
+        self.requests: List[Dict[str, Any]] = []
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802
+                n = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(n) if n else b""
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    body = {"raw": raw.decode("utf-8", "replace")}
+                stub.requests.append(
+                    {
+                        "path": self.path,
+                        "idempotency_key": self.headers.get("Idempotency-Key"),
+                        "body": body,
+                    }
+                )
+                if stub.delay_s:
+                    time.sleep(stub.delay_s)
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-Message-Id", f"stub-{len(stub.requests)}")
+                self.end_headers()
+                self.wfile.write(json.dumps({"ok": 200 <= stub.status < 300}).encode())
+
+            def log_message(self, *a):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/notify"
+
+    def start(self) -> "StubRoute":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubRoute":
+        return self.start()
+
+    def __exit__(self, *a) -> None:
+        self.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    st = sub.add_parser("stub", help="Run the local webhook stand-in")
+    st.add_argument("--host", default="0.0.0.0")
+    st.add_argument("--port", type=int, default=8099)
+    st.add_argument("--status", type=int, default=200)
+    st.add_argument("--delay", type=float, default=0.0)
+    args = ap.parse_args()
+
+    stub = StubRoute(args.host, args.port, status=args.status, delay_s=args.delay)
+    print(f"stub_url={stub.url}", flush=True)
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
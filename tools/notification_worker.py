@@ -9,18 +9,29 @@ Implements:
 - idempotent delivery via notification_deliveries unique index
 - route_type='db' (no external side-effect; writes delivery receipt + ack)
 - policy: NORMAL / QUIET / NIGHT + override_until + bypass_policy
+- resident mode (--daemon): batch claim, per-batch policy cache,
+  wakeup on LISTEN notification_outbox or the earliest next_attempt_at
+- network routes (notification_delivery.py): claims committed before the call,
+  concurrent per-route delivery, results written back in bulk
 """
 
+import argparse
 import os
 import sys
 import json
 import random
+import select
+import signal
 import socket
+import time
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
 
 import psycopg2
 import psycopg2.extras
 
+from notification_delivery import DeliveryExecutor
+
 try:
     from zoneinfo import ZoneInfo
 except Exception:
@@ -58,6 +69,14 @@ def get_policy(cur, org_id: str, home_id: str, subject_id: str):
     return cur.fetchone()
 
 
+def get_policy_cached(cur, cache: dict, org_id: str, home_id: str, subject_id: str):
+    """get_policy, memoized per scope for one claimed batch (None is cached too)."""
+    key = (org_id, home_id, subject_id)
+    if key not in cache:
+        cache[key] = get_policy(cur, org_id, home_id, subject_id)
+    return cache[key]
+
+
 def in_quiet_window(now_local, start_t, end_t) -> bool:
     """
     True if now_local.time() is within [start,end).
@@ -105,6 +124,56 @@ def defer_due_to_policy(
     )
 
 
+_CLAIM_SQL = """
+        WITH candidate AS (
+          SELECT id
+          FROM notification_outbox
+          WHERE status IN ('PENDING','RETRY')
+            AND next_attempt_at <= now()
+            AND (locked_at IS NULL OR locked_at < (now() - interval '15 minutes'))
+          ORDER BY next_attempt_at ASC, id ASC
+          FOR UPDATE SKIP LOCKED
+          LIMIT %s
+        )
+        UPDATE notification_outbox o
+        SET status = 'IN_FLIGHT',
+            locked_at = now(),
+            locked_by = %s,
+            updated_at = now()
+        FROM candidate
+        WHERE o.id = candidate.id
+        RETURNING
+          o.id, o.org_id, o.home_id, o.subject_id,
+          o.route_type, o.route_key, o.destination,
+          o.message_type, o.severity, o.idempotency_key, o.payload,
+          o.bypass_policy,
+          o.status, o.attempt_n, o.max_attempts,
+          o.next_attempt_at, o.last_attempt_at,
+          o.delivered_at, o.acked_at;
+"""
+
+
+def claim_batch(cur, worker_id: str, limit: int):
+    """Claim up to limit due rows in one statement (same predicate as claim_one)."""
+    cur.execute(_CLAIM_SQL, (limit, worker_id))
+    rows = cur.fetchall()
+    rows.sort(key=lambda r: (r["next_attempt_at"], r["id"]))
+    return rows
+
+
+def seconds_until_next_due(cur):
+    """Seconds until the earliest PENDING/RETRY row is due (<= 0: due now), None if none."""
+    cur.execute(
+        """
+        SELECT EXTRACT(EPOCH FROM (MIN(next_attempt_at) - now())) AS due_in
+        FROM notification_outbox
+        WHERE status IN ('PENDING','RETRY')
+        """
+    )
+    row = cur.fetchone()
+    return None if not row or row["due_in"] is None else float(row["due_in"])
+
+
 def claim_one(cur, worker_id: str):
     cur.execute(
         """
@@ -191,7 +260,21 @@ def mark_delivered_and_acked(cur, outbox_id: int):
     )
 
 
+def receipt_keys(row):
+    """
+    (route_key, idempotency_key) for notification_deliveries, where both are NOT NULL.
+
+    Outbox rows may leave them unset; the idempotency key falls back to the one the
+    delivery handlers send (outbox-<id>), the route key to ''.
+    """
+    return (
+        row.get("route_key") or "",
+        row.get("idempotency_key") or f"outbox-{row['id']}",
+    )
+
+
 def insert_delivery_receipt(cur, row) -> bool:
+    route_key, idempotency_key = receipt_keys(row)
     cur.execute(
         """
         INSERT INTO notification_deliveries (
@@ -213,8 +296,8 @@ def insert_delivery_receipt(cur, row) -> bool:
             "home_id": row["home_id"],
             "subject_id": row["subject_id"],
             "route_type": row["route_type"],
-            "route_key": row["route_key"],
-            "idempotency_key": row["idempotency_key"],
+            "route_key": route_key,
+            "idempotency_key": idempotency_key,
             "response": json.dumps({"route_type": row["route_type"], "ack": True}),
         },
     )
@@ -227,6 +310,131 @@ def deliver_db(cur, row):
     return {"ok": True, "receipt_inserted": inserted}
 
 
+def _write_delivered(cur, worker_id: str, ok) -> None:
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO notification_deliveries (
+          outbox_id, org_id, home_id, subject_id,
+          route_type, route_key, idempotency_key,
+          provider_msg_id, response
+        )
+        VALUES %s
+        ON CONFLICT (org_id, home_id, subject_id, route_type, route_key, idempotency_key)
+        DO NOTHING;
+        """,
+        [
+            (
+                r.row["id"],
+                r.row["org_id"],
+                r.row["home_id"],
+                r.row["subject_id"],
+                r.row["route_type"],
+                *receipt_keys(r.row),
+                r.provider_msg_id,
+                json.dumps(r.response),
+            )
+            for r in ok
+        ],
+        template="(%s,%s,%s,%s, %s,%s,%s, %s,%s::jsonb)",
+    )
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        UPDATE notification_outbox o
+        SET status='DELIVERED',
+            delivered_at=COALESCE(o.delivered_at, now()),
+            last_attempt_at=now(),
+            locked_at=NULL,
+            locked_by=NULL,
+            updated_at=now()
+        FROM (VALUES %s) AS v(id, locked_by)
+        WHERE o.id = v.id AND o.status = 'IN_FLIGHT' AND o.locked_by = v.locked_by;
+        """,
+        [(r.row["id"], worker_id) for r in ok],
+        template="(%s::bigint, %s::text)",
+    )
+
+
+def _write_failed(cur, worker_id: str, failed) -> None:
+    vals = []
+    for r in failed:
+        attempt_n = int(r.row["attempt_n"]) + 1
+        dead = attempt_n >= int(r.row["max_attempts"])
+        err = f"max_attempts_reached: {r.error}" if dead else r.error
+        delay = 0.0 if dead else backoff_seconds(attempt_n)
+        vals.append((r.row["id"], worker_id, dead, attempt_n, delay, err))
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        UPDATE notification_outbox o
+        SET status = CASE WHEN v.dead THEN 'DEAD' ELSE 'RETRY' END,
+            attempt_n = CASE WHEN v.dead THEN o.attempt_n ELSE v.attempt_n END,
+            last_attempt_at = CASE WHEN v.dead THEN o.last_attempt_at ELSE now() END,
+            next_attempt_at = CASE
+              WHEN v.dead THEN o.next_attempt_at
+              ELSE now() + make_interval(secs => v.delay_s)
+            END,
+            last_error = v.err,
+            dead_letter_reason = CASE WHEN v.dead THEN v.err ELSE o.dead_letter_reason END,
+            locked_at = NULL,
+            locked_by = NULL,
+            updated_at = now()
+        FROM (VALUES %s) AS v(id, locked_by, dead, attempt_n, delay_s, err)
+        WHERE o.id = v.id AND o.status = 'IN_FLIGHT' AND o.locked_by = v.locked_by;
+        """,
+        vals,
+        template="(%s::bigint, %s::text, %s::boolean, %s::int, %s::float8, %s::text)",
+    )
+
+
+def _write_results(cur, worker_id: str, results) -> None:
+    ok = [r for r in results if r.ok]
+    failed = [r for r in results if not r.ok]
+    if ok:
+        _write_delivered(cur, worker_id, ok)
+    if failed:
+        _write_failed(cur, worker_id, failed)
+
+
+def write_delivery_results(cur, worker_id: str, results) -> None:
+    """
+    Bulk write-back for network routes (same row effects as deliver/schedule_retry/mark_dead).
+
+    Only rows still IN_FLIGHT under this worker are touched: a row reclaimed after a
+    stale lock belongs to the other worker now.
+
+    If the bulk write fails, rows are written one at a time under a savepoint. A
+    delivered row whose receipt cannot be written is recorded as a failed attempt
+    (retry/dead-letter); a row that cannot be written at all stays IN_FLIGHT until
+    its lock goes stale and it is reclaimed.
+    """
+    cur.execute("SAVEPOINT delivery_results;")
+    try:
+        _write_results(cur, worker_id, results)
+        cur.execute("RELEASE SAVEPOINT delivery_results;")
+        return
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT delivery_results;")
+        cur.execute("RELEASE SAVEPOINT delivery_results;")
+        print(f"bulk_write_error={type(e).__name__}: {e}", file=sys.stderr, flush=True)
+
+    for r in results:
+        cur.execute("SAVEPOINT delivery_row;")
+        try:
+            _write_results(cur, worker_id, [r])
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT delivery_row;")
+            err = f"write_back_failed: {type(e).__name__}: {e}"
+            print(f"outbox_id={r.row['id']} {err}", file=sys.stderr, flush=True)
+            if r.ok:
+                try:
+                    _write_failed(cur, worker_id, [replace(r, ok=False, error=err)])
+                except Exception:
+                    cur.execute("ROLLBACK TO SAVEPOINT delivery_row;")
+        cur.execute("RELEASE SAVEPOINT delivery_row;")
+
+
 def deliver(cur, row):
     rt = row["route_type"]
     if rt == "db":
@@ -234,7 +442,7 @@ def deliver(cur, row):
     raise RuntimeError(f"Unsupported route_type: {rt}")
 
 
-def apply_policy_or_none(cur, row) -> bool:
+def apply_policy_or_none(cur, row, policy_cache: dict = None) -> bool:
     """
     Returns True if deferred due to policy (and caller should commit+continue),
     False if delivery is allowed.
@@ -242,7 +450,12 @@ def apply_policy_or_none(cur, row) -> bool:
     if row["bypass_policy"]:
         return False
 
-    pol = get_policy(cur, row["org_id"], row["home_id"], row["subject_id"])
+    if policy_cache is None:
+        pol = get_policy(cur, row["org_id"], row["home_id"], row["subject_id"])
+    else:
+        pol = get_policy_cached(
+            cur, policy_cache, row["org_id"], row["home_id"], row["subject_id"]
+        )
     if not pol:
         return False
 
@@ -272,61 +485,171 @@ def apply_policy_or_none(cur, row) -> bool:
     return False
 
 
-def run_once(limit: int = 1) -> int:
+def process_batch(
+    conn, cur, worker_id: str, batch_size: int, executor: DeliveryExecutor = None
+) -> int:
+    """
+    Claim up to batch_size due rows and handle them in one transaction.
+
+    Each row runs under a savepoint, so a failed delivery only rolls back its own
+    writes before retry/dead-letter is recorded. One commit per batch.
+
+    Rows for executor routes stay IN_FLIGHT in that commit; they are delivered
+    concurrently afterwards (no transaction open during network calls) and their
+    results written back in a second, bulk transaction.
+    """
+    rows = claim_batch(cur, worker_id, batch_size)
+    if not rows:
+        conn.rollback()
+        return 0
+
+    policy_cache: dict = {}
+    remote = []
+    for row in rows:
+        outbox_id = int(row["id"])
+        cur.execute("SAVEPOINT outbox_row;")
+        try:
+            # Policy gate first
+            if not apply_policy_or_none(cur, row, policy_cache):
+                if executor is not None and executor.handles(row["route_type"]):
+                    remote.append(row)
+                else:
+                    deliver(cur, row)
+            cur.execute("RELEASE SAVEPOINT outbox_row;")
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT outbox_row;")
+            err = f"{type(e).__name__}: {e}"
+            attempt_n = int(row["attempt_n"]) + 1
+            if attempt_n >= int(row["max_attempts"]):
+                mark_dead(cur, outbox_id, f"max_attempts_reached: {err}")
+            else:
+                schedule_retry(cur, outbox_id, attempt_n, err)
+    conn.commit()
+
+    if remote:
+        write_delivery_results(cur, worker_id, executor.run(remote))
+        conn.commit()
+    return len(rows)
+
+
+def run_once(limit: int = 1, batch_size: int = 50) -> int:
     worker_id = os.getenv("WORKER_ID", socket.gethostname())
     dsn = os.getenv("DATABASE_URL", get_db_dsn())
 
     conn = psycopg2.connect(dsn)
     conn.autocommit = False
 
+    executor = DeliveryExecutor()
     processed = 0
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            for _ in range(limit):
-                cur.execute("BEGIN;")
-                row = claim_one(cur, worker_id)
-                if not row:
-                    conn.rollback()
+            while processed < limit:
+                n = process_batch(
+                    conn, cur, worker_id, min(batch_size, limit - processed), executor
+                )
+                if n == 0:
                     break
-                outbox_id = int(row["id"])
-                max_attempts = int(row["max_attempts"])
-
-                try:
-                    # Policy gate first
-                    if apply_policy_or_none(cur, row):
-                        conn.commit()
-                        processed += 1
-                        continue
-
-                    # Attempt delivery
-                    deliver(cur, row)
-                    conn.commit()
-                    processed += 1
-
-                except Exception as e:
-                    err = f"{type(e).__name__}: {e}"
-                    attempt_n = int(row["attempt_n"]) + 1
-
-                    if attempt_n >= max_attempts:
-                        mark_dead(cur, outbox_id, f"max_attempts_reached: {err}")
-                        conn.commit()
-                        processed += 1
-                    else:
-                        schedule_retry(cur, outbox_id, attempt_n, err)
-                        conn.commit()
-                        processed += 1
+                processed += n
     finally:
+        executor.close()
         conn.close()
 
     return processed
 
 
+_STOP = False
+
+
+def _request_stop(signum, frame):
+    global _STOP
+    _STOP = True
+
+
+def run_forever(batch_size: int = 50, max_idle_s: float = 30.0) -> None:
+    """
+    Resident worker: drain due rows in batches, then sleep on LISTEN
+    notification_outbox until notified, the earliest next_attempt_at, or max_idle_s
+    (covers stale IN_FLIGHT locks and missed notifications). Reconnects after any error.
+    """
+    worker_id = os.getenv("WORKER_ID", socket.gethostname())
+    dsn = os.getenv("DATABASE_URL", get_db_dsn())
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    executor = DeliveryExecutor()
+
+    while not _STOP:
+        conn = listen = None
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.autocommit = False
+            listen = psycopg2.connect(dsn)
+            listen.autocommit = True
+            with listen.cursor() as lcur:
+                lcur.execute("LISTEN notification_outbox;")
+
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                while not _STOP:
+                    n = process_batch(conn, cur, worker_id, batch_size, executor)
+                    if n:
+                        print(f"processed={n}", flush=True)
+                    if n == batch_size:
+                        continue  # more may be due
+
+                    due_in = seconds_until_next_due(cur)
+                    conn.rollback()
+                    wait = max_idle_s if due_in is None else min(max_idle_s, due_in)
+                    # due rows we could not claim are locked by another worker: back off briefly
+                    wait = max(wait, 0.2)
+                    if not listen.notifies:
+                        select.select([listen], [], [], wait)
+                    listen.poll()
+                    listen.notifies.clear()
+        except psycopg2.OperationalError as e:
+            print(f"db_error={type(e).__name__}: {e}", file=sys.stderr, flush=True)
+            time.sleep(min(max_idle_s, 5.0))
+        except Exception as e:
+            # claimed rows of a failed batch stay IN_FLIGHT until their lock goes stale
+            print(f"worker_error={type(e).__name__}: {e}", file=sys.stderr, flush=True)
+            time.sleep(min(max_idle_s, 5.0))
+        finally:
+            for c in (conn, listen):
+                if c is not None:
+                    try:
+                        c.close()
+                    except Exception:
+                        pass
+    executor.close()
+
+
 def main():
-    limit = 1
-    if len(sys.argv) >= 2:
-        limit = int(sys.argv[1])
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "limit", nargs="?", type=int, default=1, help="One-shot: max rows to process"
+    )
+    ap.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Resident worker (batch claim + LISTEN notification_outbox)",
+    )
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=int(os.getenv("NOTIFICATION_WORKER_BATCH", "50")),
+        help="Rows claimed per transaction",
+    )
+    ap.add_argument(
+        "--max-idle-seconds",
+        type=float,
+        default=float(os.getenv("NOTIFICATION_WORKER_MAX_IDLE_S", "30")),
+        help="Longest sleep without a notification in --daemon mode",
+    )
+    args = ap.parse_args()
+
+    if args.daemon:
+        run_forever(batch_size=args.batch_size, max_idle_s=args.max_idle_seconds)
+        return
 
-    n = run_once(limit=limit)
+    n = run_once(limit=args.limit, batch_size=args.batch_size)
     print(f"processed={n}")
 
 
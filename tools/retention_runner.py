@@ -1,14 +1,31 @@
 #!/usr/bin/env python3
+"""
+Retention runner: preview/prune rows older than --days per scope (dry-run by default).
+
+Connects directly to Postgres, so a DSN is required:
+  - DATABASE_URL, or
+  - PGHOST (+ PGPORT/PGUSER/PGPASSWORD/PGDATABASE, default 5432/agingos/agingos/agingos).
+
+The base docker-compose.yml does not publish the db port. Either run inside the
+backend container, which has DATABASE_URL and mounts tools/ at /tools:
+  docker compose exec -T backend python3 /tools/retention_runner.py --days 180
+or publish 127.0.0.1:5432 with docker-compose.dev.yml and set PGHOST=localhost.
+
+The JSON report has per-table totals under "tables" and the overall row count
+under "deleted".
+"""
 import argparse
 import datetime as dt
 import json
 import os
-import subprocess
-from typing import Dict, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-DB_CONTAINER = os.environ.get("AGINGOS_DB_CONTAINER", "agingos-db-1")
-DB_USER = os.environ.get("AGINGOS_DB_USER", "agingos")
-DB_NAME = os.environ.get("AGINGOS_DB_NAME", "agingos")
+import psycopg2
+import psycopg2.errors
+import psycopg2.pool
 
 TABLES = [
     ("events", "retention_preview_events", "retention_prune_events", 5000),
@@ -28,75 +45,212 @@ TABLES = [
     ("deviations", "retention_preview_deviations", "retention_prune_deviations", 2000),
 ]
 
+# Adaptive batch bounds (rows per retention_prune_* call)
+MIN_LIMIT = 100
+MAX_LIMIT = 50000
+
+Scope = Tuple[str, str, str]
 
-def psql(sql: str) -> str:
-    cmd = [
-        "docker",
-        "exec",
-        "-i",
-        DB_CONTAINER,
-        "psql",
-        "-U",
-        DB_USER,
-        "-d",
-        DB_NAME,
-        "-v",
-        "ON_ERROR_STOP=1",
-        "-At",
-    ]
-    p = subprocess.run(
-        cmd, input=sql.encode("utf-8"), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if p.returncode != 0:
-        raise RuntimeError(p.stderr.decode("utf-8"))
-    return p.stdout.decode("utf-8").strip()
 
+def db_dsn() -> str:
+    # DATABASE_URL, else PG* with PGHOST required; no silent localhost fallback since
+    # the base compose file does not publish the db port
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        host = os.getenv("PGHOST")
+        if not host:
+            raise SystemExit(
+                "retention_runner: no database configured; set DATABASE_URL or PGHOST "
+                "(e.g. docker compose exec -T backend python3 /tools/retention_runner.py)"
+            )
+        port = os.getenv("PGPORT", "5432")
+        user = os.getenv("PGUSER", "agingos")
+        pwd = os.getenv("PGPASSWORD", "agingos")
+        db = os.getenv("PGDATABASE", "agingos")
+        dsn = f"postgresql://{user}:{pwd}@{host}:{port}/{db}"
+    return dsn
 
-def get_scopes() -> List[Tuple[str, str, str]]:
-    out = psql("""
-    SELECT DISTINCT org_id, home_id, subject_id
-    FROM public.events
-    ORDER BY 1,2,3;
-    """)
-    scopes = []
-    if out:
-        for line in out.splitlines():
-            org_id, home_id, subject_id = line.split("|")
-            scopes.append((org_id, home_id, subject_id))
-    return scopes
+
+@contextmanager
+def pooled(pool: psycopg2.pool.ThreadedConnectionPool) -> Iterator[Any]:
+    conn = pool.getconn()
+    conn.autocommit = True  # each retention_prune_* batch commits on its own
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def scalar(conn, sql: str, params: tuple) -> int:
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+def get_scopes(conn) -> List[Scope]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT DISTINCT org_id, home_id, subject_id
+            FROM public.events
+            ORDER BY 1,2,3
+            """
+        )
+        return [(r[0], r[1], r[2]) for r in cur.fetchall()]
 
 
 def iso(ts: dt.datetime) -> str:
     return ts.replace(microsecond=0).isoformat()
 
 
-def preview(scope: Tuple[str, str, str], before: dt.datetime) -> Dict[str, int]:
-    org_id, home_id, subject_id = scope
-    result: Dict[str, int] = {}
+def next_limit(limit: int, elapsed_s: float, target_s: float) -> int:
+    """
+    Scale the batch towards target_s per call.
+
+    Growth/shrink is capped at 2x per step so one slow or fast outlier (lock wait,
+    cold cache) does not swing the batch size.
+    """
+    if elapsed_s <= 0:
+        factor = 2.0
+    else:
+        factor = min(2.0, max(0.5, target_s / elapsed_s))
+    return int(min(MAX_LIMIT, max(MIN_LIMIT, limit * factor)))
+
+
+def preview(conn, scope: Scope, before: dt.datetime) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
     for table, fn_preview, _, _limit in TABLES:
-        q = f"SELECT public.{fn_preview}('{org_id}','{home_id}','{subject_id}','{iso(before)}'::timestamptz);"
-        n = int(psql(q) or "0")
-        result[table] = n
-    return result
-
-
-def prune(
-    scope: Tuple[str, str, str], before: dt.datetime, execute: bool, max_rounds: int
-) -> Dict[str, int]:
-    org_id, home_id, subject_id = scope
-    totals: Dict[str, int] = {t: 0 for t, _, _, _ in TABLES}
-    if not execute:
-        return totals
-
-    for table, _prev, fn_prune, limit in TABLES:
-        rounds = 0
-        while rounds < max_rounds:
-            q = f"SELECT public.{fn_prune}('{org_id}','{home_id}','{subject_id}','{iso(before)}'::timestamptz,{limit});"
-            n = int(psql(q) or "0")
-            totals[table] += n
-            rounds += 1
-            if n == 0:
-                break
+        t0 = time.monotonic()
+        n = scalar(conn, f"SELECT public.{fn_preview}(%s,%s,%s,%s)", (*scope, before))
+        out[table] = {"rows": n, "ms": int((time.monotonic() - t0) * 1000)}
+    return out
+
+
+def prune_table(
+    conn,
+    scope: Scope,
+    before: dt.datetime,
+    fn_prune: str,
+    *,
+    limit: int,
+    target_s: float,
+    max_rounds: int,
+    deadline: Optional[float],
+) -> Dict[str, Any]:
+    """
+    Call fn_prune in batches until a short batch (nothing left) or a limit is hit.
+
+    The connection is in autocommit (see pooled), so row locks are held for one
+    batch only.
+    """
+    deleted = 0
+    rounds = 0
+    batch_ms: List[int] = []
+    stopped = "done"
+    t_start = time.monotonic()
+
+    while True:
+        if rounds >= max_rounds:
+            stopped = "max_rounds"
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            stopped = "deadline"
+            break
+        t0 = time.monotonic()
+        n = scalar(
+            conn, f"SELECT public.{fn_prune}(%s,%s,%s,%s,%s)", (*scope, before, limit)
+        )
+        elapsed = time.monotonic() - t0
+        batch_ms.append(int(elapsed * 1000))
+        deleted += n
+        rounds += 1
+        if n < limit:
+            break
+        limit = next_limit(limit, elapsed, target_s)
+
+    return {
+        "deleted": deleted,
+        "batches": rounds,
+        "ms": int((time.monotonic() - t_start) * 1000),
+        "max_batch_ms": max(batch_ms) if batch_ms else 0,
+        "final_limit": limit,
+        "stopped": stopped,
+    }
+
+
+def run_scope(
+    pool,
+    scope: Scope,
+    before: dt.datetime,
+    *,
+    execute: bool,
+    target_s: float,
+    max_rounds: int,
+    deadline: Optional[float],
+) -> Dict[str, Any]:
+    with pooled(pool) as conn:
+        out: Dict[str, Any] = {
+            "org_id": scope[0],
+            "home_id": scope[1],
+            "subject_id": scope[2],
+            "preview": preview(conn, scope, before),
+            "tables": {},
+        }
+        if not execute:
+            return out
+        for table, _prev, fn_prune, limit in TABLES:
+            out["tables"][table] = prune_table(
+                conn,
+                scope,
+                before,
+                fn_prune,
+                limit=limit,
+                target_s=target_s,
+                max_rounds=max_rounds,
+                deadline=deadline,
+            )
+        return out
+
+
+def drop_event_partitions(conn, before: dt.datetime) -> Dict[str, Any]:
+    """
+    Detach/drop whole monthly events partitions older than `before` (all scopes).
+
+    retention_prune_events then only deletes rows in the boundary month. Skipped on
+    deployments where events is not partitioned.
+    """
+    t0 = time.monotonic()
+    try:
+        n = scalar(conn, "SELECT public.retention_drop_event_partitions(%s)", (before,))
+    except psycopg2.errors.UndefinedFunction:
+        return {"dropped": 0, "ms": 0, "skipped": "not_partitioned"}
+    return {"dropped": n, "ms": int((time.monotonic() - t0) * 1000)}
+
+
+def summarize(scopes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per-table totals across scopes (timing report)."""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for table, _, _, _ in TABLES:
+        t = {
+            "preview_rows": 0,
+            "preview_ms": 0,
+            "deleted": 0,
+            "batches": 0,
+            "ms": 0,
+            "max_batch_ms": 0,
+        }
+        for s in scopes:
+            p = s["preview"].get(table) or {}
+            t["preview_rows"] += p.get("rows", 0)
+            t["preview_ms"] += p.get("ms", 0)
+            r = s["tables"].get(table)
+            if r:
+                t["deleted"] += r["deleted"]
+                t["batches"] += r["batches"]
+                t["ms"] += r["ms"]
+                t["max_batch_ms"] = max(t["max_batch_ms"], r["max_batch_ms"])
+        totals[table] = t
     return totals
 
 
@@ -116,30 +270,66 @@ def main():
     ap.add_argument(
         "--max-rounds", type=int, default=200, help="Max batches per table per scope"
     )
+    ap.add_argument(
+        "--batch-seconds",
+        type=float,
+        default=1.0,
+        help="Target duration per prune batch; batch size adapts towards it",
+    )
+    ap.add_argument(
+        "--concurrency", type=int, default=4, help="Scopes processed in parallel"
+    )
+    ap.add_argument(
+        "--deadline-seconds",
+        type=float,
+        default=None,
+        help="Stop starting new batches after this many seconds (report says 'deadline')",
+    )
     args = ap.parse_args()
 
     before = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=args.days)
+    t0 = time.monotonic()
+    deadline = t0 + args.deadline_seconds if args.deadline_seconds else None
+    workers = max(1, args.concurrency)
+
+    pool = psycopg2.pool.ThreadedConnectionPool(1, workers, db_dsn())
+    try:
+        with pooled(pool) as conn:
+            partitions = drop_event_partitions(conn, before) if args.execute else None
+            scopes = get_scopes(conn)
+        # each scope borrows a pool connection for its duration (run_scope); the pool
+        # holds at most one per worker thread
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            results = list(
+                ex.map(
+                    lambda s: run_scope(
+                        pool,
+                        s,
+                        before,
+                        execute=args.execute,
+                        target_s=args.batch_seconds,
+                        max_rounds=args.max_rounds,
+                        deadline=deadline,
+                    ),
+                    scopes,
+                )
+            )
+    finally:
+        pool.closeall()
 
-    scopes = get_scopes()
+    tables = summarize(results)
     report = {
         "before": iso(before),
         "execute": args.execute,
-        "scopes": [],
+        "concurrency": workers,
+        "batch_seconds": args.batch_seconds,
+        "duration_ms": int((time.monotonic() - t0) * 1000),
+        "event_partitions": partitions,
+        "deleted": sum(t["deleted"] for t in tables.values()),
+        "tables": tables,
+        "scopes": results,
     }
 
-    for scope in scopes:
-        prev = preview(scope, before)
-        deleted = prune(scope, before, args.execute, args.max_rounds)
-        report["scopes"].append(
-            {
-                "org_id": scope[0],
-                "home_id": scope[1],
-                "subject_id": scope[2],
-                "preview": prev,
-                "deleted": deleted,
-            }
-        )
-
     print(json.dumps(report, indent=2))
 
 